@@ -195,7 +195,7 @@ async def websocket_chat(websocket: WebSocket):
                         continue
 
                     # Process message through agent with streaming
-                    async for event in agent.run_streaming(session, content):
+                    async for event in agent.run(session, content):
                         await websocket.send_json(event)
 
                     # Save session after each turn
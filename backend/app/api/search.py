@@ -4,14 +4,22 @@ Search API endpoints.
 Direct search endpoints (bypassing agent) for programmatic access.
 """
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response
 from loguru import logger
 
 from app.services.parcel_search import hybrid_search, SearchPreferences, SearchResult
-from app.services.spatial_service import spatial_service
+from app.services.spatial_service import spatial_service, TWKB_MEDIA_TYPE
 from app.services.graph_service import graph_service
+from app.services.query_templates import query_templates
+from app.services.facet_cube import facet_cube
+from app.services.district_stats import district_stats
+from app.services.location_index import location_index
+from app.services.embedding_service import EmbeddingService
+from app.services.tile_service import tile_service
+from app.services.road_graph import road_graph
 from app.models.schemas import (
     SearchPreferencesRequest,
     SearchResponse,
@@ -33,6 +41,8 @@ from app.models.schemas import (
     NeighborhoodNeighbors,
     NeighborhoodPOI,
     NeighborhoodAssessment,
+    NeighborhoodBatchRequest,
+    NeighborhoodBatchResponse,
 )
 from app.services.neighborhood_service import get_neighborhood_service
 
@@ -110,6 +120,8 @@ async def search_parcels(
             results=items,
             free_results=3,
             requires_payment=len(items) > 3,
+            strategy=results.strategy,
+            latency_ms=results.latency_ms,
         )
 
     except Exception as e:
@@ -164,6 +176,8 @@ async def find_similar(
             results=items,
             free_results=3,
             requires_payment=len(items) > 3,
+            strategy=results.strategy,
+            latency_ms=results.latency_ms,
         )
 
     except Exception as e:
@@ -259,13 +273,28 @@ async def get_parcel_details(
 # =============================================================================
 
 @router.post("/map", response_model=MapDataResponse)
-async def generate_map_data(request: MapDataRequest):
+async def generate_map_data(
+    request: MapDataRequest,
+    accept: Optional[str] = Header(None),
+):
     """
     Generate GeoJSON map data for the given parcel IDs.
 
     Returns GeoJSON FeatureCollection suitable for Leaflet/MapLibre.
+    With `Accept: application/vnd.moja-dzialka.twkb` returns the same data as
+    a binary frame of TWKB geometries built in PostGIS (see
+    SpatialService.generate_twkb_frame).
     """
     try:
+        if accept and TWKB_MEDIA_TYPE in accept:
+            frame = await spatial_service.generate_twkb_frame(
+                parcel_ids=request.parcel_ids,
+                include_geometry=request.include_geometry,
+            )
+            if not frame:
+                raise HTTPException(status_code=404, detail="No parcels found")
+            return Response(content=frame, media_type=TWKB_MEDIA_TYPE, headers={"Vary": "Accept"})
+
         result = await spatial_service.generate_geojson(
             parcel_ids=request.parcel_ids,
             include_geometry=request.include_geometry,
@@ -396,51 +425,7 @@ async def get_neighborhood_analysis(
         if "error" in analysis:
             raise HTTPException(status_code=404, detail=analysis["error"])
 
-        # Map to response schema
-        return NeighborhoodResponse(
-            parcel_id=analysis.get("parcel_id", parcel_id),
-            district=analysis.get("district"),
-            city=analysis.get("city"),
-            character=NeighborhoodCharacter(
-                type=analysis.get("character", {}).get("type", "unknown"),
-                description=analysis.get("character", {}).get("description", ""),
-            ),
-            density=NeighborhoodDensity(
-                building_pct=analysis.get("density", {}).get("building_pct", 0),
-                residential_pct=analysis.get("density", {}).get("residential_pct", 0),
-                avg_parcel_size_m2=analysis.get("density", {}).get("avg_parcel_size_m2"),
-            ),
-            environment=NeighborhoodEnvironment(
-                quietness_score=analysis.get("environment", {}).get("quietness_score", 50),
-                nature_score=analysis.get("environment", {}).get("nature_score", 50),
-                accessibility_score=analysis.get("environment", {}).get("accessibility_score", 50),
-            ),
-            scores=NeighborhoodScores(
-                transport=analysis.get("scores", {}).get("transport", 50),
-                amenities=analysis.get("scores", {}).get("amenities", 50),
-                overall_livability=analysis.get("scores", {}).get("overall_livability", 50),
-            ),
-            neighbors=NeighborhoodNeighbors(
-                adjacent_count=analysis.get("neighbors", {}).get("adjacent_count", 0),
-                adjacent_parcels=analysis.get("neighbors", {}).get("adjacent_parcels", []),
-                nearby_poi_count=analysis.get("neighbors", {}).get("nearby_poi_count", 0),
-            ),
-            poi=[
-                NeighborhoodPOI(
-                    type=p.get("type", "unknown"),
-                    name=p.get("name"),
-                    distance_m=p.get("distance_m", 0),
-                )
-                for p in analysis.get("poi", [])
-            ],
-            assessment=NeighborhoodAssessment(
-                strengths=analysis.get("assessment", {}).get("strengths", []),
-                weaknesses=analysis.get("assessment", {}).get("weaknesses", []),
-                ideal_for=analysis.get("assessment", {}).get("ideal_for", []),
-            ),
-            summary=analysis.get("summary", ""),
-            is_premium=True,
-        )
+        return _to_neighborhood_response(analysis, parcel_id)
 
     except HTTPException:
         raise
@@ -449,6 +434,80 @@ async def get_neighborhood_analysis(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/neighborhood/batch", response_model=NeighborhoodBatchResponse)
+async def get_neighborhood_analysis_batch(request: NeighborhoodBatchRequest):
+    """
+    Neighborhood analysis for several parcels in one call.
+
+    Same analysis as GET /neighborhood/{parcel_id}, fetched for all parcels
+    in a single graph round trip (e.g., comparing or rendering a result page).
+    """
+    try:
+        service = get_neighborhood_service()
+        analyses = await service.analyze_neighborhoods(request.parcel_ids, request.radius_m)
+
+        results, not_found = [], []
+        for parcel_id, analysis in analyses.items():
+            if "error" in analysis:
+                not_found.append(parcel_id)
+            else:
+                results.append(_to_neighborhood_response(analysis, parcel_id))
+
+        return NeighborhoodBatchResponse(count=len(results), results=results, not_found=not_found)
+
+    except Exception as e:
+        logger.error(f"Neighborhood batch analysis error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _to_neighborhood_response(analysis: Dict[str, Any], parcel_id: str) -> NeighborhoodResponse:
+    """Map a NeighborhoodService analysis to the response schema."""
+    return NeighborhoodResponse(
+        parcel_id=analysis.get("parcel_id", parcel_id),
+        district=analysis.get("district"),
+        city=analysis.get("city"),
+        character=NeighborhoodCharacter(
+            type=analysis.get("character", {}).get("type", "unknown"),
+            description=analysis.get("character", {}).get("description", ""),
+        ),
+        density=NeighborhoodDensity(
+            building_pct=analysis.get("density", {}).get("building_pct", 0),
+            residential_pct=analysis.get("density", {}).get("residential_pct", 0),
+            avg_parcel_size_m2=analysis.get("density", {}).get("avg_parcel_size_m2"),
+        ),
+        environment=NeighborhoodEnvironment(
+            quietness_score=analysis.get("environment", {}).get("quietness_score", 50),
+            nature_score=analysis.get("environment", {}).get("nature_score", 50),
+            accessibility_score=analysis.get("environment", {}).get("accessibility_score", 50),
+        ),
+        scores=NeighborhoodScores(
+            transport=analysis.get("scores", {}).get("transport", 50),
+            amenities=analysis.get("scores", {}).get("amenities", 50),
+            overall_livability=analysis.get("scores", {}).get("overall_livability", 50),
+        ),
+        neighbors=NeighborhoodNeighbors(
+            adjacent_count=analysis.get("neighbors", {}).get("adjacent_count", 0),
+            adjacent_parcels=analysis.get("neighbors", {}).get("adjacent_parcels", []),
+            nearby_poi_count=analysis.get("neighbors", {}).get("nearby_poi_count", 0),
+        ),
+        poi=[
+            NeighborhoodPOI(
+                type=p.get("type", "unknown"),
+                name=p.get("name"),
+                distance_m=p.get("distance_m", 0),
+            )
+            for p in analysis.get("poi", [])
+        ],
+        assessment=NeighborhoodAssessment(
+            strengths=analysis.get("assessment", {}).get("strengths", []),
+            weaknesses=analysis.get("assessment", {}).get("weaknesses", []),
+            ideal_for=analysis.get("assessment", {}).get("ideal_for", []),
+        ),
+        summary=analysis.get("summary", ""),
+        is_premium=True,
+    )
+
+
 # =============================================================================
 # STATISTICS
 # =============================================================================
@@ -464,6 +523,13 @@ async def get_search_stats():
             "total_parcels": total_parcels,
             "total_gminy": len(gminy),
             "data_version": "dev-sample-v1.0.0",
+            "query_templates": query_templates.stats(),
+            "facet_cube": facet_cube.stats(),
+            "district_stats": district_stats.stats(),
+            "location_index": location_index.stats(),
+            "embeddings": EmbeddingService.stats(),
+            "tiles": tile_service.stats(),
+            "road_graph": road_graph.stats(),
         }
 
     except Exception as e:
@@ -0,0 +1,61 @@
+"""
+Vector tile endpoints for the parcel map layer.
+
+Endpoints:
+- GET /api/v1/tiles/parcels/{z}/{x}/{y}.mvt - Parcel polygons as Mapbox Vector Tile
+"""
+
+import gzip
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from loguru import logger
+
+from app.config import settings
+from app.services.tile_service import tile_service, valid_tile
+
+
+router = APIRouter(prefix="/tiles", tags=["tiles"])
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+
+@router.get("/parcels/{z}/{x}/{y}.mvt")
+async def get_parcel_tile(z: int, x: int, y: int, request: Request):
+    """
+    Parcel layer tile (layer "parcels") in the XYZ scheme.
+
+    Features carry id_dzialki, quietness_score, nature_score, pog_symbol and
+    area_m2. Tiles without parcels (or below the minimum zoom) return 204.
+    Responses are gzip-encoded when the client accepts it and revalidate
+    with ETag / If-None-Match.
+    """
+    if not valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    if z > settings.tiles_max_zoom:
+        raise HTTPException(status_code=404, detail=f"Max zoom is {settings.tiles_max_zoom}")
+
+    tile = await tile_service.get_tile(z, x, y)
+    if tile is None:
+        raise HTTPException(status_code=500, detail="Tile rendering failed")
+
+    headers = {
+        "ETag": tile.etag,
+        "Cache-Control": f"public, max-age={settings.tiles_max_age_s}",
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == tile.etag:
+        return Response(status_code=304, headers=headers)
+    if tile.empty:
+        return Response(status_code=204, headers=headers)
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=tile.data, media_type=MVT_MEDIA_TYPE, headers=headers)
+
+    try:
+        data = gzip.decompress(tile.data)
+    except OSError as e:
+        logger.error(f"Corrupt cached tile {z}/{x}/{y}: {e}")
+        raise HTTPException(status_code=500, detail="Tile rendering failed")
+    return Response(content=data, media_type=MVT_MEDIA_TYPE, headers=headers)
@@ -47,6 +47,52 @@ class Settings(BaseSettings):
     debug: bool = False
     persistence_backend: str = "memory"
 
+    # Columnar parcel store (in-process scoring for search_parcels)
+    parcel_store_enabled: bool = False
+    parcel_store_path: str = "/tmp/moja-dzialka/parcel_store"
+
+    # Hybrid search: run the next relaxation strategy alongside the current one
+    search_speculative: bool = True
+
+    # Search result cache (memory LRU + Redis), keyed on dataset version
+    search_cache_enabled: bool = True
+    search_cache_size: int = 512
+    search_cache_ttl_s: int = 3600
+
+    # Facet cube (in-process counts for search_count / diagnosis)
+    facet_cube_enabled: bool = True
+    facet_cube_path: str = "/tmp/moja-dzialka/facet_cube"
+
+    # Materialized District/City aggregates: recompute at runtime when the
+    # stamp is stale (off by default: full parcel scan; pipeline step 30
+    # writes them)
+    district_stats_refresh: bool = False
+
+    # Query embeddings: memory LRU + Redis cache (float16), and micro-batching
+    # of concurrent encode calls into one model.encode in a worker thread
+    embedding_cache_size: int = 4096
+    embedding_cache_ttl_s: int = 7 * 24 * 3600
+    embedding_batch_max: int = 32
+    embedding_batch_wait_ms: float = 5.0
+
+    # Parcel vector tiles (/api/v1/tiles), cached on disk per dataset version;
+    # below min zoom tiles are empty, from full detail zoom on unsimplified
+    tiles_cache_path: str = "/tmp/moja-dzialka/tiles"
+    tiles_min_zoom: int = 12
+    tiles_max_zoom: int = 20
+    tiles_full_detail_zoom: int = 17
+    tiles_max_age_s: int = 300
+
+    # Road graph for travel-time search (egib pipeline 07b_build_road_graph.py);
+    # Dijkstra results cached per (travel mode, origin node)
+    road_graph_enabled: bool = True
+    road_graph_path: str = "/tmp/moja-dzialka/road_graph.npz"
+    road_graph_cache_size: int = 128
+
+    # Agent: read-only tool_use blocks of one turn run concurrently, at most
+    # this many at a time per session
+    agent_tool_concurrency: int = 4
+
     @property
     def cors_origins(self) -> List[str]:
         return json.loads(self.cors_origins_str)
@@ -13,16 +13,17 @@ Architecture:
         ▼
     Claude API (Sonnet 4.5) with 16 tools
         │
-        ├─ text → stream to frontend
-        ├─ tool_use → check gates → execute → return result
+        ├─ text delta → stream to frontend
+        ├─ tool_use block complete → check gates → execute (while the
+        │  model may still stream further blocks) → return result
         └─ stop → save session
 """
 
 from __future__ import annotations
 
-import json
+import asyncio
 import time
-from typing import Dict, Any, List, Optional, AsyncGenerator
+from typing import Dict, Any, List, Optional, AsyncGenerator, Callable
 
 from loguru import logger
 import anthropic
@@ -31,6 +32,8 @@ from app.config import settings
 from app.engine.session import Session
 from app.engine.notepad import Notepad, LocationState, SearchResults
 from app.engine.prompt_compiler import get_system_prompt
+from app.engine.prompt_cache import build_request, log_cache_usage
+from app.engine.result_projector import result_projector
 from app.engine.tool_definitions import get_tool_definitions
 from app.engine.tool_gates import check_gates
 from app.engine.tool_executor_v4 import ToolExecutorV4
@@ -40,6 +43,105 @@ from app.engine.tool_executor_v4 import ToolExecutorV4
 MAX_RETRIES = 3
 
 
+class ToolScheduler:
+    """Run one turn's tool calls as their tool_use blocks complete.
+
+    Read-only tools (ToolExecutorV4.is_read_only) start at once and run
+    concurrently, at most settings.agent_tool_concurrency at a time. Any
+    other tool waits for every call before it and runs alone, so its gates
+    and the calls after it see all earlier notepad updates. Updates are
+    applied in the original call order; tool_result events are queued as
+    each tool finishes.
+    """
+
+    def __init__(
+        self,
+        notepad: Notepad,
+        executor: ToolExecutorV4,
+        apply_updates: Callable[[Notepad, Dict[str, Any]], None],
+    ):
+        self.notepad = notepad
+        self.executor = executor
+        self.calls: List[Dict[str, Any]] = []
+        self.results: List[Optional[Dict[str, Any]]] = []
+        self._apply_updates = apply_updates
+        self._semaphore = asyncio.Semaphore(max(1, settings.agent_tool_concurrency))
+        self._tasks: List[asyncio.Task] = []
+        self._barrier: Optional[asyncio.Task] = None
+        self._updates: Dict[int, Dict[str, Any]] = {}
+        self._applied = 0
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._emitted = 0
+
+    def submit(self, call: Dict[str, Any]) -> None:
+        """Schedule a complete tool call ({"name", "input", "id"})."""
+        index = len(self.calls)
+        self.calls.append(call)
+        self.results.append(None)
+
+        if self.executor.is_read_only(call["name"]):
+            wait_for = [self._barrier] if self._barrier else []
+            task = asyncio.create_task(self._execute(index, wait_for))
+        else:
+            task = asyncio.create_task(self._execute(index, list(self._tasks)))
+            self._barrier = task
+        self._tasks.append(task)
+
+    async def _execute(self, index: int, wait_for: List[asyncio.Task]) -> None:
+        if wait_for:
+            await asyncio.wait(wait_for)
+
+        call = self.calls[index]
+        async with self._semaphore:
+            start_time = time.time()
+            try:
+                gate_error = check_gates(call["name"], self.notepad, call["input"])
+                if gate_error:
+                    result, updates = gate_error, {}
+                else:
+                    result, updates = await self.executor.execute(call["name"], call["input"])
+            except Exception as e:
+                logger.error(f"Tool scheduling error ({call['name']}): {e}")
+                result, updates = {"error": str(e)}, {}
+            duration_ms = int((time.time() - start_time) * 1000)
+
+        self.results[index] = result
+        self._updates[index] = updates
+        # Apply updates in call order, as far as the earlier calls are done
+        while self._applied in self._updates:
+            self._apply_updates(self.notepad, self._updates.pop(self._applied))
+            self._applied += 1
+
+        self._events.put_nowait({
+            "type": "tool_result",
+            "data": {
+                "name": call["name"],
+                "id": call["id"],
+                "result": result,
+                "duration_ms": duration_ms,
+            },
+        })
+
+    def ready(self) -> List[Dict[str, Any]]:
+        """tool_result events of the tools finished so far (non-blocking)."""
+        events = []
+        while not self._events.empty():
+            events.append(self._events.get_nowait())
+        self._emitted += len(events)
+        return events
+
+    async def remaining(self) -> AsyncGenerator[Dict[str, Any], None]:
+        """Wait for the remaining tools, yielding their events as they finish."""
+        while self._emitted < len(self.calls):
+            event = await self._events.get()
+            self._emitted += 1
+            yield event
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+
 class Agent:
     """Single agent with tool calling and streaming.
 
@@ -70,14 +172,17 @@ class Agent:
         session: Session,
         user_message: str,
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """Run the agent loop for a single user message.
+        """Run the agent loop for a single user message (token streaming).
+
+        Text deltas are forwarded as they arrive. Each tool starts as soon
+        as its tool_use block is complete, while the model may still be
+        streaming further blocks; its tool_result is yielded when it finishes.
 
         Yields events:
-        - {"type": "thinking", "data": {"text": "..."}}
         - {"type": "message", "data": {"text": "...", "delta": true}}
         - {"type": "tool_call", "data": {"name": "...", "input": {...}, "id": "..."}}
-        - {"type": "tool_result", "data": {"name": "...", "result": {...}, "duration_ms": N}}
-        - {"type": "done", "data": {"session_id": "..."}}
+        - {"type": "tool_result", "data": {"name": "...", "id": "...", "result": {...}, "duration_ms": N}}
+        - {"type": "done", "data": {"session_id": "...", "ttft_ms": [N, ...]}}
         - {"type": "error", "data": {"message": "..."}}
         """
         # Check compaction before processing
@@ -86,6 +191,9 @@ class Agent:
 
         # Build messages for API
         api_messages = session.build_messages_for_api(user_message)
+        # History before the current (notepad-injected) user message is the
+        # cacheable prefix shared with the previous user turns
+        stable_prefix = len(api_messages) - 1
 
         # Create tool executor for this turn
         executor = ToolExecutorV4(session.notepad, session.session_id)
@@ -94,104 +202,98 @@ class Agent:
         collected_text = ""
         collected_tool_calls = []
         collected_tool_results = []
+        ttft_ms: List[int] = []
         iteration = 0
 
-        while iteration < self.MAX_TOOL_ITERATIONS:
-            iteration += 1
-
-            # Call Claude API (SDK handles retries)
-            try:
-                response = await self._call_api(api_messages)
-            except anthropic.APIError as e:
-                logger.error(f"API error: {e}")
-                yield {"type": "error", "data": {"message": str(e)}}
-                return
-
-            # Process response
-            text_parts = []
-            tool_uses = []
-
-            for block in response.content:
-                if block.type == "text":
-                    text_parts.append(block.text)
-                    yield {"type": "message", "data": {"text": block.text, "delta": False}}
-                elif block.type == "tool_use":
-                    tool_uses.append(block)
-                    yield {
-                        "type": "tool_call",
-                        "data": {
-                            "name": block.name,
-                            "input": block.input,
-                            "id": block.id,
-                        },
-                    }
-
-            turn_text = "".join(text_parts)
-            collected_text += turn_text
-
-            # If no tool calls, we're done
-            if not tool_uses:
-                break
-
-            # Process tool calls
-            # Build assistant message with tool uses
-            assistant_content = []
-            if turn_text:
-                assistant_content.append({"type": "text", "text": turn_text})
-            for tu in tool_uses:
-                assistant_content.append({
-                    "type": "tool_use",
-                    "id": tu.id,
-                    "name": tu.name,
-                    "input": tu.input,
-                })
-
-            api_messages.append({"role": "assistant", "content": assistant_content})
-
-            # Execute each tool and build tool_result messages
-            tool_result_blocks = []
-            for tu in tool_uses:
-                start_time = time.time()
-
-                # Check gates first
-                gate_error = check_gates(tu.name, session.notepad, tu.input)
-                if gate_error:
-                    result = gate_error
-                    logger.info(f"Gate blocked {tu.name}: {gate_error['error']}")
-                else:
-                    # Execute tool
-                    result, notepad_updates = await executor.execute(tu.name, tu.input)
-
-                    # Apply notepad updates
-                    self._apply_notepad_updates(session.notepad, notepad_updates)
-
-                duration_ms = int((time.time() - start_time) * 1000)
+        # Tools still running when the turn ends early (error, client gone,
+        # generator closed) must not keep changing the notepad
+        scheduler: Optional[ToolScheduler] = None
+        try:
+            while iteration < self.MAX_TOOL_ITERATIONS:
+                iteration += 1
+                logger.debug(f"API call iteration {iteration}, messages count: {len(api_messages)}")
 
-                yield {
-                    "type": "tool_result",
-                    "data": {
-                        "name": tu.name,
-                        "result": result,
-                        "duration_ms": duration_ms,
-                    },
-                }
+                turn_text = ""
+                scheduler = ToolScheduler(session.notepad, executor, self._apply_notepad_updates)
+                turn_start = time.monotonic()
+                first_token_ms: Optional[int] = None
 
-                collected_tool_calls.append({"name": tu.name, "input": tu.input, "id": tu.id})
-                collected_tool_results.append({"name": tu.name, "result": result})
-
-                # Build tool_result block for API
-                tool_result_blocks.append({
-                    "type": "tool_result",
-                    "tool_use_id": tu.id,
-                    "content": json.dumps(result, ensure_ascii=False, default=str)[:10000],
-                })
-
-            # Add tool results to messages for next iteration
-            api_messages.append({"role": "user", "content": tool_result_blocks})
+                try:
+                    async with self._stream_api(api_messages, stable_prefix) as stream:
+                        async for event in stream:
+                            if event.type == "content_block_delta":
+                                if first_token_ms is None:
+                                    first_token_ms = int((time.monotonic() - turn_start) * 1000)
+                                if event.delta.type == "text_delta":
+                                    turn_text += event.delta.text
+                                    yield {
+                                        "type": "message",
+                                        "data": {"text": event.delta.text, "delta": True},
+                                    }
+                            elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                                # Input JSON complete - dispatch now
+                                block = event.content_block
+                                call = {"name": block.name, "input": block.input or {}, "id": block.id}
+                                yield {"type": "tool_call", "data": call}
+                                scheduler.submit(call)
+
+                            for tool_event in scheduler.ready():
+                                yield tool_event
+
+                        response = await stream.get_final_message()
+                    log_cache_usage(f"Agent turn {iteration}", response.usage)
+
+                except anthropic.APIError as e:
+                    logger.error(f"API error on iteration {iteration}: {e}")
+                    yield {"type": "error", "data": {"message": f"API error: {e}"}}
+                    return
+
+                if first_token_ms is not None:
+                    ttft_ms.append(first_token_ms)
+                logger.info(
+                    f"Agent turn {iteration}: first token {first_token_ms}ms, "
+                    f"stream {int((time.monotonic() - turn_start) * 1000)}ms, {len(scheduler.calls)} tools"
+                )
 
-            # If stop_reason is end_turn (not tool_use), break
-            if response.stop_reason != "tool_use":
-                break
+                collected_text += turn_text
+
+                # If no tool calls, we're done
+                if not scheduler.calls:
+                    break
+
+                # Wait for tools still running
+                async for tool_event in scheduler.remaining():
+                    yield tool_event
+
+                # Build assistant message with tool uses
+                assistant_content = []
+                if turn_text:
+                    assistant_content.append({"type": "text", "text": turn_text})
+                for call in scheduler.calls:
+                    assistant_content.append({"type": "tool_use", **call})
+
+                api_messages.append({"role": "assistant", "content": assistant_content})
+
+                # Build tool_result blocks for API (original order)
+                tool_result_blocks = []
+                for call, result in zip(scheduler.calls, scheduler.results):
+                    collected_tool_calls.append(call)
+                    collected_tool_results.append({"name": call["name"], "result": result})
+                    tool_result_blocks.append({
+                        "type": "tool_result",
+                        "tool_use_id": call["id"],
+                        "content": result_projector.project(call["name"], result),
+                    })
+
+                # Add tool results to messages for next iteration
+                api_messages.append({"role": "user", "content": tool_result_blocks})
+
+                # If stop_reason is end_turn (not tool_use), break
+                if response.stop_reason != "tool_use":
+                    break
+        finally:
+            if scheduler is not None:
+                scheduler.cancel()
 
         # Save messages to session
         session.add_user_message(user_message)
@@ -201,7 +303,7 @@ class Agent:
             tool_results=collected_tool_results if collected_tool_results else None,
         )
 
-        yield {"type": "done", "data": {"session_id": session.session_id}}
+        yield {"type": "done", "data": {"session_id": session.session_id, "ttft_ms": ttft_ms}}
 
     def _apply_notepad_updates(self, notepad: Notepad, updates: Dict[str, Any]) -> None:
         """Apply updates from tool execution to notepad."""
@@ -229,177 +331,11 @@ class Agent:
             for key, value in updates["user_fact"].items():
                 notepad.set_user_fact(key, value)
 
-    async def _call_api(
-        self,
-        messages: List[Dict[str, Any]],
-    ) -> anthropic.types.Message:
-        """Call Claude API. Retry is handled by the SDK (max_retries on client)."""
-        return await self.client.messages.create(
-            model=self.model,
-            max_tokens=self.MAX_TOKENS,
-            system=self.system_prompt,
-            tools=self.tools,
-            messages=messages,
-        )
-
-    async def run_streaming(
-        self,
-        session: Session,
-        user_message: str,
-    ) -> AsyncGenerator[Dict[str, Any], None]:
-        """Run agent with true streaming (token-by-token).
+    def _stream_api(self, messages: List[Dict[str, Any]], stable_prefix: int = 0):
+        """Open a streaming Claude API call with prompt-cache breakpoints.
 
-        Similar to run() but uses the streaming API for text generation,
-        yielding individual text deltas as they arrive.
+        Retry is handled by the SDK (max_retries on client).
         """
-        if session.should_compact():
-            session.compact()
-
-        api_messages = session.build_messages_for_api(user_message)
-        executor = ToolExecutorV4(session.notepad, session.session_id)
-
-        collected_text = ""
-        collected_tool_calls = []
-        collected_tool_results = []
-        iteration = 0
-
-        while iteration < self.MAX_TOOL_ITERATIONS:
-            iteration += 1
-
-            # Streaming API call
-            logger.debug(f"API call iteration {iteration}, messages count: {len(api_messages)}")
-            for i, m in enumerate(api_messages):
-                role = m.get("role", "?")
-                content = m.get("content", "")
-                if isinstance(content, list):
-                    types = [b.get("type", "?") for b in content]
-                    logger.debug(f"  messages[{i}]: role={role}, blocks={types}")
-                else:
-                    logger.debug(f"  messages[{i}]: role={role}, len={len(str(content))}")
-
-            turn_text = ""
-            tool_uses = []
-
-            try:
-                stream = self.client.messages.stream(
-                    model=self.model,
-                    max_tokens=self.MAX_TOKENS,
-                    system=self.system_prompt,
-                    tools=self.tools,
-                    messages=api_messages,
-                )
-                async with stream as s:
-                    async for event in s:
-                        if event.type == "content_block_start":
-                            if hasattr(event.content_block, "type"):
-                                if event.content_block.type == "tool_use":
-                                    tool_uses.append({
-                                        "id": event.content_block.id,
-                                        "name": event.content_block.name,
-                                        "input_json": "",
-                                    })
-                                    yield {
-                                        "type": "tool_call",
-                                        "data": {
-                                            "name": event.content_block.name,
-                                            "id": event.content_block.id,
-                                            "status": "started",
-                                        },
-                                    }
-                        elif event.type == "content_block_delta":
-                            if hasattr(event.delta, "text"):
-                                turn_text += event.delta.text
-                                yield {
-                                    "type": "message",
-                                    "data": {"text": event.delta.text, "delta": True},
-                                }
-                            elif hasattr(event.delta, "partial_json"):
-                                if tool_uses:
-                                    tool_uses[-1]["input_json"] += event.delta.partial_json
-
-                    # Get the final message
-                    response = await s.get_final_message()
-
-            except anthropic.APIError as e:
-                logger.error(f"API error on streaming iteration {iteration}: {e}")
-                yield {"type": "error", "data": {"message": f"API error: {e}"}}
-                return
-
-            collected_text += turn_text
-
-            # If no tool calls, we're done
-            if not tool_uses:
-                break
-
-            # Parse tool inputs and execute
-            assistant_content = []
-            if turn_text:
-                assistant_content.append({"type": "text", "text": turn_text})
-
-            parsed_tool_uses = []
-            for tu in tool_uses:
-                try:
-                    input_data = json.loads(tu["input_json"]) if tu["input_json"] else {}
-                except json.JSONDecodeError:
-                    input_data = {}
-
-                assistant_content.append({
-                    "type": "tool_use",
-                    "id": tu["id"],
-                    "name": tu["name"],
-                    "input": input_data,
-                })
-                parsed_tool_uses.append({
-                    "id": tu["id"],
-                    "name": tu["name"],
-                    "input": input_data,
-                })
-
-            api_messages.append({"role": "assistant", "content": assistant_content})
-
-            # Execute tools
-            tool_result_blocks = []
-            for tu in parsed_tool_uses:
-                start_time = time.time()
-
-                gate_error = check_gates(tu["name"], session.notepad, tu["input"])
-                if gate_error:
-                    result = gate_error
-                else:
-                    result, notepad_updates = await executor.execute(tu["name"], tu["input"])
-                    self._apply_notepad_updates(session.notepad, notepad_updates)
-
-                duration_ms = int((time.time() - start_time) * 1000)
-
-                yield {
-                    "type": "tool_result",
-                    "data": {
-                        "name": tu["name"],
-                        "result": result,
-                        "duration_ms": duration_ms,
-                    },
-                }
-
-                collected_tool_calls.append(tu)
-                collected_tool_results.append({"name": tu["name"], "result": result})
-
-                tool_result_blocks.append({
-                    "type": "tool_result",
-                    "tool_use_id": tu["id"],
-                    "content": json.dumps(result, ensure_ascii=False, default=str)[:10000],
-                })
-
-            api_messages.append({"role": "user", "content": tool_result_blocks})
-
-            if response.stop_reason != "tool_use":
-                break
-
-        # Save to session
-        session.add_user_message(user_message)
-        session.add_assistant_message(
-            content=collected_text,
-            tool_calls=collected_tool_calls if collected_tool_calls else None,
-            tool_results=collected_tool_results if collected_tool_results else None,
-        )
-
-        yield {"type": "done", "data": {"session_id": session.session_id}}
+        return self.client.messages.stream(**build_request(
+            self.model, self.MAX_TOKENS, self.system_prompt, self.tools, messages, stable_prefix,
+        ))
@@ -0,0 +1,106 @@
+"""
+Prompt cache - Claude API request builder with cache breakpoints.
+
+Every agent iteration resends the same prefix: tool schemas, the static
+system prompt (prompt_compiler) and the conversation so far. Marking it with
+cache_control lets the API reuse it instead of re-reading it up to
+MAX_TOOL_ITERATIONS times per user turn.
+
+Breakpoints (the API allows 4, each caches everything before it):
+1. last tool definition       -> tools
+2. system prompt              -> tools + system
+3. last stable message        -> + conversation history (before the current
+                                 user message, so the notepad injected into
+                                 it stays after the breakpoint)
+4. last message, from the second iteration of a turn on
+                              -> + this turn's tool_use / tool_result rounds
+
+Usage:
+    from app.engine.prompt_cache import build_request, log_cache_usage
+
+    request = build_request(model, max_tokens, system, tools, messages, stable_prefix)
+    response = await client.messages.create(**request)
+    log_cache_usage("agent", response.usage)
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _with_breakpoint(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a message with cache_control on its last content block."""
+    content = message["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = list(content)
+    if not blocks:
+        return message
+    blocks[-1] = {**blocks[-1], "cache_control": CACHE_CONTROL}
+    return {**message, "content": blocks}
+
+
+def build_request(
+    model: str,
+    max_tokens: int,
+    system: str,
+    tools: Optional[List[Dict[str, Any]]],
+    messages: List[Dict[str, Any]],
+    stable_prefix: int = 0,
+) -> Dict[str, Any]:
+    """Build messages.create / messages.stream kwargs with cache breakpoints.
+
+    Args:
+        model, max_tokens: Passed through
+        system: System prompt (cached as one text block)
+        tools: Tool definitions (omitted from the request when empty)
+        messages: Full message list; not modified
+        stable_prefix: Number of leading messages identical across user turns
+            (history before the current user message)
+
+    Returns:
+        Keyword arguments for the Anthropic client
+    """
+    request: Dict[str, Any] = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "system": [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}],
+        "messages": list(messages),
+    }
+
+    if tools:
+        request["tools"] = list(tools)
+        request["tools"][-1] = {**tools[-1], "cache_control": CACHE_CONTROL}
+
+    marked = set()
+    if 0 < stable_prefix <= len(messages):
+        marked.add(stable_prefix - 1)
+    # Tool rounds of this turn: the prefix up to the latest tool_result
+    # is resent by the next iteration
+    if len(messages) > stable_prefix + 1:
+        marked.add(len(messages) - 1)
+    for i in marked:
+        request["messages"][i] = _with_breakpoint(messages[i])
+
+    return request
+
+
+def log_cache_usage(label: str, usage: Any) -> None:
+    """Log input / cache read / cache write / output tokens of one API call."""
+    if usage is None:
+        return
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+    uncached = getattr(usage, "input_tokens", 0) or 0
+    total = uncached + cache_read + cache_write
+    logger.info(
+        f"{label} tokens: input {total} (cache read {cache_read}, cache write {cache_write}, "
+        f"uncached {uncached}), output {getattr(usage, 'output_tokens', 0)}"
+        + (f", {cache_read / total:.0%} cached" if total else "")
+    )
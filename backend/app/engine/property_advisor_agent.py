@@ -620,7 +620,16 @@ class PropertyAdvisorAgent:
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """Execute using multi-agent delegation.
 
-        Routes the task to appropriate sub-agents and synthesizes results.
+        Routes the task to sub-agents and runs them as a DAG
+        (AgentRouter.dependencies): an agent starts when the agents it
+        depends on have finished and their state updates are applied, so
+        independent agents (e.g. analyst + narrator) run concurrently with
+        their event streams multiplexed (each event tagged with its agent).
+
+        State updates are applied in route order, whatever order the agents
+        finish in; when concurrent agents write the same key, the one
+        routed later wins. The synthesized response streams as soon as the
+        first routed agent finishes.
 
         Args:
             user_message: User's message
@@ -629,69 +638,144 @@ class PropertyAdvisorAgent:
         Yields:
             Events during execution
         """
-        from app.engine.sub_agents import AgentRouter, AgentType
+        from app.engine.sub_agents import AgentRouter, SubAgentResult
 
-        # 1. Determine which sub-agents to use
+        # 1. Determine which sub-agents to use and what each waits for
         agent_types = AgentRouter.route(state, user_message)
+        dependencies = AgentRouter.dependencies(agent_types)
 
-        logger.info(f"Multi-agent routing: {[a.value for a in agent_types]}")
+        logger.info(
+            f"Multi-agent routing: {[a.value for a in agent_types]}, "
+            f"depends on: { {a.value: [d.value for d in deps] for a, deps in dependencies.items() if deps} }"
+        )
 
         yield {
             "type": "orchestrator_routing",
             "data": {
                 "agents": [a.value for a in agent_types],
+                "depends_on": {a.value: [d.value for d in deps] for a, deps in dependencies.items()},
                 "message": f"Deleguję zadanie do: {', '.join(a.value for a in agent_types)}"
             }
         }
 
-        # 2. Execute sub-agents sequentially (could be parallelized for independent agents)
-        all_responses = []
-        all_state_updates = {}
+        # 2. Run sub-agents as soon as their dependencies are applied
+        events: asyncio.Queue = asyncio.Queue()
+        results: Dict[Any, SubAgentResult] = {}
+        applied = {agent_type: asyncio.Event() for agent_type in agent_types}
 
-        for agent_type in agent_types:
-            yield {
-                "type": "sub_agent_start",
-                "data": {"agent": agent_type.value}
-            }
+        async def run_agent(agent_type) -> None:
+            try:
+                for dependency in dependencies[agent_type]:
+                    await applied[dependency].wait()
 
-            # Build task context for sub-agent
-            task_context = self._build_task_context(agent_type, state, user_message)
+                await events.put((agent_type, {
+                    "type": "sub_agent_start",
+                    "data": {"agent": agent_type.value}
+                }))
 
-            # Spawn and execute sub-agent
-            async for event in self.sub_agent_spawner.spawn(
-                agent_type, state, task_context, user_message
-            ):
-                # Forward events from sub-agent
-                yield event
+                # Build task context for sub-agent (sees dependency updates)
+                task_context = self._build_task_context(agent_type, state, user_message)
 
-                # Collect state updates
-                if event["type"] == "sub_agent_complete":
-                    response = event["data"].get("response", "")
-                    if response:
-                        all_responses.append({
-                            "agent": agent_type.value,
-                            "response": response,
-                        })
-
-                # Apply state updates as they come
-                if event["type"] == "tool_result":
-                    state_updates = event["data"].get("state_updates", [])
-                    for key in state_updates:
-                        all_state_updates[key] = True
-
-        # 3. Synthesize final response if multiple agents were used
-        if len(all_responses) > 1:
-            final_response = await self._synthesize_responses(all_responses, state)
-            self._last_response = final_response
+                async for event in self.sub_agent_spawner.spawn(
+                    agent_type, state, task_context, user_message, results=results
+                ):
+                    await events.put((agent_type, event))
+            except Exception as e:
+                logger.error(f"Sub-agent {agent_type.value} failed: {e}")
+                await events.put((agent_type, {
+                    "type": "error",
+                    "data": {"message": str(e)}
+                }))
+            finally:
+                await events.put((agent_type, None))
+
+        tasks = [asyncio.create_task(run_agent(agent_type)) for agent_type in agent_types]
+
+        # 3. Multiplex events; apply updates and stream the synthesis in route order
+        all_responses: List[Dict[str, Any]] = []
+        all_state_updates: Dict[str, Any] = {}
+        written_by: Dict[str, Any] = {}
+        finished = set()
+        next_index = 0
+        # Up to 2 agents: responses are joined and streamed as they finish;
+        # more agents: one LLM synthesis call once all are done
+        stream_parts = 1 < len(agent_types) <= 2
+        streamed = False
 
+        try:
+            while len(finished) < len(agent_types):
+                agent_type, event = await events.get()
+                if event is not None:
+                    # Forward events from sub-agent
+                    if isinstance(event.get("data"), dict):
+                        event["data"].setdefault("agent", agent_type.value)
+                    yield event
+                    continue
+
+                finished.add(agent_type)
+                while next_index < len(agent_types) and agent_types[next_index] in finished:
+                    done = agent_types[next_index]
+                    next_index += 1
+                    result = results.get(done)
+
+                    if result is not None:
+                        for key in result.state_updates:
+                            writer = written_by.get(key)
+                            if writer is not None and writer not in dependencies[done]:
+                                logger.warning(
+                                    f"State update conflict on {key}: {writer.value} and "
+                                    f"{done.value} - keeping {done.value} (routed later)"
+                                )
+                            written_by[key] = done
+                            all_state_updates[key] = True
+                        self._apply_state_updates(state, result.state_updates)
+
+                        if result.response.strip():
+                            all_responses.append({"agent": done.value, "response": result.response})
+                            if stream_parts:
+                                yield {
+                                    "type": "message",
+                                    "data": {
+                                        "content": ("\n\n" if streamed else "") + result.response,
+                                        "is_complete": False,
+                                    }
+                                }
+                                streamed = True
+
+                    applied[done].set()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # 4. Synthesize final response if multiple agents were used
+        if len(all_responses) > 2 and not stream_parts:
+            parts = []
+            async for delta in self._synthesize_responses(all_responses, state):
+                parts.append(delta)
+                yield {
+                    "type": "message",
+                    "data": {"content": delta, "is_complete": False}
+                }
+            streamed = bool(parts)
+            final_response = "".join(parts)
+        elif len(all_responses) == 2 and not stream_parts:
+            final_response = "\n\n".join(r["response"] for r in all_responses)
             yield {
                 "type": "message",
-                "data": {"content": final_response, "is_complete": True}
+                "data": {"content": final_response, "is_complete": False}
             }
+            streamed = True
         elif all_responses:
-            self._last_response = all_responses[0]["response"]
+            final_response = "\n\n".join(r["response"] for r in all_responses)
         else:
-            self._last_response = None
+            final_response = None
+
+        self._last_response = final_response
+        if streamed:
+            yield {
+                "type": "message",
+                "data": {"content": "", "is_complete": True}
+            }
 
         yield {
             "type": "multi_agent_complete",
@@ -768,25 +852,16 @@ class PropertyAdvisorAgent:
         self,
         responses: List[Dict[str, Any]],
         state: AgentState,
-    ) -> str:
-        """Synthesize multiple sub-agent responses into a coherent final response.
+    ) -> AsyncGenerator[str, None]:
+        """Stream one coherent response synthesized from several sub-agent responses.
 
         Args:
-            responses: List of {agent, response} dicts
+            responses: List of {agent, response} dicts (route order)
             state: Current agent state
 
-        Returns:
-            Synthesized response string
+        Yields:
+            Text deltas of the synthesized response
         """
-        # For simple cases, just concatenate with attribution
-        if len(responses) <= 2:
-            parts = []
-            for r in responses:
-                if r["response"].strip():
-                    parts.append(r["response"])
-            return "\n\n".join(parts)
-
-        # For complex cases, use LLM to synthesize
         synthesis_prompt = """Połącz poniższe odpowiedzi od różnych specjalistów w jedną spójną odpowiedź dla użytkownika.
 
 ODPOWIEDZI:
@@ -803,14 +878,18 @@ WYMAGANIA:
 - Nie wspominaj o "specjalistach" ani "agentach"
 """
 
+        emitted = False
         try:
-            response = await self.client.messages.create(
+            async with self.client.messages.stream(
                 model=self.MODEL,
                 max_tokens=1024,
                 messages=[{"role": "user", "content": synthesis_prompt}]
-            )
-            return response.content[0].text
+            ) as stream:
+                async for text in stream.text_stream:
+                    emitted = True
+                    yield text
         except Exception as e:
             logger.error(f"Synthesis failed: {e}")
-            # Fallback to simple concatenation
-            return "\n\n".join(r["response"] for r in responses if r["response"].strip())
+            if not emitted:
+                # Fallback to simple concatenation
+                yield "\n\n".join(r["response"] for r in responses if r["response"].strip())
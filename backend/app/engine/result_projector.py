@@ -0,0 +1,273 @@
+"""
+Result Projector - Compact tool results for the model.
+
+Tool results go back to Claude as tool_result content and are resent on
+every later iteration of the turn (and rebuilt from session history on the
+next turns). The frontend still gets the full result in the tool_result
+event; the model gets a projection:
+
+- parcel lists as one table: only the columns the model reasons with,
+  columns equal for every row factored out into "common", all-empty
+  columns dropped, at most TOP_N rows (search results stay in the
+  result store, so the model pages through the rest with results_load_page)
+- numbers rounded (meters and m² to whole units, scores to 1 decimal)
+- geometries, None values and empty containers dropped
+- always valid JSON within max_chars (rows are dropped, never cut mid-token)
+
+Usage:
+    from app.engine.result_projector import result_projector
+
+    content = result_projector.project("search_execute", result)
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+MAX_RESULT_CHARS = 10000
+TOP_N = 20
+
+# Rough chars per token of the compact JSON (Polish text, digits, punctuation)
+CHARS_PER_TOKEN = 3.5
+
+# Never useful to the model (maps go to the frontend via the event)
+DROP_KEYS = {"geometry", "geojson", "geom", "wkt", "geom_wkt", "bbox"}
+
+# Parcel table columns (search_execute / search_refine / results_load_page)
+PARCEL_COLUMNS = [
+    "index", "id", "dzielnica", "gmina", "area_m2",
+    "quietness_score", "nature_score", "accessibility_score",
+    "has_mpzp", "mpzp_symbol", "has_road_access",
+    "dist_to_forest", "dist_to_water", "dist_to_school", "dist_to_shop",
+    "travel_minutes", "pct_forest_500m",
+]
+SIMILAR_COLUMNS = ["id", "dzielnica", "gmina", "area_m2", "quietness_score", "similarity"]
+NEIGHBOR_COLUMNS = ["id", "dzielnica", "gmina", "area_m2", "shared_border_m", "is_built"]
+
+
+def _round_number(key: str, value: float) -> Any:
+    """Round a float to the precision the model needs, by key."""
+    if value != value or value in (float("inf"), float("-inf")):
+        return None
+    if "lat" in key or "lon" in key:
+        return round(value, 5)
+    if key.startswith("dist_") or key.endswith(("_m", "_m2")):
+        return int(round(value))
+    if key == "similarity":
+        return round(value, 3)
+    if abs(value) >= 100:
+        return int(round(value))
+    return round(value, 1) if abs(value) >= 1 else round(value, 2)
+
+
+def compact(value: Any, key: str = "") -> Any:
+    """Drop empty values and geometries, round floats, tabulate lists of dicts."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, float):
+        return _round_number(key, value)
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            if k in DROP_KEYS:
+                continue
+            v = compact(v, k)
+            if v is None or v == "" or v == [] or v == {}:
+                continue
+            out[k] = v
+        return out
+    if isinstance(value, (list, tuple)):
+        if len(value) >= 3 and all(isinstance(v, dict) for v in value):
+            return table(value)
+        items = [compact(v, key) for v in value[:TOP_N]]
+        if len(value) > TOP_N:
+            items.append(f"... (+{len(value) - TOP_N})")
+        return items
+    return value
+
+
+def table(rows: List[Dict[str, Any]], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Rows as {"common", "columns", "rows", "omitted"} with repeated keys factored out."""
+    shown = rows[:TOP_N]
+    if columns is None:
+        columns = []
+        for row in shown:
+            columns.extend(k for k in row if k not in columns and k not in DROP_KEYS)
+    values = [[compact(row.get(c), c) for c in columns] for row in shown]
+
+    keep, common = [], {}
+    for j, column in enumerate(columns):
+        col = [row[j] for row in values]
+        if all(v is None for v in col):
+            continue
+        first = json.dumps(col[0], sort_keys=True, default=str)
+        if len(col) > 1 and all(json.dumps(v, sort_keys=True, default=str) == first for v in col):
+            common[column] = col[0]
+            continue
+        keep.append(j)
+
+    out: Dict[str, Any] = {}
+    if common:
+        out["common"] = common
+    out["columns"] = [columns[j] for j in keep]
+    out["rows"] = [[row[j] for j in keep] for row in values]
+    if len(rows) > len(shown):
+        out["omitted"] = len(rows) - len(shown)
+    return out
+
+
+def _with_table(result: Dict[str, Any], list_key: str, out_key: str, columns: List[str]) -> Dict[str, Any]:
+    rows = result.get(list_key) or []
+    out = compact({k: v for k, v in result.items() if k != list_key})
+    if rows:
+        out[out_key] = table(rows, columns)
+    return out
+
+
+def _project_search(result: Dict[str, Any]) -> Dict[str, Any]:
+    return _with_table(result, "parcels", "parcels", PARCEL_COLUMNS)
+
+
+def _project_page(result: Dict[str, Any]) -> Dict[str, Any]:
+    out = _with_table(result, "items", "parcels", PARCEL_COLUMNS)
+    out.pop("page_size", None)
+    return out
+
+
+def _project_similar(result: Dict[str, Any]) -> Dict[str, Any]:
+    return _with_table(result, "similar", "similar", SIMILAR_COLUMNS)
+
+
+def _project_adjacent(result: Dict[str, Any]) -> Dict[str, Any]:
+    return _with_table(result, "neighbors", "neighbors", NEIGHBOR_COLUMNS)
+
+
+def _project_map(result: Dict[str, Any]) -> Dict[str, Any]:
+    features = (result.get("geojson") or {}).get("features") or []
+    ids = [f.get("properties", {}).get("id") for f in features]
+    return compact({
+        "count": result.get("count"),
+        "center": result.get("center"),
+        "parcel_ids": ids,
+        "note": "Mapa wyświetlona użytkownikowi.",
+    })
+
+
+PROJECTORS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "search_execute": _project_search,
+    "search_refine": _project_search,
+    "results_load_page": _project_page,
+    "search_similar": _project_similar,
+    "search_adjacent": _project_adjacent,
+    "market_map": _project_map,
+}
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+def _longest_list(value: Any):
+    """(parent, key) of the longest shrinkable list in a projected result.
+
+    Only lists held by a dict can be shrunk; table column lists and the
+    rows inside a table never are (they must stay aligned), a table's row
+    list is, and its "omitted" count follows.
+    """
+    best, best_len = None, 1
+    stack = [(None, None, value)]
+    while stack:
+        parent, key, node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend((node, k, v) for k, v in node.items())
+        elif isinstance(node, list):
+            if parent is not None and key != "columns" and len(node) > best_len:
+                best, best_len = (parent, key), len(node)
+            stack.extend((None, None, v) for v in node)
+    return best
+
+
+def _fit(projected: Any, max_chars: int) -> str:
+    """Serialize, halving the longest list until the JSON fits max_chars."""
+    text = _dumps(projected)
+    while len(text) > max_chars:
+        found = _longest_list(projected)
+        if found is None:
+            return _dumps({"truncated": True, "preview": text[:max_chars - 100]})
+        parent, key = found
+        items = parent[key]
+        keep = (len(items) + 1) // 2
+        if key == "rows":
+            parent["omitted"] = parent.get("omitted", 0) + len(items) - keep
+        parent[key] = items[:keep]
+        text = _dumps(projected)
+    return text
+
+
+class ResultProjector:
+    """Project tool results for the model and track the bytes saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"results": 0, "raw_chars": 0, "projected_chars": 0, "fallbacks": 0}
+
+    def project(
+        self,
+        tool_name: str,
+        result: Any,
+        max_chars: int = MAX_RESULT_CHARS,
+        record: bool = True,
+    ) -> str:
+        """
+        Compact JSON of a tool result for a tool_result block.
+
+        Args:
+            tool_name: Tool that produced the result (selects the projector)
+            result: Full result dict
+            max_chars: Size limit of the returned JSON
+            record: Count the result in stats (off when rebuilding history)
+        """
+        # What used to be sent: the full JSON, truncated at max_chars
+        raw = json.dumps(result, ensure_ascii=False, default=str)
+        try:
+            projector = PROJECTORS.get(tool_name) if isinstance(result, dict) else None
+            projected = projector(result) if projector else compact(result)
+            text = _fit(projected, max_chars)
+            fallback = False
+        except Exception as e:
+            logger.warning(f"Result projection failed for {tool_name}: {e}")
+            text = _fit(compact(json.loads(raw)), max_chars)
+            fallback = True
+
+        if record:
+            with self._lock:
+                self._stats["results"] += 1
+                self._stats["raw_chars"] += min(len(raw), max_chars)
+                self._stats["projected_chars"] += len(text)
+                self._stats["fallbacks"] += int(fallback)
+            logger.debug(
+                f"Projected {tool_name}: {len(raw)} -> {len(text)} chars "
+                f"(~{int((min(len(raw), max_chars) - len(text)) / CHARS_PER_TOKEN)} tokens saved)"
+            )
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        """Bytes and estimated tokens saved since startup."""
+        with self._lock:
+            s = dict(self._stats)
+        saved = s["raw_chars"] - s["projected_chars"]
+        return {
+            **s,
+            "saved_chars": saved,
+            "saved_tokens_est": int(saved / CHARS_PER_TOKEN),
+            "ratio": round(s["projected_chars"] / s["raw_chars"], 3) if s["raw_chars"] else None,
+        }
+
+
+# Global instance
+result_projector = ResultProjector()
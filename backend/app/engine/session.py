@@ -10,7 +10,6 @@ Replaces the 7-layer memory system with a pragmatic 4-layer approach:
 
 from __future__ import annotations
 
-import json
 import time
 from dataclasses import dataclass, field, asdict
 from typing import List, Dict, Any, Optional
@@ -19,6 +18,7 @@ from datetime import datetime
 from loguru import logger
 
 from app.engine.notepad import Notepad
+from app.engine.result_projector import result_projector
 
 
 @dataclass
@@ -193,7 +193,7 @@ class Session:
                     tool_result_blocks.append({
                         "type": "tool_result",
                         "tool_use_id": tc_id,
-                        "content": json.dumps(result, ensure_ascii=False, default=str)[:5000],
+                        "content": result_projector.project(tc_name, result, max_chars=5000, record=False),
                     })
 
                 # Store for merging with next user message (proper alternation)
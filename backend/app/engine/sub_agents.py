@@ -34,6 +34,7 @@ except ImportError:
     ANTHROPIC_AVAILABLE = False
 
 from app.config import settings
+from app.engine.prompt_cache import build_request, log_cache_usage
 from app.memory import AgentState
 
 
@@ -324,6 +325,18 @@ PROPOZYCJA WARTOŚCI:
 }
 
 
+# Agents whose state updates a sub-agent reads (its context is built from
+# them). Routed agents with no dependency between them run concurrently.
+AGENT_DEPENDENCIES: Dict[AgentType, Set[AgentType]] = {
+    AgentType.DISCOVERY: set(),
+    AgentType.FEEDBACK: set(),
+    AgentType.SEARCH: {AgentType.DISCOVERY, AgentType.FEEDBACK},  # preferences
+    AgentType.ANALYST: {AgentType.SEARCH},                        # current results
+    AgentType.NARRATOR: {AgentType.SEARCH},                       # first result
+    AgentType.LEAD: set(),
+}
+
+
 # =============================================================================
 # SUB-AGENT RESULT
 # =============================================================================
@@ -380,6 +393,7 @@ class SubAgentSpawner:
         state: AgentState,
         task_context: Dict[str, Any],
         user_message: str,
+        results: Optional[Dict[AgentType, SubAgentResult]] = None,
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """Spawn a sub-agent and execute its task.
 
@@ -388,6 +402,8 @@ class SubAgentSpawner:
             state: Current agent state
             task_context: Additional context for the task
             user_message: Original user message
+            results: If given, receives the SubAgentResult (with the state
+                updates, which are not applied to state here)
 
         Yields:
             Events during execution (tool_call, tool_result, message, etc.)
@@ -424,6 +440,8 @@ class SubAgentSpawner:
             yield event
 
         result.execution_time_ms = int((time.time() - start_time) * 1000)
+        if results is not None:
+            results[agent_type] = result
 
         yield {
             "type": "sub_agent_complete",
@@ -522,25 +540,28 @@ class SubAgentSpawner:
 
         tool_executor = ToolExecutor(state)
         iterations = 0
+        # History before the current user message is stable across calls
+        stable_prefix = len(messages) - 1
 
         while iterations < config.max_tool_iterations:
             iterations += 1
 
-            # Call Claude
+            # Call Claude (tools, system prompt and message prefix cached)
             try:
-                response = await self._client.messages.create(
-                    model=model,
-                    max_tokens=config.max_tokens,
-                    system=system_prompt,
-                    tools=tools if tools else None,
-                    messages=messages,
-                )
+                response = await self._client.messages.create(**build_request(
+                    model, config.max_tokens, system_prompt, tools, messages, stable_prefix,
+                ))
             except Exception as e:
                 logger.error(f"Sub-agent API error: {e}")
                 yield {"type": "error", "data": {"message": str(e)}}
                 return
 
-            result.tokens_used += response.usage.input_tokens + response.usage.output_tokens
+            log_cache_usage(f"{config.name} iteration {iterations}", response.usage)
+            result.tokens_used += (
+                response.usage.input_tokens + response.usage.output_tokens
+                + (response.usage.cache_read_input_tokens or 0)
+                + (response.usage.cache_creation_input_tokens or 0)
+            )
 
             # Process response
             assistant_content = []
@@ -617,6 +638,10 @@ class SubAgentSpawner:
 # AGENT ROUTER
 # =============================================================================
 
+ANALYST_WORDS = ["porównaj", "analiza", "która lepsza", "oceń"]
+NARRATOR_WORDS = ["opowiedz", "opisz", "jak tam", "atmosfera"]
+
+
 class AgentRouter:
     """Routes requests to appropriate sub-agents based on intent.
 
@@ -644,11 +669,16 @@ class AgentRouter:
             if not state.working.search_state.preferences_approved:
                 agents.append(AgentType.DISCOVERY)
             agents.append(AgentType.SEARCH)
+            # Analysis / narration asked for in the same message run on the
+            # new results
+            agents.extend(AgentRouter._result_agents(message_lower))
 
-        elif any(word in message_lower for word in ["porównaj", "analiza", "która lepsza", "oceń"]):
-            agents.append(AgentType.ANALYST)
+        elif any(word in message_lower for word in ANALYST_WORDS):
+            # Both only read the current results, so the DAG runs them
+            # concurrently when the message asks for both
+            agents.extend(AgentRouter._result_agents(message_lower))
 
-        elif any(word in message_lower for word in ["opowiedz", "opisz", "jak tam", "atmosfera"]):
+        elif any(word in message_lower for word in NARRATOR_WORDS):
             agents.append(AgentType.NARRATOR)
 
         elif any(word in message_lower for word in ["nie podoba", "za mało", "za dużo", "zmień", "inaczej"]):
@@ -675,6 +705,35 @@ class AgentRouter:
 
         return agents
 
+    @staticmethod
+    def _result_agents(message_lower: str) -> List[AgentType]:
+        """Analyst / narrator agents the message explicitly asks for."""
+        agents = []
+        if any(word in message_lower for word in ANALYST_WORDS):
+            agents.append(AgentType.ANALYST)
+        if any(word in message_lower for word in NARRATOR_WORDS):
+            agents.append(AgentType.NARRATOR)
+        return agents
+
+    @staticmethod
+    def dependencies(agent_types: List[AgentType]) -> Dict[AgentType, List[AgentType]]:
+        """Dependency DAG of routed agents.
+
+        An agent waits only for the agents routed before it that it depends
+        on (AGENT_DEPENDENCIES), so the route order stays a valid execution
+        order and the graph has no cycles.
+
+        Returns:
+            {agent_type: [agent types it waits for]}
+        """
+        return {
+            agent: [
+                earlier for earlier in agent_types[:i]
+                if earlier in AGENT_DEPENDENCIES.get(agent, set())
+            ]
+            for i, agent in enumerate(agent_types)
+        }
+
 
 # =============================================================================
 # FACTORY FUNCTION
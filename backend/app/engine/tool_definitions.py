@@ -135,6 +135,8 @@ def get_tool_definitions() -> List[Dict[str, Any]]:
                     "max_dist_to_school_m": {"type": "integer", "description": "Max odległość do szkoły w metrach"},
                     "max_dist_to_shop_m": {"type": "integer", "description": "Max odległość do sklepu w metrach"},
                     "max_dist_to_bus_stop_m": {"type": "integer", "description": "Max odległość do przystanku"},
+                    "max_travel_minutes": {"type": "number", "description": "Max czas dojazdu/dojścia po drogach (minuty) od punktu lokalizacji, np. 'do 15 minut pieszo od centrum dzielnicy'"},
+                    "travel_mode": {"type": "string", "enum": ["walk", "drive"], "description": "Tryb dla max_travel_minutes: walk (pieszo, domyślnie) lub drive (samochodem)"},
                     "pog_residential": {"type": "boolean", "description": "Tylko strefy mieszkaniowe POG"},
                     "sort_by": {
                         "type": "string",
@@ -10,6 +10,7 @@ Replaces the global state pattern from agent/tools.py.
 """
 
 from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import replace
 import json
 
 from loguru import logger
@@ -24,6 +25,8 @@ from app.services import (
     BBoxSearchParams,
 )
 from app.services.database import neo4j
+from app.services.facet_cube import facet_cube, FacetQuery
+from app.services.location_index import location_index
 
 
 # Type alias for tool execution results
@@ -592,12 +595,22 @@ class ToolExecutor:
                 base_where.append("p.gmina = $gmina")
                 params["gmina"] = prefs["gmina"]
 
+            # In-process facet cube (no DB round trips) when loaded
+            cube = facet_cube.cube
+            location_query = FacetQuery(
+                gmina=None if prefs.get("miejscowosc") else prefs.get("gmina"),
+                dzielnica=prefs.get("miejscowosc"),
+                dzielnica_prefix=False,
+            )
+
             # Count total in location
             where_clause = " AND ".join(base_where) if base_where else "1=1"
-            query = f"MATCH (p:Parcel) WHERE {where_clause} RETURN count(p) as cnt"
-
-            results = await neo4j.run(query, params)
-            total_in_location = results[0]["cnt"] if results else 0
+            if cube is not None:
+                total_in_location = cube.count(location_query).count
+            else:
+                query = f"MATCH (p:Parcel) WHERE {where_clause} RETURN count(p) as cnt"
+                results = await neo4j.run(query, params)
+                total_in_location = results[0]["cnt"] if results else 0
 
             diagnostics["total_in_location"] = total_in_location
 
@@ -609,22 +622,25 @@ class ToolExecutor:
 
             # Test category filters with their distribution
             category_filters = [
-                ("quietness_categories", "HAS_QUIETNESS", "QuietnessCategory", "cisza"),
-                ("nature_categories", "HAS_NATURE", "NatureCategory", "natura"),
-                ("building_density", "HAS_DENSITY", "DensityCategory", "gęstość zabudowy"),
-                ("accessibility_categories", "HAS_ACCESS", "AccessCategory", "dostępność"),
+                ("quietness_categories", "HAS_QUIETNESS", "QuietnessCategory", "kategoria_ciszy", "cisza"),
+                ("nature_categories", "HAS_NATURE", "NatureCategory", "kategoria_natury", "natura"),
+                ("building_density", "HAS_DENSITY", "DensityCategory", "gestosc_zabudowy", "gęstość zabudowy"),
+                ("accessibility_categories", "HAS_ACCESS", "AccessCategory", "kategoria_dostepu", "dostępność"),
             ]
 
-            for filter_name, rel_name, node_type, polish_name in category_filters:
+            for filter_name, rel_name, node_type, cube_dim, polish_name in category_filters:
                 if prefs.get(filter_name):
-                    query = f"""
-                        MATCH (p:Parcel)-[:{rel_name}]->(c:{node_type})
-                        WHERE {where_clause}
-                        RETURN c.id as category, count(p) as cnt
-                        ORDER BY cnt DESC
-                    """
-                    records = await neo4j.run(query, params)
-                    available_categories = {r["category"]: r["cnt"] for r in records}
+                    if cube is not None:
+                        available_categories = cube.distribution(location_query, cube_dim)
+                    else:
+                        query = f"""
+                            MATCH (p:Parcel)-[:{rel_name}]->(c:{node_type})
+                            WHERE {where_clause}
+                            RETURN c.id as category, count(p) as cnt
+                            ORDER BY cnt DESC
+                        """
+                        records = await neo4j.run(query, params)
+                        available_categories = {r["category"]: r["cnt"] for r in records}
                     requested = prefs.get(filter_name, [])
                     matching = sum(available_categories.get(cat, 0) for cat in requested)
 
@@ -664,16 +680,23 @@ class ToolExecutor:
             if prefs.get("min_area_m2") or prefs.get("max_area_m2"):
                 min_a = prefs.get("min_area_m2", 0)
                 max_a = prefs.get("max_area_m2", 999999)
-                query = f"""
-                    MATCH (p:Parcel)
-                    WHERE {where_clause} AND p.area_m2 >= $min_a AND p.area_m2 <= $max_a
-                    RETURN count(p) as cnt
-                """
-                params["min_a"] = min_a
-                params["max_a"] = max_a
+                # Cube estimates (interpolated, min bound) never decide a block
+                answer = cube.count(
+                    replace(location_query, min_area=min_a, max_area=max_a)
+                ) if cube is not None else None
+                if answer is not None and answer.exact:
+                    area_count = answer.count
+                else:
+                    query = f"""
+                        MATCH (p:Parcel)
+                        WHERE {where_clause} AND p.area_m2 >= $min_a AND p.area_m2 <= $max_a
+                        RETURN count(p) as cnt
+                    """
+                    params["min_a"] = min_a
+                    params["max_a"] = max_a
 
-                results = await neo4j.run(query, params)
-                area_count = results[0]["cnt"] if results else 0
+                    results = await neo4j.run(query, params)
+                    area_count = results[0]["cnt"] if results else 0
 
                 diagnostics["area_filter_count"] = area_count
 
@@ -699,15 +722,21 @@ class ToolExecutor:
             for filter_name, db_field, polish_name in distance_filters:
                 if prefs.get(filter_name):
                     max_dist = prefs[filter_name]
-                    query = f"""
-                        MATCH (p:Parcel)
-                        WHERE {where_clause} AND p.{db_field} <= $max_dist
-                        RETURN count(p) as cnt
-                    """
-                    params["max_dist"] = max_dist
+                    answer = cube.count(
+                        replace(location_query, max_dist={db_field: max_dist})
+                    ) if cube is not None else None
+                    if answer is not None and answer.exact:
+                        dist_count = answer.count
+                    else:
+                        query = f"""
+                            MATCH (p:Parcel)
+                            WHERE {where_clause} AND p.{db_field} <= $max_dist
+                            RETURN count(p) as cnt
+                        """
+                        params["max_dist"] = max_dist
 
-                    results = await neo4j.run(query, params)
-                    dist_count = results[0]["cnt"] if results else 0
+                        results = await neo4j.run(query, params)
+                        dist_count = results[0]["cnt"] if results else 0
 
                     if dist_count == 0:
                         diagnostics["blocking_filter"] = filter_name
@@ -1223,8 +1252,22 @@ class ToolExecutor:
         query = f"MATCH (p:Parcel) WHERE {where_clause} RETURN count(p) as cnt"
 
         try:
-            results = await neo4j.run(query, query_params)
-            count = results[0]["cnt"] if results else 0
+            # Checkpoint counts come from the in-process facet cube when loaded
+            cube = facet_cube.cube
+            exact = True
+            if cube is not None:
+                answer = cube.count(FacetQuery(
+                    gmina=prefs.get("gmina"),
+                    dzielnica=prefs.get("miejscowosc"),
+                    min_area=prefs.get("min_area_m2"),
+                    max_area=prefs.get("max_area_m2"),
+                    has_pog=True if prefs.get("requires_mpzp") else None,
+                    is_residential_zone=True if prefs.get("mpzp_buildable") else None,
+                ))
+                count, exact = answer.count, answer.exact
+            else:
+                results = await neo4j.run(query, query_params)
+                count = results[0]["cnt"] if results else 0
 
             # Build human-readable criteria summary
             criteria_summary = []
@@ -1241,13 +1284,17 @@ class ToolExecutor:
             if prefs.get("nature_categories"):
                 criteria_summary.append(f"natura: {', '.join(prefs['nature_categories'])}")
 
-            return {
+            result = {
                 "matching_count": count,
                 "criteria_used": prefs,
                 "criteria_summary": criteria_summary,
                 "message": f"Na podstawie aktualnych kryteriów: **{count:,}** pasujących działek.".replace(",", " "),
                 "note": "To szybkie zliczenie - pełne wyszukiwanie może uwzględnić więcej filtrów.",
             }
+            if not exact:
+                # Area bounds inside a histogram bin are estimated
+                result["approximate"] = True
+            return result
         except Exception as e:
             logger.error(f"Quick count error: {e}")
             return {"error": str(e), "matching_count": 0}
@@ -1894,10 +1941,17 @@ class ToolExecutor:
 
         results = []
 
+        # In-memory name index covers steps 1-3; Neo4j while it is not loaded
+        # and when it finds nothing
+        index = location_index.index
+        if index is not None:
+            results = index.search(name, level=level, parent=parent_name)
+        indexed = bool(results)
+
         # === STEP 1: Exact match across admin levels ===
 
         # 1a. Dzielnica (District nodes → City via BELONGS_TO)
-        if not level or level == "dzielnica":
+        if not indexed and (not level or level == "dzielnica"):
             q = "MATCH (d:District)-[:BELONGS_TO]->(c:City) WHERE toLower(d.name) = toLower($name)"
             p = {"name": name}
             if parent_name:
@@ -1918,7 +1972,7 @@ class ToolExecutor:
                 logger.debug(f"search_locations dzielnica query error: {e}")
 
         # 1b. Gmina (from Parcel DISTINCT)
-        if not level or level in ("gmina", "miejscowosc"):
+        if not indexed and (not level or level in ("gmina", "miejscowosc")):
             try:
                 q = """
                     MATCH (p:Parcel) WHERE toLower(p.gmina) = toLower($name)
@@ -1935,7 +1989,7 @@ class ToolExecutor:
                 logger.debug(f"search_locations gmina query error: {e}")
 
         # 1c. Powiat
-        if not level or level == "powiat":
+        if not indexed and (not level or level == "powiat"):
             try:
                 q = """
                     MATCH (p:Parcel) WHERE toLower(p.powiat) = toLower($name)
@@ -1951,7 +2005,7 @@ class ToolExecutor:
                 logger.debug(f"search_locations powiat query error: {e}")
 
         # 1d. Województwo
-        if not level or level == "wojewodztwo":
+        if not indexed and (not level or level == "wojewodztwo"):
             try:
                 q = """
                     MATCH (p:Parcel) WHERE toLower(p.wojewodztwo) = toLower($name)
@@ -2012,7 +2066,7 @@ class ToolExecutor:
         if not results:
             try:
                 from app.services.embedding_service import EmbeddingService
-                embedding = EmbeddingService.encode(name)
+                embedding = await EmbeddingService.aencode(name)
                 q = """
                     CALL db.index.vector.queryNodes('location_name_embedding_idx', 5, $emb)
                     YIELD node, score WHERE score >= 0.7
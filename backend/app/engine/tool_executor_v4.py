@@ -13,6 +13,7 @@ Agent calls tools directly. Gates are checked by tool_gates middleware.
 
 from __future__ import annotations
 
+import asyncio
 import json
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
@@ -28,11 +29,30 @@ from app.services import (
     SearchPreferences,
 )
 from app.services.database import neo4j, mongodb
+from app.services.facet_cube import facet_cube, FacetQuery
+from app.services.location_index import location_index
+from app.services.neighborhood_service import get_neighborhood_service
 
 
 # Type alias
 ToolResult = Tuple[Dict[str, Any], Dict[str, Any]]  # (result, notepad_updates)
 
+# Tools that neither return notepad updates nor change notepad / executor
+# state (the parcel index map used for "pierwsza", "2" references), so
+# several of them in one turn can run concurrently. Every other tool is
+# run alone, after the tools before it.
+READ_ONLY_TOOLS = frozenset({
+    "location_search",
+    "search_count",
+    "search_similar",
+    "search_adjacent",
+    "parcel_details",
+    "parcel_compare",
+    "market_prices",
+    "market_map",
+    "lead_summary",
+})
+
 
 class ToolExecutorV4:
     """Execute 16 consolidated tools with notepad-driven state.
@@ -49,6 +69,11 @@ class ToolExecutorV4:
         # Build parcel index map from search results for reference resolution
         self._parcel_index_map: Dict[int, str] = {}
 
+    @staticmethod
+    def is_read_only(tool_name: str) -> bool:
+        """True if the tool can run concurrently with other read-only tools."""
+        return tool_name in READ_ONLY_TOOLS
+
     async def execute(self, tool_name: str, params: Dict[str, Any]) -> ToolResult:
         """Execute a tool by name."""
         logger.info(f"Executing tool: {tool_name}")
@@ -134,8 +159,15 @@ class ToolExecutorV4:
 
         results = []
 
+        # In-memory name index covers steps 1-3; Neo4j while it is not loaded
+        # and when it finds nothing
+        index = location_index.index
+        if index is not None:
+            results = index.search(name, level=level, parent=parent_name)
+        indexed = bool(results)
+
         # STEP 1: Exact match on District nodes
-        if level in ("any", "dzielnica"):
+        if not indexed and level in ("any", "dzielnica"):
             q = "MATCH (d:District)-[:BELONGS_TO]->(c:City) WHERE toLower(d.name) = toLower($name)"
             p = {"name": name}
             if parent_name:
@@ -156,7 +188,7 @@ class ToolExecutorV4:
                 logger.debug(f"location_search dzielnica error: {e}")
 
         # STEP 1b: Exact match on gmina
-        if level in ("any", "gmina", "miejscowosc"):
+        if not indexed and level in ("any", "gmina", "miejscowosc"):
             try:
                 q = """
                     MATCH (p:Parcel) WHERE toLower(p.gmina) = toLower($name)
@@ -216,7 +248,7 @@ class ToolExecutorV4:
         if not results:
             try:
                 from app.services.embedding_service import EmbeddingService
-                embedding = EmbeddingService.encode(name)
+                embedding = await EmbeddingService.aencode(name)
                 q = """
                     CALL db.index.vector.queryNodes('location_name_embedding_idx', 5, $emb)
                     YIELD node, score WHERE score >= 0.7
@@ -380,10 +412,39 @@ class ToolExecutorV4:
             hi = params.get("max_area_m2", "?")
             filter_desc.append(f"{lo}-{hi}m²")
 
+        filters_str = ", ".join(filter_desc) if filter_desc else "bez filtrów"
+
+        # In-process facet cube answers without a DB round trip
+        cube = facet_cube.cube
+        if cube is not None:
+            query = FacetQuery(
+                gmina=loc.gmina if loc and loc.validated else None,
+                dzielnica=loc.dzielnica if loc and loc.validated else None,
+                ownership_type=[params["ownership_type"]] if params.get("ownership_type") else None,
+                build_status=[params["build_status"]] if params.get("build_status") else None,
+                size_category=params.get("size_category"),
+                kategoria_ciszy=params.get("quietness_categories"),
+                kategoria_natury=params.get("nature_categories"),
+                min_area=params.get("min_area_m2"),
+                max_area=params.get("max_area_m2"),
+                eligible=True,
+            )
+            answer = cube.count(query)
+            result = {
+                "matching_count": answer.count,
+                "filters": filters_str,
+                "message": f"**{answer.count:,}** pasujących działek ({filters_str}).".replace(",", " "),
+            }
+            if not answer.exact:
+                result["approximate"] = True
+            if answer.count < 10:
+                # Count after dropping each filter - shows which one to relax
+                result["count_without_filter"] = cube.blocking_filters(query)
+            return result, {}
+
         try:
             result = await neo4j.run(f"MATCH (p:Parcel) WHERE {where} RETURN count(p) as cnt", q_params)
             count = result[0]["cnt"] if result else 0
-            filters_str = ", ".join(filter_desc) if filter_desc else "bez filtrów"
             return {
                 "matching_count": count,
                 "filters": filters_str,
@@ -423,6 +484,8 @@ class ToolExecutorV4:
             lat=loc.lat,
             lon=loc.lon,
             radius_m=loc.radius_m,
+            max_travel_minutes=params.get("max_travel_minutes"),
+            travel_mode=params.get("travel_mode") or "walk",
             min_area=params.get("min_area_m2"),
             max_area=params.get("max_area_m2"),
             quietness_categories=params.get("quietness_categories"),
@@ -483,6 +546,7 @@ class ToolExecutorV4:
                 "dist_to_water": r.dist_to_water,
                 "dist_to_school": r.dist_to_school,
                 "dist_to_shop": r.dist_to_shop,
+                "travel_minutes": r.travel_minutes,
                 "pct_forest_500m": r.pct_forest_500m,
                 "has_road_access": r.has_road_access,
                 "shape_index": round(r.shape_index, 2) if getattr(r, "shape_index", None) else None,
@@ -518,6 +582,7 @@ class ToolExecutorV4:
             "remaining": remaining,
             "pages_total": pages_total,
             "message": f"Znaleziono {len(result_dicts)} działek. Pokazuję top {len(first_page)}.",
+            "strategy": results.strategy,
             "hint": f"Kolejne wyniki: results_load_page(page=1..{pages_total - 1}). NIE powtarzaj search_execute z tymi samymi filtrami." if remaining > 0 else None,
         }, {"search_results": search_results}
 
@@ -617,14 +682,27 @@ class ToolExecutorV4:
         if len(raw_ids) < 2:
             return {"error": "Min. 2 działki do porównania"}, {}
 
+        pids = [pid for pid in (self._resolve_parcel_ref(str(raw)) for raw in raw_ids[:5]) if pid]
+
+        # Details and neighborhood profiles (one batched graph query) concurrently
+        *details_list, neighborhoods = await asyncio.gather(
+            *(spatial_service.get_parcel_details(pid, include_geometry=False) for pid in pids),
+            get_neighborhood_service().analyze_neighborhoods(pids),
+        )
+
         parcels = []
-        for raw in raw_ids[:5]:
-            pid = self._resolve_parcel_ref(str(raw))
-            if not pid:
+        for pid, details in zip(pids, details_list):
+            if not details:
                 continue
-            details = await spatial_service.get_parcel_details(pid, include_geometry=False)
-            if details:
-                parcels.append(details)
+            analysis = neighborhoods.get(pid, {})
+            if "error" not in analysis:
+                details["neighborhood"] = {
+                    "character": analysis["character"]["type"],
+                    "scores": analysis["scores"],
+                    "strengths": analysis["assessment"]["strengths"],
+                    "weaknesses": analysis["assessment"]["weaknesses"],
+                }
+            parcels.append(details)
 
         if len(parcels) < 2:
             return {"error": "Nie udało się pobrać danych dla min. 2 działek"}, {}
@@ -13,12 +13,15 @@ from loguru import logger
 
 from app.config import settings
 from app.services.database import check_all_connections, close_all_connections
+from app.services.search_cache import search_cache
+from app.engine.result_projector import result_projector
 from app.api.conversation import router as conversation_v4_router
 from app.api.conversation_v2 import router as conversation_router
 from app.api.search import router as search_router
 from app.api.lidar import router as lidar_router
 from app.api.leads import router as leads_router
 from app.api.feedback import router as feedback_router
+from app.api.tiles import router as tiles_router
 
 
 @asynccontextmanager
@@ -42,6 +45,26 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Failed to pre-load embedding model: {e}")
 
+    # Load columnar parcel snapshot (in-process scoring for search_parcels)
+    if settings.parcel_store_enabled:
+        from app.services.parcel_store import parcel_store
+        if not await parcel_store.refresh():
+            logger.warning("Parcel store not loaded - scored search uses Cypher")
+
+    # Facet cube for search_count / diagnosis (built in background if not on disk)
+    if settings.facet_cube_enabled:
+        from app.services.facet_cube import facet_cube
+        facet_cube.schedule_refresh()
+
+    # In-memory location name index (resolve_location, location search tools)
+    from app.services.location_index import location_index
+    location_index.schedule_refresh()
+
+    # Road graph for travel-time search (loaded in background if present)
+    if settings.road_graph_enabled:
+        from app.services.road_graph import road_graph
+        road_graph.schedule_load()
+
     yield
 
     # Shutdown
@@ -78,6 +101,7 @@ app.include_router(search_router, prefix="/api/v1")     # Search stays at v1 (no
 app.include_router(lidar_router, prefix="/api/v1")      # LiDAR stays at v1
 app.include_router(leads_router, prefix="/api/v1")      # Leads at v1
 app.include_router(feedback_router, prefix="/api/v1")   # Feedback v3.0 (v1 URL)
+app.include_router(tiles_router, prefix="/api/v1")      # Parcel vector tiles
 
 
 # =============================================================================
@@ -106,6 +130,8 @@ async def health():
         "version": "0.1.0",
         "check_time_ms": check_time_ms,
         "databases": db_status,
+        "search_cache": search_cache.stats(),
+        "tool_results": result_projector.stats(),
     }
 
 
@@ -139,12 +165,16 @@ async def api_info():
                 "similar": "GET /api/v1/search/similar/{parcel_id}",
                 "parcel": "GET /api/v1/search/parcel/{parcel_id}",
                 "neighborhood": "GET /api/v1/search/neighborhood/{parcel_id}",  # v3.0
+                "neighborhood_batch": "POST /api/v1/search/neighborhood/batch",
                 "map": "POST /api/v1/search/map",
                 "gminy": "GET /api/v1/search/gminy",
                 "gmina": "GET /api/v1/search/gmina/{name}",
                 "mpzp_symbols": "GET /api/v1/search/mpzp-symbols",
                 "stats": "GET /api/v1/search/stats",
             },
+            "tiles": {
+                "parcels": "GET /api/v1/tiles/parcels/{z}/{x}/{y}.mvt",
+            },
             "feedback": {  # v3.0
                 "submit": "POST /api/v1/feedback/{parcel_id}",
                 "history": "GET /api/v1/feedback/history",
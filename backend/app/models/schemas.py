@@ -89,6 +89,8 @@ class SearchResponse(BaseModel):
     results: List[SearchResultItem]
     free_results: int = 3
     requires_payment: bool = False
+    strategy: Optional[str] = None  # Relaxation strategy that produced results
+    latency_ms: Optional[int] = None
 
 
 # =============================================================================
@@ -328,6 +330,19 @@ class NeighborhoodResponse(BaseModel):
     is_premium: bool = True
 
 
+class NeighborhoodBatchRequest(BaseModel):
+    """Request for neighborhood analysis of several parcels."""
+    parcel_ids: List[str] = Field(..., min_length=1, max_length=20)
+    radius_m: int = Field(500, ge=100, le=2000)
+
+
+class NeighborhoodBatchResponse(BaseModel):
+    """Neighborhood analyses for several parcels (request order)."""
+    count: int
+    results: List[NeighborhoodResponse]
+    not_found: List[str] = []
+
+
 # =============================================================================
 # FEEDBACK (v3.0)
 # =============================================================================
@@ -18,7 +18,7 @@ from app.services.database import (
 )
 from app.services.spatial_service import spatial_service, SpatialSearchParams, BBoxSearchParams
 from app.services.graph_service import graph_service
-from app.services.parcel_search import hybrid_search, SearchPreferences, SearchResult
+from app.services.parcel_search import hybrid_search, SearchPreferences, SearchResult, HybridSearchResults
 from app.services.diversity import (
     select_diverse_proposals,
     parse_user_feedback,
@@ -51,6 +51,7 @@ __all__ = [
     "BBoxSearchParams",
     "SearchPreferences",
     "SearchResult",
+    "HybridSearchResults",
     "DiverseProposal",
     "UserFeedback",
 
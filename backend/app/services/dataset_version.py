@@ -0,0 +1,76 @@
+"""
+Dataset version stamp.
+
+The import pipeline writes a single (:DatasetVersion {id: "current"}) node
+at the end of every run (see egib/scripts/pipeline/29_bump_dataset_version.py).
+In-process snapshots derived from graph data (columnar parcel store, caches)
+key on this stamp, so a pipeline re-run invalidates them without a restart.
+
+Usage:
+    from app.services.dataset_version import dataset_version
+
+    version = await dataset_version.get()
+"""
+
+import time
+from typing import Optional
+
+from loguru import logger
+
+from app.services.database import neo4j
+
+
+# Re-check Neo4j at most this often (the stamp only moves on pipeline runs)
+VERSION_CHECK_INTERVAL_S = 60
+
+# Reported when the graph has never been stamped
+UNVERSIONED = "unversioned"
+
+
+class DatasetVersion:
+    """Cached reader for the dataset version stamp."""
+
+    def __init__(self):
+        self._version: Optional[str] = None
+        self._checked_at: float = 0.0
+
+    async def get(self, force: bool = False) -> str:
+        """Get the current dataset version (re-read from Neo4j when stale).
+
+        Args:
+            force: Skip the check interval and read Neo4j now
+
+        Returns:
+            Version string, or "unversioned" if the graph has no stamp
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self._version is not None
+            and now - self._checked_at < VERSION_CHECK_INTERVAL_S
+        ):
+            return self._version
+
+        try:
+            results = await neo4j.run(
+                "MATCH (v:DatasetVersion {id: 'current'}) RETURN v.version AS version"
+            )
+            version = str(results[0]["version"]) if results and results[0]["version"] else UNVERSIONED
+        except Exception as e:
+            logger.warning(f"Dataset version check failed: {e}")
+            version = self._version or UNVERSIONED
+
+        if self._version is not None and version != self._version:
+            logger.info(f"Dataset version changed: {self._version} -> {version}")
+        self._version = version
+        self._checked_at = now
+        return version
+
+    @property
+    def current(self) -> Optional[str]:
+        """Last known version without touching Neo4j (None before first check)."""
+        return self._version
+
+
+# Global instance
+dataset_version = DatasetVersion()
@@ -0,0 +1,296 @@
+"""
+Materialized district and city aggregates.
+
+Location-level statistics (parcel counts, centroids, category
+distributions, built/residential shares) used to be recomputed from raw
+parcels on every call. Pipeline step 30
+(egib/scripts/pipeline/30_materialize_district_stats.py) writes them as
+properties on District and City nodes, stamped with the dataset version
+(stats_version). The same materialization (district_stats_queries) can run
+here so a running backend catches up when the stamp does not match the
+current dataset version (e.g. a partial re-import that skipped step 30);
+it is a full parcel scan, so only with settings.district_stats_refresh.
+
+Only additive values are stored (counts and sums, never averages), so
+stats for a district prefix ("Wrzeszcz" -> "Wrzeszcz Dolny" +
+"Wrzeszcz Górny") or for a single parcel's neighbors (district minus the
+parcel) are exact.
+
+DistrictStatsStore keeps all stamped rows in memory - a few hundred nodes -
+and answers lookups without touching Neo4j. Lookups return None while the
+stats are missing or stale; callers then fall back to their raw-parcel
+queries.
+
+Usage:
+    from app.services.district_stats import district_stats
+
+    stats = await district_stats.location(gmina="Gdańsk", dzielnica="Osowa")
+    if stats is not None:
+        stats["parcel_count"], district_stats.centroid(stats)
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.services.database import neo4j
+from app.services.dataset_version import VERSION_CHECK_INTERVAL_S, dataset_version
+from app.services.district_stats_queries import MATERIALIZE_CITIES, MATERIALIZE_DISTRICTS
+
+
+# Additive aggregates stored on District / City nodes (summed when merging)
+SUM_FIELDS: Tuple[str, ...] = (
+    "parcel_count",
+    "sum_area", "n_area",
+    "sum_quietness", "n_quietness",
+    "sum_lat", "sum_lon", "n_centroid",
+    "n_built",
+    "n_residential",
+    "n_residential_zone",
+    "n_mpzp",
+    "n_road_access",
+)
+
+# Category distributions, stored as parallel <name>_categories / <name>_counts
+# lists (Neo4j properties cannot hold maps)
+DISTRIBUTIONS: Tuple[str, ...] = ("quietness", "nature")
+
+QUIET_CATEGORIES = ("bardzo_cicha", "cicha")
+GREEN_CATEGORIES = ("bardzo_zielona", "zielona")
+
+_STAT_PROJECTION = ", ".join(
+    [f".{f}" for f in SUM_FIELDS]
+    + [f".{d}_categories, .{d}_counts" for d in DISTRIBUTIONS]
+)
+
+LOAD_QUERY = f"""
+    MATCH (d:District) WHERE d.stats_version = $version
+    OPTIONAL MATCH (d)-[:BELONGS_TO]->(c:City)
+    RETURN 'district' AS level, d.name AS name, c.name AS city,
+           d {{{_STAT_PROJECTION}}} AS stats
+    UNION ALL
+    MATCH (c:City) WHERE c.stats_version = $version
+    RETURN 'city' AS level, c.name AS name, c.name AS city,
+           c {{{_STAT_PROJECTION}}} AS stats
+"""
+
+
+def merge_stats(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum aggregates of several districts/cities into one stats dict.
+
+    Distributions become {category: count}.
+    """
+    merged: Dict[str, Any] = {f: 0 for f in SUM_FIELDS}
+    for name in DISTRIBUTIONS:
+        merged[name] = {}
+    for row in rows:
+        for f in SUM_FIELDS:
+            merged[f] += row.get(f) or 0
+        for name in DISTRIBUTIONS:
+            dist = merged[name]
+            for category, n in row[name].items():
+                dist[category] = dist.get(category, 0) + n
+    return merged
+
+
+class DistrictStatsStore:
+    """In-memory view of the materialized District / City aggregates."""
+
+    def __init__(self):
+        self._districts: Dict[str, Dict[str, Any]] = {}
+        self._cities: Dict[str, Dict[str, Any]] = {}
+        self._version: Optional[str] = None
+        self._missing_version: Optional[str] = None
+        self._missing_at: float = 0.0
+        self._materialized_version: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _current(self) -> bool:
+        """Make sure stats for the current dataset version are loaded.
+
+        Returns False (and schedules a materialization) when the graph has no
+        stats stamped with the current version.
+        """
+        version = await dataset_version.get()
+        if version == self._version:
+            return True
+        if (
+            version == self._missing_version
+            and time.monotonic() - self._missing_at < VERSION_CHECK_INTERVAL_S
+        ):
+            return False
+
+        async with self._lock:
+            if version == self._version:
+                return True
+            if await self._load(version):
+                return True
+            self._missing_version = version
+            self._missing_at = time.monotonic()
+
+        self.schedule_refresh()
+        return False
+
+    async def _load(self, version: str) -> bool:
+        """Read stamped stats for a version into memory."""
+        try:
+            results = await neo4j.run(LOAD_QUERY, {"version": version})
+        except Exception as e:
+            logger.error(f"District stats load error: {e}")
+            return False
+        if not results:
+            return False
+
+        districts: Dict[str, Dict[str, Any]] = {}
+        cities: Dict[str, Dict[str, Any]] = {}
+        for r in results:
+            if not r.get("name"):
+                continue
+            raw = r["stats"]
+            row: Dict[str, Any] = {"name": r["name"], "city": r["city"]}
+            for f in SUM_FIELDS:
+                row[f] = raw.get(f) or 0
+            for name in DISTRIBUTIONS:
+                row[name] = dict(zip(
+                    raw.get(f"{name}_categories") or [],
+                    raw.get(f"{name}_counts") or [],
+                ))
+            (districts if r["level"] == "district" else cities)[r["name"]] = row
+
+        self._districts = districts
+        self._cities = cities
+        self._version = version
+        logger.info(f"District stats loaded: {len(districts)} districts, "
+                   f"{len(cities)} cities (dataset {version})")
+        return True
+
+    async def materialize(self, version: Optional[str] = None) -> bool:
+        """Recompute aggregates on District / City nodes and reload them."""
+        version = version or await dataset_version.get(force=True)
+        try:
+            districts = await neo4j.run(MATERIALIZE_DISTRICTS, {"version": version})
+            cities = await neo4j.run(MATERIALIZE_CITIES, {"version": version})
+        except Exception as e:
+            logger.error(f"District stats materialization error: {e}")
+            return False
+        self._materialized_version = version
+        logger.info(
+            f"District stats materialized: {districts[0]['nodes'] if districts else 0} districts, "
+            f"{cities[0]['nodes'] if cities else 0} cities (dataset {version})"
+        )
+        async with self._lock:
+            loaded = await self._load(version)
+            if loaded:
+                self._missing_version = None
+        return loaded
+
+    def schedule_refresh(self):
+        """Materialize in the background (once per dataset version)."""
+        if not settings.district_stats_refresh:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        version = dataset_version.current
+        if version is not None and version == self._materialized_version:
+            return
+        self._refresh_task = asyncio.create_task(self.materialize(version))
+
+    async def location(
+        self,
+        gmina: Optional[str] = None,
+        dzielnica: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Merged stats for a district (name or name prefix) or a city.
+
+        A district name also matches its sub-districts ("Wrzeszcz" covers
+        "Wrzeszcz Dolny"), like the p.dzielnica STARTS WITH filters it
+        replaces. With both arguments, only districts of that city count.
+
+        Returns:
+            Stats dict (see merge_stats), or None when stats are unavailable
+            or nothing matches
+        """
+        if not (gmina or dzielnica) or not await self._current():
+            return None
+
+        if dzielnica:
+            prefix = dzielnica + " "
+            rows = [
+                row for name, row in self._districts.items()
+                if (name == dzielnica or name.startswith(prefix))
+                and (not gmina or row["city"] == gmina)
+            ]
+        else:
+            rows = [self._cities[gmina]] if gmina in self._cities else []
+
+        if not rows:
+            return None
+        return merge_stats(rows)
+
+    async def district(self, name: str) -> Optional[Dict[str, Any]]:
+        """Stats of a single district (exact name)."""
+        if not await self._current():
+            return None
+        return self._districts.get(name)
+
+    async def top_districts(
+        self,
+        categories: Tuple[str, ...],
+        gmina: Optional[str] = None,
+        limit: int = 3,
+        distribution: str = "quietness",
+    ) -> Optional[List[Tuple[Dict[str, Any], int]]]:
+        """Districts with the most parcels in the given categories.
+
+        Returns:
+            [(district row, count)] by count descending, or None when stats
+            are unavailable
+        """
+        if not await self._current():
+            return None
+        counted = []
+        for row in self._districts.values():
+            if gmina and row["city"] != gmina:
+                continue
+            n = sum(row[distribution].get(c, 0) for c in categories)
+            if n > 0:
+                counted.append((row, n))
+        counted.sort(key=lambda item: item[1], reverse=True)
+        return counted[:limit]
+
+    @staticmethod
+    def centroid(stats: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        """Average parcel centroid of merged stats."""
+        n = stats.get("n_centroid") or 0
+        if not n:
+            return None
+        return {"lat": stats["sum_lat"] / n, "lon": stats["sum_lon"] / n}
+
+    @staticmethod
+    def distribution(stats: Dict[str, Any], name: str) -> List[Dict[str, Any]]:
+        """Distribution as [{category, count}], parcels without a category
+        reported under category None."""
+        dist = stats[name]
+        out = [{"category": c, "count": n} for c, n in dist.items()]
+        unknown = stats["parcel_count"] - sum(dist.values())
+        if unknown > 0:
+            out.append({"category": None, "count": unknown})
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        """Store status for /stats."""
+        return {
+            "dataset_version": self._version,
+            "districts": len(self._districts),
+            "cities": len(self._cities),
+            "refreshing": self._refresh_task is not None and not self._refresh_task.done(),
+            "runtime_refresh": settings.district_stats_refresh,
+        }
+
+
+# Global instance
+district_stats = DistrictStatsStore()
@@ -0,0 +1,63 @@
+"""
+District / City aggregate queries.
+
+One materialization query per level, shared by the backend
+(app.services.district_stats, runtime catch-up) and pipeline step 30
+(egib/scripts/pipeline/30_materialize_district_stats.py). No imports: the
+pipeline script loads this file directly, without the backend's
+dependencies and config.
+"""
+
+# Aggregates for every {node} from its {parcels} pattern, stamped with
+# $version; returns the node and parcel counts
+AGGREGATE_TEMPLATE = """
+    CALL {{
+        WITH {node}
+        OPTIONAL MATCH {parcels}
+        WITH p, p.centroid_lat IS NOT NULL AND p.centroid_lon IS NOT NULL AS has_centroid
+        RETURN {{
+            parcel_count: count(p),
+            sum_area: sum(p.area_m2), n_area: count(p.area_m2),
+            sum_quietness: sum(p.quietness_score), n_quietness: count(p.quietness_score),
+            sum_lat: sum(CASE WHEN has_centroid THEN p.centroid_lat ELSE 0 END),
+            sum_lon: sum(CASE WHEN has_centroid THEN p.centroid_lon ELSE 0 END),
+            n_centroid: sum(CASE WHEN has_centroid THEN 1 ELSE 0 END),
+            n_built: sum(CASE WHEN p.is_built = true THEN 1 ELSE 0 END),
+            n_residential: sum(CASE WHEN p.has_residential = true THEN 1 ELSE 0 END),
+            n_residential_zone: sum(CASE WHEN p.is_residential_zone = true THEN 1 ELSE 0 END),
+            n_mpzp: sum(CASE WHEN p.pog_symbol IS NOT NULL THEN 1 ELSE 0 END),
+            n_road_access: sum(CASE WHEN p.dist_to_main_road < 50 THEN 1 ELSE 0 END)
+        }} AS stats
+    }}
+    CALL {{
+        WITH {node}
+        OPTIONAL MATCH {parcels}
+        OPTIONAL MATCH (p)-[:HAS_QUIETNESS]->(qc:QuietnessCategory)
+        WITH qc.id AS category, count(p) AS n
+        WHERE category IS NOT NULL
+        RETURN collect(category) AS quietness_categories, collect(n) AS quietness_counts
+    }}
+    CALL {{
+        WITH {node}
+        OPTIONAL MATCH {parcels}
+        OPTIONAL MATCH (p)-[:HAS_NATURE]->(nc:NatureCategory)
+        WITH nc.id AS category, count(p) AS n
+        WHERE category IS NOT NULL
+        RETURN collect(category) AS nature_categories, collect(n) AS nature_counts
+    }}
+    SET {node} += stats,
+        {node}.quietness_categories = quietness_categories,
+        {node}.quietness_counts = quietness_counts,
+        {node}.nature_categories = nature_categories,
+        {node}.nature_counts = nature_counts,
+        {node}.stats_version = $version,
+        {node}.stats_updated_at = datetime()
+    RETURN count({node}) AS nodes, sum(stats.parcel_count) AS parcels
+"""
+
+MATERIALIZE_DISTRICTS = "MATCH (d:District)" + AGGREGATE_TEMPLATE.format(
+    node="d", parcels="(p:Parcel)-[:LOCATED_IN]->(d)",
+)
+MATERIALIZE_CITIES = "MATCH (c:City)" + AGGREGATE_TEMPLATE.format(
+    node="c", parcels="(p:Parcel) WHERE p.gmina = c.name",
+)
@@ -17,17 +17,243 @@ Usage:
 
     # Batch encoding (more efficient)
     embeddings = EmbeddingService.encode_batch(["Osowa", "Matarnia", "Wrzeszcz"])
+
+    # From async code: cached, batched with concurrent callers, off the loop
+    embedding = await EmbeddingService.aencode("Osowa Gdańsk cicha okolica")
+
+Async encoding:
+    Query texts repeat a lot (search_execute builds near-identical
+    "Osowa Gdańsk cicha spokojna okolica ..." strings), so aencode() first
+    checks an in-process LRU and then Redis, keyed on the normalized text.
+    Vectors are cached as float16 (1 KB per 512-dim vector; cosine ranking
+    is unaffected at that precision).
+
+    Misses from concurrent requests (many websocket sessions) are coalesced
+    by EmbeddingBatcher: requests arriving within embedding_batch_wait_ms
+    (or up to embedding_batch_max texts) become one model.encode batch, run
+    in a single worker thread so inference never blocks the event loop.
 """
 
-from typing import List, Optional
+import asyncio
+import base64
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
 from loguru import logger
 
+from app.config import settings
+
+
+# Bump when the cached vector layout changes
+EMBEDDING_CACHE_SCHEMA = "v1"
+
+# Batch size histogram buckets (upper bounds)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def normalize_text(text: str) -> str:
+    """Canonical model input: lowercase, trimmed, single spaces."""
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+@dataclass
+class _CacheTierStats:
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + Redis) cache of text -> float16 vector."""
+
+    def __init__(self, model_name: str, max_entries: int, ttl_s: int):
+        self._prefix = f"emb:{EMBEDDING_CACHE_SCHEMA}:{model_name}"
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_stats = _CacheTierStats()
+        self._redis_stats = _CacheTierStats()
+
+    def key(self, text: str, normalize: bool) -> str:
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return f"{self._prefix}:{int(normalize)}:{digest}"
+
+    async def get(self, key: str) -> Optional[np.ndarray]:
+        """Look up a vector: memory first, then Redis (promoted to memory)."""
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self._memory_stats.hits += 1
+            return vector
+        self._memory_stats.misses += 1
+
+        try:
+            from app.services.database import redis_cache
+            raw = await redis_cache.get(key)
+        except Exception as e:
+            self._redis_stats.errors += 1
+            logger.warning(f"Embedding cache Redis get failed: {e}")
+            return None
+        if raw is None:
+            self._redis_stats.misses += 1
+            return None
+
+        try:
+            vector = np.frombuffer(base64.b64decode(raw), dtype=np.float16)
+        except (ValueError, TypeError) as e:
+            self._redis_stats.errors += 1
+            logger.warning(f"Embedding cache entry unreadable ({key}): {e}")
+            return None
+        self._redis_stats.hits += 1
+        self._remember(key, vector)
+        return vector
+
+    async def put(self, key: str, vector: np.ndarray):
+        """Store a float16 vector in both tiers."""
+        self._remember(key, vector)
+        try:
+            from app.services.database import redis_cache
+            # RedisManager decodes responses as text, hence base64
+            raw = base64.b64encode(vector.tobytes()).decode("ascii")
+            await redis_cache.set(key, raw, expire=self._ttl_s)
+        except Exception as e:
+            self._redis_stats.errors += 1
+            logger.warning(f"Embedding cache Redis set failed: {e}")
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._memory_stats.hits + self._memory_stats.misses
+        hits = self._memory_stats.hits + self._redis_stats.hits
+        return {
+            "entries": len(self._memory),
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory": asdict(self._memory_stats),
+            "redis": asdict(self._redis_stats),
+        }
+
+
+@dataclass
+class _BatchStats:
+    batches: int = 0
+    texts: int = 0
+    requests: int = 0
+    max_size: int = 0
+    encode_ms_total: float = 0.0
+    sizes: Dict[int, int] = field(default_factory=lambda: {b: 0 for b in BATCH_SIZE_BUCKETS})
+
+    def add(self, size: int, requests: int, encode_ms: float):
+        self.batches += 1
+        self.texts += size
+        self.requests += requests
+        self.max_size = max(self.max_size, size)
+        self.encode_ms_total += encode_ms
+        for bound in BATCH_SIZE_BUCKETS:
+            if size <= bound:
+                self.sizes[bound] += 1
+                return
+        self.sizes[BATCH_SIZE_BUCKETS[-1]] += 1
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent encode requests into one model.encode call.
+
+    Requests are queued; the queue is flushed max_wait_ms after the first
+    request (or as soon as max_batch texts are waiting). Each flush encodes
+    the distinct texts in one batch on a single worker thread, so batches
+    run one at a time and new requests pile up into the next batch while a
+    batch is running.
+    """
+
+    def __init__(self, encode_fn, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self._encode_fn = encode_fn
+        self._max_batch = max_batch
+        self._max_wait_s = max_wait_ms / 1000.0
+        self._pending: List[Tuple[str, bool, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._stats = _BatchStats()
+
+    async def encode(self, text: str, normalize: bool = True) -> np.ndarray:
+        """Encode one (already normalized) text as part of the next batch."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, normalize, future))
+        if len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._max_wait_s, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        # One model call per normalize flag, distinct texts only
+        groups: Dict[bool, List[Tuple[str, asyncio.Future]]] = {}
+        for text, normalize, future in pending:
+            groups.setdefault(normalize, []).append((text, future))
+        for normalize, items in groups.items():
+            asyncio.ensure_future(self._run(items, normalize))
+
+    async def _run(self, items: List[Tuple[str, asyncio.Future]], normalize: bool):
+        texts = list(dict.fromkeys(text for text, _ in items))
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        try:
+            vectors = await loop.run_in_executor(
+                self._executor, self._encode_fn, texts, normalize,
+            )
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._stats.add(len(texts), len(items), (time.monotonic() - start) * 1000)
+        by_text = dict(zip(texts, vectors))
+        for text, future in items:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> Dict[str, Any]:
+        s = self._stats
+        return {
+            "batches": s.batches,
+            "requests": s.requests,
+            "texts": s.texts,
+            "avg_batch_size": round(s.texts / s.batches, 2) if s.batches else 0.0,
+            "max_batch_size": s.max_size,
+            "avg_encode_ms": round(s.encode_ms_total / s.batches, 1) if s.batches else 0.0,
+            "batch_sizes": {f"<={b}": n for b, n in s.sizes.items()},
+            "queued": len(self._pending),
+        }
+
 
 class EmbeddingService:
     """Lazy-loading embedding service using sentence-transformers."""
 
     _model = None
     _model_name = "distiluse-base-multilingual-cased"
+    _cache: Optional[EmbeddingCache] = None
+    _batcher: Optional[EmbeddingBatcher] = None
+    # Cache misses being encoded, by cache key (concurrent duplicates share one)
+    _inflight: Dict[str, "asyncio.Future[np.ndarray]"] = {}
 
     @classmethod
     def get_model(cls):
@@ -93,6 +319,88 @@ class EmbeddingService:
         )
         return embeddings.tolist()
 
+    @classmethod
+    def _encode_texts(cls, texts: List[str], normalize: bool) -> np.ndarray:
+        """model.encode for the batcher's worker thread (texts pre-normalized)."""
+        return cls.get_model().encode(
+            texts,
+            normalize_embeddings=normalize,
+            convert_to_numpy=True,
+            batch_size=max(len(texts), 1),
+        )
+
+    @classmethod
+    def _get_cache(cls) -> EmbeddingCache:
+        if cls._cache is None:
+            cls._cache = EmbeddingCache(
+                cls._model_name,
+                max_entries=settings.embedding_cache_size,
+                ttl_s=settings.embedding_cache_ttl_s,
+            )
+        return cls._cache
+
+    @classmethod
+    def _get_batcher(cls) -> EmbeddingBatcher:
+        if cls._batcher is None:
+            cls._batcher = EmbeddingBatcher(
+                cls._encode_texts,
+                max_batch=settings.embedding_batch_max,
+                max_wait_ms=settings.embedding_batch_wait_ms,
+            )
+        return cls._batcher
+
+    @classmethod
+    async def aencode(cls, text: str, normalize: bool = True) -> List[float]:
+        """Encode a single text from async code.
+
+        Cached (memory, then Redis) by normalized text; on a miss the text
+        joins the current micro-batch and is encoded in the worker thread.
+        Concurrent calls for the same text wait for one encode. Results are
+        float16-rounded on both paths, so a text always maps to the same
+        vector.
+
+        Args:
+            text: Text to encode
+            normalize: Whether to L2-normalize the embedding (default: True)
+
+        Returns:
+            List of floats representing the embedding
+        """
+        text = normalize_text(text)
+        cache = cls._get_cache()
+        key = cache.key(text, normalize)
+        vector = await cache.get(key)
+        if vector is None:
+            task = cls._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(cls._encode_and_cache(key, text, normalize))
+                cls._inflight[key] = task
+                task.add_done_callback(lambda t: cls._encode_done(key, t))
+            # Shielded: a cancelled caller must not cancel the shared encode
+            vector = await asyncio.shield(task)
+        return vector.astype(np.float32).tolist()
+
+    @classmethod
+    async def _encode_and_cache(cls, key: str, text: str, normalize: bool) -> np.ndarray:
+        vector = (await cls._get_batcher().encode(text, normalize)).astype(np.float16)
+        await cls._get_cache().put(key, vector)
+        return vector
+
+    @classmethod
+    def _encode_done(cls, key: str, task: "asyncio.Future[np.ndarray]"):
+        cls._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller was cancelled
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Cache hit rate and batch size metrics."""
+        return {
+            "model_loaded": cls.is_loaded(),
+            "cache": cls._cache.stats() if cls._cache else None,
+            "batching": cls._batcher.stats() if cls._batcher else None,
+        }
+
     @classmethod
     def get_dimension(cls) -> int:
         """Get the embedding dimension (512 for distiluse-base-multilingual-cased).
@@ -0,0 +1,475 @@
+"""
+Per-district facet cube - in-process parcel counts and filter diagnosis.
+
+Parcels are grouped into cells by every categorical filter the agent uses
+(gmina x dzielnica x size/quietness/nature/access/density category x
+ownership x build status x MPZP flags x default shape eligibility). Each
+cell stores its parcel count plus histograms for area_m2 and the dist_to_*
+fields, so:
+
+- category/location filters select cells (exact),
+- one upper bound (max area or one distance) is read off the cell
+  histogram: exact on bin edges (bins include their upper edge, so
+  "<= 500 m" counts parcels at exactly 500 m), linearly interpolated
+  inside a bin (estimate),
+- lower bounds (min area) and several range filters combine per cell
+  (estimate; several ranges assuming independence).
+
+Estimates are flagged (FacetCount.exact=False) and never round a positive
+share down to 0 - callers that need a reliable zero run the exact query.
+
+Checkpoint counts (search_count) and empty-result diagnosis then run in
+microseconds without touching Neo4j.
+
+The cube is built once per dataset version - from the columnar parcel
+store's snapshot when loaded, otherwise from one keyset export - and saved
+as a single compressed .npz under settings.facet_cube_path, so restarts
+only read the file.
+
+Usage:
+    from app.services.facet_cube import facet_cube, FacetQuery
+
+    cube = facet_cube.cube          # None until loaded
+    if cube:
+        cube.count(FacetQuery(gmina="Gdańsk", min_area=800))
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.services.dataset_version import dataset_version
+from app.services.parcel_store import ParcelSnapshot, parcel_store
+
+
+# Categorical cube dimensions (ParcelSnapshot column names)
+CATEGORY_DIMENSIONS = [
+    "gmina", "dzielnica",
+    "size_category", "kategoria_ciszy", "kategoria_natury", "kategoria_dostepu",
+    "gestosc_zabudowy", "ownership_type", "build_status",
+]
+
+# Boolean cube dimensions (0/1 codes)
+FLAG_DIMENSIONS = [
+    "has_pog",              # pog_symbol IS NOT NULL
+    "is_residential_zone",
+    "eligible",             # default search filters: shape quality, not SK/SI
+]
+
+DIMENSIONS = CATEGORY_DIMENSIONS + FLAG_DIMENSIONS
+
+# Histogram bin edges - common agent thresholds fall on edges (exact counts).
+# Bins are (edge_i, edge_i+1]: upper bounds ("<= 500") are exact on an edge.
+AREA_BINS = np.array([
+    0, 300, 400, 500, 600, 700, 800, 900, 1000, 1200, 1500, 2000, 2500,
+    3000, 4000, 5000, 7500, 10000, 20000, 50000, np.inf,
+])
+DIST_BINS = np.array([
+    0, 100, 200, 300, 400, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000, np.inf,
+])
+DIST_FIELDS = [
+    "dist_to_forest", "dist_to_water", "dist_to_school",
+    "dist_to_supermarket", "dist_to_bus_stop",
+]
+
+CUBE_FILE = "cube.npz"
+# Bumped when the saved arrays change meaning (2: upper-inclusive bins)
+CUBE_LAYOUT = 2
+
+
+@dataclass
+class FacetQuery:
+    """Filters understood by the cube (None = not filtered)."""
+    gmina: Optional[str] = None
+    dzielnica: Optional[str] = None
+    dzielnica_prefix: bool = True  # also match "Wrzeszcz Dolny" for "Wrzeszcz"
+    size_category: Optional[List[str]] = None
+    kategoria_ciszy: Optional[List[str]] = None
+    kategoria_natury: Optional[List[str]] = None
+    kategoria_dostepu: Optional[List[str]] = None
+    gestosc_zabudowy: Optional[List[str]] = None
+    ownership_type: Optional[List[str]] = None
+    build_status: Optional[List[str]] = None
+    has_pog: Optional[bool] = None
+    is_residential_zone: Optional[bool] = None
+    eligible: Optional[bool] = None
+    min_area: Optional[float] = None
+    max_area: Optional[float] = None
+    max_dist: Dict[str, float] = field(default_factory=dict)
+
+    def active_filters(self) -> List[str]:
+        """Names of filters other than location that are set."""
+        names = [
+            f.name for f in fields(self)
+            if f.name not in ("gmina", "dzielnica", "dzielnica_prefix", "max_dist",
+                              "min_area", "max_area", "eligible")
+            and getattr(self, f.name) not in (None, [])
+        ]
+        if self.min_area or self.max_area:
+            names.append("area")
+        names.extend(self.max_dist)
+        return names
+
+    def without(self, name: str) -> "FacetQuery":
+        """Copy with one filter (as named by active_filters) removed."""
+        if name == "area":
+            return replace(self, min_area=None, max_area=None)
+        if name in self.max_dist:
+            return replace(self, max_dist={k: v for k, v in self.max_dist.items() if k != name})
+        return replace(self, **{name: None})
+
+
+@dataclass
+class FacetCount:
+    """Count answer; exact=False when it is a histogram estimate."""
+    count: int
+    exact: bool = True
+
+
+class FacetCube:
+    """Cell table: dimension codes, counts and per-cell histograms."""
+
+    def __init__(
+        self,
+        version: str,
+        cells: np.ndarray,
+        counts: np.ndarray,
+        area_hist: np.ndarray,
+        dist_hist: np.ndarray,
+        vocab: Dict[str, List[str]],
+    ):
+        self.version = version
+        self.cells = cells            # (n_cells, len(DIMENSIONS)) int32, -1 = NULL
+        self.counts = counts          # (n_cells,) int64
+        self.area_hist = area_hist    # (n_cells, len(AREA_BINS) - 1)
+        self.dist_hist = dist_hist    # (len(DIST_FIELDS), n_cells, len(DIST_BINS) - 1)
+        self.vocab = vocab
+        self._vocab_index = {
+            dim: {value: code for code, value in enumerate(values)}
+            for dim, values in vocab.items()
+        }
+        self._dim = {name: i for i, name in enumerate(DIMENSIONS)}
+        # Cumulative histograms with a leading 0 column: cdf[:, i] = count <= edge i
+        self._area_cdf = _cumulative(area_hist)
+        self._dist_cdf = np.stack([_cumulative(h) for h in dist_hist]) if len(dist_hist) else dist_hist
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    # -------------------------------------------------------------------------
+    # Build / persist
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def from_snapshot(cls, snapshot: ParcelSnapshot) -> "FacetCube":
+        """Aggregate a parcel snapshot into cells."""
+        pog = snapshot.codes["pog_symbol"]
+        aspect = snapshot.numeric["aspect_ratio"]
+        shape = snapshot.numeric["shape_index"]
+        eligible = (
+            (np.isnan(aspect) | (aspect <= 6.0))
+            & (np.isnan(shape) | (shape >= 0.15))
+            & ~snapshot.isin("pog_symbol", ["SK", "SI"])
+        )
+        flags = {
+            "has_pog": pog >= 0,
+            "is_residential_zone": np.asarray(snapshot.flags["is_residential_zone"]),
+            "eligible": eligible,
+        }
+
+        columns = [np.asarray(snapshot.codes[dim], dtype=np.int32) for dim in CATEGORY_DIMENSIONS]
+        columns += [flags[dim].astype(np.int32) for dim in FLAG_DIMENSIONS]
+        keys = np.stack(columns, axis=1)
+        cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        n_cells = len(cells)
+        counts = np.bincount(inverse, minlength=n_cells).astype(np.int64)
+
+        area_hist = _histogram(inverse, np.asarray(snapshot.numeric["area_m2"]), AREA_BINS, n_cells)
+        dist_hist = np.stack([
+            _histogram(inverse, np.asarray(snapshot.numeric[f]), DIST_BINS, n_cells)
+            for f in DIST_FIELDS
+        ])
+
+        vocab = {dim: list(snapshot.vocab[dim]) for dim in CATEGORY_DIMENSIONS}
+        return cls(snapshot.version, cells, counts, area_hist, dist_hist, vocab)
+
+    def save(self, path: Path) -> None:
+        """Write a single compressed .npz (atomic replace)."""
+        meta = {
+            "version": self.version,
+            "layout": CUBE_LAYOUT,
+            "dimensions": DIMENSIONS,
+            "dist_fields": DIST_FIELDS,
+            "vocab": self.vocab,
+        }
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez_compressed(
+            tmp,
+            cells=self.cells, counts=self.counts,
+            area_hist=self.area_hist, dist_hist=self.dist_hist,
+            area_bins=AREA_BINS, dist_bins=DIST_BINS,
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "FacetCube":
+        """Load a saved cube (layout must match this module's bins/dims)."""
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if (
+                meta.get("layout") != CUBE_LAYOUT
+                or meta["dimensions"] != DIMENSIONS
+                or meta["dist_fields"] != DIST_FIELDS
+                or not np.array_equal(data["area_bins"], AREA_BINS)
+                or not np.array_equal(data["dist_bins"], DIST_BINS)
+            ):
+                raise ValueError("facet cube layout changed")
+            return cls(
+                meta["version"], data["cells"], data["counts"],
+                data["area_hist"], data["dist_hist"], meta["vocab"],
+            )
+
+    # -------------------------------------------------------------------------
+    # Query
+    # -------------------------------------------------------------------------
+
+    def _codes(self, dim: str, values: List[str]) -> List[int]:
+        index = self._vocab_index[dim]
+        return [index[v] for v in values if v in index]
+
+    def cell_mask(self, q: FacetQuery) -> np.ndarray:
+        """Cells matching the categorical part of a query."""
+        mask = np.ones(len(self), dtype=bool)
+
+        if q.gmina:
+            mask &= self.cells[:, self._dim["gmina"]] == self._code("gmina", q.gmina)
+        if q.dzielnica:
+            names = [q.dzielnica]
+            if q.dzielnica_prefix:
+                prefix = q.dzielnica + " "
+                names = [v for v in self.vocab["dzielnica"] if v == q.dzielnica or v.startswith(prefix)]
+            mask &= np.isin(self.cells[:, self._dim["dzielnica"]], self._codes("dzielnica", names))
+
+        for dim in CATEGORY_DIMENSIONS[2:]:
+            values = getattr(q, dim)
+            if values:
+                mask &= np.isin(self.cells[:, self._dim[dim]], self._codes(dim, values))
+
+        for dim in FLAG_DIMENSIONS:
+            value = getattr(q, dim)
+            if value is not None:
+                mask &= self.cells[:, self._dim[dim]] == int(bool(value))
+
+        return mask
+
+    def _code(self, dim: str, value: str) -> int:
+        # -2 never matches (-1 is NULL)
+        return self._vocab_index[dim].get(value, -2)
+
+    def _range_fraction(self, cdf: np.ndarray, bins: np.ndarray, idx: np.ndarray,
+                        lo: Optional[float], hi: Optional[float]) -> Tuple[np.ndarray, bool]:
+        """Share of each cell's parcels with lo <= value <= hi (NULL excluded).
+
+        A lower bound is never exact: values equal to it are in the bin below.
+        """
+        below_hi, exact_hi = _cdf_at(cdf[idx], bins, hi if hi else np.inf)
+        below_lo, _ = _cdf_at(cdf[idx], bins, lo if lo else 0.0)
+        n = self.counts[idx].astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = np.where(n > 0, (below_hi - below_lo) / n, 0.0)
+        return np.clip(frac, 0.0, 1.0), exact_hi and not lo
+
+    def count(self, q: FacetQuery) -> FacetCount:
+        """Number of parcels matching the query."""
+        idx = np.flatnonzero(self.cell_mask(q))
+        if idx.size == 0:
+            return FacetCount(0)
+
+        ranges = []
+        if q.min_area or q.max_area:
+            ranges.append(self._range_fraction(self._area_cdf, AREA_BINS, idx, q.min_area, q.max_area))
+        for name, max_dist in q.max_dist.items():
+            f = DIST_FIELDS.index(name)
+            ranges.append(self._range_fraction(self._dist_cdf[f], DIST_BINS, idx, None, max_dist))
+
+        if not ranges:
+            return FacetCount(int(self.counts[idx].sum()))
+
+        weight = np.ones(idx.size)
+        for frac, _ in ranges:
+            weight *= frac
+        exact = len(ranges) == 1 and ranges[0][1]
+        estimate = float((self.counts[idx] * weight).sum())
+        count = int(round(estimate))
+        if not exact and estimate > 0:
+            # An estimate is no evidence of zero matches
+            count = max(count, 1)
+        return FacetCount(count, exact)
+
+    def distribution(self, q: FacetQuery, dim: str) -> Dict[str, int]:
+        """Parcel counts per category of `dim` among cells matching q (desc)."""
+        idx = np.flatnonzero(self.cell_mask(q))
+        codes = self.cells[idx, self._dim[dim]]
+        valid = codes >= 0
+        totals = np.bincount(codes[valid], weights=self.counts[idx][valid],
+                             minlength=len(self.vocab[dim]))
+        out = {self.vocab[dim][c]: int(totals[c]) for c in np.flatnonzero(totals)}
+        return dict(sorted(out.items(), key=lambda kv: -kv[1]))
+
+    def blocking_filters(self, q: FacetQuery) -> Dict[str, int]:
+        """Count after removing each active filter in turn (largest gain first)."""
+        out = {name: self.count(q.without(name)).count for name in q.active_filters()}
+        return dict(sorted(out.items(), key=lambda kv: -kv[1]))
+
+
+def _histogram(inverse: np.ndarray, values: np.ndarray, bins: np.ndarray, n_cells: int) -> np.ndarray:
+    """(n_cells, n_bins) counts of non-null values per cell, bins (edge_i, edge_i+1]."""
+    n_bins = len(bins) - 1
+    valid = ~np.isnan(values)
+    b = np.clip(np.searchsorted(bins, values[valid], side="left") - 1, 0, n_bins - 1)
+    flat = np.bincount(inverse[valid] * n_bins + b, minlength=n_cells * n_bins)
+    return flat.reshape(n_cells, n_bins).astype(np.int32)
+
+
+def _cumulative(hist: np.ndarray) -> np.ndarray:
+    out = np.zeros((hist.shape[0], hist.shape[1] + 1), dtype=np.int64)
+    np.cumsum(hist, axis=1, out=out[:, 1:])
+    return out
+
+
+def _cdf_at(cdf: np.ndarray, bins: np.ndarray, t: float) -> Tuple[np.ndarray, bool]:
+    """Per-cell count of values <= t (interpolated within a bin).
+
+    Bins are (edge_i, edge_i+1], so a threshold on an edge is exact
+    (values equal to it are counted).
+    """
+    if t >= bins[-1] or np.isinf(t):
+        return cdf[:, -1].astype(np.float64), True
+    if t <= bins[0]:
+        return np.zeros(cdf.shape[0]), True
+    i = int(np.searchsorted(bins, t, side="right") - 1)
+    lo, hi = bins[i], bins[i + 1]
+    if t == lo:
+        return cdf[:, i].astype(np.float64), True
+    if np.isinf(hi):
+        # Open last bin: no width to interpolate over
+        return cdf[:, i].astype(np.float64), False
+    share = (t - lo) / (hi - lo)
+    return cdf[:, i] + share * (cdf[:, i + 1] - cdf[:, i]), False
+
+
+class FacetCubeStore:
+    """Versioned cube with lazy background build."""
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = Path(root or settings.facet_cube_path)
+        self._cube: Optional[FacetCube] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def cube(self) -> Optional[FacetCube]:
+        """Loaded cube for the last known dataset version, or None.
+
+        Never blocks on the database; when the dataset version moved on, a
+        rebuild is scheduled and None is returned until it completes.
+        """
+        cube = self._cube
+        current = dataset_version.current
+        if cube is None or (current is not None and cube.version != current):
+            if settings.facet_cube_enabled:
+                self.schedule_refresh()
+            return None
+        return cube
+
+    def _version_path(self, version: str) -> Path:
+        return self._root / re.sub(r"[^A-Za-z0-9._-]", "_", version) / CUBE_FILE
+
+    async def _snapshot(self, version: str) -> Optional[ParcelSnapshot]:
+        snapshot = parcel_store.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        rows = await parcel_store.fetch_rows()
+        if not rows:
+            return None
+        return await asyncio.to_thread(ParcelSnapshot.from_rows, version, rows)
+
+    def _build_and_save(self, snapshot: ParcelSnapshot, path: Path) -> FacetCube:
+        cube = FacetCube.from_snapshot(snapshot)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        cube.save(path)
+        return cube
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Load (or build) the cube for the current dataset version.
+
+        Returns:
+            True if a current cube is loaded
+        """
+        async with self._lock:
+            try:
+                version = await dataset_version.get()
+                if not force and self._cube is not None and self._cube.version == version:
+                    return True
+
+                start = time.monotonic()
+                path = self._version_path(version)
+                cube = None
+                if not force and path.exists():
+                    try:
+                        cube = await asyncio.to_thread(FacetCube.load, path)
+                        source = "disk"
+                    except (ValueError, KeyError, OSError) as e:
+                        logger.info(f"Facet cube on disk not usable ({e}), rebuilding")
+                if cube is None:
+                    snapshot = await self._snapshot(version)
+                    if snapshot is None:
+                        logger.warning("Facet cube: no parcels in Neo4j")
+                        return self._cube is not None
+                    cube = await asyncio.to_thread(self._build_and_save, snapshot, path)
+                    source = "snapshot"
+
+                self._cube = cube
+                logger.info(
+                    f"Facet cube loaded from {source}: {len(cube):,} cells, "
+                    f"{cube.total:,} parcels, version={version} "
+                    f"({(time.monotonic() - start) * 1000:.0f}ms)"
+                )
+                return True
+            except Exception as e:
+                logger.warning(f"Facet cube refresh failed: {e}")
+                return False
+
+    def schedule_refresh(self) -> None:
+        """Start refresh() in the background unless one is running."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    def stats(self) -> Dict[str, Any]:
+        """Cube status for diagnostics."""
+        cube = self._cube
+        return {
+            "ready": cube is not None,
+            "version": cube.version if cube else None,
+            "cells": len(cube) if cube else 0,
+            "parcels": cube.total if cube else 0,
+        }
+
+
+# Global instance
+facet_cube = FacetCubeStore()
@@ -8,12 +8,26 @@ Handles knowledge graph queries for:
 - PRIMARY parcel search using rich relationships
 """
 
-from typing import List, Optional, Dict, Any
-from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import dataclass
 
 from loguru import logger
 
+from app.config import settings
 from app.services.database import neo4j
+from app.services.dataset_version import dataset_version
+from app.services.district_stats import (
+    GREEN_CATEGORIES,
+    QUIET_CATEGORIES,
+    district_stats,
+)
+from app.services.location_index import (
+    RESOLVE_LEVELS,
+    LocationIndex,
+    LocationMatch,
+    location_index,
+)
+from app.services.query_templates import query_templates
 
 
 # =============================================================================
@@ -45,9 +59,58 @@ WATER_TYPES = {
     "staw": {"name_pl": "Staw", "priority": 6, "premium_factor": 1.05, "threshold_m": 100},
 }
 
+# Walking distances over the road network (pipeline step 07c) for POI
+# classes that have them; the straight-line dist_to_* is the fallback for
+# parcels without one (not reached, or not yet imported)
+NETWORK_DISTANCE_FIELDS = {
+    "dist_to_school": "net_dist_to_school",
+    "dist_to_supermarket": "net_dist_to_supermarket",
+    "dist_to_bus_stop": "net_dist_to_bus_stop",
+    "dist_to_doctors": "net_dist_to_doctors",
+}
+
+
+def field_cypher(name: str, alias: str = "p") -> str:
+    """Cypher expression for a parcel property (network distance first)."""
+    network = NETWORK_DISTANCE_FIELDS.get(name)
+    if network:
+        return f"coalesce({alias}.{network}, {alias}.{name})"
+    return f"{alias}.{name}"
+
+
 # Price segments for districts
 PRICE_SEGMENTS = ["ULTRA_PREMIUM", "PREMIUM", "HIGH", "MEDIUM", "BUDGET", "ECONOMY"]
 
+# Fields returned for every scored-search hit (Cypher and columnar paths)
+SEARCH_RESULT_PROJECTION = """
+                p.id_dzialki as id,
+                p.gmina as gmina,
+                p.dzielnica as miejscowosc,
+                p.area_m2 as area_m2,
+                p.quietness_score as quietness_score,
+                p.nature_score as nature_score,
+                p.accessibility_score as accessibility_score,
+                p.pog_symbol IS NOT NULL as has_mpzp,
+                p.pog_symbol as mpzp_symbol,
+                p.centroid_lat as lat,
+                p.centroid_lon as lon,
+                p.dist_to_forest as dist_to_forest,
+                p.dist_to_water as dist_to_water,
+                coalesce(p.net_dist_to_school, p.dist_to_school) as dist_to_school,
+                coalesce(p.net_dist_to_supermarket, p.dist_to_supermarket) as dist_to_shop,
+                coalesce(p.net_dist_to_bus_stop, p.dist_to_bus_stop) as dist_to_bus_stop,
+                p.pct_forest_500m as pct_forest_500m,
+                p.count_buildings_500m as count_buildings_500m,
+                p.is_built as is_built,
+                p.is_residential_zone as is_residential_zone,
+                p.nearest_water_type as nearest_water_type,
+                p.dist_to_sea as dist_to_sea,
+                p.kategoria_ciszy as kategoria_ciszy,
+                p.kategoria_natury as kategoria_natury,
+                p.gestosc_zabudowy as gestosc_zabudowy,
+                p.shape_index as shape_index,
+                p.aspect_ratio as aspect_ratio"""
+
 
 @dataclass
 class ParcelSearchCriteria:
@@ -153,6 +216,34 @@ class MPZPInfo:
     parcel_count: int = 0
 
 
+@dataclass
+class ScoreTerm:
+    """
+    One weighted component of the search_parcels soft score.
+
+    Kept as data so the Cypher query and the in-process columnar store
+    (app.services.parcel_store) evaluate exactly the same formula.
+
+    Kinds:
+        score  - coalesce(field, 0) / 100, boosted to 0.5 + 0.5 * x when
+                 category_field is IN categories
+        match  - 1.0 when category_field IN categories, else 0.0
+        decay  - NULL -> 0, <= ideal -> 1, else exp(-(d - ideal) / decay)
+        min_pct - >= threshold -> 1, >= threshold/2 -> 0.5, else pct / threshold
+        far    - NULL -> 0.5, >= threshold -> 1, >= threshold/2 -> 0.5, else 0
+        shape  - fixed compactness/aspect-ratio bonus
+    """
+    kind: str
+    weight: float
+    field: Optional[str] = None
+    category_field: Optional[str] = None
+    categories: Optional[List[str]] = None
+    param: Optional[str] = None  # Cypher parameter name for categories
+    ideal: float = 0.0
+    decay: float = 1.0
+    threshold: float = 0.0
+
+
 class GraphService:
     """Service for Neo4j knowledge graph queries."""
 
@@ -168,6 +259,13 @@ class GraphService:
             logger.error(f"Error running query: {e}")
             return []
 
+    async def _run_template(
+        self, name: str, query: str, params: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Run a parameterized query template, counting plan-cache reuse."""
+        query_templates.record(name, query)
+        return await neo4j.run(query, params)
+
     async def get_gmina_info(self, gmina_name: str) -> Optional[GminaInfo]:
         """
         Get information about a gmina (city) including statistics.
@@ -542,6 +640,216 @@ class GraphService:
 
         return inferred
 
+    @staticmethod
+    def _build_score_terms(
+        criteria: ParcelSearchCriteria,
+        weights: Dict[str, float],
+    ) -> List[ScoreTerm]:
+        """Translate criteria + weights into the soft-score terms of search_parcels."""
+        terms: List[ScoreTerm] = []
+
+        # --- Normalized score dimensions (0-100 score -> 0.0-1.0) ---
+        # Matching preferred category gives 0.5 + 0.5 * continuous score
+        score_dims = [
+            ("quietness", "quietness_score", "kategoria_ciszy",
+             criteria.quietness_categories, "quietness_cats"),
+            ("nature", "nature_score", "kategoria_natury",
+             criteria.nature_categories, "nature_cats"),
+            ("accessibility", "accessibility_score", "kategoria_dostepu",
+             criteria.accessibility_categories, "access_cats"),
+        ]
+        for dim, field_name, category_field, categories, param in score_dims:
+            if weights[dim] > 0:
+                terms.append(ScoreTerm(
+                    kind="score", weight=weights[dim], field=field_name,
+                    category_field=category_field if categories else None,
+                    categories=categories or None,
+                    param=param if categories else None,
+                ))
+
+        # Density category match (binary bonus)
+        if criteria.building_density:
+            terms.append(ScoreTerm(
+                kind="match", weight=0.1, category_field="gestosc_zabudowy",
+                categories=criteria.building_density, param="density_cats",
+            ))
+
+        # Size category match (binary bonus)
+        size_cats = criteria.size_category or criteria.area_category
+        if size_cats:
+            terms.append(ScoreTerm(
+                kind="match", weight=0.1, category_field="size_category",
+                categories=size_cats, param="size_cats",
+            ))
+
+        # --- Distance-based scoring with exponential decay ---
+        # ideal = threshold * 0.5 (perfect score zone)
+        # decay = threshold (score drops to ~37% at 1.5x threshold)
+
+        # Forest proximity
+        if weights["forest"] > 0:
+            terms.append(ScoreTerm(
+                kind="decay", weight=weights["forest"], field="dist_to_forest",
+                ideal=int(criteria.max_dist_to_forest_m * 0.5) if criteria.max_dist_to_forest_m else 200,
+                decay=criteria.max_dist_to_forest_m or 500,
+            ))
+
+        # Water proximity
+        if weights["water"] > 0:
+            if criteria.water_type:
+                dist_field_map = {
+                    "morze": "dist_to_sea", "zatoka": "dist_to_sea",
+                    "rzeka": "dist_to_river", "jezioro": "dist_to_lake",
+                    "kanal": "dist_to_canal", "staw": "dist_to_pond",
+                }
+                dist_field = dist_field_map.get(criteria.water_type, "dist_to_water")
+                wt = WATER_TYPES.get(criteria.water_type, {})
+                ideal = int(wt.get("threshold_m", 500) * 0.3)
+                decay = int(wt.get("threshold_m", 500))
+            elif criteria.max_dist_to_water_m:
+                dist_field = "dist_to_water"
+                ideal = int(criteria.max_dist_to_water_m * 0.5)
+                decay = criteria.max_dist_to_water_m
+            else:
+                dist_field = "dist_to_water"
+                ideal = 200
+                decay = 500
+            terms.append(ScoreTerm(
+                kind="decay", weight=weights["water"], field=dist_field,
+                ideal=ideal, decay=decay,
+            ))
+
+        # Specific water distance scoring (sea/lake/river)
+        water_dist_configs = [
+            (criteria.max_dist_to_sea_m, "dist_to_sea"),
+            (criteria.max_dist_to_lake_m, "dist_to_lake"),
+            (criteria.max_dist_to_river_m, "dist_to_river"),
+        ]
+        for threshold, field_name in water_dist_configs:
+            if threshold:
+                terms.append(ScoreTerm(
+                    kind="decay", weight=0.15, field=field_name,
+                    ideal=int(threshold * 0.3), decay=threshold,
+                ))
+
+        # Near water (general, when explicitly required)
+        if criteria.near_water_required and weights["water"] == 0:
+            terms.append(ScoreTerm(
+                kind="decay", weight=0.15, field="dist_to_water", ideal=150, decay=500,
+            ))
+
+        # POI proximity: (weight key, criteria threshold, field, default ideal, default decay)
+        poi_configs = [
+            ("school", criteria.max_dist_to_school_m, "dist_to_school", 400, 1000),
+            ("shop", criteria.max_dist_to_shop_m, "dist_to_supermarket", 300, 800),
+            ("transport", criteria.max_dist_to_bus_stop_m, "dist_to_bus_stop", 250, 600),
+        ]
+        for dim, threshold, field_name, default_ideal, default_decay in poi_configs:
+            if weights[dim] > 0:
+                terms.append(ScoreTerm(
+                    kind="decay", weight=weights[dim], field=field_name,
+                    ideal=int(threshold * 0.5) if threshold else default_ideal,
+                    decay=threshold or default_decay,
+                ))
+
+        # Hospital proximity (only when explicitly requested)
+        if criteria.max_dist_to_hospital_m:
+            terms.append(ScoreTerm(
+                kind="decay", weight=0.1, field="dist_to_doctors",
+                ideal=int(criteria.max_dist_to_hospital_m * 0.5),
+                decay=criteria.max_dist_to_hospital_m,
+            ))
+
+        # Forest percentage in 500m buffer
+        if criteria.min_forest_pct_500m:
+            terms.append(ScoreTerm(
+                kind="min_pct", weight=0.1, field="pct_forest_500m",
+                threshold=criteria.min_forest_pct_500m,
+            ))
+
+        # Industrial distance (want to be FAR - reversed scoring)
+        if criteria.min_dist_to_industrial_m:
+            terms.append(ScoreTerm(
+                kind="far", weight=0.1, field="dist_to_industrial",
+                threshold=int(criteria.min_dist_to_industrial_m),
+            ))
+
+        # Shape quality (always active, fixed weight) - compact, rectangular parcels
+        terms.append(ScoreTerm(kind="shape", weight=0.08))
+
+        return terms
+
+    @staticmethod
+    def _score_term_cypher(term: ScoreTerm, params: Dict[str, Any], i: int) -> str:
+        """Render one ScoreTerm as a Cypher expression over `p`.
+
+        All numbers go into params (suffix i = term position), so the query
+        text depends only on which dimensions are active and Neo4j can reuse
+        the cached plan across different weights and thresholds.
+        """
+        w = f"$w{i}"
+        params[f"w{i}"] = float(term.weight)
+        f = field_cypher(term.field) if term.field else None
+
+        if term.kind == "score":
+            if term.categories:
+                params[term.param] = term.categories
+                return (
+                    f"{w} * (CASE WHEN p.{term.category_field} IN ${term.param} "
+                    f"THEN 0.5 + 0.5 * coalesce({f}, 0) / 100.0 "
+                    f"ELSE coalesce({f}, 0) / 100.0 END)"
+                )
+            return f"{w} * coalesce({f}, 0) / 100.0"
+
+        if term.kind == "match":
+            params[term.param] = term.categories
+            return f"{w} * CASE WHEN p.{term.category_field} IN ${term.param} THEN 1.0 ELSE 0.0 END"
+
+        if term.kind == "decay":
+            params[f"ideal{i}"] = float(term.ideal)
+            params[f"decay{i}"] = float(term.decay)
+            return (
+                f"{w} * CASE WHEN {f} IS NULL THEN 0.0 "
+                f"WHEN {f} <= $ideal{i} THEN 1.0 "
+                f"ELSE exp(-1.0 * ({f} - $ideal{i}) / $decay{i}) END"
+            )
+
+        if term.kind == "min_pct":
+            params[f"pct{i}"] = float(term.threshold)
+            params[f"pct_div{i}"] = float(max(term.threshold, 0.01))
+            return (
+                f"{w} * CASE WHEN {f} >= $pct{i} THEN 1.0 "
+                f"WHEN {f} >= $pct{i} * 0.5 THEN 0.5 "
+                f"ELSE coalesce({f}, 0) / $pct_div{i} END"
+            )
+
+        if term.kind == "far":
+            t = int(term.threshold)
+            params[f"far{i}"] = t
+            params[f"far_half{i}"] = max(1, t // 2)
+            return (
+                f"{w} * CASE WHEN {f} IS NULL THEN 0.5 "
+                f"WHEN {f} >= $far{i} THEN 1.0 "
+                f"WHEN {f} >= $far_half{i} THEN 0.5 "
+                f"ELSE 0.0 END"
+            )
+
+        # shape
+        return (
+            f"{w} * ("
+            "  0.5 * CASE "
+            "    WHEN p.shape_index IS NULL THEN 0.3 "
+            "    WHEN p.shape_index >= 0.7 THEN 1.0 "
+            "    WHEN p.shape_index >= 0.4 THEN 0.6 "
+            "    ELSE 0.2 END"
+            "  + 0.5 * CASE "
+            "    WHEN p.aspect_ratio IS NULL THEN 0.3 "
+            "    WHEN p.aspect_ratio <= 2.0 THEN 1.0 "
+            "    WHEN p.aspect_ratio <= 4.0 THEN 0.6 "
+            "    ELSE 0.2 END"
+            ")"
+        )
+
     async def search_parcels(
         self,
         criteria: ParcelSearchCriteria
@@ -647,235 +955,21 @@ class GraphService:
         # Scoring uses exp() for smooth distance decay and normalized 0-100 scores.
         # Each dimension has a weight (0.0-1.0) set by agent based on user emphasis.
         # If no weights provided, auto-inferred from which filters are active.
-        score_parts = []
-        has_soft_filters = False
-
-        # Auto-infer weights from active criteria when agent doesn't provide them
         weights = self._compute_weights(criteria)
-
-        # --- Normalized score dimensions (0.0-1.0 range) ---
-
-        # Quietness (from 0-100 score → 0.0-1.0)
-        if weights["quietness"] > 0:
-            w = weights["quietness"]
-            if criteria.quietness_categories:
-                # Bonus for matching preferred category + continuous score
-                params["quietness_cats"] = criteria.quietness_categories
-                score_parts.append(
-                    f"{w} * (CASE WHEN p.kategoria_ciszy IN $quietness_cats "
-                    f"THEN 0.5 + 0.5 * coalesce(p.quietness_score, 0) / 100.0 "
-                    f"ELSE coalesce(p.quietness_score, 0) / 100.0 END)"
-                )
-            else:
-                score_parts.append(
-                    f"{w} * coalesce(p.quietness_score, 0) / 100.0"
-                )
-            has_soft_filters = True
-
-        # Nature (from 0-100 score → 0.0-1.0)
-        if weights["nature"] > 0:
-            w = weights["nature"]
-            if criteria.nature_categories:
-                params["nature_cats"] = criteria.nature_categories
-                score_parts.append(
-                    f"{w} * (CASE WHEN p.kategoria_natury IN $nature_cats "
-                    f"THEN 0.5 + 0.5 * coalesce(p.nature_score, 0) / 100.0 "
-                    f"ELSE coalesce(p.nature_score, 0) / 100.0 END)"
-                )
-            else:
-                score_parts.append(
-                    f"{w} * coalesce(p.nature_score, 0) / 100.0"
-                )
-            has_soft_filters = True
-
-        # Accessibility (from 0-100 score → 0.0-1.0)
-        if weights["accessibility"] > 0:
-            w = weights["accessibility"]
-            if criteria.accessibility_categories:
-                params["access_cats"] = criteria.accessibility_categories
-                score_parts.append(
-                    f"{w} * (CASE WHEN p.kategoria_dostepu IN $access_cats "
-                    f"THEN 0.5 + 0.5 * coalesce(p.accessibility_score, 0) / 100.0 "
-                    f"ELSE coalesce(p.accessibility_score, 0) / 100.0 END)"
-                )
-            else:
-                score_parts.append(
-                    f"{w} * coalesce(p.accessibility_score, 0) / 100.0"
-                )
-            has_soft_filters = True
-
-        # Density category match (binary bonus)
-        if criteria.building_density:
-            params["density_cats"] = criteria.building_density
-            score_parts.append(
-                "0.1 * CASE WHEN p.gestosc_zabudowy IN $density_cats THEN 1.0 ELSE 0.0 END"
-            )
-            has_soft_filters = True
-
-        # Size category match (binary bonus)
-        size_cats = criteria.size_category or criteria.area_category
-        if size_cats:
-            params["size_cats"] = size_cats
-            score_parts.append(
-                "0.1 * CASE WHEN p.size_category IN $size_cats THEN 1.0 ELSE 0.0 END"
-            )
-            has_soft_filters = True
-
-        # --- Distance-based scoring with exponential decay ---
-        # Formula: CASE WHEN dist <= ideal THEN 1.0 ELSE exp(-(dist - ideal) / decay) END
-        # ideal = threshold * 0.5 (perfect score zone)
-        # decay = threshold (score drops to ~37% at 1.5x threshold)
-
-        # Forest proximity
-        if weights["forest"] > 0:
-            w = weights["forest"]
-            ideal = int(criteria.max_dist_to_forest_m * 0.5) if criteria.max_dist_to_forest_m else 200
-            decay = criteria.max_dist_to_forest_m or 500
-            score_parts.append(
-                f"{w} * CASE WHEN p.dist_to_forest IS NULL THEN 0.0 "
-                f"WHEN p.dist_to_forest <= {ideal} THEN 1.0 "
-                f"ELSE exp(-1.0 * (p.dist_to_forest - {ideal}) / {decay}.0) END"
-            )
-            has_soft_filters = True
-
-        # Water proximity
-        if weights["water"] > 0:
-            w = weights["water"]
-            if criteria.water_type:
-                dist_field_map = {
-                    "morze": "dist_to_sea", "zatoka": "dist_to_sea",
-                    "rzeka": "dist_to_river", "jezioro": "dist_to_lake",
-                    "kanal": "dist_to_canal", "staw": "dist_to_pond",
-                }
-                dist_field = f"p.{dist_field_map.get(criteria.water_type, 'dist_to_water')}"
-                wt = WATER_TYPES.get(criteria.water_type, {})
-                ideal = int(wt.get("threshold_m", 500) * 0.3)
-                decay = int(wt.get("threshold_m", 500))
-            elif criteria.max_dist_to_water_m:
-                dist_field = "p.dist_to_water"
-                ideal = int(criteria.max_dist_to_water_m * 0.5)
-                decay = criteria.max_dist_to_water_m
-            else:
-                dist_field = "p.dist_to_water"
-                ideal = 200
-                decay = 500
-            score_parts.append(
-                f"{w} * CASE WHEN {dist_field} IS NULL THEN 0.0 "
-                f"WHEN {dist_field} <= {ideal} THEN 1.0 "
-                f"ELSE exp(-1.0 * ({dist_field} - {ideal}) / {decay}.0) END"
-            )
-            has_soft_filters = True
-
-        # Specific water distance scoring (sea/lake/river)
-        water_dist_configs = [
-            (criteria.max_dist_to_sea_m, "p.dist_to_sea"),
-            (criteria.max_dist_to_lake_m, "p.dist_to_lake"),
-            (criteria.max_dist_to_river_m, "p.dist_to_river"),
+        score_terms = self._build_score_terms(criteria, weights)
+        score_parts = [
+            self._score_term_cypher(term, params, i) for i, term in enumerate(score_terms)
         ]
-        for threshold, field_name in water_dist_configs:
-            if threshold:
-                ideal = int(threshold * 0.3)
-                score_parts.append(
-                    f"0.15 * CASE WHEN {field_name} IS NULL THEN 0.0 "
-                    f"WHEN {field_name} <= {ideal} THEN 1.0 "
-                    f"ELSE exp(-1.0 * ({field_name} - {ideal}) / {threshold}.0) END"
-                )
-                has_soft_filters = True
-
-        # Near water (general, when explicitly required)
-        if criteria.near_water_required and weights["water"] == 0:
-            score_parts.append(
-                "0.15 * CASE WHEN p.dist_to_water IS NULL THEN 0.0 "
-                "WHEN p.dist_to_water <= 150 THEN 1.0 "
-                "ELSE exp(-1.0 * (p.dist_to_water - 150) / 500.0) END"
-            )
-            has_soft_filters = True
-
-        # School proximity
-        if weights["school"] > 0:
-            w = weights["school"]
-            ideal = int(criteria.max_dist_to_school_m * 0.5) if criteria.max_dist_to_school_m else 400
-            decay = criteria.max_dist_to_school_m or 1000
-            score_parts.append(
-                f"{w} * CASE WHEN p.dist_to_school IS NULL THEN 0.0 "
-                f"WHEN p.dist_to_school <= {ideal} THEN 1.0 "
-                f"ELSE exp(-1.0 * (p.dist_to_school - {ideal}) / {decay}.0) END"
-            )
-            has_soft_filters = True
-
-        # Shop proximity
-        if weights["shop"] > 0:
-            w = weights["shop"]
-            ideal = int(criteria.max_dist_to_shop_m * 0.5) if criteria.max_dist_to_shop_m else 300
-            decay = criteria.max_dist_to_shop_m or 800
-            score_parts.append(
-                f"{w} * CASE WHEN p.dist_to_supermarket IS NULL THEN 0.0 "
-                f"WHEN p.dist_to_supermarket <= {ideal} THEN 1.0 "
-                f"ELSE exp(-1.0 * (p.dist_to_supermarket - {ideal}) / {decay}.0) END"
-            )
-            has_soft_filters = True
-
-        # Transport / bus stop proximity
-        if weights["transport"] > 0:
-            w = weights["transport"]
-            ideal = int(criteria.max_dist_to_bus_stop_m * 0.5) if criteria.max_dist_to_bus_stop_m else 250
-            decay = criteria.max_dist_to_bus_stop_m or 600
-            score_parts.append(
-                f"{w} * CASE WHEN p.dist_to_bus_stop IS NULL THEN 0.0 "
-                f"WHEN p.dist_to_bus_stop <= {ideal} THEN 1.0 "
-                f"ELSE exp(-1.0 * (p.dist_to_bus_stop - {ideal}) / {decay}.0) END"
-            )
-            has_soft_filters = True
-
-        # Hospital proximity (only when explicitly requested)
-        if criteria.max_dist_to_hospital_m:
-            ideal = int(criteria.max_dist_to_hospital_m * 0.5)
-            decay = criteria.max_dist_to_hospital_m
-            score_parts.append(
-                f"0.1 * CASE WHEN p.dist_to_doctors IS NULL THEN 0.0 "
-                f"WHEN p.dist_to_doctors <= {ideal} THEN 1.0 "
-                f"ELSE exp(-1.0 * (p.dist_to_doctors - {ideal}) / {decay}.0) END"
-            )
-            has_soft_filters = True
-
-        # Forest percentage in 500m buffer
-        if criteria.min_forest_pct_500m:
-            pct = criteria.min_forest_pct_500m
-            score_parts.append(
-                f"0.1 * CASE WHEN p.pct_forest_500m >= {pct} THEN 1.0 "
-                f"WHEN p.pct_forest_500m >= {pct * 0.5} THEN 0.5 "
-                f"ELSE coalesce(p.pct_forest_500m, 0) / {max(pct, 0.01)} END"
-            )
-            has_soft_filters = True
+        has_soft_filters = bool(score_parts)
 
-        # Industrial distance (want to be FAR - reversed scoring)
-        if criteria.min_dist_to_industrial_m:
-            t = int(criteria.min_dist_to_industrial_m)
-            score_parts.append(
-                f"0.1 * CASE WHEN p.dist_to_industrial IS NULL THEN 0.5 "
-                f"WHEN p.dist_to_industrial >= {t} THEN 1.0 "
-                f"WHEN p.dist_to_industrial >= {max(1, t // 2)} THEN 0.5 "
-                f"ELSE 0.0 END"
-            )
-            has_soft_filters = True
-
-        # --- Shape quality scoring (always active, fixed weight) ---
-        # Compact, rectangular parcels get a bonus
-        score_parts.append(
-            "0.08 * ("
-            "  0.5 * CASE "
-            "    WHEN p.shape_index IS NULL THEN 0.3 "
-            "    WHEN p.shape_index >= 0.7 THEN 1.0 "
-            "    WHEN p.shape_index >= 0.4 THEN 0.6 "
-            "    ELSE 0.2 END"
-            "  + 0.5 * CASE "
-            "    WHEN p.aspect_ratio IS NULL THEN 0.3 "
-            "    WHEN p.aspect_ratio <= 2.0 THEN 1.0 "
-            "    WHEN p.aspect_ratio <= 4.0 THEN 0.6 "
-            "    ELSE 0.2 END"
-            ")"
-        )
-        has_soft_filters = True
+        # ===== COLUMNAR FAST PATH =====
+        # Rank in-process over the NumPy parcel snapshot; Neo4j only hydrates
+        # the winning IDs. Falls through to Cypher when the store is not ready.
+        if settings.parcel_store_enabled:
+            from app.services.parcel_store import parcel_store
+            ranked = await parcel_store.rank(criteria, score_terms)
+            if ranked is not None:
+                return await self.hydrate_ranked(ranked)
 
         # ===== BUILD QUERY =====
 
@@ -904,34 +998,7 @@ class GraphService:
             {where_clause}
             WITH p,
               ({total_score_expr}) AS total_score
-            RETURN DISTINCT
-                p.id_dzialki as id,
-                p.gmina as gmina,
-                p.dzielnica as miejscowosc,
-                p.area_m2 as area_m2,
-                p.quietness_score as quietness_score,
-                p.nature_score as nature_score,
-                p.accessibility_score as accessibility_score,
-                p.pog_symbol IS NOT NULL as has_mpzp,
-                p.pog_symbol as mpzp_symbol,
-                p.centroid_lat as lat,
-                p.centroid_lon as lon,
-                p.dist_to_forest as dist_to_forest,
-                p.dist_to_water as dist_to_water,
-                p.dist_to_school as dist_to_school,
-                p.dist_to_supermarket as dist_to_shop,
-                p.dist_to_bus_stop as dist_to_bus_stop,
-                p.pct_forest_500m as pct_forest_500m,
-                p.count_buildings_500m as count_buildings_500m,
-                p.is_built as is_built,
-                p.is_residential_zone as is_residential_zone,
-                p.nearest_water_type as nearest_water_type,
-                p.dist_to_sea as dist_to_sea,
-                p.kategoria_ciszy as kategoria_ciszy,
-                p.kategoria_natury as kategoria_natury,
-                p.gestosc_zabudowy as gestosc_zabudowy,
-                p.shape_index as shape_index,
-                p.aspect_ratio as aspect_ratio,
+            RETURN DISTINCT {SEARCH_RESULT_PROJECTION},
                 total_score
             {order_clause}
             LIMIT $limit
@@ -946,12 +1013,39 @@ class GraphService:
         logger.debug(f"Params: {params}")
 
         try:
-            results = await neo4j.run(query, params)
+            results = await self._run_template("search_parcels", query, params)
             return [dict(r) for r in results]
         except Exception as e:
             logger.error(f"Graph search error: {e}")
             return []
 
+    async def hydrate_ranked(self, ranked: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+        """Fetch search-result fields for pre-ranked IDs, preserving rank order."""
+        if not ranked:
+            return []
+
+        query = f"""
+            MATCH (p:Parcel)
+            WHERE p.id_dzialki IN $ids
+            RETURN {SEARCH_RESULT_PROJECTION}
+        """
+        try:
+            results = await self._run_template(
+                "search_parcels_hydrate", query, {"ids": [pid for pid, _ in ranked]}
+            )
+        except Exception as e:
+            logger.error(f"Graph search hydration error: {e}")
+            return []
+
+        by_id = {r["id"]: dict(r) for r in results}
+        hydrated = []
+        for pid, score in ranked:
+            row = by_id.get(pid)
+            if row is not None:
+                row["total_score"] = score
+                hydrated.append(row)
+        return hydrated
+
     async def search_parcels_simple(
         self,
         gmina: Optional[str] = None,
@@ -1171,6 +1265,25 @@ class GraphService:
         Returns:
             Dictionary with category distributions
         """
+        # Materialized District/City aggregates (pipeline step 30)
+        materialized = await district_stats.location(gmina=gmina, dzielnica=dzielnica)
+        if materialized is not None:
+            total = materialized["parcel_count"]
+            with_mpzp = materialized["n_mpzp"]
+            with_road = materialized["n_road_access"]
+            return {
+                "total_parcels": total,
+                "with_mpzp": with_mpzp,
+                "pct_mpzp": round((with_mpzp / total * 100), 1) if total > 0 else 0,
+                "residential_zone": materialized["n_residential_zone"],
+                "with_road_access": with_road,
+                "pct_road_access": round((with_road / total * 100), 1) if total > 0 else 0,
+                "built": materialized["n_built"],
+                "quietness_distribution": district_stats.distribution(materialized, "quietness"),
+                "nature_distribution": district_stats.distribution(materialized, "nature"),
+                "location_filter": {"gmina": gmina, "dzielnica": dzielnica},
+            }
+
         # Build location filter
         conditions = []
         params = {}
@@ -1290,10 +1403,10 @@ class GraphService:
                 p.pog_maks_zabudowa_pct as pog_max_zabudowa,
 
                 // POI distances (properties)
-                p.dist_to_school as dist_to_school,
-                p.dist_to_supermarket as dist_to_shop,
-                p.dist_to_doctors as dist_to_hospital,
-                p.dist_to_bus_stop as dist_to_bus_stop,
+                coalesce(p.net_dist_to_school, p.dist_to_school) as dist_to_school,
+                coalesce(p.net_dist_to_supermarket, p.dist_to_supermarket) as dist_to_shop,
+                coalesce(p.net_dist_to_doctors, p.dist_to_doctors) as dist_to_hospital,
+                coalesce(p.net_dist_to_bus_stop, p.dist_to_bus_stop) as dist_to_bus_stop,
                 p.dist_to_industrial as dist_to_industrial,
 
                 // Nature distances (properties)
@@ -1603,10 +1716,10 @@ class GraphService:
                 p.dist_to_water as dist_to_water,
 
                 // Distances
-                p.dist_to_school as dist_to_school,
-                p.dist_to_bus_stop as dist_to_bus_stop,
+                coalesce(p.net_dist_to_school, p.dist_to_school) as dist_to_school,
+                coalesce(p.net_dist_to_bus_stop, p.dist_to_bus_stop) as dist_to_bus_stop,
                 p.dist_to_forest as dist_to_forest,
-                p.dist_to_supermarket as dist_to_supermarket,
+                coalesce(p.net_dist_to_supermarket, p.dist_to_supermarket) as dist_to_supermarket,
                 p.dist_to_main_road as dist_to_main_road,
 
                 // Context
@@ -1724,14 +1837,17 @@ class GraphService:
         """
         query = """
             MATCH (c:City)
-            OPTIONAL MATCH (p:Parcel) WHERE p.gmina = c.name
-            WITH c.name as miejscowosc, count(p) as parcel_count
+            WITH c.name as miejscowosc,
+                 CASE WHEN c.stats_version = $stats_version
+                      THEN c.parcel_count
+                      ELSE COUNT { MATCH (p:Parcel) WHERE p.gmina = c.name }
+                 END as parcel_count
             RETURN miejscowosc, parcel_count
             ORDER BY parcel_count DESC
         """
 
         try:
-            results = await neo4j.run(query)
+            results = await neo4j.run(query, {"stats_version": await dataset_version.get()})
             miejscowosci = [r["miejscowosc"] for r in results if r["miejscowosc"]]
             by_miejscowosc = {r["miejscowosc"]: r["parcel_count"] for r in results if r["miejscowosc"]}
             total = sum(by_miejscowosc.values())
@@ -1762,14 +1878,20 @@ class GraphService:
         """
         query = """
             MATCH (d:District)-[:BELONGS_TO]->(c:City {name: $miejscowosc})
-            OPTIONAL MATCH (p:Parcel)-[:LOCATED_IN]->(d)
-            WITH d.name as dzielnica, count(p) as parcel_count
+            WITH d.name as dzielnica,
+                 CASE WHEN d.stats_version = $stats_version
+                      THEN d.parcel_count
+                      ELSE COUNT { (:Parcel)-[:LOCATED_IN]->(d) }
+                 END as parcel_count
             RETURN dzielnica, parcel_count
             ORDER BY parcel_count DESC
         """
 
         try:
-            results = await neo4j.run(query, {"miejscowosc": miejscowosc})
+            results = await neo4j.run(query, {
+                "miejscowosc": miejscowosc,
+                "stats_version": await dataset_version.get(),
+            })
             districts = [r["dzielnica"] for r in results if r["dzielnica"]]
             by_district = {r["dzielnica"]: r["parcel_count"] for r in results if r["dzielnica"]}
 
@@ -1830,6 +1952,14 @@ class GraphService:
             Dict with resolved: bool, gmina, miejscowosc, dzielnica, parcel_count, fuzzy
             or error if not found
         """
+        # In-memory name index; the Neo4j path below runs until it is loaded
+        # and for names it does not match
+        index = location_index.index
+        if index is not None:
+            match = index.resolve(location_text)
+            if match is not None:
+                return self._resolved_location(index, match, location_text)
+
         # Clean input text
         clean_text = location_text.lower().strip()
 
@@ -1854,6 +1984,9 @@ class GraphService:
         if clean_text.endswith("ej"):
             search_variants.append(clean_text[:-2] + "a")  # Osowej -> Osowa
 
+        # Parcel counts come from materialized District/City stats when stamped
+        stats_version = await dataset_version.get()
+
         try:
             # 1. Try fulltext search on District names (fuzzy with ~)
             # This handles typos and missing Polish characters
@@ -1863,8 +1996,11 @@ class GraphService:
                 YIELD node as district, score
                 WHERE score > 0.5
                 MATCH (district)-[:BELONGS_TO]->(city:City)
-                OPTIONAL MATCH (p:Parcel)-[:LOCATED_IN]->(district)
-                WITH district, city, score, count(p) as parcel_count
+                WITH district, city, score,
+                     CASE WHEN district.stats_version = $stats_version
+                          THEN district.parcel_count
+                          ELSE COUNT { (:Parcel)-[:LOCATED_IN]->(district) }
+                     END as parcel_count
                 RETURN
                     district.name as dzielnica,
                     city.name as miejscowosc,
@@ -1875,7 +2011,10 @@ class GraphService:
                 LIMIT 3
                 """
 
-                results = await neo4j.run(query, {"search_term": f"{search_term}~"})
+                results = await neo4j.run(query, {
+                    "search_term": f"{search_term}~",
+                    "stats_version": stats_version,
+                })
 
                 if results and len(results) > 0:
                     best = results[0]
@@ -1896,13 +2035,18 @@ class GraphService:
                 MATCH (c:City)
                 WHERE toLower(c.name) CONTAINS toLower($search_term)
                    OR toLower($search_term) CONTAINS toLower(c.name)
-                OPTIONAL MATCH (p:Parcel) WHERE p.gmina = c.name
-                WITH c, count(p) as parcel_count
-                RETURN c.name as miasto, parcel_count
-                LIMIT 1
+                WITH c LIMIT 1
+                RETURN c.name as miasto,
+                       CASE WHEN c.stats_version = $stats_version
+                            THEN c.parcel_count
+                            ELSE COUNT { MATCH (p:Parcel) WHERE p.gmina = c.name }
+                       END as parcel_count
                 """
 
-                city_results = await neo4j.run(query, {"search_term": search_term})
+                city_results = await neo4j.run(query, {
+                    "search_term": search_term,
+                    "stats_version": stats_version,
+                })
 
                 if city_results and len(city_results) > 0:
                     return {
@@ -1981,13 +2125,18 @@ class GraphService:
             query = """
             MATCH (d:District)-[:BELONGS_TO]->(c:City)
             WHERE toLower(d.name) = toLower($dzielnica)
-            OPTIONAL MATCH (p:Parcel)-[:LOCATED_IN]->(d)
-            WITH d, c, count(p) as parcel_count
-            RETURN d.name as dzielnica, c.name as miasto, parcel_count
-            LIMIT 1
+            WITH d, c LIMIT 1
+            RETURN d.name as dzielnica, c.name as miasto,
+                   CASE WHEN d.stats_version = $stats_version
+                        THEN d.parcel_count
+                        ELSE COUNT { (:Parcel)-[:LOCATED_IN]->(d) }
+                   END as parcel_count
             """
 
-            results = await neo4j.run(query, {"dzielnica": dzielnica})
+            results = await neo4j.run(query, {
+                "dzielnica": dzielnica,
+                "stats_version": await dataset_version.get(),
+            })
 
             if not results or len(results) == 0:
                 # Dzielnica not found - try to suggest similar ones
@@ -2074,6 +2223,76 @@ class GraphService:
     # Uses 512-dim embeddings and vector search for fuzzy matching
     # =========================================================================
 
+    @staticmethod
+    def _resolved_location(
+        index: LocationIndex,
+        match: LocationMatch,
+        location_text: str,
+    ) -> Dict[str, Any]:
+        """resolve_location result for an index match."""
+        entry = match.entry
+        if entry.level == "dzielnica":
+            return {
+                "resolved": True,
+                "gmina": entry.gmina,
+                "miejscowosc": entry.gmina,
+                "dzielnica": entry.name,
+                "parcel_count": entry.parcel_count,
+                "fuzzy": match.score < 1.0,
+                "confidence": match.score,
+                "alternatives": index.alternatives(match, location_text),
+            }
+        return {
+            "resolved": True,
+            "gmina": entry.name,
+            "miejscowosc": entry.name,
+            "dzielnica": None,
+            "parcel_count": entry.parcel_count,
+            "fuzzy": match.score < 1.0,
+        }
+
+    @staticmethod
+    def _resolved_location_v2(matches: List[LocationMatch]) -> Dict[str, Any]:
+        """resolve_location_v2 result for exact / declension index matches."""
+        best = matches[0]
+        entry = best.entry
+        if entry.alias is not None:
+            alias = entry.alias
+            canonical_name = alias["canonical_name"]
+            location_type = alias.get("type")
+            district = alias.get("maps_to_district")
+            gmina = alias.get("maps_to_gmina")
+            search_in_districts = alias.get("search_in_districts") or []
+        else:
+            alias = {}
+            canonical_name = entry.name
+            location_type = "district" if entry.level == "dzielnica" else "city"
+            district = entry.name if entry.level == "dzielnica" else None
+            gmina = entry.gmina if entry.level == "dzielnica" else entry.name
+            search_in_districts = []
+        if not search_in_districts and district:
+            search_in_districts = [district]
+
+        return {
+            "resolved": True,
+            "canonical_name": canonical_name,
+            "type": location_type,
+            "maps_to_district": district,
+            "maps_to_gmina": gmina,
+            "search_in_districts": search_in_districts,
+            "price_segment": alias.get("price_segment"),
+            "price_min": alias.get("price_min"),
+            "price_max": alias.get("price_max"),
+            "note": alias.get("note"),
+            "similarity": best.score,
+            "confidence": "HIGH",
+            "alternatives": [m.entry.name for m in matches[1:]],
+            # Compatibility with existing code
+            "gmina": gmina,
+            "dzielnica": district,
+            "miejscowosc": gmina,
+        }
+
     async def resolve_location_v2(
         self,
         location_text: str,
@@ -2111,6 +2330,18 @@ class GraphService:
             - confidence: HIGH/MEDIUM/LOW
             - alternatives: Other possible matches
         """
+        # Known names (exact or declined) resolve from the in-memory index;
+        # LocationName aliases first, they carry price data
+        index = location_index.index
+        if index is not None:
+            for levels in (("alias",), RESOLVE_LEVELS):
+                matches = index.match(
+                    location_text, levels=levels,
+                    modes=("exact", "declension"), limit=top_k,
+                )
+                if matches:
+                    return self._resolved_location_v2(matches)
+
         try:
             # Import embedding service
             from app.services.embedding_service import EmbeddingService
@@ -2124,7 +2355,7 @@ class GraphService:
                     clean_text = clean_text[len(prefix):].strip()
 
             # Generate embedding for user input
-            query_embedding = EmbeddingService.encode(clean_text)
+            query_embedding = await EmbeddingService.aencode(clean_text)
 
             # Vector search on LocationName nodes
             query = """
@@ -2225,7 +2456,7 @@ class GraphService:
         try:
             from app.services.embedding_service import EmbeddingService
 
-            query_embedding = EmbeddingService.encode(user_text.lower().strip())
+            query_embedding = await EmbeddingService.aencode(user_text.lower().strip())
 
             query = """
             CALL db.index.vector.queryNodes('semantic_category_embedding_idx', 3, $embedding)
@@ -2289,7 +2520,7 @@ class GraphService:
         try:
             from app.services.embedding_service import EmbeddingService
 
-            query_embedding = EmbeddingService.encode(user_text.lower().strip())
+            query_embedding = await EmbeddingService.aencode(user_text.lower().strip())
 
             query = """
             CALL db.index.vector.queryNodes('water_type_name_embedding_idx', 3, $embedding)
@@ -2352,7 +2583,7 @@ class GraphService:
         try:
             from app.services.embedding_service import EmbeddingService
 
-            query_embedding = EmbeddingService.encode(user_text.lower().strip())
+            query_embedding = await EmbeddingService.aencode(user_text.lower().strip())
 
             query = """
             CALL db.index.vector.queryNodes('poi_type_name_embedding_idx', 3, $embedding)
@@ -2604,6 +2835,13 @@ class GraphService:
         Returns:
             List of districts with quiet parcel counts
         """
+        top = await district_stats.top_districts(QUIET_CATEGORIES, gmina=gmina, limit=limit)
+        if top is not None:
+            return [
+                {"name": row["name"], "gmina": row["city"], "quiet_count": n}
+                for row, n in top
+            ]
+
         gmina_filter = "AND p.gmina = $gmina" if gmina else ""
 
         query = f"""
@@ -2641,6 +2879,15 @@ class GraphService:
         Returns:
             List of districts with green parcel counts
         """
+        top = await district_stats.top_districts(
+            GREEN_CATEGORIES, gmina=gmina, limit=limit, distribution="nature",
+        )
+        if top is not None:
+            return [
+                {"name": row["name"], "gmina": row["city"], "green_count": n}
+                for row, n in top
+            ]
+
         gmina_filter = "AND p.gmina = $gmina" if gmina else ""
 
         query = f"""
@@ -2776,8 +3023,8 @@ class GraphService:
                 p.centroid_lon as lon,
                 p.dist_to_forest as dist_to_forest,
                 p.dist_to_water as dist_to_water,
-                p.dist_to_school as dist_to_school,
-                p.dist_to_supermarket as dist_to_shop,
+                coalesce(p.net_dist_to_school, p.dist_to_school) as dist_to_school,
+                coalesce(p.net_dist_to_supermarket, p.dist_to_supermarket) as dist_to_shop,
                 p.pct_forest_500m as pct_forest_500m,
                 p.kategoria_ciszy as kategoria_ciszy,
                 p.kategoria_natury as kategoria_natury
@@ -2786,7 +3033,7 @@ class GraphService:
         logger.info(f"Randomized search with {len(where_conditions)} conditions, excluding {len(exclude_ids or [])} parcels")
 
         try:
-            results = await neo4j.run(query, params)
+            results = await self._run_template("search_parcels_randomized", query, params)
             return [dict(r) for r in results]
         except Exception as e:
             logger.error(f"Randomized search error: {e}")
@@ -3074,7 +3321,7 @@ class GraphService:
         """
 
         try:
-            results = await neo4j.run(query, params)
+            results = await self._run_template("graphrag_search", query, params)
             return [dict(r) for r in results]
         except Exception as e:
             logger.error(f"GraphRAG search error: {e}")
@@ -3097,6 +3344,12 @@ class GraphService:
         Returns:
             Dict with 'lat' and 'lon' keys, or None if no parcels found
         """
+        materialized = await district_stats.location(
+            dzielnica=dzielnica, gmina=None if dzielnica else gmina,
+        )
+        if materialized is not None:
+            return district_stats.centroid(materialized)
+
         conditions = []
         params = {}
         if dzielnica:
@@ -0,0 +1,558 @@
+"""
+In-memory location name index.
+
+Location resolution (GraphService.resolve_location / resolve_location_v2,
+the search_locations / location_search tools) used to try declension
+variants one by one against Neo4j - fulltext on District, CONTAINS on City,
+CONTAINS on Parcel.dzielnica (a full parcel scan) - up to ~15 round trips
+for an unknown name.
+
+All names are small enough to keep in memory: districts, gminy, powiaty,
+województwa and LocationName aliases (a few thousand entries). They are
+loaded once per dataset version with their hierarchy and parcel counts,
+and matched locally:
+
+- folding: lowercase, Polish diacritics removed ("Gdańsk" == "gdansk")
+- declension stemming: "w Osowej" / "Osowa", "Sopocie" / "Sopot"
+- district + city: "Osowa Gdańsk", "Osowej w Gdańsku" resolve to the
+  district of that city
+- fuzzy: trigram candidates, ranked by edit distance ("mateblewo")
+
+Neo4j is queried while the index is not loaded yet (cold start, right
+after a dataset version change) and for names the index does not match.
+
+Usage:
+    from app.services.location_index import location_index
+
+    index = location_index.index
+    if index is not None:
+        match = index.resolve("okolice Osowej")
+"""
+
+import asyncio
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.services.database import neo4j
+from app.services.dataset_version import dataset_version
+
+
+# Leading words that are not part of the name ("okolice Osowej")
+LOCATION_PREFIXES = (
+    "okolice", "okolica", "gmina", "gminie", "miasto", "m.", "dzielnica",
+    "dzielnicy", "rejon", "w", "we", "na", "blisko", "centrum", "koło", "pod",
+)
+
+_POLISH_FOLD = str.maketrans("ąćęłńóśźż", "acelnoszz")
+
+# Declension endings stripped from each token, longest first.
+# (suffix, replacement) - replacement covers consonant alternation
+# ("Sopocie" -> "Sopot").
+_SUFFIXES: Tuple[Tuple[str, str], ...] = tuple(sorted(
+    [
+        ("owie", ""), ("owej", ""), ("owym", ""), ("owa", ""), ("owo", ""),
+        ("owy", ""), ("cie", "t"), ("dzie", "d"), ("ego", ""), ("emu", ""),
+        ("iej", ""), ("ych", ""), ("ymi", ""), ("ami", ""), ("ach", ""),
+        ("iem", ""), ("iu", ""), ("ia", ""), ("ie", ""), ("ii", ""),
+        ("ym", ""), ("im", ""), ("ej", ""), ("em", ""), ("om", ""),
+        ("a", ""), ("e", ""), ("i", ""), ("o", ""), ("u", ""), ("y", ""),
+    ],
+    key=lambda s: -len(s[0]),
+))
+MIN_STEM = 3
+
+# Match scores (exact > declension > fuzzy / partial)
+SCORE_EXACT = 1.0
+SCORE_DECLENSION = 0.95
+MIN_FUZZY_SCORE = 0.75
+MIN_PARTIAL_LENGTH = 3
+
+# Levels used by resolve(): administrative names users type as "location"
+RESOLVE_LEVELS = ("dzielnica", "gmina")
+ADMIN_LEVELS = ("dzielnica", "gmina", "powiat", "wojewodztwo")
+
+
+def fold(text: str) -> str:
+    """Lowercase, strip Polish diacritics and punctuation, collapse spaces."""
+    text = text.lower().translate(_POLISH_FOLD)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def strip_prefixes(folded: str) -> str:
+    """Drop leading filler words ("okolice", "w", "na", ...)."""
+    tokens = folded.split()
+    while len(tokens) > 1 and tokens[0] in _FOLDED_PREFIXES:
+        tokens.pop(0)
+    return " ".join(tokens)
+
+
+_FOLDED_PREFIXES = frozenset(fold(p) for p in LOCATION_PREFIXES)
+
+
+def stem_token(token: str) -> str:
+    """Strip one declension ending, keeping at least MIN_STEM characters."""
+    for suffix, replacement in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) + len(replacement) >= MIN_STEM:
+            return token[: len(token) - len(suffix)] + replacement
+    return token
+
+
+def stem(folded: str) -> str:
+    """Declension-insensitive key of a folded name."""
+    return " ".join(stem_token(t) for t in folded.split())
+
+
+def trigrams(key: str, padded: bool = True) -> Set[str]:
+    if padded:
+        key = f" {key} "
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+def edit_similarity(a: str, b: str) -> float:
+    """1 - Levenshtein distance / longer length."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        previous = current
+    return 1.0 - previous[-1] / max(len(a), len(b))
+
+
+@dataclass(slots=True)
+class LocationEntry:
+    """One indexed name."""
+    level: str                      # dzielnica | gmina | powiat | wojewodztwo | alias
+    name: str
+    gmina: Optional[str] = None
+    powiat: Optional[str] = None
+    wojewodztwo: Optional[str] = None
+    parcel_count: int = 0
+    # LocationName properties for level "alias" (maps_to_*, price_*, note, ...)
+    alias: Optional[Dict[str, Any]] = None
+    # Extra spellings (LocationName.name_variants)
+    variants: List[str] = field(default_factory=list)
+
+    def to_result(self) -> Dict[str, Any]:
+        """Row in the search_locations tool format."""
+        out: Dict[str, Any] = {"level": self.level}
+        if self.level == "dzielnica":
+            out.update(dzielnica=self.name, gmina=self.gmina)
+        elif self.level == "gmina":
+            out.update(gmina=self.name, powiat=self.powiat, wojewodztwo=self.wojewodztwo)
+        elif self.level == "powiat":
+            out.update(powiat=self.name, wojewodztwo=self.wojewodztwo)
+        elif self.level == "wojewodztwo":
+            out.update(wojewodztwo=self.name)
+        out["parcel_count"] = self.parcel_count
+        return out
+
+
+@dataclass(slots=True)
+class LocationMatch:
+    entry: LocationEntry
+    score: float
+    match: str                      # exact | declension | split | fuzzy | partial
+
+
+# Level preference when scores tie (districts first, like the old resolver)
+_LEVEL_ORDER = {"dzielnica": 0, "alias": 1, "gmina": 2, "powiat": 3, "wojewodztwo": 4}
+
+
+class LocationIndex:
+    """Folded / stemmed / trigram lookup over location names."""
+
+    def __init__(self, version: str, entries: List[LocationEntry]):
+        self.version = version
+        self.entries = entries
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+        self._stem: Dict[str, List[int]] = defaultdict(list)
+        self._trigrams: Dict[str, List[int]] = defaultdict(list)
+        # Unpadded trigrams of folded and stemmed keys (substring candidates)
+        self._inner: Dict[str, Set[int]] = defaultdict(set)
+        self._keys: List[List[Tuple[str, str]]] = []
+
+        for i, entry in enumerate(entries):
+            keys = []
+            for name in dict.fromkeys([entry.name, *entry.variants]):
+                folded = fold(name)
+                if not folded:
+                    continue
+                stemmed = stem(folded)
+                keys.append((folded, stemmed))
+                self._exact[folded].append(i)
+                self._stem[stemmed].append(i)
+                for gram in trigrams(stemmed):
+                    self._trigrams[gram].append(i)
+                for gram in trigrams(folded, padded=False) | trigrams(stemmed, padded=False):
+                    self._inner[gram].add(i)
+            self._keys.append(keys)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _allowed(
+        self,
+        i: int,
+        levels: Optional[Iterable[str]],
+        parent: Optional[str],
+    ) -> bool:
+        entry = self.entries[i]
+        if levels is not None and entry.level not in levels:
+            return False
+        if parent and entry.level == "dzielnica" and fold(entry.gmina or "") != parent:
+            return False
+        return True
+
+    def match(
+        self,
+        text: str,
+        levels: Optional[Iterable[str]] = None,
+        parent: Optional[str] = None,
+        modes: Iterable[str] = ("exact", "declension", "split", "fuzzy", "partial"),
+        limit: int = 10,
+    ) -> List[LocationMatch]:
+        """Ranked matches for a location text.
+
+        Args:
+            text: Raw user text ("okolice Osowej", "Gdansk", "mateblewo")
+            levels: Restrict to these entry levels
+            parent: Gmina name that dzielnica matches must belong to
+            modes: Matching stages to use, each only if the previous found
+                nothing
+            limit: Max matches
+
+        Returns:
+            Matches by score, then level preference, then parcel count
+        """
+        levels = tuple(levels) if levels is not None else None
+        parent = fold(parent) if parent else None
+        folded = strip_prefixes(fold(text))
+        if not folded:
+            return []
+        stemmed = stem(folded)
+
+        found: Dict[int, LocationMatch] = {}
+
+        def add(i: int, score: float, how: str):
+            if not self._allowed(i, levels, parent):
+                return
+            current = found.get(i)
+            if current is None or score > current.score:
+                found[i] = LocationMatch(self.entries[i], score, how)
+
+        for mode in modes:
+            if mode == "exact":
+                for i in self._exact.get(folded, ()):
+                    add(i, SCORE_EXACT, "exact")
+            elif mode == "declension":
+                for i in self._stem.get(stemmed, ()):
+                    add(i, SCORE_DECLENSION, "declension")
+            elif mode == "split":
+                self._split(folded, add)
+            elif mode == "fuzzy":
+                self._fuzzy(stemmed, add)
+            elif mode == "partial":
+                self._partial(folded, stemmed, add)
+            if found:
+                break
+
+        ranked = sorted(
+            found.values(),
+            key=lambda m: (-m.score, _LEVEL_ORDER.get(m.entry.level, 9), -m.entry.parcel_count),
+        )
+        return ranked[:limit]
+
+    def _lookup(self, folded: str, level: str) -> List[int]:
+        """Entries of a level named `folded`, exactly or else by declension."""
+        hits = [i for i in self._exact.get(folded, ()) if self.entries[i].level == level]
+        if not hits:
+            hits = [i for i in self._stem.get(stem(folded), ()) if self.entries[i].level == level]
+        return hits
+
+    def _split(self, folded: str, add):
+        """District followed or preceded by its city ("Osowa Gdańsk").
+
+        Every split of the tokens into a district part and a gmina part is
+        tried; filler words between them ("Osowej w Gdańsku") are dropped.
+        Only districts belonging to the named gmina match.
+        """
+        tokens = folded.split()
+        for k in range(1, len(tokens)):
+            head, tail = " ".join(tokens[:k]), " ".join(tokens[k:])
+            for district, city in ((head, tail), (tail, head)):
+                district, city = strip_prefixes(district), strip_prefixes(city)
+                gminy = {fold(self.entries[g].name) for g in self._lookup(city, "gmina")}
+                if not gminy:
+                    continue
+                for i in self._lookup(district, "dzielnica"):
+                    if fold(self.entries[i].gmina or "") in gminy:
+                        add(i, SCORE_DECLENSION, "split")
+
+    def _fuzzy(self, stemmed: str, add):
+        grams = trigrams(stemmed)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for i in self._trigrams.get(gram, ()):
+                shared[i] += 1
+        # Edit distance only for entries sharing enough trigrams
+        min_shared = max(1, len(grams) // 3)
+        for i, n in shared.items():
+            if n < min_shared:
+                continue
+            score = max(edit_similarity(stemmed, s) for _, s in self._keys[i])
+            if score >= MIN_FUZZY_SCORE:
+                add(i, round(score * SCORE_DECLENSION, 3), "fuzzy")
+
+    def _partial(self, folded: str, stemmed: str, add):
+        """Substring match either way (CONTAINS), on folded or stemmed keys.
+
+        Either side of a substring match shares at least one unpadded
+        trigram with the other, so only those entries are checked.
+        """
+        if len(stemmed) < MIN_PARTIAL_LENGTH:
+            return
+        candidates: Set[int] = set()
+        for gram in trigrams(folded, padded=False) | trigrams(stemmed, padded=False):
+            candidates |= self._inner.get(gram, set())
+        for i in candidates:
+            for key, key_stem in self._keys[i]:
+                if len(key_stem) < MIN_PARTIAL_LENGTH:
+                    continue
+                if (
+                    folded in key or key in folded
+                    or stemmed in key_stem or key_stem in stemmed
+                ):
+                    coverage = min(len(key), len(folded)) / max(len(key), len(folded))
+                    add(i, round(0.5 + 0.3 * coverage, 3), "partial")
+                    break
+
+    def resolve(self, text: str) -> Optional[LocationMatch]:
+        """Best district or gmina for free text, or None."""
+        matches = self.match(text, levels=RESOLVE_LEVELS, limit=1)
+        return matches[0] if matches else None
+
+    def alternatives(self, match: LocationMatch, text: str, limit: int = 2) -> List[str]:
+        """Other district names matching the text as well as `match`."""
+        others = self.match(text, levels=("dzielnica",), limit=limit + 1)
+        return [m.entry.name for m in others if m.entry is not match.entry][:limit]
+
+    def search(
+        self,
+        name: str,
+        level: Optional[str] = None,
+        parent: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Rows for the location search tools.
+
+        Same stages as the Neo4j version: exact name across admin levels,
+        else district names by declension, district + city, partial match,
+        then fuzzy.
+
+        Args:
+            name: Location name as given by the LLM
+            level: dzielnica | gmina | miejscowosc | powiat | wojewodztwo,
+                or None / "any"
+            parent: Gmina the district must belong to
+        """
+        if level in (None, "any"):
+            levels = ADMIN_LEVELS
+        else:
+            levels = ("gmina",) if level == "miejscowosc" else (level,)
+
+        matches = self.match(name, levels=levels, parent=parent, modes=("exact",), limit=limit)
+        if not matches:
+            matches = self.match(
+                name, levels=("dzielnica",), parent=parent,
+                modes=("declension", "split", "partial", "fuzzy"), limit=10,
+            )
+
+        rows = []
+        for m in matches:
+            row = m.entry.to_result()
+            if m.match != "exact":
+                row["match"] = m.match
+                row["score"] = round(m.score, 2)
+            rows.append(row)
+        return rows
+
+
+# One scan groups parcels by the whole hierarchy; District -> City comes from
+# the graph (each district belongs to one dominant city)
+HIERARCHY_QUERY = """
+    MATCH (p:Parcel)
+    RETURN p.wojewodztwo AS wojewodztwo, p.powiat AS powiat,
+           p.gmina AS gmina, p.dzielnica AS dzielnica, count(p) AS parcel_count
+"""
+DISTRICTS_QUERY = """
+    MATCH (d:District)
+    OPTIONAL MATCH (d)-[:BELONGS_TO]->(c:City)
+    RETURN d.name AS name, head(collect(c.name)) AS city
+"""
+ALIASES_QUERY = """
+    MATCH (ln:LocationName)
+    RETURN ln.canonical_name AS canonical_name, ln.name_variants AS name_variants,
+           ln.type AS type, ln.maps_to_district AS maps_to_district,
+           ln.maps_to_gmina AS maps_to_gmina,
+           ln.search_in_districts AS search_in_districts,
+           ln.price_segment AS price_segment, ln.price_min AS price_min,
+           ln.price_max AS price_max, ln.note AS note
+"""
+
+
+def build_entries(
+    hierarchy: List[Dict[str, Any]],
+    districts: List[Dict[str, Any]],
+    aliases: List[Dict[str, Any]],
+) -> List[LocationEntry]:
+    """Index entries from the three loader queries."""
+    district_city = {r["name"]: r["city"] for r in districts if r.get("name")}
+
+    gminy: Dict[Tuple, int] = defaultdict(int)
+    powiaty: Dict[Tuple, int] = defaultdict(int)
+    wojewodztwa: Dict[str, int] = defaultdict(int)
+    dzielnice: Dict[str, int] = defaultdict(int)
+    dzielnica_gmina: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    for r in hierarchy:
+        n = r["parcel_count"] or 0
+        woj, powiat, gmina, dzielnica = r["wojewodztwo"], r["powiat"], r["gmina"], r["dzielnica"]
+        if gmina:
+            gminy[(gmina, powiat, woj)] += n
+        if powiat:
+            powiaty[(powiat, woj)] += n
+        if woj:
+            wojewodztwa[woj] += n
+        if dzielnica:
+            dzielnice[dzielnica] += n
+            if gmina:
+                dzielnica_gmina[dzielnica][gmina] += n
+
+    entries: List[LocationEntry] = []
+    for name in dict.fromkeys([*district_city, *dzielnice]):
+        # Parcel count as LOCATED_IN (all parcels with this dzielnica name);
+        # districts without a node take their dominant gmina from parcels
+        gmina = district_city.get(name)
+        if gmina is None and dzielnica_gmina.get(name):
+            gmina = max(dzielnica_gmina[name].items(), key=lambda kv: kv[1])[0]
+        entries.append(LocationEntry(
+            "dzielnica", name, gmina=gmina, parcel_count=dzielnice.get(name, 0),
+        ))
+    for (gmina, powiat, woj), n in gminy.items():
+        entries.append(LocationEntry("gmina", gmina, powiat=powiat, wojewodztwo=woj, parcel_count=n))
+    for (powiat, woj), n in powiaty.items():
+        entries.append(LocationEntry("powiat", powiat, wojewodztwo=woj, parcel_count=n))
+    for woj, n in wojewodztwa.items():
+        entries.append(LocationEntry("wojewodztwo", woj, parcel_count=n))
+    for r in aliases:
+        if not r.get("canonical_name"):
+            continue
+        entries.append(LocationEntry(
+            "alias", r["canonical_name"],
+            gmina=r.get("maps_to_gmina"),
+            parcel_count=dzielnice.get(r.get("maps_to_district"), 0),
+            alias=r,
+            variants=[v for v in (r.get("name_variants") or []) if v],
+        ))
+    return entries
+
+
+class LocationIndexStore:
+    """Versioned location index with background (re)load."""
+
+    def __init__(self):
+        self._index: Optional[LocationIndex] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._hits = 0
+        self._cold_misses = 0
+
+    @property
+    def index(self) -> Optional[LocationIndex]:
+        """Index for the last known dataset version, or None.
+
+        Never blocks on the database; when the index is missing or stale a
+        reload is scheduled and None is returned until it completes (callers
+        then use their Neo4j path).
+        """
+        index = self._index
+        current = dataset_version.current
+        if index is None or (current is not None and index.version != current):
+            self._cold_misses += 1
+            self.schedule_refresh()
+            return None
+        self._hits += 1
+        return index
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Load the index for the current dataset version.
+
+        Returns:
+            True if a current index is loaded
+        """
+        async with self._lock:
+            try:
+                version = await dataset_version.get()
+                if not force and self._index is not None and self._index.version == version:
+                    return True
+
+                start = time.monotonic()
+                hierarchy, districts = await asyncio.gather(
+                    neo4j.run(HIERARCHY_QUERY), neo4j.run(DISTRICTS_QUERY),
+                )
+                try:
+                    aliases = await neo4j.run(ALIASES_QUERY)
+                except Exception as e:
+                    logger.info(f"Location index: no LocationName aliases ({e})")
+                    aliases = []
+
+                entries = build_entries(hierarchy, districts, aliases)
+                if not entries:
+                    logger.warning("Location index: no locations in Neo4j")
+                    return self._index is not None
+                self._index = LocationIndex(version, entries)
+                logger.info(
+                    f"Location index loaded: {len(entries):,} names, version={version} "
+                    f"({(time.monotonic() - start) * 1000:.0f}ms)"
+                )
+                return True
+            except Exception as e:
+                logger.warning(f"Location index refresh failed: {e}")
+                return False
+
+    def schedule_refresh(self) -> None:
+        """Start refresh() in the background unless one is running."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    def stats(self) -> Dict[str, Any]:
+        """Index status for diagnostics."""
+        index = self._index
+        return {
+            "loaded": index is not None,
+            "version": index.version if index else None,
+            "names": len(index) if index else 0,
+            "hits": self._hits,
+            "cold_misses": self._cold_misses,
+        }
+
+
+# Global instance
+location_index = LocationIndexStore()
@@ -9,12 +9,14 @@ Provides detailed analysis of a parcel's neighborhood including:
 - Quality of life metrics
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
 from loguru import logger
 
+from app.services.dataset_version import dataset_version
+
 
 class NeighborhoodCharacter(str, Enum):
     """Classification of neighborhood character."""
@@ -76,6 +78,9 @@ class NeighborhoodService:
             graph_service: Neo4j graph service (optional, will import if needed)
         """
         self._graph_service = graph_service
+        # District aggregates (sums/counts) by District elementId
+        self._district_cache: Dict[str, Dict[str, Any]] = {}
+        self._district_cache_version: Optional[str] = None
 
     @property
     def graph_service(self):
@@ -99,154 +104,177 @@ class NeighborhoodService:
         Returns:
             Comprehensive neighborhood analysis
         """
-        logger.info(f"Analyzing neighborhood for parcel {parcel_id}")
-
-        # Get parcel data
-        parcel = await self._get_parcel_data(parcel_id)
-        if not parcel:
-            return {"error": f"Parcel {parcel_id} not found"}
-
-        # Get neighborhood context
-        neighborhood = await self._get_neighborhood_context(parcel_id, radius_m)
+        results = await self.analyze_neighborhoods([parcel_id], radius_m)
+        return results[parcel_id]
 
-        # Get adjacent parcels
-        adjacent = await self._get_adjacent_parcels(parcel_id)
-
-        # Get nearby POI
-        poi = await self._get_nearby_poi(parcel_id)
+    async def analyze_neighborhoods(
+        self,
+        parcel_ids: List[str],
+        radius_m: int = 500,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Neighborhood analysis for several parcels in one round trip.
 
-        # Build analysis
-        analysis = self._build_analysis(parcel, neighborhood, adjacent, poi)
+        One UNWIND query fetches parcel data, adjacency and nearby POI for all
+        parcels, plus the materialized district aggregates (pipeline step 30).
+        Districts without current aggregates fall back to a per-district cache
+        (one more query for districts not cached yet).
 
-        return analysis
+        Args:
+            parcel_ids: IDs of the parcels to analyze
+            radius_m: Analysis radius in meters
 
-    async def _get_parcel_data(self, parcel_id: str) -> Optional[Dict[str, Any]]:
-        """Get parcel data from Neo4j."""
+        Returns:
+            Analysis per parcel ID ({"error": ...} for parcels not found)
+        """
+        parcel_ids = list(dict.fromkeys(parcel_ids))
+        logger.info(f"Analyzing neighborhood for {len(parcel_ids)} parcel(s)")
+
+        rows = await self._get_parcel_profiles(parcel_ids)
+        district_stats = await self._get_district_stats([
+            r["district_id"] for r in rows.values()
+            if r.get("district_id") and not r.get("district_stats")
+        ])
+
+        results = {}
+        for parcel_id in parcel_ids:
+            row = rows.get(parcel_id)
+            if not row:
+                results[parcel_id] = {"error": f"Parcel {parcel_id} not found"}
+                continue
+            parcel = row["parcel"]
+            neighborhood = self._neighborhood_context(
+                parcel, row.get("district_stats") or district_stats.get(row.get("district_id"))
+            )
+            poi = row["schools"] + row["bus_stops"] + row["shops"]
+            results[parcel_id] = self._build_analysis(parcel, neighborhood, row["adjacent"], poi)
+        return results
+
+    async def _get_parcel_profiles(self, parcel_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Parcel data, district, adjacency and nearby POI for all parcels."""
+        if not parcel_ids:
+            return {}
         try:
             query = """
-            MATCH (p:Parcel {id_dzialki: $parcel_id})
+            UNWIND $parcel_ids AS parcel_id
+            MATCH (p:Parcel {id_dzialki: parcel_id})
             OPTIONAL MATCH (p)-[:LOCATED_IN]->(d:District)
             OPTIONAL MATCH (d)-[:BELONGS_TO]->(c:City)
-            RETURN p {
-                .*,
-                district: d.name,
-                city: c.name
-            } as parcel
+            WITH p, head(collect(d)) AS d, head(collect(c.name)) AS city
+
+            CALL {
+                WITH p
+                MATCH (p)-[r:ADJACENT_TO]-(neighbor:Parcel)
+                WITH r, neighbor ORDER BY r.shared_border_m DESC
+                RETURN collect(neighbor {
+                    .id_dzialki,
+                    .area_m2,
+                    .is_built,
+                    .typ_wlasnosci,
+                    shared_border_m: r.shared_border_m
+                })[..10] AS adjacent
+            }
+            CALL {
+                WITH p
+                MATCH (p)-[r:NEAR_SCHOOL]->(s:School)
+                WITH r, s ORDER BY r.distance_m
+                RETURN collect({type: 'school', name: s.name, distance_m: r.distance_m})[..3] AS schools
+            }
+            CALL {
+                WITH p
+                MATCH (p)-[r:NEAR_BUS_STOP]->(b:BusStop)
+                WITH r, b ORDER BY r.distance_m
+                RETURN collect({type: 'bus_stop', name: b.name, distance_m: r.distance_m})[..3] AS bus_stops
+            }
+            CALL {
+                WITH p
+                MATCH (p)-[r:NEAR_SHOP]->(sh:Shop)
+                WITH r, sh ORDER BY r.distance_m
+                RETURN collect({type: 'shop', name: sh.name, distance_m: r.distance_m})[..3] AS shops
+            }
+
+            RETURN p.id_dzialki AS parcel_id,
+                   p {.*, district: d.name, city: city} AS parcel,
+                   elementId(d) AS district_id,
+                   CASE WHEN d.stats_version = $stats_version THEN d {
+                       .parcel_count, .sum_area, .n_area, .sum_quietness,
+                       .n_quietness, .n_built, .n_residential
+                   } END AS district_stats,
+                   adjacent, schools, bus_stops, shops
             """
-            result = await self.graph_service.run_query(query, {"parcel_id": parcel_id})
-            if result:
-                return result[0]["parcel"]
-            return None
+            result = await self.graph_service.run_query(query, {
+                "parcel_ids": parcel_ids,
+                "stats_version": await dataset_version.get(),
+            })
+            return {r["parcel_id"]: r for r in result}
         except Exception as e:
-            logger.error(f"Error getting parcel data: {e}")
-            return None
-
-    async def _get_neighborhood_context(
-        self,
-        parcel_id: str,
-        radius_m: int,
-    ) -> Dict[str, Any]:
-        """Get neighborhood context from Neo4j."""
-        try:
-            query = """
-            MATCH (p:Parcel {id_dzialki: $parcel_id})
-
-            OPTIONAL MATCH (p)-[:LOCATED_IN]->(d:District)<-[:LOCATED_IN]-(neighbor:Parcel)
-            WHERE neighbor.id_dzialki <> p.id_dzialki
-
-            WITH p, d, collect(neighbor) as neighbors
-            WITH p, d, neighbors,
-                 [n in neighbors WHERE n.area_m2 IS NOT NULL | n.area_m2] AS areas,
-                 [n in neighbors WHERE n.quietness_score IS NOT NULL | n.quietness_score] AS qscores
-
-            RETURN {
-                parcel_count_in_district: size(neighbors),
-                avg_area_m2: CASE WHEN size(areas) > 0
-                    THEN reduce(s = 0.0, x IN areas | s + x) / size(areas)
-                    ELSE 0 END,
-                avg_quietness: CASE WHEN size(qscores) > 0
-                    THEN reduce(s = 0.0, x IN qscores | s + x) / size(qscores)
-                    ELSE p.quietness_score END,
-                pct_built: CASE WHEN size(neighbors) > 0
-                    THEN toFloat(size([n in neighbors WHERE n.is_built])) / size(neighbors)
-                    ELSE 0.0 END,
-                pct_residential: CASE WHEN size(neighbors) > 0
-                    THEN toFloat(size([n in neighbors WHERE n.has_residential])) / size(neighbors)
-                    ELSE 0.0 END,
-                count_buildings_500m: p.count_buildings_500m,
-                gestosc_zabudowy: p.gestosc_zabudowy
-            } as context
-            """
-            result = await self.graph_service.run_query(query, {"parcel_id": parcel_id})
-            if result:
-                ctx = result[0]["context"]
-                # Ensure no None values for numeric fields
-                for key in ["pct_built", "pct_residential", "avg_area_m2", "avg_quietness"]:
-                    if ctx.get(key) is None:
-                        ctx[key] = 0
-                return ctx
-            return {}
-        except Exception as e:
-            logger.error(f"Error getting neighborhood context: {e}")
+            logger.error(f"Error getting parcel profiles: {e}")
             return {}
 
-    async def _get_adjacent_parcels(self, parcel_id: str) -> List[Dict[str, Any]]:
-        """Get adjacent parcels from Neo4j."""
-        try:
-            query = """
-            MATCH (p:Parcel {id_dzialki: $parcel_id})-[r:ADJACENT_TO]-(neighbor:Parcel)
-            RETURN neighbor {
-                .id_dzialki,
-                .area_m2,
-                .is_built,
-                .typ_wlasnosci,
-                shared_border_m: r.shared_border_m
-            } as adjacent
-            ORDER BY r.shared_border_m DESC
-            LIMIT 10
-            """
-            result = await self.graph_service.run_query(query, {"parcel_id": parcel_id})
-            return [r["adjacent"] for r in result]
-        except Exception as e:
-            logger.error(f"Error getting adjacent parcels: {e}")
-            return []
-
-    async def _get_nearby_poi(self, parcel_id: str) -> List[Dict[str, Any]]:
-        """Get nearby POI from Neo4j."""
-        try:
-            poi_list = []
+    async def _get_district_stats(self, district_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Per-district parcel aggregates, cached per dataset version.
 
-            # Schools
-            query_schools = """
-            MATCH (p:Parcel {id_dzialki: $parcel_id})-[r:NEAR_SCHOOL]->(s:School)
-            RETURN {type: 'school', name: s.name, distance_m: r.distance_m} as poi
-            ORDER BY r.distance_m LIMIT 3
-            """
-            schools = await self.graph_service.run_query(query_schools, {"parcel_id": parcel_id})
-            poi_list.extend([r["poi"] for r in schools])
-
-            # Bus stops
-            query_bus = """
-            MATCH (p:Parcel {id_dzialki: $parcel_id})-[r:NEAR_BUS_STOP]->(b:BusStop)
-            RETURN {type: 'bus_stop', name: b.name, distance_m: r.distance_m} as poi
-            ORDER BY r.distance_m LIMIT 3
-            """
-            bus = await self.graph_service.run_query(query_bus, {"parcel_id": parcel_id})
-            poi_list.extend([r["poi"] for r in bus])
-
-            # Shops
-            query_shops = """
-            MATCH (p:Parcel {id_dzialki: $parcel_id})-[r:NEAR_SHOP]->(sh:Shop)
-            RETURN {type: 'shop', name: sh.name, distance_m: r.distance_m} as poi
-            ORDER BY r.distance_m LIMIT 3
-            """
-            shops = await self.graph_service.run_query(query_shops, {"parcel_id": parcel_id})
-            poi_list.extend([r["poi"] for r in shops])
+        Fallback for districts whose materialized stats are missing or stale.
+        """
+        version = await dataset_version.get()
+        if version != self._district_cache_version:
+            self._district_cache.clear()
+            self._district_cache_version = version
+
+        missing = [d for d in dict.fromkeys(district_ids) if d not in self._district_cache]
+        if missing:
+            try:
+                query = """
+                UNWIND $district_ids AS district_id
+                MATCH (d:District) WHERE elementId(d) = district_id
+                MATCH (d)<-[:LOCATED_IN]-(n:Parcel)
+                RETURN district_id,
+                       count(n) AS parcel_count,
+                       sum(n.area_m2) AS sum_area,
+                       count(n.area_m2) AS n_area,
+                       sum(n.quietness_score) AS sum_quietness,
+                       count(n.quietness_score) AS n_quietness,
+                       sum(CASE WHEN n.is_built THEN 1 ELSE 0 END) AS n_built,
+                       sum(CASE WHEN n.has_residential THEN 1 ELSE 0 END) AS n_residential
+                """
+                result = await self.graph_service.run_query(query, {"district_ids": missing})
+                for r in result:
+                    self._district_cache[r["district_id"]] = r
+            except Exception as e:
+                logger.error(f"Error getting district stats: {e}")
+
+        return {d: self._district_cache[d] for d in district_ids if d in self._district_cache}
+
+    @staticmethod
+    def _neighborhood_context(
+        parcel: Dict[str, Any],
+        stats: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """District context for a parcel, excluding the parcel itself."""
+        stats = stats or {}
+
+        def without_self(total_key: str, count_key: str, own: Any) -> Tuple[float, int]:
+            total = stats.get(total_key) or 0.0
+            count = stats.get(count_key) or 0
+            if own is not None and count > 0:
+                total -= own
+                count -= 1
+            return total, count
+
+        n = max((stats.get("parcel_count") or 0) - 1, 0)
+        sum_area, n_area = without_self("sum_area", "n_area", parcel.get("area_m2"))
+        sum_quiet, n_quiet = without_self("sum_quietness", "n_quietness", parcel.get("quietness_score"))
+        n_built = (stats.get("n_built") or 0) - (1 if stats and parcel.get("is_built") else 0)
+        n_res = (stats.get("n_residential") or 0) - (1 if stats and parcel.get("has_residential") else 0)
 
-            return poi_list
-        except Exception as e:
-            logger.error(f"Error getting nearby POI: {e}")
-            return []
+        return {
+            "parcel_count_in_district": n,
+            "avg_area_m2": sum_area / n_area if n_area > 0 else 0,
+            "avg_quietness": (sum_quiet / n_quiet if n_quiet > 0 else parcel.get("quietness_score")) or 0,
+            "pct_built": n_built / n if n > 0 else 0.0,
+            "pct_residential": n_res / n if n > 0 else 0.0,
+            "count_buildings_500m": parcel.get("count_buildings_500m"),
+            "gestosc_zabudowy": parcel.get("gestosc_zabudowy"),
+        }
 
     def _build_analysis(
         self,
@@ -5,19 +5,24 @@ Architecture:
 - Neo4j (graph) = PRIMARY source for filtering and finding parcels via relationships
 - PostGIS = Spatial queries for geometry-based searches (radius from point)
 - Neo4j GraphRAG = Semantic search via text embeddings (512-dim) + graph constraints
+- Road graph = Travel-time (isochrone) search over the road network
 
 Uses Reciprocal Rank Fusion (RRF) to combine rankings when multiple sources used.
 """
 
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass, field
-from collections import defaultdict
 import asyncio
+import time
 
 from loguru import logger
 
+from app.config import settings
 from app.services.spatial_service import spatial_service, SpatialSearchParams
 from app.services.graph_service import graph_service, ParcelSearchCriteria
+from app.services.rank_fusion import SourceRanking, fuse_rankings, hard_filter_mask, membership_mask
+from app.services.road_graph import road_graph
+from app.services.search_cache import search_cache, CachedSearch
 
 
 @dataclass
@@ -36,6 +41,9 @@ class SearchPreferences:
     lat: Optional[float] = None
     lon: Optional[float] = None
     radius_m: float = 5000
+    # Travel-time search from lat/lon over the road network (isochrone)
+    max_travel_minutes: Optional[float] = None
+    travel_mode: str = "walk"  # or "drive"
 
     # === AREA ===
     min_area: Optional[float] = None
@@ -152,7 +160,7 @@ class SearchPreferences:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """Combined search result with all available data."""
     parcel_id: str
@@ -178,6 +186,7 @@ class SearchResult:
     centroid_lat: Optional[float] = None
     centroid_lon: Optional[float] = None
     distance_m: Optional[float] = None  # For spatial search (distance from point)
+    travel_minutes: Optional[float] = None  # For travel-time search (road network)
 
     # Distance to nature (meters)
     dist_to_forest: Optional[float] = None
@@ -203,6 +212,90 @@ class SearchResult:
     similarity_score: Optional[float] = None
 
 
+# SearchResult field -> row key, for building results from source rows
+RESULT_FIELDS = (
+    ("gmina", "gmina"),
+    ("miejscowosc", "miejscowosc"),
+    ("area_m2", "area_m2"),
+    ("quietness_score", "quietness_score"),
+    ("nature_score", "nature_score"),
+    ("accessibility_score", "accessibility_score"),
+    ("has_mpzp", "has_mpzp"),
+    ("mpzp_symbol", "mpzp_symbol"),
+    ("mpzp_budowlane", "mpzp_czy_budowlane"),
+    ("centroid_lat", "centroid_lat"),
+    ("centroid_lon", "centroid_lon"),
+    ("distance_m", "distance_m"),
+    ("travel_minutes", "travel_minutes"),
+    ("dist_to_forest", "dist_to_forest"),
+    ("dist_to_water", "dist_to_water"),
+    ("dist_to_school", "dist_to_school"),
+    ("dist_to_shop", "dist_to_shop"),
+    ("dist_to_bus_stop", "dist_to_bus_stop"),
+    ("pct_forest_500m", "pct_forest_500m"),
+    ("count_buildings_500m", "count_buildings_500m"),
+    ("has_road_access", "has_road_access"),
+    ("shape_index", "shape_index"),
+    ("aspect_ratio", "aspect_ratio"),
+    ("similarity_score", "similarity_score"),
+)
+
+# Fields spatial / semantic rows may fill in when the graph row lacks them
+SPATIAL_FILL_KEYS = ("gmina", "miejscowosc", "area_m2", "centroid_lat", "centroid_lon")
+SEMANTIC_FILL_KEYS = ("gmina", "miejscowosc", "area_m2", "centroid_lat", "centroid_lon",
+                      "quietness_score", "nature_score", "accessibility_score")
+
+# SearchResult field -> PostGIS details key, for _enrich_results
+ENRICH_FIELDS = (
+    ("gmina", "gmina"),
+    ("miejscowosc", "miejscowosc"),
+    ("area_m2", "area_m2"),
+    ("quietness_score", "quietness_score"),
+    ("nature_score", "nature_score"),
+    ("accessibility_score", "accessibility_score"),
+    ("has_mpzp", "has_mpzp"),
+    ("mpzp_symbol", "mpzp_symbol"),
+    ("mpzp_budowlane", "mpzp_czy_budowlane"),
+    ("centroid_lat", "centroid_lat"),
+    ("centroid_lon", "centroid_lon"),
+    ("dist_to_forest", "dist_to_forest"),
+    ("dist_to_water", "dist_to_water"),
+    ("dist_to_school", "dist_to_school"),
+    ("dist_to_shop", "dist_to_shop"),
+    ("dist_to_bus_stop", "dist_to_bus_stop"),
+    ("pct_forest_500m", "pct_forest_500m"),
+    ("has_road_access", "has_public_road_access"),
+    ("shape_index", "shape_index"),
+    ("aspect_ratio", "aspect_ratio"),
+)
+
+
+class HybridSearchResults(list):
+    """
+    Search results with metadata about how they were produced.
+
+    Behaves like List[SearchResult]; additionally carries the relaxation
+    strategy that produced the results, the total search latency and
+    whether the ranking came from the search cache.
+    """
+
+    def __init__(
+        self,
+        results=(),
+        strategy: Optional[str] = None,
+        latency_ms: int = 0,
+        cached: bool = False,
+    ):
+        super().__init__(results)
+        self.strategy = strategy
+        self.latency_ms = latency_ms
+        self.cached = cached
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return {"strategy": self.strategy, "latency_ms": self.latency_ms, "cached": self.cached}
+
+
 class HybridSearchService:
     """
     Hybrid search combining graph, spatial, and semantic queries.
@@ -211,6 +304,7 @@ class HybridSearchService:
     - Graph (Neo4j) = PRIMARY - always runs, uses rich relationships
     - Spatial (PostGIS) = Geometry-based searches (radius from point)
     - Semantic (Neo4j GraphRAG) = Text embedding similarity + graph constraints
+    - Travel (road graph) = Parcels within N minutes walk/drive of a point
 
     Uses Reciprocal Rank Fusion (RRF) to combine results when multiple sources used.
     """
@@ -222,16 +316,24 @@ class HybridSearchService:
     GRAPH_WEIGHT = 0.45    # PRIMARY: Neo4j property + relationship matching
     SPATIAL_WEIGHT = 0.20  # PostGIS distance-ordered by centroid proximity
     SEMANTIC_WEIGHT = 0.35 # GraphRAG text embedding similarity
+    TRAVEL_WEIGHT = 0.30   # Road-network travel time (only with max_travel_minutes)
 
     # Minimum acceptable results before triggering relaxation
     MIN_RESULTS = 5
 
+    # Speculative relaxation: strategies running at once, and how long to
+    # wait for one before a finished lower-priority answer is taken instead
+    SPECULATIVE_IN_FLIGHT = 2
+    SPECULATIVE_BUDGET_S = 2.0
+
     async def search(
         self,
         preferences: SearchPreferences,
         limit: int = 20,
         include_details: bool = False,
-    ) -> List[SearchResult]:
+        speculative: Optional[bool] = None,
+        use_cache: bool = True,
+    ) -> "HybridSearchResults":
         """
         Perform hybrid search with progressive relaxation.
 
@@ -241,13 +343,26 @@ class HybridSearchService:
         3. If still <5: drop soft criteria, keep hard filters
         4. If still 0: pure semantic search (vector only)
 
+        In speculative mode (default, see settings.search_speculative) the
+        next relaxed strategy runs alongside the current one (at most
+        SPECULATIVE_IN_FLIGHT at once); the first acceptable result in
+        priority order wins, or an already finished lower-priority one once
+        the current strategy has used up SPECULATIVE_BUDGET_S.
+
+        Rankings are cached (see search_cache) per preferences + limit +
+        dataset version; a hit skips all strategies and only re-reads parcel
+        fields for the cached IDs.
+
         Args:
             preferences: Search preferences
             limit: Maximum results to return
             include_details: Whether to fetch full details
+            speculative: Override settings.search_speculative
+            use_cache: Read/write the search result cache
 
         Returns:
-            List of SearchResult ordered by RRF score
+            HybridSearchResults (list of SearchResult ordered by RRF score,
+            with .strategy, .latency_ms and .cached)
         """
         logger.info(f"Hybrid search: gmina={preferences.gmina}, "
                    f"area={preferences.min_area}-{preferences.max_area}, "
@@ -255,44 +370,189 @@ class HybridSearchService:
                    f"nature={preferences.nature_categories}, "
                    f"reference={preferences.reference_parcel_id}")
 
-        # Strategy 1: Full criteria
-        combined = await self._execute_search_pipeline(preferences, limit)
+        if speculative is None:
+            speculative = settings.search_speculative
 
-        if len(combined) >= self.MIN_RESULTS:
-            if include_details and combined:
-                combined = await self._enrich_results(combined[:limit])
-            return combined[:limit]
+        start = time.perf_counter()
+        cache_key = None
+        cached = None
+        if use_cache and search_cache.enabled:
+            cache_key = await search_cache.make_key(preferences, limit)
+            cached = await search_cache.get(cache_key)
 
-        # Strategy 2: Relax distance thresholds 2x
-        logger.info(f"Only {len(combined)} results, relaxing distance thresholds 2x")
-        relaxed = self._relax_distances(preferences)
-        combined_relaxed = await self._execute_search_pipeline(relaxed, limit)
+        if cached is not None:
+            strategy = cached.strategy
+            combined = await self._results_from_cache(cached)
+        else:
+            strategies = self._relaxation_strategies(preferences, limit)
+            if speculative:
+                strategy, combined = await self._run_speculative(strategies)
+            else:
+                strategy, combined = await self._run_sequential(strategies)
+            combined = combined[:limit]
+            # Empty results are not cached (may be a transient source failure)
+            if cache_key and combined:
+                await search_cache.put(cache_key, self._to_cache_entry(combined, strategy))
+
+        if include_details and combined:
+            combined = await self._enrich_results(combined)
+
+        results = HybridSearchResults(
+            combined,
+            strategy=strategy,
+            latency_ms=int((time.perf_counter() - start) * 1000),
+            cached=cached is not None,
+        )
+        if cache_key:
+            search_cache.record_latency(results.cached, results.latency_ms)
+        logger.info(f"Hybrid search: strategy={results.strategy}, cached={results.cached}, "
+                   f"{len(results)} results in {results.latency_ms}ms")
+        return results
+
+    @staticmethod
+    def _to_cache_entry(results: List[SearchResult], strategy: Optional[str]) -> CachedSearch:
+        """Ranking-only cache entry for a result page."""
+        return CachedSearch(
+            ids=[r.parcel_id for r in results],
+            scores=[r.rrf_score for r in results],
+            sources=[r.sources for r in results],
+            distance_m=[r.distance_m for r in results],
+            similarity=[r.similarity_score for r in results],
+            strategy=strategy,
+            travel_minutes=[r.travel_minutes for r in results],
+        )
 
-        if len(combined_relaxed) >= self.MIN_RESULTS:
-            if include_details and combined_relaxed:
-                combined_relaxed = await self._enrich_results(combined_relaxed[:limit])
-            return combined_relaxed[:limit]
+    async def _results_from_cache(self, cached: CachedSearch) -> List[SearchResult]:
+        """Rebuild SearchResults for a cached ranking from current graph data."""
+        rows = await graph_service.hydrate_ranked(list(zip(cached.ids, cached.scores)))
+        by_id = {r["id"]: self._graph_row(r, 0) for r in rows}
+        travel = cached.travel_minutes or [None] * len(cached.ids)
+        return [
+            self._build_result(pid, score, sources, {
+                "graph": by_id.get(pid),
+                "spatial": {"distance_m": distance_m},
+                "semantic": {"similarity_score": similarity},
+                "travel": {"travel_minutes": minutes},
+            })
+            for pid, score, sources, distance_m, similarity, minutes in zip(
+                cached.ids, cached.scores, cached.sources,
+                cached.distance_m, cached.similarity, travel,
+            )
+        ]
 
-        # Strategy 3: Drop soft criteria, keep hard filters only
-        logger.info(f"Only {len(combined_relaxed)} results, dropping soft criteria")
-        minimal = self._drop_soft_criteria(preferences)
-        combined_minimal = await self._execute_search_pipeline(minimal, limit)
+    def _relaxation_strategies(
+        self,
+        preferences: SearchPreferences,
+        limit: int,
+    ) -> List[tuple]:
+        """Relaxation ladder in priority order.
 
-        if combined_minimal:
-            if include_details:
-                combined_minimal = await self._enrich_results(combined_minimal[:limit])
-            return combined_minimal[:limit]
+        Returns:
+            List of (name, coroutine factory, minimum results to accept)
+        """
+        async def semantic_only():
+            semantic_results = await self._graphrag_search(preferences, limit * 2)
+            return self._fuse([], [], semantic_results, limit) if semantic_results else []
 
-        # Strategy 4: Pure semantic fallback
-        logger.info("No graph results, falling back to pure semantic search")
-        semantic_results = await self._graphrag_search(preferences, limit * 2)
-        if semantic_results:
-            combined_semantic = self._convert_semantic_to_results(semantic_results)
-            if include_details:
-                combined_semantic = await self._enrich_results(combined_semantic[:limit])
-            return combined_semantic[:limit]
+        relaxed = self._relax_distances(preferences)
+        minimal = self._drop_soft_criteria(preferences)
+        return [
+            ("full", lambda: self._execute_search_pipeline(preferences, limit), self.MIN_RESULTS),
+            ("relaxed_distances", lambda: self._execute_search_pipeline(relaxed, limit), self.MIN_RESULTS),
+            ("hard_filters_only", lambda: self._execute_search_pipeline(minimal, limit), 1),
+            ("semantic_only", semantic_only, 1),
+        ]
 
-        return []
+    async def _run_sequential(self, strategies: List[tuple]) -> tuple:
+        """Try strategies one after another until one is acceptable."""
+        for name, run, min_results in strategies:
+            try:
+                combined = await run()
+            except Exception as e:
+                logger.error(f"Search strategy {name} failed: {e}")
+                combined = []
+            if len(combined) >= min_results:
+                return name, combined
+            logger.info(f"Strategy {name}: only {len(combined)} results, relaxing")
+        return None, []
+
+    async def _run_speculative(self, strategies: List[tuple]) -> tuple:
+        """Run the ladder with up to SPECULATIVE_IN_FLIGHT strategies at once.
+
+        Strategies start in ladder order whenever fewer than
+        SPECULATIVE_IN_FLIGHT are running, so the next relaxed strategy runs
+        alongside the current one and a fast strategy that returns too few
+        results costs no extra round trip. The first acceptable result in
+        priority order wins; once the strategy being waited on has used up
+        SPECULATIVE_BUDGET_S, a finished lower-priority one with an
+        acceptable result is taken instead. The rest are cancelled.
+        """
+        tasks: List[Optional[asyncio.Task]] = [None] * len(strategies)
+        started_at = [0.0] * len(strategies)
+        budget = self.SPECULATIVE_BUDGET_S
+        outcomes: Dict[int, List[SearchResult]] = {}
+
+        def outcome(i: int) -> List[SearchResult]:
+            """Results of finished strategy i (logged once)."""
+            if i not in outcomes:
+                task = tasks[i]
+                name, _, min_results = strategies[i]
+                if task.cancelled() or task.exception() is not None:
+                    if not task.cancelled():
+                        logger.error(f"Search strategy {name} failed: {task.exception()}")
+                    outcomes[i] = []
+                else:
+                    outcomes[i] = task.result()
+                if len(outcomes[i]) < min_results:
+                    logger.info(f"Strategy {name}: only {len(outcomes[i])} results, relaxing")
+            return outcomes[i]
+
+        def acceptable(i: int) -> bool:
+            return tasks[i] is not None and tasks[i].done() and len(outcome(i)) >= strategies[i][2]
+
+        try:
+            while True:
+                # Keep the window full, in ladder order (nothing below a
+                # finished acceptable strategy is needed)
+                running = sum(1 for t in tasks if t is not None and not t.done())
+                for j in range(len(strategies)):
+                    if running >= self.SPECULATIVE_IN_FLIGHT or acceptable(j):
+                        break
+                    if tasks[j] is None:
+                        tasks[j] = asyncio.create_task(strategies[j][1]())
+                        started_at[j] = time.perf_counter()
+                        running += 1
+
+                # Walk the ladder until the first still-running strategy
+                for i, (name, _, _) in enumerate(strategies):
+                    if not tasks[i].done():
+                        break
+                    if acceptable(i):
+                        return name, outcome(i)
+                else:
+                    return None, []
+
+                timeout = started_at[i] + budget - time.perf_counter()
+                if timeout <= 0:
+                    timeout = None
+                    # Budget spent: take any finished lower-priority strategy
+                    for j in range(i + 1, len(strategies)):
+                        if acceptable(j):
+                            logger.info(f"Speculative budget exceeded, "
+                                       f"skipping {strategies[i][0]} for {strategies[j][0]}")
+                            return strategies[j][0], outcome(j)
+
+                pending = [t for t in tasks if t is not None and not t.done()]
+                await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # Mark unused failures as retrieved (no "never retrieved" warning)
+                    task.exception()
 
     @staticmethod
     def _relax_distances(prefs: SearchPreferences) -> SearchPreferences:
@@ -311,6 +571,8 @@ class HybridSearchService:
             relaxed.max_dist_to_bus_stop_m = int(relaxed.max_dist_to_bus_stop_m * 2)
         if relaxed.max_dist_to_hospital_m:
             relaxed.max_dist_to_hospital_m = int(relaxed.max_dist_to_hospital_m * 2)
+        if relaxed.max_travel_minutes:
+            relaxed.max_travel_minutes = relaxed.max_travel_minutes * 2
         # Also relax all weights slightly (move toward center)
         for attr in ["w_quietness", "w_nature", "w_forest", "w_water",
                       "w_school", "w_shop", "w_transport", "w_accessibility"]:
@@ -329,6 +591,8 @@ class HybridSearchService:
             lat=prefs.lat,
             lon=prefs.lon,
             radius_m=prefs.radius_m,
+            max_travel_minutes=prefs.max_travel_minutes,
+            travel_mode=prefs.travel_mode,
             min_area=prefs.min_area,
             max_area=prefs.max_area,
             ownership_type=prefs.ownership_type,
@@ -349,6 +613,9 @@ class HybridSearchService:
         async def empty_result():
             return []
 
+        async def no_travel():
+            return [], None
+
         # 1. GRAPH SEARCH - PRIMARY (ALWAYS RUNS)
         tasks.append(self._graph_search(preferences, limit * 3))
 
@@ -369,133 +636,145 @@ class HybridSearchService:
         else:
             tasks.append(empty_result())
 
+        # 4. Travel-time search (road network isochrone from the point)
+        if preferences.lat and preferences.lon and preferences.max_travel_minutes:
+            tasks.append(self._travel_search(preferences, limit * 2))
+        else:
+            tasks.append(no_travel())
+
         # Execute all searches
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
         graph_results = results[0] if not isinstance(results[0], Exception) else []
         spatial_results = results[1] if not isinstance(results[1], Exception) else []
         semantic_results = results[2] if not isinstance(results[2], Exception) else []
+        travel_results, reachable = results[3] if not isinstance(results[3], Exception) else ([], None)
 
         # Log any errors
         for i, r in enumerate(results):
             if isinstance(r, Exception):
-                source_name = ["graph", "spatial", "semantic"][i]
+                source_name = ["graph", "spatial", "semantic", "travel"][i]
                 logger.error(f"Search task {source_name} failed: {r}")
 
-        # Combine results based on what's available
-        active_sources = sum([
-            bool(graph_results), bool(spatial_results), bool(semantic_results)
-        ])
-
-        if active_sources == 0:
-            combined = []
-        elif active_sources == 1 and graph_results:
-            combined = self._convert_graph_to_results(graph_results)
-        elif active_sources == 1 and semantic_results:
-            combined = self._convert_semantic_to_results(semantic_results)
-        else:
-            combined = self._combine_with_rrf(
-                spatial_results, semantic_results, graph_results
-            )
-
-        # Post-filter: enforce hard constraints on combined results
-        # Spatial/semantic sources don't apply all graph hard filters,
-        # so we filter here to ensure consistency
-        before_filter = len(combined)
-        combined = self._apply_hard_filters(combined, preferences)
-        if before_filter != len(combined):
-            logger.info(f"Post-filter removed {before_filter - len(combined)} results "
-                       f"not matching hard criteria")
+        combined = self._fuse(graph_results, spatial_results, semantic_results,
+                              limit, preferences, travel_results, reachable)
 
         logger.info(f"Search pipeline: {len(combined)} results "
                    f"(graph={len(graph_results)}, spatial={len(spatial_results)}, "
-                   f"semantic={len(semantic_results)})")
+                   f"semantic={len(semantic_results)}, travel={len(travel_results)})")
         return combined
 
-    @staticmethod
-    def _apply_hard_filters(
-        results: List[SearchResult],
-        preferences: SearchPreferences,
+    def _fuse(
+        self,
+        graph_results: List[Dict],
+        spatial_results: List[Dict],
+        semantic_results: List[Dict],
+        limit: int,
+        preferences: Optional[SearchPreferences] = None,
+        travel_results: Optional[List[Dict]] = None,
+        reachable: Optional[Dict[str, float]] = None,
     ) -> List[SearchResult]:
-        """Enforce hard constraints on combined results.
-
-        Spatial and semantic searches don't apply all graph hard filters
-        (area range, shape quality, POG exclusion). This post-filter
-        ensures consistency across all sources.
         """
-        filtered = []
-        for r in results:
-            # Area range (if specified)
-            if r.area_m2 is not None:
-                if preferences.min_area and r.area_m2 < preferences.min_area:
-                    continue
-                if preferences.max_area and r.area_m2 > preferences.max_area:
-                    continue
-
-            # Shape quality: exclude extreme elongation
-            if r.aspect_ratio is not None and r.aspect_ratio > 6.0:
-                continue
-
-            # Shape quality: exclude very irregular shapes
-            if r.shape_index is not None and r.shape_index < 0.15:
-                continue
+        Rank candidates from all sources and build the top page.
 
-            filtered.append(r)
-        return filtered
+        Multiple sources are combined with weighted RRF plus a multi-source
+        bonus; a single source keeps its own ranking (graph: 1/rank, semantic:
+        similarity). When preferences are given, hard constraints (area range,
+        shape quality) are enforced on the fused candidates, since spatial,
+        semantic and travel sources don't apply all graph hard filters.
+        With `reachable` (every parcel within max_travel_minutes -> minutes),
+        candidates outside the isochrone are dropped too.
 
-    def _convert_graph_to_results(self, graph_results: List[Dict]) -> List[SearchResult]:
-        """Convert graph results directly to SearchResult when no RRF needed."""
-        results = []
-        for i, r in enumerate(graph_results):
-            result = SearchResult(
-                parcel_id=r.get("id_dzialki", ""),
-                rrf_score=1.0 / (i + 1),  # Simple rank-based score
-                sources=["graph"],
-                gmina=r.get("gmina"),
-                miejscowosc=r.get("miejscowosc"),
-                area_m2=r.get("area_m2"),
-                quietness_score=r.get("quietness_score"),
-                nature_score=r.get("nature_score"),
-                accessibility_score=r.get("accessibility_score"),
-                has_mpzp=r.get("has_mpzp"),
-                mpzp_symbol=r.get("mpzp_symbol"),
-                centroid_lat=r.get("centroid_lat"),
-                centroid_lon=r.get("centroid_lon"),
-                # Additional fields from graph
-                dist_to_forest=r.get("dist_to_forest"),
-                dist_to_water=r.get("dist_to_water"),
-                dist_to_school=r.get("dist_to_school"),
-                dist_to_shop=r.get("dist_to_shop"),
-                pct_forest_500m=r.get("pct_forest_500m"),
-                has_road_access=r.get("has_road_access"),
-                shape_index=r.get("shape_index"),
-                aspect_ratio=r.get("aspect_ratio"),
-            )
-            results.append(result)
+        Only the top max(limit, MIN_RESULTS) SearchResult objects are built.
+        """
+        fused = fuse_rankings([
+            SourceRanking(
+                "graph", graph_results, self.GRAPH_WEIGHT,
+                native_scores=[1.0 / (i + 1) for i in range(len(graph_results))],
+            ),
+            SourceRanking("spatial", spatial_results, self.SPATIAL_WEIGHT),
+            SourceRanking(
+                "semantic", semantic_results, self.SEMANTIC_WEIGHT,
+                native_scores=[
+                    r["similarity_score"] if r.get("similarity_score") is not None else 1.0 / (i + 1)
+                    for i, r in enumerate(semantic_results)
+                ],
+            ),
+            SourceRanking(
+                "travel", travel_results or [], self.TRAVEL_WEIGHT,
+                native_scores=[1.0 / (i + 1) for i in range(len(travel_results or []))],
+            ),
+        ], k=self.RRF_K)
+
+        if preferences is not None:
+            removed = fused.apply_mask(hard_filter_mask(
+                fused, min_area=preferences.min_area, max_area=preferences.max_area,
+                area_sources=("graph", "spatial", "semantic", "travel"),
+                shape_sources=("graph", "travel"),
+            ))
+            if removed:
+                logger.info(f"Post-filter removed {removed} results "
+                           f"not matching hard criteria")
+
+        if reachable is not None:
+            removed = fused.apply_mask(membership_mask(fused, reachable))
+            if removed:
+                logger.info(f"Travel filter removed {removed} results "
+                           f"beyond {preferences.max_travel_minutes if preferences else '?'} min")
+
+        results = [
+            self._build_result(fused.ids[i], float(fused.scores[i]),
+                               fused.source_names(i), fused.rows_for(i))
+            for i in fused.page(max(limit, self.MIN_RESULTS))
+        ]
+        if reachable:
+            for r in results:
+                if r.travel_minutes is None:
+                    r.travel_minutes = reachable.get(r.parcel_id)
         return results
 
-    def _convert_semantic_to_results(self, semantic_results: List[Dict]) -> List[SearchResult]:
-        """Convert semantic/GraphRAG results directly to SearchResult when no RRF needed."""
-        results = []
-        for i, r in enumerate(semantic_results):
-            result = SearchResult(
-                parcel_id=r.get("id_dzialki", ""),
-                rrf_score=r.get("similarity_score", 1.0 / (i + 1)),
-                sources=["semantic"],
-                gmina=r.get("gmina"),
-                miejscowosc=r.get("miejscowosc"),
-                area_m2=r.get("area_m2"),
-                quietness_score=r.get("quietness_score"),
-                nature_score=r.get("nature_score"),
-                accessibility_score=r.get("accessibility_score"),
-                has_mpzp=r.get("has_mpzp"),
-                mpzp_symbol=r.get("mpzp_symbol"),
-                centroid_lat=r.get("centroid_lat"),
-                centroid_lon=r.get("centroid_lon"),
-                similarity_score=r.get("similarity_score"),
-            )
-            results.append(result)
-        return results
+    @staticmethod
+    def _build_result(
+        parcel_id: str,
+        score: float,
+        sources: List[str],
+        rows: Dict[str, Optional[Dict]],
+    ) -> SearchResult:
+        """Merge one parcel's source rows into a SearchResult.
+
+        Graph provides comprehensive data and is the base; spatial adds
+        distance_m, travel adds travel_minutes and semantic adds
+        similarity_score, each filling only basic fields the graph row lacks.
+        """
+        data = dict(rows.get("graph") or {})
+        travel = rows.get("travel")
+        if travel:
+            if travel.get("travel_minutes") is not None:
+                data["travel_minutes"] = travel["travel_minutes"]
+            for key in SPATIAL_FILL_KEYS:
+                if data.get(key) is None and travel.get(key) is not None:
+                    data[key] = travel[key]
+        spatial = rows.get("spatial")
+        if spatial:
+            if spatial.get("distance_m") is not None:
+                data["distance_m"] = spatial["distance_m"]
+            for key in SPATIAL_FILL_KEYS:
+                if data.get(key) is None and spatial.get(key) is not None:
+                    data[key] = spatial[key]
+        semantic = rows.get("semantic")
+        if semantic:
+            if semantic.get("similarity_score") is not None:
+                data["similarity_score"] = semantic["similarity_score"]
+            for key in SEMANTIC_FILL_KEYS:
+                if data.get(key) is None and semantic.get(key) is not None:
+                    data[key] = semantic[key]
+
+        return SearchResult(
+            parcel_id=parcel_id,
+            rrf_score=score,
+            sources=sources,
+            **{attr: data.get(key) for attr, key in RESULT_FIELDS},
+        )
 
     async def _spatial_search(
         self,
@@ -513,17 +792,54 @@ class HybridSearchService:
             has_mpzp=preferences.has_mpzp,
             mpzp_budowlane=preferences.mpzp_budowlane,
             limit=limit,
+            knn=True,
         )
 
         results = await spatial_service.search_by_radius(params)
 
         # Add source tag
-        for r in results:
+        for i, r in enumerate(results):
             r["_source"] = "spatial"
-            r["_rank"] = results.index(r) + 1
+            r["_rank"] = i + 1
 
         return results
 
+    async def _travel_search(
+        self,
+        preferences: SearchPreferences,
+        limit: int
+    ) -> tuple:
+        """Execute travel-time search (fastest first), rows hydrated from PostGIS.
+
+        Returns:
+            (rows of the `limit` nearest parcels, {id: minutes} of every
+            reachable parcel), or ([], None) while the road graph is not
+            loaded - then candidates are not filtered by travel time
+        """
+        if road_graph.graph is None:
+            return [], None
+        hits = await road_graph.isochrone(
+            preferences.lat, preferences.lon,
+            max_minutes=preferences.max_travel_minutes,
+            mode=preferences.travel_mode,
+        )
+        reachable = dict(hits)
+        hits = hits[:limit]
+        if not hits:
+            return [], reachable
+
+        rows = await spatial_service.get_parcels_by_ids([pid for pid, _ in hits])
+        by_id = {r["id_dzialki"]: r for r in rows}
+
+        results = []
+        for i, (pid, minutes) in enumerate(hits):
+            r = dict(by_id.get(pid) or {"id_dzialki": pid})
+            r["travel_minutes"] = minutes
+            r["_source"] = "travel"
+            r["_rank"] = i + 1
+            results.append(r)
+        return results, reachable
+
     async def _graphrag_search(
         self,
         preferences: SearchPreferences,
@@ -552,7 +868,7 @@ class HybridSearchService:
                 parts.append("prywatna do kupienia")
             query_text = ". ".join(parts) if parts else "działka budowlana pod dom"
 
-        query_embedding = EmbeddingService.encode(query_text)
+        query_embedding = await EmbeddingService.aencode(query_text)
 
         results = await graph_service.graphrag_search(
             query_embedding=query_embedding,
@@ -610,140 +926,36 @@ class HybridSearchService:
         results = await graph_service.search_parcels(criteria)
 
         # Convert to standard format with rank
-        return [
-            {
-                "id_dzialki": r.get("id"),
-                "gmina": r.get("gmina"),
-                "miejscowosc": r.get("miejscowosc"),
-                "area_m2": r.get("area_m2"),
-                "quietness_score": r.get("quietness_score"),
-                "nature_score": r.get("nature_score"),
-                "accessibility_score": r.get("accessibility_score"),
-                "has_mpzp": r.get("has_mpzp"),
-                "mpzp_symbol": r.get("mpzp_symbol"),
-                "centroid_lat": r.get("lat"),
-                "centroid_lon": r.get("lon"),
-                "dist_to_forest": r.get("dist_to_forest"),
-                "dist_to_water": r.get("dist_to_water"),
-                "dist_to_school": r.get("dist_to_school"),
-                "dist_to_shop": r.get("dist_to_shop"),
-                "dist_to_bus_stop": r.get("dist_to_bus_stop"),
-                "pct_forest_500m": r.get("pct_forest_500m"),
-                "count_buildings_500m": r.get("count_buildings_500m"),
-                "has_road_access": r.get("has_road_access"),
-                "shape_index": r.get("shape_index"),
-                "aspect_ratio": r.get("aspect_ratio"),
-                "_source": "graph",
-                "_rank": i + 1,
-            }
-            for i, r in enumerate(results)
-        ]
-
-    def _combine_with_rrf(
-        self,
-        spatial_results: List[Dict],
-        semantic_results: List[Dict],
-        graph_results: List[Dict],
-    ) -> List[SearchResult]:
-        """
-        Combine results using Reciprocal Rank Fusion.
-
-        RRF score = sum(weight / (k + rank)) across all sources.
-        Multi-source bonus: parcels found by 2+ sources get a score boost.
-        """
-        # Collect all parcel IDs with their ranks
-        parcel_scores = defaultdict(lambda: {"score": 0.0, "sources": [], "data": {}})
-
-        # Process GRAPH results FIRST (PRIMARY source - provides most data)
-        for r in graph_results:
-            pid = r.get("id_dzialki")
-            if pid:
-                rank = r.get("_rank", len(graph_results))
-                parcel_scores[pid]["score"] += self.GRAPH_WEIGHT / (self.RRF_K + rank)
-                parcel_scores[pid]["sources"].append("graph")
-                # Graph provides comprehensive data - use it as base
-                parcel_scores[pid]["data"].update(r)
-
-        # Process spatial results (supplements with location-based data)
-        for r in spatial_results:
-            pid = r.get("id_dzialki")
-            if pid:
-                rank = r.get("_rank", len(spatial_results))
-                parcel_scores[pid]["score"] += self.SPATIAL_WEIGHT / (self.RRF_K + rank)
-                parcel_scores[pid]["sources"].append("spatial")
-                # Only add spatial-specific data that graph doesn't have
-                existing_data = parcel_scores[pid]["data"]
-                if "distance_m" in r and r["distance_m"] is not None:
-                    existing_data["distance_m"] = r["distance_m"]
-                # Fill in any missing basic fields
-                for key in ["gmina", "miejscowosc", "area_m2", "centroid_lat", "centroid_lon"]:
-                    if key in r and r[key] is not None and existing_data.get(key) is None:
-                        existing_data[key] = r[key]
-
-        # Process semantic results (GraphRAG text embeddings + graph constraints)
-        for r in semantic_results:
-            pid = r.get("id_dzialki")
-            if pid:
-                rank = r.get("_rank", len(semantic_results))
-                parcel_scores[pid]["score"] += self.SEMANTIC_WEIGHT / (self.RRF_K + rank)
-                parcel_scores[pid]["sources"].append("semantic")
-                existing_data = parcel_scores[pid]["data"]
-                # Add similarity score from semantic search
-                if "similarity_score" in r and r["similarity_score"] is not None:
-                    existing_data["similarity_score"] = r["similarity_score"]
-                # Fill in any missing fields
-                for key in ["gmina", "miejscowosc", "area_m2", "centroid_lat", "centroid_lon",
-                            "quietness_score", "nature_score", "accessibility_score"]:
-                    if key in r and r[key] is not None and existing_data.get(key) is None:
-                        existing_data[key] = r[key]
-
-        # Multi-source bonus: parcels confirmed by multiple sources rank higher
-        for pid, info in parcel_scores.items():
-            source_count = len(set(info["sources"]))
-            if source_count >= 3:
-                info["score"] *= 1.3  # 30% bonus for confirmation from all 3 sources
-            elif source_count >= 2:
-                info["score"] *= 1.1  # 10% bonus for 2 sources
-
-        # Convert to SearchResult objects
-        results = []
-        for pid, info in parcel_scores.items():
-            data = info["data"]
-            result = SearchResult(
-                parcel_id=pid,
-                rrf_score=info["score"],
-                sources=list(set(info["sources"])),
-                gmina=data.get("gmina"),
-                miejscowosc=data.get("miejscowosc"),
-                area_m2=data.get("area_m2"),
-                quietness_score=data.get("quietness_score"),
-                nature_score=data.get("nature_score"),
-                accessibility_score=data.get("accessibility_score"),
-                has_mpzp=data.get("has_mpzp"),
-                mpzp_symbol=data.get("mpzp_symbol"),
-                mpzp_budowlane=data.get("mpzp_czy_budowlane"),
-                centroid_lat=data.get("centroid_lat"),
-                centroid_lon=data.get("centroid_lon"),
-                distance_m=data.get("distance_m"),
-                # New fields from graph
-                dist_to_forest=data.get("dist_to_forest"),
-                dist_to_water=data.get("dist_to_water"),
-                dist_to_school=data.get("dist_to_school"),
-                dist_to_shop=data.get("dist_to_shop"),
-                dist_to_bus_stop=data.get("dist_to_bus_stop"),
-                pct_forest_500m=data.get("pct_forest_500m"),
-                count_buildings_500m=data.get("count_buildings_500m"),
-                has_road_access=data.get("has_road_access"),
-                shape_index=data.get("shape_index"),
-                aspect_ratio=data.get("aspect_ratio"),
-                similarity_score=data.get("similarity_score"),
-            )
-            results.append(result)
-
-        # Sort by RRF score
-        results.sort(key=lambda x: x.rrf_score, reverse=True)
+        return [self._graph_row(r, i + 1) for i, r in enumerate(results)]
 
-        return results
+    @staticmethod
+    def _graph_row(r: Dict[str, Any], rank: int) -> Dict[str, Any]:
+        """Graph search row in the shared source-row format."""
+        return {
+            "id_dzialki": r.get("id"),
+            "gmina": r.get("gmina"),
+            "miejscowosc": r.get("miejscowosc"),
+            "area_m2": r.get("area_m2"),
+            "quietness_score": r.get("quietness_score"),
+            "nature_score": r.get("nature_score"),
+            "accessibility_score": r.get("accessibility_score"),
+            "has_mpzp": r.get("has_mpzp"),
+            "mpzp_symbol": r.get("mpzp_symbol"),
+            "centroid_lat": r.get("lat"),
+            "centroid_lon": r.get("lon"),
+            "dist_to_forest": r.get("dist_to_forest"),
+            "dist_to_water": r.get("dist_to_water"),
+            "dist_to_school": r.get("dist_to_school"),
+            "dist_to_shop": r.get("dist_to_shop"),
+            "dist_to_bus_stop": r.get("dist_to_bus_stop"),
+            "pct_forest_500m": r.get("pct_forest_500m"),
+            "count_buildings_500m": r.get("count_buildings_500m"),
+            "has_road_access": r.get("has_road_access"),
+            "shape_index": r.get("shape_index"),
+            "aspect_ratio": r.get("aspect_ratio"),
+            "_source": "graph",
+            "_rank": rank,
+        }
 
     async def _enrich_results(
         self,
@@ -757,52 +969,14 @@ class HybridSearchService:
         details_map = {d["id_dzialki"]: d for d in details}
 
         # Update results - fill in any missing fields from PostGIS
+        # (graph data takes precedence)
         for result in results:
-            if result.parcel_id in details_map:
-                d = details_map[result.parcel_id]
-                # Only fill in if not already set (graph data takes precedence)
-                if result.gmina is None:
-                    result.gmina = d.get("gmina")
-                if result.miejscowosc is None:
-                    result.miejscowosc = d.get("miejscowosc")
-                if result.area_m2 is None:
-                    result.area_m2 = d.get("area_m2")
-                if result.quietness_score is None:
-                    result.quietness_score = d.get("quietness_score")
-                if result.nature_score is None:
-                    result.nature_score = d.get("nature_score")
-                if result.accessibility_score is None:
-                    result.accessibility_score = d.get("accessibility_score")
-                if result.has_mpzp is None:
-                    result.has_mpzp = d.get("has_mpzp")
-                if result.mpzp_symbol is None:
-                    result.mpzp_symbol = d.get("mpzp_symbol")
-                if result.mpzp_budowlane is None:
-                    result.mpzp_budowlane = d.get("mpzp_czy_budowlane")
-                if result.centroid_lat is None:
-                    result.centroid_lat = d.get("centroid_lat")
-                if result.centroid_lon is None:
-                    result.centroid_lon = d.get("centroid_lon")
-                # Distance fields from PostGIS
-                if result.dist_to_forest is None:
-                    result.dist_to_forest = d.get("dist_to_forest")
-                if result.dist_to_water is None:
-                    result.dist_to_water = d.get("dist_to_water")
-                if result.dist_to_school is None:
-                    result.dist_to_school = d.get("dist_to_school")
-                if result.dist_to_shop is None:
-                    result.dist_to_shop = d.get("dist_to_shop")
-                if result.dist_to_bus_stop is None:
-                    result.dist_to_bus_stop = d.get("dist_to_bus_stop")
-                if result.pct_forest_500m is None:
-                    result.pct_forest_500m = d.get("pct_forest_500m")
-                if result.has_road_access is None:
-                    result.has_road_access = d.get("has_public_road_access")
-                # Shape quality fields
-                if result.shape_index is None:
-                    result.shape_index = d.get("shape_index")
-                if result.aspect_ratio is None:
-                    result.aspect_ratio = d.get("aspect_ratio")
+            d = details_map.get(result.parcel_id)
+            if d is None:
+                continue
+            for attr, key in ENRICH_FIELDS:
+                if getattr(result, attr) is None:
+                    setattr(result, attr, d.get(key))
 
         return results
 
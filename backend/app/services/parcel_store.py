@@ -0,0 +1,465 @@
+"""
+Columnar parcel store - in-process scoring for GraphService.search_parcels.
+
+Loads the Parcel properties used by the scored search (hard filters and the
+ScoreTerm list) once into NumPy arrays, one .npy file per column, and
+memory-maps them. A search then:
+
+1. applies the hard filters as boolean masks,
+2. evaluates the weighted decay score vectorized over the surviving rows,
+3. picks the top-k with np.argpartition,
+
+so Neo4j is only asked to hydrate the winning IDs.
+
+Snapshots live under settings.parcel_store_path/<dataset_version>/ and are
+rebuilt in the background when the pipeline bumps the dataset version
+(see app.services.dataset_version). Until a snapshot for the current
+version is loaded, rank() returns None and callers fall back to Cypher.
+
+Enable with PARCEL_STORE_ENABLED=true.
+"""
+
+import asyncio
+import json
+import re
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.services.database import neo4j
+from app.services.dataset_version import dataset_version
+from app.services.graph_service import NETWORK_DISTANCE_FIELDS, ParcelSearchCriteria, ScoreTerm
+
+
+# Float columns read by hard filters and ScoreTerms (NULL -> NaN)
+NUMERIC_COLUMNS = [
+    "area_m2",
+    "quietness_score", "nature_score", "accessibility_score",
+    "dist_to_forest", "dist_to_water",
+    "dist_to_sea", "dist_to_river", "dist_to_lake", "dist_to_canal", "dist_to_pond",
+    "dist_to_school", "dist_to_supermarket", "dist_to_bus_stop", "dist_to_doctors",
+    "dist_to_industrial", "dist_to_main_road",
+    *NETWORK_DISTANCE_FIELDS.values(),
+    "pct_forest_500m",
+    "shape_index", "aspect_ratio",
+]
+
+# String columns, dictionary-encoded to int32 codes (NULL -> -1)
+CATEGORICAL_COLUMNS = [
+    "gmina", "dzielnica", "powiat",
+    "kategoria_ciszy", "kategoria_natury", "kategoria_dostepu", "gestosc_zabudowy",
+    "size_category", "pog_symbol",
+    "ownership_type",  # OwnershipType.id via HAS_OWNERSHIP
+    "build_status",    # BuildStatus.id via HAS_BUILD_STATUS
+]
+
+# Boolean columns (NULL -> False)
+BOOL_COLUMNS = [
+    "is_residential_zone",
+    "pog_residential",  # any HAS_POG zone with is_residential = true
+]
+
+_RELATION_COLUMNS = {"ownership_type", "build_status", "pog_residential"}
+
+# Keyset-paginated export of all parcels
+LOAD_BATCH_SIZE = 20000
+LOAD_QUERY = f"""
+    MATCH (p:Parcel)
+    WHERE p.id_dzialki > $after
+    WITH p ORDER BY p.id_dzialki LIMIT $batch
+    OPTIONAL MATCH (p)-[:HAS_OWNERSHIP]->(ot:OwnershipType)
+    WITH p, head(collect(ot.id)) AS ownership_type
+    OPTIONAL MATCH (p)-[:HAS_BUILD_STATUS]->(bs:BuildStatus)
+    WITH p, ownership_type, head(collect(bs.id)) AS build_status
+    OPTIONAL MATCH (p)-[:HAS_POG]->(pz:POGZone)
+    WITH p, ownership_type, build_status,
+         any(x IN collect(pz.is_residential) WHERE x = true) AS pog_residential
+    RETURN
+        p.id_dzialki AS id,
+        ownership_type,
+        build_status,
+        pog_residential,
+        {", ".join(f"p.{c} AS {c}" for c in NUMERIC_COLUMNS + CATEGORICAL_COLUMNS + BOOL_COLUMNS
+                   if c not in _RELATION_COLUMNS)}
+    ORDER BY id
+"""
+
+META_FILE = "meta.json"
+
+
+def _to_float(value: Any) -> float:
+    """Convert a Neo4j property to float (NULL/invalid -> NaN)."""
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+@dataclass
+class ParcelSnapshot:
+    """Column arrays for all parcels of one dataset version."""
+    version: str
+    ids: np.ndarray
+    numeric: Dict[str, np.ndarray]
+    codes: Dict[str, np.ndarray]
+    vocab: Dict[str, List[str]]
+    flags: Dict[str, np.ndarray]
+    _vocab_index: Dict[str, Dict[str, int]] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self._vocab_index = {
+            column: {value: code for code, value in enumerate(values)}
+            for column, values in self.vocab.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # -------------------------------------------------------------------------
+    # Build / persist
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def from_rows(cls, version: str, rows: List[Dict[str, Any]]) -> "ParcelSnapshot":
+        """Build a snapshot from LOAD_QUERY rows."""
+        ids = np.array([r["id"] for r in rows], dtype=str)
+
+        numeric = {
+            c: np.array([_to_float(r.get(c)) for r in rows], dtype=np.float32)
+            for c in NUMERIC_COLUMNS
+        }
+
+        codes, vocab = {}, {}
+        for c in CATEGORICAL_COLUMNS:
+            values = [r.get(c) for r in rows]
+            vocab[c] = sorted({str(v) for v in values if v is not None})
+            index = {v: i for i, v in enumerate(vocab[c])}
+            codes[c] = np.array(
+                [index[str(v)] if v is not None else -1 for v in values],
+                dtype=np.int32,
+            )
+
+        flags = {
+            c: np.array([r.get(c) is True or str(r.get(c)).lower() == "true" for r in rows], dtype=bool)
+            for c in BOOL_COLUMNS
+        }
+
+        return cls(version=version, ids=ids, numeric=numeric, codes=codes, vocab=vocab, flags=flags)
+
+    def save(self, path: Path) -> None:
+        """Write one .npy per column plus meta.json (atomic directory swap)."""
+        tmp = path.with_name(path.name + ".tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        np.save(tmp / "ids.npy", self.ids)
+        for c, arr in self.numeric.items():
+            np.save(tmp / f"num_{c}.npy", arr)
+        for c, arr in self.codes.items():
+            np.save(tmp / f"cat_{c}.npy", arr)
+        for c, arr in self.flags.items():
+            np.save(tmp / f"flag_{c}.npy", arr)
+
+        meta = {"version": self.version, "count": len(self), "vocab": self.vocab}
+        (tmp / META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+        if path.exists():
+            shutil.rmtree(path)
+        tmp.rename(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ParcelSnapshot":
+        """Memory-map a saved snapshot."""
+        meta = json.loads((path / META_FILE).read_text(encoding="utf-8"))
+        return cls(
+            version=meta["version"],
+            ids=np.load(path / "ids.npy", mmap_mode="r"),
+            numeric={c: np.load(path / f"num_{c}.npy", mmap_mode="r") for c in NUMERIC_COLUMNS},
+            codes={c: np.load(path / f"cat_{c}.npy", mmap_mode="r") for c in CATEGORICAL_COLUMNS},
+            vocab=meta["vocab"],
+            flags={c: np.load(path / f"flag_{c}.npy", mmap_mode="r") for c in BOOL_COLUMNS},
+        )
+
+    # -------------------------------------------------------------------------
+    # Query
+    # -------------------------------------------------------------------------
+
+    def isin(self, column: str, values: List[str]) -> np.ndarray:
+        """Mask of rows whose categorical column is one of values."""
+        index = self._vocab_index[column]
+        wanted = [index[v] for v in values if v in index]
+        if not wanted:
+            return np.zeros(len(self), dtype=bool)
+        return np.isin(self.codes[column], wanted)
+
+    def name_match(self, column: str, name: str) -> np.ndarray:
+        """Mask for `col = name OR col STARTS WITH name + ' '` (district sub-areas)."""
+        prefix = name + " "
+        matching = [v for v in self.vocab[column] if v == name or v.startswith(prefix)]
+        return self.isin(column, matching)
+
+    def filter_mask(self, criteria: ParcelSearchCriteria) -> np.ndarray:
+        """Hard filters of search_parcels as a boolean mask."""
+        mask = np.ones(len(self), dtype=bool)
+
+        # Location
+        if criteria.gmina:
+            mask &= self.isin("gmina", [criteria.gmina])
+        if criteria.miejscowosc:
+            mask &= self.name_match("dzielnica", criteria.miejscowosc)
+        if criteria.powiat:
+            mask &= self.isin("powiat", [criteria.powiat])
+
+        # Area range
+        area = self.numeric["area_m2"]
+        if criteria.min_area_m2:
+            mask &= area >= criteria.min_area_m2
+        if criteria.max_area_m2:
+            mask &= area <= criteria.max_area_m2
+
+        # Ownership / build status / POG residential (graph relations)
+        if criteria.ownership_type:
+            mask &= self.isin("ownership_type", [criteria.ownership_type])
+        if criteria.build_status:
+            mask &= self.isin("build_status", [criteria.build_status])
+        if criteria.pog_residential:
+            mask &= self.flags["pog_residential"]
+
+        # MPZP/POG
+        if criteria.has_mpzp is not None:
+            has_pog = self.codes["pog_symbol"] >= 0
+            mask &= has_pog if criteria.has_mpzp else ~has_pog
+        if criteria.mpzp_buildable:
+            mask &= self.flags["is_residential_zone"]
+        if criteria.mpzp_symbols:
+            mask &= self.isin("pog_symbol", criteria.mpzp_symbols)
+
+        # Road access
+        if criteria.has_road_access is not None:
+            road = self.numeric["dist_to_main_road"]
+            mask &= (road < 50) if criteria.has_road_access else (road >= 50)
+
+        # Default shape quality filters
+        aspect = self.numeric["aspect_ratio"]
+        mask &= np.isnan(aspect) | (aspect <= 6.0)
+        shape = self.numeric["shape_index"]
+        mask &= np.isnan(shape) | (shape >= 0.15)
+        if not criteria.include_infrastructure:
+            mask &= ~self.isin("pog_symbol", ["SK", "SI"])
+
+        return mask
+
+    def column(self, name: str, idx: np.ndarray) -> np.ndarray:
+        """Numeric column for rows idx, network distance first (as field_cypher)."""
+        values = self.numeric[name][idx].astype(np.float64)
+        network = NETWORK_DISTANCE_FIELDS.get(name)
+        if network:
+            net = self.numeric[network][idx].astype(np.float64)
+            values = np.where(np.isnan(net), values, net)
+        return values
+
+    def _term_values(self, term: ScoreTerm, idx: np.ndarray) -> np.ndarray:
+        """Evaluate one ScoreTerm (before weighting) for rows idx."""
+        if term.kind == "score":
+            s = np.nan_to_num(self.column(term.field, idx), nan=0.0) / 100.0
+            if term.categories:
+                in_cat = self.isin(term.category_field, term.categories)[idx]
+                return np.where(in_cat, 0.5 + 0.5 * s, s)
+            return s
+
+        if term.kind == "match":
+            return self.isin(term.category_field, term.categories)[idx].astype(np.float64)
+
+        if term.kind == "decay":
+            d = self.column(term.field, idx)
+            with np.errstate(over="ignore", invalid="ignore"):
+                decayed = np.exp(-1.0 * (d - term.ideal) / float(term.decay))
+            values = np.where(d <= term.ideal, 1.0, decayed)
+            return np.where(np.isnan(d), 0.0, values)
+
+        if term.kind == "min_pct":
+            p = self.column(term.field, idx)
+            pct = term.threshold
+            return np.where(
+                p >= pct, 1.0,
+                np.where(p >= pct * 0.5, 0.5, np.nan_to_num(p, nan=0.0) / max(pct, 0.01)),
+            )
+
+        if term.kind == "far":
+            d = self.column(term.field, idx)
+            t = int(term.threshold)
+            values = np.where(d >= t, 1.0, np.where(d >= max(1, t // 2), 0.5, 0.0))
+            return np.where(np.isnan(d), 0.5, values)
+
+        # shape
+        si = self.numeric["shape_index"][idx]
+        ar = self.numeric["aspect_ratio"][idx]
+        si_part = np.where(np.isnan(si), 0.3, np.where(si >= 0.7, 1.0, np.where(si >= 0.4, 0.6, 0.2)))
+        ar_part = np.where(np.isnan(ar), 0.3, np.where(ar <= 2.0, 1.0, np.where(ar <= 4.0, 0.6, 0.2)))
+        return 0.5 * si_part + 0.5 * ar_part
+
+    def rank(self, criteria: ParcelSearchCriteria, terms: List[ScoreTerm]) -> List[Tuple[str, float]]:
+        """Top `criteria.limit` (id, total_score) pairs, best first."""
+        idx = np.flatnonzero(self.filter_mask(criteria))
+        if idx.size == 0:
+            return []
+
+        scores = np.zeros(idx.size, dtype=np.float64)
+        for term in terms:
+            scores += term.weight * self._term_values(term, idx)
+
+        k = min(criteria.limit, idx.size)
+        if k < idx.size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(idx.size)
+
+        # ORDER BY total_score DESC, quietness_score DESC
+        quiet = np.nan_to_num(self.numeric["quietness_score"][idx[top]], nan=-1.0)
+        top = top[np.lexsort((-quiet, -scores[top]))]
+
+        return [(str(self.ids[i]), float(scores[j])) for i, j in zip(idx[top], top)]
+
+
+class ParcelColumnStore:
+    """Versioned, memory-mapped ParcelSnapshot with background refresh."""
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = Path(root or settings.parcel_store_path)
+        self._snapshot: Optional[ParcelSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def snapshot(self) -> Optional[ParcelSnapshot]:
+        """Loaded snapshot (may be for an older dataset version)."""
+        return self._snapshot
+
+    def _version_path(self, version: str) -> Path:
+        return self._root / re.sub(r"[^A-Za-z0-9._-]", "_", version)
+
+    async def fetch_rows(self) -> List[Dict[str, Any]]:
+        """Export all parcels from Neo4j in keyset-paginated batches."""
+        rows: List[Dict[str, Any]] = []
+        after = ""
+        while True:
+            batch = await neo4j.run(LOAD_QUERY, {"after": after, "batch": LOAD_BATCH_SIZE})
+            if not batch:
+                break
+            rows.extend(batch)
+            after = batch[-1]["id"]
+            if len(batch) < LOAD_BATCH_SIZE:
+                break
+        return rows
+
+    def _build_and_save(self, version: str, rows: List[Dict[str, Any]], path: Path) -> ParcelSnapshot:
+        ParcelSnapshot.from_rows(version, rows).save(path)
+        return ParcelSnapshot.load(path)
+
+    def _prune(self, keep: Path) -> None:
+        """Remove snapshots of older dataset versions."""
+        for child in self._root.iterdir():
+            if child.is_dir() and child != keep:
+                shutil.rmtree(child, ignore_errors=True)
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Load (or build) the snapshot for the current dataset version.
+
+        Args:
+            force: Rebuild from Neo4j even if an on-disk snapshot exists
+
+        Returns:
+            True if a current snapshot is loaded
+        """
+        async with self._lock:
+            try:
+                version = await dataset_version.get(force=True)
+                if not force and self._snapshot is not None and self._snapshot.version == version:
+                    return True
+
+                start = time.monotonic()
+                path = self._version_path(version)
+                snapshot = None
+                if not force and (path / META_FILE).exists():
+                    try:
+                        snapshot = await asyncio.to_thread(ParcelSnapshot.load, path)
+                        source = "disk"
+                    except (KeyError, OSError, ValueError) as e:
+                        # e.g. saved before a column was added
+                        logger.info(f"Parcel store snapshot on disk not usable ({e}), rebuilding")
+                if snapshot is None:
+                    rows = await self.fetch_rows()
+                    if not rows:
+                        logger.warning("Parcel store: no parcels in Neo4j, keeping previous snapshot")
+                        return self._snapshot is not None
+                    self._root.mkdir(parents=True, exist_ok=True)
+                    snapshot = await asyncio.to_thread(self._build_and_save, version, rows, path)
+                    source = "neo4j"
+
+                self._snapshot = snapshot
+                self._loaded_at = time.time()
+                await asyncio.to_thread(self._prune, path)
+                logger.info(
+                    f"Parcel store loaded from {source}: {len(snapshot):,} parcels, "
+                    f"version={version} ({(time.monotonic() - start) * 1000:.0f}ms)"
+                )
+                return True
+            except Exception as e:
+                logger.warning(f"Parcel store refresh failed: {e}")
+                return False
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def rank(
+        self,
+        criteria: ParcelSearchCriteria,
+        terms: List[ScoreTerm],
+    ) -> Optional[List[Tuple[str, float]]]:
+        """Rank parcels in-process.
+
+        Returns:
+            Ranked (id, total_score) pairs, or None when no snapshot for the
+            current dataset version is loaded (a refresh is then scheduled)
+        """
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != await dataset_version.get():
+            self._schedule_refresh()
+            return None
+
+        start = time.monotonic()
+        ranked = snapshot.rank(criteria, terms)
+        logger.info(
+            f"Columnar search: {len(ranked)} of {len(snapshot):,} parcels, "
+            f"{len(terms)} scoring dims ({(time.monotonic() - start) * 1000:.1f}ms)"
+        )
+        return ranked
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot status for diagnostics."""
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "version": snapshot.version if snapshot else None,
+            "parcels": len(snapshot) if snapshot else 0,
+            "loaded_at": self._loaded_at,
+        }
+
+
+# Global instance
+parcel_store = ParcelColumnStore()
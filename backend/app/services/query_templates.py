@@ -0,0 +1,109 @@
+"""
+Cypher query template registry.
+
+Neo4j caches execution plans keyed by query text. Queries that inline
+numbers (weights, distances) produce a new text - and a new plan - for
+every call. Scored searches are therefore built as fixed templates with all
+values passed as $params, and registered here so we can see how many
+distinct texts we actually send.
+
+The registry mirrors Neo4j's LRU query cache (dbms.query_cache_size,
+default 1000): a "hit" is an execution whose text is still in that window,
+so hit_rate approximates the server-side plan-cache hit rate.
+
+Usage:
+    from app.services.query_templates import query_templates
+
+    query_templates.record("search_parcels", query)
+    query_templates.stats()
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict
+
+
+# Neo4j default dbms.query_cache_size
+QUERY_CACHE_SIZE = 1000
+
+
+@dataclass
+class TemplateStats:
+    """Counters for one distinct query text."""
+    name: str
+    executions: int = 0
+
+
+class QueryTemplateRegistry:
+    """Counts distinct query texts per named query and plan-cache hits."""
+
+    def __init__(self, cache_size: int = QUERY_CACHE_SIZE):
+        self._cache_size = cache_size
+        self._templates: "OrderedDict[str, TemplateStats]" = OrderedDict()
+        self._executions = 0
+        self._hits = 0
+        self._per_name: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def template_key(query: str) -> str:
+        """Stable key for a query text (whitespace-insensitive)."""
+        normalized = re.sub(r"\s+", " ", query).strip()
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+    def record(self, name: str, query: str) -> str:
+        """Record one execution of a query.
+
+        Args:
+            name: Logical query name (e.g., "search_parcels")
+            query: Cypher text about to be sent
+
+        Returns:
+            Template key
+        """
+        key = self.template_key(query)
+        per_name = self._per_name.setdefault(name, {"executions": 0, "hits": 0})
+        self._executions += 1
+        per_name["executions"] += 1
+
+        stats = self._templates.get(key)
+        if stats is not None:
+            self._hits += 1
+            per_name["hits"] += 1
+            self._templates.move_to_end(key)
+        else:
+            stats = TemplateStats(name=name)
+            self._templates[key] = stats
+            if len(self._templates) > self._cache_size:
+                self._templates.popitem(last=False)
+        stats.executions += 1
+        return key
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate summary, overall and per query name."""
+        def rate(hits: int, total: int) -> float:
+            return round(hits / total, 3) if total else 0.0
+
+        templates_per_name: Dict[str, int] = {}
+        for stats in self._templates.values():
+            templates_per_name[stats.name] = templates_per_name.get(stats.name, 0) + 1
+
+        return {
+            "executions": self._executions,
+            "hits": self._hits,
+            "hit_rate": rate(self._hits, self._executions),
+            "templates": len(self._templates),
+            "by_query": {
+                name: {
+                    "executions": c["executions"],
+                    "templates": templates_per_name.get(name, 0),
+                    "hit_rate": rate(c["hits"], c["executions"]),
+                }
+                for name, c in self._per_name.items()
+            },
+        }
+
+
+# Global instance
+query_templates = QueryTemplateRegistry()
@@ -0,0 +1,214 @@
+"""
+Array-based rank fusion for hybrid search.
+
+Graph, spatial and semantic searches each return a ranked list of parcel
+rows. Fusion maps every parcel ID to a candidate index once and then works
+on per-source arrays (rank, row position, area/shape columns), so scoring,
+the multi-source bonus, hard filters and the final ordering are numpy ops
+instead of per-row dict merging. Callers materialize result objects only for
+the page they return (FusedRanking.page).
+
+Usage:
+    from app.services.rank_fusion import SourceRanking, fuse_rankings
+
+    fused = fuse_rankings([SourceRanking("graph", rows, 0.45), ...], k=60)
+    fused.apply_mask(hard_filter_mask(fused, min_area=800))
+    for i in fused.page(20):
+        fused.ids[i], fused.scores[i], fused.rows_for(i)
+"""
+
+from dataclasses import dataclass
+from typing import Any, Container, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# (minimum distinct sources, score multiplier) - checked in order
+MULTI_SOURCE_BONUS: Tuple[Tuple[int, float], ...] = ((3, 1.3), (2, 1.1))
+
+
+@dataclass
+class SourceRanking:
+    """Ranked rows from one search source."""
+    name: str
+    rows: List[Dict[str, Any]]
+    weight: float = 1.0
+    # Optional native score per row, used instead of RRF when this is the
+    # only active source
+    native_scores: Optional[Sequence[float]] = None
+
+
+class FusedRanking:
+    """Fused candidates: IDs, scores, and per-source row pointers."""
+
+    def __init__(
+        self,
+        sources: List[SourceRanking],
+        ids: List[str],
+        scores: np.ndarray,
+        row_index: np.ndarray,
+    ):
+        self.sources = sources
+        self.ids = ids
+        self.scores = scores
+        # row_index[s, i] = position of candidate i in sources[s].rows, or -1
+        self.row_index = row_index
+        self._keep = np.ones(len(ids), dtype=bool)
+        self._order: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return int(self._keep.sum())
+
+    @property
+    def total_candidates(self) -> int:
+        return len(self.ids)
+
+    def column(self, key: str, source_names: Sequence[str]) -> np.ndarray:
+        """Float column for all candidates, first non-null across sources.
+
+        Missing values are NaN (comparisons with NaN are False, so hard
+        filters let unknown values through).
+        """
+        out = np.full(len(self.ids), np.nan)
+        for s, source in enumerate(self.sources):
+            if source.name not in source_names:
+                continue
+            idx = self.row_index[s]
+            present = (idx >= 0) & np.isnan(out)
+            if not present.any():
+                continue
+            rows = source.rows
+            values = np.array(
+                [rows[j].get(key) for j in idx[present]], dtype=float,
+            )
+            out[present] = values
+        return out
+
+    def apply_mask(self, mask: np.ndarray) -> int:
+        """Drop candidates where mask is False. Returns number removed."""
+        before = len(self)
+        self._keep &= mask
+        self._order = None
+        return before - len(self)
+
+    def order(self) -> np.ndarray:
+        """Kept candidate indices by score descending (stable)."""
+        if self._order is None:
+            kept = np.flatnonzero(self._keep)
+            self._order = kept[np.argsort(-self.scores[kept], kind="stable")]
+        return self._order
+
+    def page(self, limit: int) -> Iterator[int]:
+        """Candidate indices of the top `limit` results."""
+        return iter(self.order()[:limit].tolist())
+
+    def source_names(self, i: int) -> List[str]:
+        """Sources that returned candidate i."""
+        return [
+            source.name for s, source in enumerate(self.sources)
+            if self.row_index[s, i] >= 0
+        ]
+
+    def rows_for(self, i: int) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Row of candidate i per source name (None where absent)."""
+        out: Dict[str, Optional[Dict[str, Any]]] = {}
+        for s, source in enumerate(self.sources):
+            j = self.row_index[s, i]
+            out[source.name] = source.rows[j] if j >= 0 else None
+        return out
+
+
+def fuse_rankings(
+    sources: List[SourceRanking],
+    k: int = 60,
+    id_key: str = "id_dzialki",
+) -> FusedRanking:
+    """
+    Fuse ranked sources with weighted Reciprocal Rank Fusion.
+
+    RRF score = sum(weight / (k + rank)) across sources, times the
+    MULTI_SOURCE_BONUS multiplier for parcels found by 2+ sources. Rank is
+    the row's "_rank" (or the list length if missing). When only one source
+    returned anything and it has native_scores, those are used as-is.
+
+    Candidate order for ties follows first appearance (sources in the order
+    given), matching a stable sort over insertion-ordered candidates.
+    """
+    index: Dict[str, int] = {}
+    positions: List[np.ndarray] = []
+    for source in sources:
+        pos = np.empty(len(source.rows), dtype=np.int64)
+        for j, r in enumerate(source.rows):
+            pid = r.get(id_key)
+            if pid:
+                pos[j] = index.setdefault(pid, len(index))
+            else:
+                pos[j] = -1
+        positions.append(pos)
+
+    n = len(index)
+    ids = list(index)
+    scores = np.zeros(n)
+    row_index = np.full((len(sources), n), -1, dtype=np.int64)
+    active = [bool(source.rows) for source in sources]
+
+    for s, source in enumerate(sources):
+        pos = positions[s]
+        valid = pos >= 0
+        if not valid.any():
+            continue
+        rows = source.rows
+        n_rows = len(rows)
+        ranks = np.fromiter(
+            (r.get("_rank", n_rows) for r in rows), dtype=float, count=n_rows,
+        )
+        np.add.at(scores, pos[valid], source.weight / (k + ranks[valid]))
+        # Last row wins for duplicate IDs within a source
+        row_index[s, pos[valid]] = np.flatnonzero(valid)
+
+    if sum(active) == 1:
+        s = active.index(True)
+        native = sources[s].native_scores
+        if native is not None:
+            pos = positions[s]
+            valid = pos >= 0
+            scores = np.zeros(n)
+            scores[pos[valid]] = np.asarray(native, dtype=float)[valid]
+    else:
+        source_count = (row_index >= 0).sum(axis=0)
+        multiplier = np.ones(n)
+        for min_sources, bonus in reversed(MULTI_SOURCE_BONUS):
+            multiplier[source_count >= min_sources] = bonus
+        scores *= multiplier
+
+    return FusedRanking(sources, ids, scores, row_index)
+
+
+def hard_filter_mask(
+    fused: FusedRanking,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    area_sources: Sequence[str] = ("graph", "spatial", "semantic"),
+    shape_sources: Sequence[str] = ("graph",),
+    max_aspect_ratio: float = 6.0,
+    min_shape_index: float = 0.15,
+) -> np.ndarray:
+    """Boolean keep-mask for area range and shape quality.
+
+    Unknown (null) values pass, like the graph query's own filters.
+    """
+    keep = np.ones(len(fused.ids), dtype=bool)
+    if min_area or max_area:
+        area = fused.column("area_m2", area_sources)
+        if min_area:
+            keep &= ~(area < min_area)
+        if max_area:
+            keep &= ~(area > max_area)
+    keep &= ~(fused.column("aspect_ratio", shape_sources) > max_aspect_ratio)
+    keep &= ~(fused.column("shape_index", shape_sources) < min_shape_index)
+    return keep
+
+
+def membership_mask(fused: FusedRanking, allowed: Container[str]) -> np.ndarray:
+    """Boolean keep-mask for candidates whose ID is in `allowed`."""
+    return np.fromiter((pid in allowed for pid in fused.ids), dtype=bool, count=len(fused.ids))
@@ -0,0 +1,27 @@
+"""
+Road graph layout and road classes.
+
+Shared by the road graph build (egib/scripts/pipeline/07b_build_road_graph.py),
+the network distances step (07c_network_distances.py) and the backend
+(app.services.road_graph). No imports: the pipeline scripts load this file
+directly, without the backend's dependencies and config.
+"""
+
+# Bumped when the .npz array layout changes
+GRAPH_FORMAT = 1
+
+# KLASADROGI values; the index is the edge's road_class code
+ROAD_CLASSES = (
+    "autostrada",
+    "droga ekspresowa",
+    "droga główna ruchu przyśpieszonego",
+    "droga główna",
+    "droga zbiorcza",
+    "droga lokalna",
+    "droga dojazdowa",
+    "droga wewnętrzna",
+    "inna",
+)
+
+# Classes excluded from walking (routing and network distances)
+NOT_WALKABLE = frozenset({"autostrada", "droga ekspresowa"})
@@ -0,0 +1,293 @@
+"""
+Road network graph for travel-time (isochrone) search.
+
+The graph is built offline by egib/scripts/pipeline/07b_build_road_graph.py
+from the BDOT10k road layer and loaded from settings.road_graph_path as
+numpy arrays: CSR adjacency (indptr / indices) with per-edge length and road
+class, node coordinates, and each parcel's nearest node.
+
+A query snaps the origin to the nearest node of the main component, runs
+scipy's Dijkstra (C implementation, cut off at the time limit) with travel
+times for the mode as edge weights, and reads parcel travel times off the
+reached nodes. Per-node times are cached per (mode, origin node), so nearby
+origins and repeated / relaxed searches reuse one Dijkstra run.
+
+Usage:
+    from app.services.road_graph import road_graph
+
+    hits = await road_graph.isochrone(54.38, 18.60, max_minutes=15, mode="walk")
+    # [(id_dzialki, minutes), ...] nearest first
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.services.road_classes import GRAPH_FORMAT, NOT_WALKABLE
+
+
+# Travel speeds (km/h) per road class (KLASADROGI, road_classes.ROAD_CLASSES)
+# - walking uses one speed on every walkable road
+DRIVE_SPEED_KMH = {
+    "autostrada": 110.0,
+    "droga ekspresowa": 100.0,
+    "droga główna ruchu przyśpieszonego": 70.0,
+    "droga główna": 50.0,
+    "droga zbiorcza": 45.0,
+    "droga lokalna": 35.0,
+    "droga dojazdowa": 25.0,
+    "droga wewnętrzna": 15.0,
+    "inna": 20.0,
+}
+WALK_SPEED_KMH = 4.8
+
+TRAVEL_MODES = ("walk", "drive")
+
+# Origin -> graph and graph -> parcel legs are walked
+ACCESS_SPEED_KMH = WALK_SPEED_KMH
+MAX_ORIGIN_SNAP_M = 1000.0
+
+# Dijkstra limits are rounded up to this step (minutes) so cached runs are
+# reused by nearby limits
+CACHE_LIMIT_STEP_MIN = 15
+
+
+class RoadGraph:
+    """In-memory road graph (CSR arrays) with parcel snapping."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.length_m = arrays["length_m"].astype(np.float64)
+        self.road_class = arrays["road_class"]
+        self.class_names = [str(c) for c in arrays["class_names"]]
+        self.parcel_ids = arrays["parcel_ids"]
+        self.parcel_node = arrays["parcel_node"]
+        self.parcel_snap_m = arrays["parcel_snap_m"].astype(np.float64)
+        self.n_nodes = len(self.indptr) - 1
+
+        # Origins snap to main-component nodes, in a local metric projection
+        lonlat = arrays["node_lonlat"]
+        self._snap_nodes = np.flatnonzero(arrays["main_component"])
+        self._lat0 = float(np.mean(lonlat[self._snap_nodes, 1]))
+        from scipy.spatial import cKDTree
+        self._tree = cKDTree(self._project(lonlat[self._snap_nodes, 0], lonlat[self._snap_nodes, 1]))
+
+        self._matrices: Dict[str, Any] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "RoadGraph":
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format"]) != GRAPH_FORMAT:
+                raise ValueError(f"road graph format {int(data['format'])}, expected {GRAPH_FORMAT}")
+            return cls({key: data[key] for key in data.files})
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def _project(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """Equirectangular meters around the graph's mean latitude (snapping only)."""
+        k = math.cos(math.radians(self._lat0))
+        return np.column_stack([np.asarray(lon) * 111_320.0 * k, np.asarray(lat) * 110_574.0])
+
+    def matrix(self, mode: str):
+        """CSR matrix of edge travel times in seconds for a mode (built once)."""
+        matrix = self._matrices.get(mode)
+        if matrix is None:
+            from scipy.sparse import csr_matrix
+            if mode == "drive":
+                speed_kmh = np.array([DRIVE_SPEED_KMH.get(c, 20.0) for c in self.class_names])
+            else:
+                speed_kmh = np.array([
+                    0.0 if c in NOT_WALKABLE else WALK_SPEED_KMH for c in self.class_names
+                ])
+            speed = speed_kmh[self.road_class] / 3.6
+            allowed = speed > 0
+            # Weight 0 = no edge: excluded edges are dropped, the rest floored at 10 ms
+            seconds = np.where(
+                allowed, np.maximum(self.length_m / np.where(allowed, speed, 1.0), 0.01), 0.0,
+            )
+            matrix = csr_matrix((seconds, self.indices, self.indptr), shape=(self.n_nodes, self.n_nodes))
+            matrix.eliminate_zeros()
+            self._matrices[mode] = matrix
+        return matrix
+
+    def snap(self, lat: float, lon: float) -> Optional[Tuple[int, float]]:
+        """Nearest main-component node to a WGS84 point: (node, distance_m)."""
+        dist, i = self._tree.query(self._project([lon], [lat])[0], k=1)
+        if not np.isfinite(dist) or dist > MAX_ORIGIN_SNAP_M:
+            return None
+        return int(self._snap_nodes[i]), float(dist)
+
+    def node_seconds(self, node: int, mode: str, limit_s: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Dijkstra from one node: (reached node ids, seconds), within limit_s."""
+        from scipy.sparse.csgraph import dijkstra
+        seconds = dijkstra(self.matrix(mode), directed=True, indices=node, limit=limit_s)
+        reached = np.flatnonzero(np.isfinite(seconds))
+        return reached.astype(np.int32), seconds[reached].astype(np.float32)
+
+    def parcel_minutes(
+        self,
+        reached: np.ndarray,
+        seconds: np.ndarray,
+        origin_snap_m: float,
+    ) -> np.ndarray:
+        """Travel minutes per parcel (inf where the parcel's node was not reached)."""
+        node_s = np.full(self.n_nodes, np.inf)
+        node_s[reached] = seconds
+        access_s = (self.parcel_snap_m + origin_snap_m) / (ACCESS_SPEED_KMH / 3.6)
+        return (node_s[self.parcel_node] + access_s) / 60.0
+
+
+class RoadGraphService:
+    """Load the road graph and answer isochrone queries with a per-origin cache."""
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = Path(path or settings.road_graph_path)
+        self._graph: Optional[RoadGraph] = None
+        self._lock = asyncio.Lock()
+        self._load_task: Optional[asyncio.Task] = None
+        self._load_failed = False
+        # (mode, origin node) -> (limit_s, reached nodes, seconds)
+        self._cache: "OrderedDict[Tuple[str, int], Tuple[float, np.ndarray, np.ndarray]]" = OrderedDict()
+        self._cache_lock = threading.Lock()  # queries run in worker threads
+        self._stats = {"queries": 0, "cache_hits": 0, "dijkstra_runs": 0, "dijkstra_ms": 0.0}
+
+    @property
+    def graph(self) -> Optional[RoadGraph]:
+        """Loaded graph, or None (a background load is scheduled once)."""
+        if self._graph is None and settings.road_graph_enabled and not self._load_failed:
+            self.schedule_load()
+        return self._graph
+
+    async def load(self) -> bool:
+        """Load the graph file (in a worker thread)."""
+        async with self._lock:
+            if self._graph is not None:
+                return True
+            if not self._path.exists():
+                logger.info(f"Road graph not found at {self._path} - travel-time search disabled")
+                self._load_failed = True
+                return False
+            try:
+                start = time.monotonic()
+                self._graph = await asyncio.to_thread(RoadGraph.load, self._path)
+                logger.info(
+                    f"Road graph loaded: {self._graph.n_nodes:,} nodes, {len(self._graph):,} edges, "
+                    f"{len(self._graph.parcel_ids):,} parcels "
+                    f"({(time.monotonic() - start) * 1000:.0f}ms)"
+                )
+                return True
+            except Exception as e:
+                logger.warning(f"Road graph load failed: {e}")
+                self._load_failed = True
+                return False
+
+    def schedule_load(self) -> None:
+        """Start load() in the background unless one is running."""
+        if self._load_task is None or self._load_task.done():
+            self._load_task = asyncio.create_task(self.load())
+
+    def _node_seconds(
+        self, graph: RoadGraph, node: int, mode: str, limit_s: float,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Cached Dijkstra run covering at least limit_s."""
+        key = (mode, node)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] >= limit_s:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+                return entry[1], entry[2]
+
+        step_s = CACHE_LIMIT_STEP_MIN * 60
+        run_limit = math.ceil(limit_s / step_s) * step_s
+        start = time.monotonic()
+        reached, seconds = graph.node_seconds(node, mode, run_limit)
+
+        with self._cache_lock:
+            self._stats["dijkstra_runs"] += 1
+            self._stats["dijkstra_ms"] += (time.monotonic() - start) * 1000
+            self._cache[key] = (run_limit, reached, seconds)
+            self._cache.move_to_end(key)
+            while len(self._cache) > settings.road_graph_cache_size:
+                self._cache.popitem(last=False)
+        return reached, seconds
+
+    async def isochrone(
+        self,
+        lat: float,
+        lon: float,
+        max_minutes: float,
+        mode: str = "walk",
+        limit: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Parcels reachable from a point within max_minutes.
+
+        Args:
+            lat, lon: Origin (WGS84)
+            max_minutes: Travel time limit
+            mode: "walk" or "drive"
+            limit: Return only the nearest `limit` parcels
+
+        Returns:
+            [(id_dzialki, minutes)] sorted by travel time; empty if the graph
+            is not loaded or the origin is off the road network
+        """
+        graph = self.graph
+        if graph is None or max_minutes <= 0:
+            return []
+        if mode not in TRAVEL_MODES:
+            logger.warning(f"Unknown travel mode {mode!r}, using walk")
+            mode = "walk"
+
+        self._stats["queries"] += 1
+        try:
+            snapped = graph.snap(lat, lon)
+            if snapped is None:
+                logger.info(f"Isochrone origin ({lat:.4f}, {lon:.4f}) is off the road network")
+                return []
+            node, origin_snap_m = snapped
+            limit_s = max_minutes * 60.0
+
+            def compute() -> List[Tuple[str, float]]:
+                reached, seconds = self._node_seconds(graph, node, mode, limit_s)
+                minutes = graph.parcel_minutes(reached, seconds, origin_snap_m)
+                hits = np.flatnonzero(minutes <= max_minutes)
+                order = hits[np.argsort(minutes[hits], kind="stable")]
+                if limit is not None:
+                    order = order[:limit]
+                return [(str(graph.parcel_ids[i]), round(float(minutes[i]), 1)) for i in order]
+
+            return await asyncio.to_thread(compute)
+        except Exception as e:
+            logger.error(f"Isochrone search error: {e}")
+            return []
+
+    def stats(self) -> Dict[str, Any]:
+        """Graph and cache status for diagnostics."""
+        graph = self._graph
+        runs = self._stats["dijkstra_runs"]
+        return {
+            "loaded": graph is not None,
+            "nodes": graph.n_nodes if graph else 0,
+            "edges": len(graph) if graph else 0,
+            "queries": self._stats["queries"],
+            "cache_hits": self._stats["cache_hits"],
+            "cached_origins": len(self._cache),
+            "dijkstra_runs": runs,
+            "avg_dijkstra_ms": round(self._stats["dijkstra_ms"] / runs, 1) if runs else None,
+        }
+
+
+# Global instance
+road_graph = RoadGraphService()
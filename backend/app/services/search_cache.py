@@ -0,0 +1,247 @@
+"""
+Search result cache for HybridSearchService.
+
+Identical searches are common (refine back to previous filters, fallback
+diagnosis re-running a search, page reloads after reconnect). Results are
+cached under a canonical hash of SearchPreferences + limit + dataset version,
+in two tiers:
+
+- in-process LRU (per worker, no I/O)
+- Redis via RedisManager (shared between workers, TTL-bound)
+
+Entries hold only the ranking - parcel IDs, scores, sources and the
+query-specific values (distance from point, similarity) - not full payloads.
+Parcel fields are re-read from the graph on a hit, so they stay current.
+
+A new dataset version (pipeline step 29) changes every key; the memory tier
+is cleared when the version moves and old Redis entries expire via TTL.
+
+Usage:
+    from app.services.search_cache import search_cache
+
+    key = await search_cache.make_key(preferences, limit)
+    entry = await search_cache.get(key)
+    ...
+    await search_cache.put(key, entry)
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.services.database import redis_cache
+from app.services.dataset_version import dataset_version
+
+
+# Bump when the entry layout or the key normalization changes
+CACHE_SCHEMA = "v2"
+KEY_PREFIX = "search"
+
+# Coordinates are compared at ~1 m precision
+COORD_DECIMALS = 5
+
+
+@dataclass
+class CachedSearch:
+    """Ranking of one search: parallel lists, in result order."""
+    ids: List[str]
+    scores: List[float]
+    sources: List[List[str]]
+    distance_m: List[Optional[float]]
+    similarity: List[Optional[float]]
+    strategy: Optional[str] = None
+    travel_minutes: List[Optional[float]] = field(default_factory=list)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CachedSearch":
+        return cls(**json.loads(raw))
+
+
+@dataclass
+class _TierStats:
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+
+
+@dataclass
+class _LatencyStats:
+    count: int = 0
+    total_ms: float = 0.0
+    samples: List[float] = field(default_factory=list)
+
+    def add(self, ms: float, keep: int = 256):
+        self.count += 1
+        self.total_ms += ms
+        self.samples.append(ms)
+        if len(self.samples) > keep:
+            del self.samples[: len(self.samples) - keep]
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        recent = sorted(self.samples)
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1),
+            "p50_ms": round(recent[len(recent) // 2], 1),
+            "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 1),
+        }
+
+
+def _normalize(value: Any) -> Any:
+    """Canonical form of a preference value for hashing."""
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = round(float(value), COORD_DECIMALS)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, (list, tuple, set)):
+        items = [_normalize(v) for v in value]
+        items = [v for v in items if v is not None]
+        return sorted(items, key=str) or None
+    return value
+
+
+def canonical_preferences(preferences: Any) -> Dict[str, Any]:
+    """SearchPreferences as a canonical dict (unset fields omitted).
+
+    List fields are order-insensitive (category sets), strings are stripped,
+    numbers rounded (whole numbers as int, so 1000 and 1000.0 match); None,
+    empty lists and zero weights are dropped so that "not given" and "given
+    as empty" hash the same.
+    """
+    out = {}
+    for name, value in asdict(preferences).items():
+        value = _normalize(value)
+        if value is None or (name.startswith("w_") and value == 0):
+            continue
+        out[name] = value
+    return out
+
+
+class SearchResultCache:
+    """Two-tier (memory LRU + Redis) cache of search rankings."""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_s: int = 3600,
+    ):
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self._memory: "OrderedDict[str, CachedSearch]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._memory_stats = _TierStats()
+        self._redis_stats = _TierStats()
+        self._hit_latency = _LatencyStats()
+        self._miss_latency = _LatencyStats()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.search_cache_enabled
+
+    async def make_key(self, preferences: Any, limit: int) -> str:
+        """Cache key for a search (changes with the dataset version)."""
+        version = await dataset_version.get()
+        if version != self._version:
+            if self._version is not None and self._memory:
+                logger.info(f"Search cache: dataset version {self._version} -> {version}, "
+                           f"dropping {len(self._memory)} entries")
+            self._memory.clear()
+            self._version = version
+
+        payload = json.dumps(
+            {"prefs": canonical_preferences(preferences), "limit": limit},
+            sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+        )
+        digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{CACHE_SCHEMA}:{version}:{digest}"
+
+    async def get(self, key: str) -> Optional[CachedSearch]:
+        """Look up a ranking: memory first, then Redis (promoted to memory)."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self._memory_stats.hits += 1
+            return entry
+        self._memory_stats.misses += 1
+
+        try:
+            raw = await redis_cache.get(key)
+        except Exception as e:
+            self._redis_stats.errors += 1
+            logger.warning(f"Search cache Redis get failed: {e}")
+            return None
+
+        if raw is None:
+            self._redis_stats.misses += 1
+            return None
+
+        try:
+            entry = CachedSearch.from_json(raw)
+        except (ValueError, TypeError) as e:
+            self._redis_stats.errors += 1
+            logger.warning(f"Search cache entry unreadable ({key}): {e}")
+            return None
+
+        self._redis_stats.hits += 1
+        self._remember(key, entry)
+        return entry
+
+    async def put(self, key: str, entry: CachedSearch):
+        """Store a ranking in both tiers."""
+        self._remember(key, entry)
+        try:
+            await redis_cache.set(key, entry.to_json(), expire=self._ttl_s)
+        except Exception as e:
+            self._redis_stats.errors += 1
+            logger.warning(f"Search cache Redis set failed: {e}")
+
+    def _remember(self, key: str, entry: CachedSearch):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    def record_latency(self, hit: bool, ms: float):
+        """Record end-to-end search latency for a hit or a miss."""
+        (self._hit_latency if hit else self._miss_latency).add(ms)
+
+    def clear(self):
+        """Drop the memory tier (Redis entries expire by TTL)."""
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per tier and search latency for hits vs misses."""
+        lookups = self._memory_stats.hits + self._memory_stats.misses
+        hits = self._memory_stats.hits + self._redis_stats.hits
+        return {
+            "enabled": self.enabled,
+            "dataset_version": self._version,
+            "entries": len(self._memory),
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory": asdict(self._memory_stats),
+            "redis": asdict(self._redis_stats),
+            "latency": {
+                "hit": self._hit_latency.summary(),
+                "miss": self._miss_latency.summary(),
+            },
+        }
+
+
+# Global instance
+search_cache = SearchResultCache(
+    max_entries=settings.search_cache_size,
+    ttl_s=settings.search_cache_ttl_s,
+)
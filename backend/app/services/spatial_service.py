@@ -5,6 +5,11 @@ Handles geometry-based queries like:
 - Search parcels within radius
 - Search parcels in bounding box
 - Get parcel details with geometry
+
+WGS84 output reads the columns materialized by
+scripts/pipeline/precompute_wgs84.py (geom_4326, geojson_4326, ...) when
+they exist, and falls back to ST_Transform per row where they are missing
+or NULL (parcels imported after the last precompute run).
 """
 
 from typing import List, Optional, Dict, Any
@@ -14,7 +19,16 @@ from loguru import logger
 from sqlalchemy import text
 
 from app.services.database import postgis
+from app.services.wgs84_columns import PRECOMPUTED_COLUMNS, COORD_PRECISION
+
 
+# Binary map payload (see SpatialService.generate_twkb_frame)
+TWKB_MEDIA_TYPE = "application/vnd.moja-dzialka.twkb"
+TWKB_FRAME_MAGIC = "MDT1"
+MAP_PROPERTY_COLUMNS = [
+    "id_dzialki", "gmina", "miejscowosc", "area_m2", "quietness_score",
+    "nature_score", "accessibility_score", "has_mpzp", "mpzp_symbol",
+]
 
 @dataclass
 class SpatialSearchParams:
@@ -28,6 +42,9 @@ class SpatialSearchParams:
     has_mpzp: Optional[bool] = None
     mpzp_budowlane: Optional[bool] = None
     limit: int = 100
+    # KNN mode: GiST index-ordered scan (geom <-> point) that stops at limit,
+    # instead of computing ST_Distance for every parcel in the radius
+    knn: bool = False
 
 
 @dataclass
@@ -48,12 +65,58 @@ class SpatialService:
     # Source CRS for frontend: WGS84
     WGS84_CRS = 4326
 
+    def __init__(self):
+        self._precomputed: Optional[bool] = None
+
+    async def has_precomputed_wgs84(self) -> bool:
+        """Whether parcels carry the precomputed WGS84 columns (checked once)."""
+        if self._precomputed is None:
+            try:
+                results = await postgis.execute(
+                    """
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_name = 'parcels' AND column_name = ANY(:columns)
+                    """,
+                    {"columns": [column for column, _ in PRECOMPUTED_COLUMNS]},
+                )
+                self._precomputed = len(results) == len(PRECOMPUTED_COLUMNS)
+                if not self._precomputed:
+                    logger.info("Parcels have no precomputed WGS84 columns - using ST_Transform")
+            except Exception as e:
+                logger.warning(f"WGS84 column check failed: {e}")
+                return False
+        return self._precomputed
+
+    def _reset_precomputed(self) -> None:
+        """Re-check the columns on the next query (e.g. after a re-import)."""
+        self._precomputed = None
+
+    async def _geojson_sql(self, alias: str = "") -> str:
+        """SQL expression for the parcel's WGS84 GeoJSON text."""
+        prefix = f"{alias}." if alias else ""
+        transformed = f"ST_AsGeoJSON(ST_Transform({prefix}geom, {self.WGS84_CRS}), {COORD_PRECISION})"
+        if await self.has_precomputed_wgs84():
+            # Rows not precomputed yet fall back per row (as the parcels_map view)
+            return f"COALESCE({prefix}geojson_4326, {transformed})"
+        return transformed
+
+    async def _twkb_sql(self) -> str:
+        """SQL expression for the parcel's WGS84 TWKB bytes."""
+        transformed = f"ST_AsTWKB(ST_Transform(geom, {self.WGS84_CRS}), {COORD_PRECISION})"
+        if await self.has_precomputed_wgs84():
+            return f"COALESCE(twkb_4326, {transformed})"
+        return transformed
+
     async def search_by_radius(
         self,
         params: SpatialSearchParams
     ) -> List[Dict[str, Any]]:
         """
-        Search parcels within radius of a point.
+        Search parcels within radius of a point, nearest first.
+
+        With params.knn the GiST index returns parcels in distance order and
+        the scan ends after `limit` matches, so latency no longer grows with
+        the number of parcels inside the radius.
 
         Args:
             params: Search parameters
@@ -61,8 +124,17 @@ class SpatialService:
         Returns:
             List of parcel dictionaries
         """
+        center_sql = f"""ST_Transform(
+                    ST_SetSRID(ST_MakePoint(:lon, :lat), {self.WGS84_CRS}),
+                    {self.TARGET_CRS}
+                )"""
+
         # Build WHERE conditions
-        conditions = ["ST_DWithin(p.geom, center_point.geom, :radius)"]
+        if params.knn:
+            # Point inlined (not a joined CTE) so it is a constant for the index scan
+            conditions = [f"ST_DWithin(p.geom, {center_sql}, :radius)"]
+        else:
+            conditions = ["ST_DWithin(p.geom, center_point.geom, :radius)"]
         query_params = {
             "lat": params.lat,
             "lon": params.lon,
@@ -96,14 +168,24 @@ class SpatialService:
         conditions.append("(pog_symbol IS NULL OR pog_symbol NOT IN ('SK', 'SI'))")
 
         where_clause = " AND ".join(conditions)
+        geojson_sql = await self._geojson_sql("p")
+
+        if params.knn:
+            # <-> is the exact geometry distance (index bbox + recheck)
+            with_sql = ""
+            distance_sql = f"p.geom <-> {center_sql}"
+            from_sql = "parcels p"
+            order_sql = distance_sql
+        else:
+            with_sql = f"""WITH center_point AS (
+                SELECT {center_sql} as geom
+            )"""
+            distance_sql = "ST_Distance(p.geom, center_point.geom)"
+            from_sql = "parcels p, center_point"
+            order_sql = "distance_m"
 
         query = f"""
-            WITH center_point AS (
-                SELECT ST_Transform(
-                    ST_SetSRID(ST_MakePoint(:lon, :lat), {self.WGS84_CRS}),
-                    {self.TARGET_CRS}
-                ) as geom
-            )
+            {with_sql}
             SELECT
                 p.id_dzialki,
                 p.gmina,
@@ -117,11 +199,11 @@ class SpatialService:
                 p.accessibility_score,
                 p.centroid_lat,
                 p.centroid_lon,
-                ST_Distance(p.geom, center_point.geom) as distance_m,
-                ST_AsGeoJSON(ST_Transform(p.geom, {self.WGS84_CRS})) as geojson
-            FROM parcels p, center_point
+                {distance_sql} as distance_m,
+                {geojson_sql} as geojson
+            FROM {from_sql}
             WHERE {where_clause}
-            ORDER BY distance_m
+            ORDER BY {order_sql}
             LIMIT :limit
         """
 
@@ -130,6 +212,7 @@ class SpatialService:
             return [dict(row._mapping) for row in results]
         except Exception as e:
             logger.error(f"Spatial search error: {e}")
+            self._reset_precomputed()
             return []
 
     async def search_by_bbox(
@@ -145,12 +228,21 @@ class SpatialService:
         Returns:
             List of parcel dictionaries
         """
+        envelope_sql = f"ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, {self.WGS84_CRS})"
+        transformed_sql = f"ST_Intersects(p.geom, ST_Transform(bbox.geom, {self.TARGET_CRS}))"
+        if await self.has_precomputed_wgs84():
+            # Envelope is already WGS84 - intersect the precomputed geometry,
+            # rows not precomputed yet via geom (both sides use their GIST index)
+            where_sql = (
+                f"(ST_Intersects(p.geom_4326, bbox.geom) "
+                f"OR (p.geom_4326 IS NULL AND {transformed_sql}))"
+            )
+        else:
+            where_sql = transformed_sql
+
         query = f"""
             WITH bbox AS (
-                SELECT ST_Transform(
-                    ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, {self.WGS84_CRS}),
-                    {self.TARGET_CRS}
-                ) as geom
+                SELECT {envelope_sql} as geom
             )
             SELECT
                 p.id_dzialki,
@@ -166,7 +258,7 @@ class SpatialService:
                 p.centroid_lat,
                 p.centroid_lon
             FROM parcels p, bbox
-            WHERE ST_Intersects(p.geom, bbox.geom)
+            WHERE {where_sql}
             LIMIT :limit
         """
 
@@ -183,6 +275,7 @@ class SpatialService:
             return [dict(row._mapping) for row in results]
         except Exception as e:
             logger.error(f"BBox search error: {e}")
+            self._reset_precomputed()
             return []
 
     async def get_parcel_details(
@@ -200,7 +293,7 @@ class SpatialService:
         Returns:
             Parcel details dictionary or None
         """
-        geom_select = f", ST_AsGeoJSON(ST_Transform(geom, {self.WGS84_CRS})) as geometry_wgs84" if include_geometry else ""
+        geom_select = f", {await self._geojson_sql()} as geometry_wgs84" if include_geometry else ""
 
         query = f"""
             SELECT
@@ -269,6 +362,7 @@ class SpatialService:
             return None
         except Exception as e:
             logger.error(f"Get parcel details error: {e}")
+            self._reset_precomputed()
             return None
 
     async def get_parcels_by_ids(
@@ -289,7 +383,7 @@ class SpatialService:
         if not parcel_ids:
             return []
 
-        geom_select = f", ST_AsGeoJSON(ST_Transform(geom, {self.WGS84_CRS})) as geojson" if include_geometry else ""
+        geom_select = f", {await self._geojson_sql()} as geojson" if include_geometry else ""
 
         # Use ANY() for array parameter
         query = f"""
@@ -320,6 +414,7 @@ class SpatialService:
             return [dict(row._mapping) for row in results]
         except Exception as e:
             logger.error(f"Get parcels by IDs error: {e}")
+            self._reset_precomputed()
             return []
 
     async def search_by_criteria(
@@ -518,6 +613,8 @@ class SpatialService:
         if not parcel_ids:
             return None
 
+        geojson_sql = await self._geojson_sql()
+
         query = f"""
             SELECT
                 id_dzialki,
@@ -532,7 +629,7 @@ class SpatialService:
                 pog_symbol as mpzp_symbol,
                 centroid_lat,
                 centroid_lon,
-                ST_AsGeoJSON(ST_Transform(geom, {self.WGS84_CRS}))::json as geometry
+                ({geojson_sql})::json as geometry
             FROM parcels
             WHERE id_dzialki = ANY(:parcel_ids)
         """
@@ -588,6 +685,85 @@ class SpatialService:
 
         except Exception as e:
             logger.error(f"Generate GeoJSON error: {e}")
+            self._reset_precomputed()
+            return None
+
+    async def generate_twkb_frame(
+        self,
+        parcel_ids: List[str],
+        include_geometry: bool = True
+    ) -> Optional[bytes]:
+        """
+        Binary map payload for parcels, assembled entirely in PostGIS.
+
+        Frame layout (integers are big-endian uint32):
+            "MDT1" | header length | header (UTF-8 JSON) | per parcel: TWKB length | TWKB
+
+        The header is {"columns": [...], "rows": [[...], ...], "bounds",
+        "center", "parcel_count"}; geometries follow in the order of rows,
+        a zero length means no geometry. TWKB coordinates are WGS84 with
+        COORD_PRECISION decimal digits, delta-encoded varints.
+
+        Returns:
+            Frame bytes, or None if no parcel was found
+        """
+        if not parcel_ids:
+            return None
+
+        twkb_sql = await self._twkb_sql() if include_geometry else "NULL::bytea"
+        row_sql = ", ".join(
+            {"has_mpzp": "has_pog", "mpzp_symbol": "pog_symbol"}.get(c, c)
+            for c in MAP_PROPERTY_COLUMNS
+        )
+        columns_sql = ", ".join(f"'{c}'" for c in MAP_PROPERTY_COLUMNS)
+
+        query = f"""
+            WITH r AS (
+                SELECT
+                    id_dzialki, centroid_lat, centroid_lon,
+                    json_build_array({row_sql}) AS props,
+                    {twkb_sql} AS twkb
+                FROM parcels
+                WHERE id_dzialki = ANY(:parcel_ids)
+            ),
+            h AS (
+                SELECT
+                    count(*) AS parcel_count,
+                    convert_to(json_build_object(
+                        'columns', json_build_array({columns_sql}),
+                        'rows', COALESCE(json_agg(props ORDER BY id_dzialki), '[]'::json),
+                        'bounds', CASE WHEN count(centroid_lat) > 0 THEN json_build_array(
+                            json_build_array(min(centroid_lat), min(centroid_lon)),
+                            json_build_array(max(centroid_lat), max(centroid_lon))
+                        ) END,
+                        'center', CASE WHEN count(centroid_lat) > 0 THEN json_build_array(
+                            (min(centroid_lat) + max(centroid_lat)) / 2,
+                            (min(centroid_lon) + max(centroid_lon)) / 2
+                        ) END,
+                        'parcel_count', count(*)
+                    )::text, 'UTF8') AS header,
+                    string_agg(
+                        int4send(COALESCE(octet_length(twkb), 0)) || COALESCE(twkb, ''::bytea),
+                        ''::bytea ORDER BY id_dzialki
+                    ) AS body
+                FROM r
+            )
+            SELECT
+                parcel_count,
+                convert_to('{TWKB_FRAME_MAGIC}', 'UTF8')
+                    || int4send(octet_length(header)) || header
+                    || COALESCE(body, ''::bytea) AS frame
+            FROM h
+        """
+
+        try:
+            results = await postgis.execute(query, {"parcel_ids": parcel_ids})
+            if not results or not results[0][0]:
+                return None
+            return bytes(results[0][1])
+        except Exception as e:
+            logger.error(f"Generate TWKB frame error: {e}")
+            self._reset_precomputed()
             return None
 
 
@@ -0,0 +1,218 @@
+"""
+Parcel vector tiles (Mapbox Vector Tile) rendered by PostGIS.
+
+Tiles are cut with ST_AsMVTGeom/ST_AsMVT straight from the parcels table
+(EPSG:2180, GIST index) and carry only the attributes the map needs for
+styling and click-through: id_dzialki, quietness_score, nature_score,
+pog_symbol, area_m2. Geometries are simplified with a zoom-dependent
+tolerance (about half a pixel), so low-zoom tiles stay small.
+
+Rendered tiles are stored gzip-compressed on disk under
+settings.tiles_cache_path/<dataset version>/z/x/y.mvt.gz. A new dataset
+version starts a fresh directory (old ones are pruned in the background),
+and the version is part of the ETag, so clients revalidate for free.
+
+Usage:
+    from app.services.tile_service import tile_service
+
+    tile = await tile_service.get_tile(z, x, y)
+    if tile:
+        tile.data, tile.etag
+"""
+
+import asyncio
+import gzip
+import math
+import os
+import re
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.services.database import postgis
+from app.services.dataset_version import dataset_version
+
+
+LAYER_NAME = "parcels"
+EXTENT = 4096
+BUFFER = 64
+
+# Web Mercator ground resolution at zoom 0 (m/px at the equator, 256 px tiles)
+# scaled to the latitude of Pomerania - tolerance is applied in EPSG:2180 meters
+_RESOLUTION_Z0 = 156543.03392 * math.cos(math.radians(54.3))
+SIMPLIFY_PX = 0.5
+
+TILE_QUERY = f"""
+    WITH bounds AS (
+        SELECT
+            ST_TileEnvelope(:z, :x, :y) AS envelope,
+            ST_Transform(ST_TileEnvelope(:z, :x, :y, margin => {BUFFER / EXTENT}), 2180) AS envelope_2180
+    ),
+    features AS (
+        SELECT
+            p.id_dzialki,
+            round(p.quietness_score::numeric, 1)::float8 AS quietness_score,
+            round(p.nature_score::numeric, 1)::float8 AS nature_score,
+            p.pog_symbol,
+            round(p.area_m2)::int AS area_m2,
+            ST_AsMVTGeom(
+                ST_Transform(
+                    CASE WHEN CAST(:tolerance AS float8) > 0
+                        THEN ST_SimplifyPreserveTopology(p.geom, CAST(:tolerance AS float8))
+                        ELSE p.geom
+                    END,
+                    3857
+                ),
+                b.envelope, {EXTENT}, {BUFFER}, true
+            ) AS geom
+        FROM parcels p, bounds b
+        WHERE p.geom && b.envelope_2180
+    )
+    SELECT ST_AsMVT(features, '{LAYER_NAME}', {EXTENT}, 'geom') AS tile
+    FROM features
+    WHERE geom IS NOT NULL
+"""
+
+
+@dataclass
+class Tile:
+    """A rendered tile: gzip-compressed MVT bytes plus its validator."""
+    data: bytes  # gzip-compressed MVT, b"" for a tile without parcels
+    etag: str
+
+    @property
+    def empty(self) -> bool:
+        return len(self.data) == 0
+
+
+def simplify_tolerance(z: int) -> float:
+    """Simplification tolerance in meters (EPSG:2180) for a zoom level."""
+    if z >= settings.tiles_full_detail_zoom:
+        return 0.0
+    return round(_RESOLUTION_Z0 / (2 ** z) * SIMPLIFY_PX, 3)
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    """True if z/x/y addresses an existing tile in the XYZ scheme."""
+    return 0 <= z <= 30 and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+class TileService:
+    """Render parcel tiles in PostGIS and cache them on disk per dataset version."""
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = Path(root or settings.tiles_cache_path)
+        self._inflight: Dict[Tuple[str, int, int, int], asyncio.Future] = {}
+        self._pruned_version: Optional[str] = None
+        self._stats = {"hits": 0, "renders": 0, "render_ms": 0.0, "bytes": 0}
+
+    def _version_dir(self, version: str) -> Path:
+        return self._root / re.sub(r"[^A-Za-z0-9._-]", "_", version)
+
+    def _tile_path(self, version: str, z: int, x: int, y: int) -> Path:
+        return self._version_dir(version) / str(z) / str(x) / f"{y}.mvt.gz"
+
+    @staticmethod
+    def etag(version: str, z: int, x: int, y: int) -> str:
+        return f'"{version}-{z}-{x}-{y}"'
+
+    @staticmethod
+    def _read(path: Path) -> Optional[bytes]:
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _prune(self, keep: str) -> None:
+        """Remove cached tiles of other dataset versions."""
+        if not self._root.exists():
+            return
+        keep_dir = self._version_dir(keep).name
+        for entry in self._root.iterdir():
+            if entry.is_dir() and entry.name != keep_dir:
+                shutil.rmtree(entry, ignore_errors=True)
+                logger.info(f"Tile cache: removed stale version {entry.name}")
+
+    async def _render(self, z: int, x: int, y: int) -> bytes:
+        """Render one tile in PostGIS; returns gzip-compressed MVT."""
+        if z < settings.tiles_min_zoom:
+            return b""
+        start = time.monotonic()
+        results = await postgis.execute(TILE_QUERY, {
+            "z": z, "x": x, "y": y, "tolerance": simplify_tolerance(z),
+        })
+        raw = bytes(results[0][0]) if results and results[0][0] is not None else b""
+        self._stats["renders"] += 1
+        self._stats["render_ms"] += (time.monotonic() - start) * 1000
+        if not raw:
+            return b""
+        return await asyncio.to_thread(gzip.compress, raw, 6)
+
+    async def _render_and_store(self, version: str, z: int, x: int, y: int) -> bytes:
+        data = await self._render(z, x, y)
+        try:
+            await asyncio.to_thread(self._write, self._tile_path(version, z, x, y), data)
+        except OSError as e:
+            logger.warning(f"Tile cache write failed for {z}/{x}/{y}: {e}")
+        return data
+
+    async def get_tile(self, z: int, x: int, y: int) -> Optional[Tile]:
+        """Get a tile from the disk cache, rendering it on a miss.
+
+        Concurrent requests for the same uncached tile share one render.
+
+        Returns:
+            Tile, or None if rendering failed
+        """
+        try:
+            version = await dataset_version.get()
+            if self._pruned_version != version:
+                self._pruned_version = version
+                asyncio.create_task(asyncio.to_thread(self._prune, version))
+
+            path = self._tile_path(version, z, x, y)
+            data = await asyncio.to_thread(self._read, path)
+            if data is not None:
+                self._stats["hits"] += 1
+            else:
+                key = (version, z, x, y)
+                future = self._inflight.get(key)
+                if future is None:
+                    future = asyncio.ensure_future(self._render_and_store(version, z, x, y))
+                    self._inflight[key] = future
+                    future.add_done_callback(lambda _: self._inflight.pop(key, None))
+                data = await asyncio.shield(future)
+
+            self._stats["bytes"] += len(data)
+            return Tile(data=data, etag=self.etag(version, z, x, y))
+        except Exception as e:
+            logger.error(f"Tile {z}/{x}/{y} error: {e}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Tile cache counters for diagnostics."""
+        renders = self._stats["renders"]
+        return {
+            "version": self._pruned_version,
+            "hits": self._stats["hits"],
+            "renders": renders,
+            "avg_render_ms": round(self._stats["render_ms"] / renders, 1) if renders else None,
+            "bytes_served": self._stats["bytes"],
+            "inflight": len(self._inflight),
+        }
+
+
+# Global instance
+tile_service = TileService()
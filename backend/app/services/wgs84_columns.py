@@ -0,0 +1,18 @@
+"""
+Precomputed WGS84 columns on parcels.
+
+Written by scripts/pipeline/precompute_wgs84.py, read by spatial_service.
+No imports: the pipeline script loads this file directly, without the
+backend's dependencies and config.
+"""
+
+# (column, PostGIS type)
+PRECOMPUTED_COLUMNS = (
+    ("geom_4326", "geometry(Geometry, 4326)"),
+    ("centroid_4326", "geometry(Point, 4326)"),
+    ("geojson_4326", "text"),
+    ("twkb_4326", "bytea"),
+)
+
+# Decimal digits of WGS84 output coordinates (1e-6 deg ~ 0.1 m)
+COORD_PRECISION = 6
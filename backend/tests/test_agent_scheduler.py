@@ -0,0 +1,84 @@
+"""Tests for tool task cleanup in the agent loop."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.engine import agent as agent_module
+from app.engine.agent import Agent
+from app.engine.session import Session
+
+
+class SlowTool:
+    """Tool execution that runs until cancelled."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def execute(self, tool_name, params):
+        self.started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {}, {}
+
+
+def tool_use_stream(tool, error=None):
+    """_stream_api replacement: a tool_use block, then (once the tool
+    runs) a text delta or `error`."""
+    @asynccontextmanager
+    async def stream_api(messages, stable_prefix=0):
+        async def events():
+            block = SimpleNamespace(type="tool_use", name="location_search", input={}, id="t1")
+            yield SimpleNamespace(type="content_block_stop", content_block=block)
+            await tool.started.wait()
+            if error is not None:
+                raise error
+            delta = SimpleNamespace(type="text_delta", text="Szukam...")
+            yield SimpleNamespace(type="content_block_delta", delta=delta)
+        yield events()
+    return stream_api
+
+
+@pytest.fixture
+def slow_tool(monkeypatch):
+    tool = SlowTool()
+    monkeypatch.setattr(agent_module.ToolExecutorV4, "execute", tool.execute)
+    monkeypatch.setattr(agent_module.ToolExecutorV4, "is_read_only", staticmethod(lambda name: True))
+    monkeypatch.setattr(agent_module, "check_gates", lambda name, notepad, params: None)
+    return tool
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(settings, "anthropic_api_key", "test")
+    return Agent()
+
+
+@pytest.mark.asyncio
+async def test_tools_cancelled_on_unexpected_error(agent, slow_tool):
+    agent._stream_api = tool_use_stream(slow_tool, RuntimeError("stream broke"))
+    with pytest.raises(RuntimeError):
+        async for _ in agent.run(Session(session_id="s", user_id="u"), "Szukam działki"):
+            pass
+    await asyncio.sleep(0)
+    assert slow_tool.cancelled
+
+
+@pytest.mark.asyncio
+async def test_tools_cancelled_when_generator_is_closed(agent, slow_tool):
+    agent._stream_api = tool_use_stream(slow_tool)
+    run = agent.run(Session(session_id="s", user_id="u"), "Szukam działki")
+    async for event in run:
+        if event["type"] == "message":
+            # Client gone while the tool is still running
+            break
+    await run.aclose()
+    await asyncio.sleep(0)
+    assert slow_tool.cancelled
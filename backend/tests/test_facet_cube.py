@@ -0,0 +1,67 @@
+"""Tests for the facet cube counts."""
+
+from app.services.facet_cube import FacetCube, FacetQuery
+from app.services.parcel_store import ParcelSnapshot
+
+
+def make_cube(rows) -> FacetCube:
+    rows = [
+        {"id": f"p{i}", "gmina": "Gdańsk", "dzielnica": "Osowa", **row}
+        for i, row in enumerate(rows)
+    ]
+    return FacetCube.from_snapshot(ParcelSnapshot.from_rows("test", rows))
+
+
+def test_location_and_category_counts_are_exact():
+    cube = make_cube([
+        {"kategoria_ciszy": "cicha"},
+        {"kategoria_ciszy": "cicha"},
+        {"kategoria_ciszy": "głośna"},
+    ])
+    answer = cube.count(FacetQuery(gmina="Gdańsk"))
+    assert (answer.count, answer.exact) == (3, True)
+    assert cube.count(FacetQuery(gmina="Sopot")).count == 0
+    assert cube.count(FacetQuery(gmina="Gdańsk", kategoria_ciszy=["cicha"])).count == 2
+    assert cube.distribution(FacetQuery(gmina="Gdańsk"), "kategoria_ciszy") == {"cicha": 2, "głośna": 1}
+
+
+def test_upper_bound_on_bin_edge_includes_threshold():
+    # 500 m is a bin edge: "<= 500" must count the parcel at exactly 500 m
+    cube = make_cube([
+        {"dist_to_forest": 500.0},
+        {"dist_to_forest": 120.0},
+        {"dist_to_forest": 900.0},
+    ])
+    answer = cube.count(FacetQuery(gmina="Gdańsk", max_dist={"dist_to_forest": 500}))
+    assert (answer.count, answer.exact) == (2, True)
+
+    answer = cube.count(FacetQuery(gmina="Gdańsk", max_dist={"dist_to_forest": 100}))
+    assert (answer.count, answer.exact) == (0, True)
+
+
+def test_interpolated_estimate_is_never_zero():
+    # 40 m falls inside the first bin (0, 100]: the share rounds to 0
+    cube = make_cube([{"dist_to_forest": 90.0}] + [{"dist_to_forest": 5000.0}] * 9)
+    answer = cube.count(FacetQuery(gmina="Gdańsk", max_dist={"dist_to_forest": 40}))
+    assert answer.exact is False
+    assert answer.count >= 1
+
+
+def test_lower_bound_is_approximate():
+    cube = make_cube([{"area_m2": 1000.0}, {"area_m2": 1500.0}, {"area_m2": 700.0}])
+    answer = cube.count(FacetQuery(gmina="Gdańsk", min_area=1000, max_area=2000))
+    assert answer.exact is False
+    assert answer.count >= 1
+
+    answer = cube.count(FacetQuery(gmina="Gdańsk", max_area=1000))
+    assert (answer.count, answer.exact) == (2, True)
+
+
+def test_blocking_filters_counts_without_each_filter():
+    cube = make_cube([
+        {"kategoria_ciszy": "głośna", "area_m2": 800.0},
+        {"kategoria_ciszy": "cicha", "area_m2": 3000.0},
+    ])
+    query = FacetQuery(gmina="Gdańsk", kategoria_ciszy=["cicha"], max_area=1000)
+    assert cube.count(query).count == 0
+    assert cube.blocking_filters(query) == {"kategoria_ciszy": 1, "area": 1}
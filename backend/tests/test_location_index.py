@@ -0,0 +1,83 @@
+"""Tests for the in-memory location name index."""
+
+from app.services.location_index import LocationIndex, build_entries
+
+
+HIERARCHY = [
+    {"wojewodztwo": "pomorskie", "powiat": "Gdańsk", "gmina": "Gdańsk",
+     "dzielnica": "Osowa", "parcel_count": 500},
+    {"wojewodztwo": "pomorskie", "powiat": "Gdańsk", "gmina": "Gdańsk",
+     "dzielnica": "Matarnia", "parcel_count": 300},
+    {"wojewodztwo": "pomorskie", "powiat": "Gdańsk", "gmina": "Gdańsk",
+     "dzielnica": "Oliwa", "parcel_count": 400},
+    {"wojewodztwo": "pomorskie", "powiat": "Sopot", "gmina": "Sopot",
+     "dzielnica": "Karlikowo", "parcel_count": 100},
+    {"wojewodztwo": "pomorskie", "powiat": "Gdynia", "gmina": "Gdynia",
+     "dzielnica": "Orłowo", "parcel_count": 200},
+]
+DISTRICTS = [
+    {"name": "Osowa", "city": "Gdańsk"},
+    {"name": "Matarnia", "city": "Gdańsk"},
+    {"name": "Oliwa", "city": "Gdańsk"},
+    {"name": "Karlikowo", "city": "Sopot"},
+    {"name": "Orłowo", "city": "Gdynia"},
+]
+
+
+def make_index() -> LocationIndex:
+    return LocationIndex("test", build_entries(HIERARCHY, DISTRICTS, []))
+
+
+def resolved(text: str):
+    match = make_index().resolve(text)
+    assert match is not None, text
+    return match.entry.level, match.entry.name
+
+
+def test_exact_and_folded_names():
+    assert resolved("Osowa") == ("dzielnica", "Osowa")
+    assert resolved("gdansk") == ("gmina", "Gdańsk")
+    assert resolved("ORŁOWO") == ("dzielnica", "Orłowo")
+
+
+def test_inflected_names():
+    assert resolved("Osowej") == ("dzielnica", "Osowa")
+    assert resolved("okolice Osowej") == ("dzielnica", "Osowa")
+    assert resolved("w Sopocie") == ("gmina", "Sopot")
+    assert resolved("Gdańska") == ("gmina", "Gdańsk")
+
+
+def test_district_with_city():
+    assert resolved("Osowa Gdańsk") == ("dzielnica", "Osowa")
+    assert resolved("Osowej w Gdańsku") == ("dzielnica", "Osowa")
+    assert resolved("Gdańsk Osowa") == ("dzielnica", "Osowa")
+    match = make_index().resolve("Osowa Gdańsk")
+    assert match.match == "split"
+    assert match.entry.gmina == "Gdańsk"
+
+
+def test_district_with_other_city_is_not_split():
+    # Orłowo belongs to Gdynia, not Sopot
+    match = make_index().resolve("Orłowo Sopot")
+    assert match is None or match.match != "split"
+
+
+def test_fuzzy_typo():
+    assert resolved("matarina") == ("dzielnica", "Matarnia")
+
+
+def test_unknown_name_is_a_miss():
+    # Callers fall back to Neo4j on None / empty rows
+    index = make_index()
+    assert index.resolve("Zakopane") is None
+    assert index.search("Zakopane") == []
+
+
+def test_search_rows():
+    index = make_index()
+    rows = index.search("Osowej")
+    assert rows[0]["dzielnica"] == "Osowa"
+    assert rows[0]["gmina"] == "Gdańsk"
+    assert rows[0]["match"] == "declension"
+    assert index.search("Osowa Gdańsk")[0]["dzielnica"] == "Osowa"
+    assert index.search("Oliwa", parent="Sopot") == []
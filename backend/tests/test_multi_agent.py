@@ -0,0 +1,94 @@
+"""Tests for multi-agent routing and DAG execution."""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.engine.property_advisor_agent import PropertyAdvisorAgent
+from app.engine.sub_agents import AgentRouter, AgentType, SubAgentResult
+from app.memory import AgentState
+
+
+class FakeSpawner:
+    """Sub-agents that wait until `together` of them are running at once."""
+
+    def __init__(self, together: int = 1):
+        self.together = together
+        self.running = 0
+        self.peak = 0
+        self.order = []
+        self._changed = asyncio.Condition()
+
+    async def spawn(self, agent_type, state, task_context, user_message, results=None):
+        async with self._changed:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            self.order.append(agent_type)
+            self._changed.notify_all()
+            if agent_type in (AgentType.ANALYST, AgentType.NARRATOR):
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self.peak >= self.together), timeout=1,
+                )
+        yield {"type": "thinking", "data": {"message": agent_type.value}}
+        async with self._changed:
+            self.running -= 1
+        results[agent_type] = SubAgentResult(agent_type=agent_type, response=f"{agent_type.value} done")
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(settings, "anthropic_api_key", "test")
+    return PropertyAdvisorAgent()
+
+
+def state() -> AgentState:
+    return AgentState(session_id="s", user_id="u")
+
+
+async def run(agent, message):
+    return [event async for event in agent._execute_multi_agent(message, state())]
+
+
+def test_route_analysis_and_narration_together():
+    agents = AgentRouter.route(state(), "porównaj te działki i opisz okolicę")
+    assert agents == [AgentType.ANALYST, AgentType.NARRATOR]
+    assert AgentRouter.dependencies(agents) == {AgentType.ANALYST: [], AgentType.NARRATOR: []}
+
+    agents = AgentRouter.route(state(), "znajdź działki w Osowej, porównaj je i opisz okolicę")
+    assert agents == [AgentType.DISCOVERY, AgentType.SEARCH, AgentType.ANALYST, AgentType.NARRATOR]
+    deps = AgentRouter.dependencies(agents)
+    assert deps[AgentType.ANALYST] == deps[AgentType.NARRATOR] == [AgentType.SEARCH]
+
+    assert AgentRouter.route(state(), "porównaj te działki") == [AgentType.ANALYST]
+
+
+@pytest.mark.asyncio
+async def test_independent_agents_run_concurrently(agent):
+    agent._sub_agent_spawner = spawner = FakeSpawner(together=2)
+    events = await run(agent, "porównaj te działki i opisz okolicę")
+
+    assert spawner.peak == 2
+    assert not [e for e in events if e["type"] == "error"]
+    text = "".join(e["data"]["content"] for e in events if e["type"] == "message")
+    assert text == "analyst done\n\nnarrator done"
+    assert agent._last_response == text
+
+
+@pytest.mark.asyncio
+async def test_more_agents_are_synthesized_after_dependencies(agent, monkeypatch):
+    agent._sub_agent_spawner = spawner = FakeSpawner(together=2)
+    synthesized = []
+
+    async def synthesize(responses, state):
+        synthesized.extend(r["agent"] for r in responses)
+        yield "synthesis"
+
+    monkeypatch.setattr(agent, "_synthesize_responses", synthesize)
+    events = await run(agent, "znajdź działki w Osowej, porównaj je i opisz okolicę")
+
+    assert spawner.order[:2] == [AgentType.DISCOVERY, AgentType.SEARCH]
+    assert spawner.peak == 2
+    assert synthesized == ["discovery", "search", "analyst", "narrator"]
+    assert agent._last_response == "synthesis"
+    assert events[-1]["type"] == "multi_agent_complete"
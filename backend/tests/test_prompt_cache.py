@@ -0,0 +1,61 @@
+"""Tests for the cache breakpoints of Claude API requests."""
+
+import copy
+
+from app.engine.prompt_cache import CACHE_CONTROL, build_request
+
+
+TOOLS = [{"name": "search_execute"}, {"name": "results_load_page"}]
+
+
+def marked(request):
+    return [
+        i for i, message in enumerate(request["messages"])
+        if isinstance(message["content"], list) and "cache_control" in message["content"][-1]
+    ]
+
+
+def conversation(n):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+        for i in range(n)
+    ]
+
+
+def test_tools_and_system_get_breakpoints():
+    request = build_request("model", 1024, "system prompt", TOOLS, conversation(1))
+    assert request["system"] == [{"type": "text", "text": "system prompt", "cache_control": CACHE_CONTROL}]
+    assert request["tools"][-1] == {"name": "results_load_page", "cache_control": CACHE_CONTROL}
+    assert "cache_control" not in request["tools"][0]
+    assert marked(request) == []
+
+
+def test_no_tools_key_without_tools():
+    assert "tools" not in build_request("model", 1024, "system", [], conversation(1))
+
+
+def test_history_breakpoint_before_current_user_message():
+    # 4 history messages + the current user message
+    request = build_request("model", 1024, "system", TOOLS, conversation(5), stable_prefix=4)
+    assert marked(request) == [3]
+    assert request["messages"][3]["content"] == [
+        {"type": "text", "text": "message 3", "cache_control": CACHE_CONTROL},
+    ]
+
+
+def test_tool_rounds_get_a_second_message_breakpoint():
+    messages = conversation(5) + [
+        {"role": "assistant", "content": [{"type": "tool_use", "id": "t1", "name": "search_execute", "input": {}}]},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "t1", "content": "{}"}]},
+    ]
+    request = build_request("model", 1024, "system", TOOLS, messages, stable_prefix=4)
+    assert marked(request) == [3, 6]
+    assert request["messages"][6]["content"][0]["tool_use_id"] == "t1"
+
+
+def test_inputs_are_not_modified():
+    messages = conversation(5)
+    tools = copy.deepcopy(TOOLS)
+    before = (copy.deepcopy(messages), copy.deepcopy(tools))
+    build_request("model", 1024, "system", tools, messages, stable_prefix=4)
+    assert (messages, tools) == before
@@ -0,0 +1,72 @@
+"""Tests for array-based rank fusion."""
+
+import pytest
+
+from app.services.rank_fusion import (
+    SourceRanking,
+    fuse_rankings,
+    hard_filter_mask,
+    membership_mask,
+)
+
+
+def rows(*ids, **columns):
+    return [
+        {"id_dzialki": pid, "_rank": rank, **{k: v[rank - 1] for k, v in columns.items()}}
+        for rank, pid in enumerate(ids, start=1)
+    ]
+
+
+def ranked(fused):
+    return [fused.ids[i] for i in fused.page(len(fused.ids))]
+
+
+def test_rrf_scores_with_multi_source_bonus():
+    fused = fuse_rankings([
+        SourceRanking("graph", rows("a", "b", "c"), 1.0),
+        SourceRanking("spatial", rows("b", "a"), 1.0),
+        SourceRanking("semantic", rows("b"), 1.0),
+    ], k=60)
+
+    scores = dict(zip(fused.ids, fused.scores))
+    assert scores["a"] == pytest.approx((1 / 61 + 1 / 62) * 1.1)
+    assert scores["b"] == pytest.approx((1 / 62 + 1 / 61 + 1 / 61) * 1.3)
+    assert scores["c"] == pytest.approx(1 / 63)
+    assert ranked(fused) == ["b", "a", "c"]
+    assert fused.source_names(fused.ids.index("b")) == ["graph", "spatial", "semantic"]
+    assert fused.rows_for(fused.ids.index("c"))["spatial"] is None
+
+
+def test_single_source_uses_native_scores():
+    fused = fuse_rankings([
+        SourceRanking("graph", rows("a", "b"), 1.0, native_scores=[0.2, 0.9]),
+        SourceRanking("spatial", [], 1.0),
+    ])
+    assert ranked(fused) == ["b", "a"]
+    assert list(fused.scores) == [0.2, 0.9]
+
+
+def test_ties_keep_first_appearance_order():
+    fused = fuse_rankings([
+        SourceRanking("graph", rows("a"), 1.0),
+        SourceRanking("spatial", rows("b"), 1.0),
+    ])
+    assert ranked(fused) == ["a", "b"]
+
+
+def test_hard_filter_mask_lets_unknown_values_through():
+    fused = fuse_rankings([
+        SourceRanking("graph", rows("a", "b", "c", "d",
+                                   area_m2=[500.0, 1200.0, None, 1500.0],
+                                   aspect_ratio=[1.0, 1.5, 2.0, 9.0]), 1.0),
+    ])
+    removed = fused.apply_mask(hard_filter_mask(fused, min_area=800))
+    assert removed == 2
+    assert ranked(fused) == ["b", "c"]
+
+
+def test_membership_mask():
+    fused = fuse_rankings([SourceRanking("graph", rows("a", "b", "c"), 1.0)])
+    fused.apply_mask(membership_mask(fused, {"a", "c", "x"}))
+    assert ranked(fused) == ["a", "c"]
+    assert len(fused) == 2 and fused.total_candidates == 3
@@ -0,0 +1,77 @@
+"""Tests for the tool result projection."""
+
+import json
+
+from app.engine.result_projector import TOP_N, ResultProjector, compact, table
+
+
+def parcels(n):
+    return [
+        {
+            "id": f"2261_1.0001.{i}",
+            "gmina": "Gdańsk",
+            "dzielnica": "Osowa",
+            "area_m2": 1000.4 + i,
+            "quietness_score": 81.26,
+            "dist_to_forest": 120.6,
+            "geometry": {"type": "Polygon", "coordinates": []},
+            "mpzp_symbol": None,
+        }
+        for i in range(n)
+    ]
+
+
+def test_compact_drops_empty_values_and_rounds():
+    assert compact({
+        "area_m2": 1234.56,
+        "dist_to_school": 87.4,
+        "lat": 54.4171234,
+        "score": 0.1234,
+        "notes": "",
+        "tags": [],
+        "geojson": {"type": "Point"},
+        "flag": False,
+    }) == {"area_m2": 1235, "dist_to_school": 87, "lat": 54.41712, "score": 0.12, "flag": False}
+
+
+def test_table_factors_out_common_columns():
+    out = table(parcels(3))
+    assert out["common"] == {"gmina": "Gdańsk", "dzielnica": "Osowa",
+                             "quietness_score": 81.3, "dist_to_forest": 121}
+    assert out["columns"] == ["id", "area_m2"]
+    assert out["rows"][0] == ["2261_1.0001.0", 1000]
+    assert "omitted" not in out
+
+    out = table(parcels(TOP_N + 5))
+    assert len(out["rows"]) == TOP_N
+    assert out["omitted"] == 5
+
+
+def test_project_search_result_uses_parcel_table():
+    projector = ResultProjector()
+    text = projector.project("search_execute", {"count": 3, "parcels": parcels(3)})
+    result = json.loads(text)
+    assert result["count"] == 3
+    assert result["parcels"]["columns"] == ["id", "area_m2"]
+    assert "geometry" not in text
+
+
+def test_project_stays_valid_json_within_max_chars():
+    projector = ResultProjector()
+    result = {"count": 500, "parcels": parcels(500), "note": "x" * 50}
+    for max_chars in (300, 1000, 4000):
+        text = projector.project("search_execute", result, max_chars=max_chars)
+        assert len(text) <= max_chars
+        projected = json.loads(text)
+        table_ = projected["parcels"]
+        assert len(table_["rows"]) + table_["omitted"] == 500
+
+    stats = projector.stats()
+    assert stats["results"] == 3
+    assert stats["projected_chars"] <= stats["raw_chars"]
+
+
+def test_project_without_record_leaves_stats_unchanged():
+    projector = ResultProjector()
+    projector.project("unknown_tool", {"a": 1.23456}, record=False)
+    assert projector.stats()["results"] == 0
@@ -0,0 +1,129 @@
+"""Tests for the search result cache keys and tiers."""
+
+import pytest
+
+from app.services import search_cache as module
+from app.services.parcel_search import SearchPreferences
+from app.services.search_cache import CachedSearch, SearchResultCache, canonical_preferences
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.expire = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, expire=3600):
+        self.data[key] = value
+        self.expire[key] = expire
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(module, "redis_cache", fake)
+    return fake
+
+
+@pytest.fixture
+def version(monkeypatch):
+    current = {"value": "v1"}
+
+    async def get():
+        return current["value"]
+
+    monkeypatch.setattr(module.dataset_version, "get", get)
+    return current
+
+
+def entry(*ids) -> CachedSearch:
+    return CachedSearch(
+        ids=list(ids),
+        scores=[1.0] * len(ids),
+        sources=[["graph"]] * len(ids),
+        distance_m=[None] * len(ids),
+        similarity=[None] * len(ids),
+    )
+
+
+def test_canonical_preferences_ignore_order_whitespace_and_empty_values():
+    a = SearchPreferences(gmina=" Gdańsk ", quietness_categories=["cicha", "bardzo_cicha"])
+    b = SearchPreferences(gmina="Gdańsk", quietness_categories=["bardzo_cicha", "cicha"],
+                          nature_categories=[], w_quietness=0.0)
+    assert canonical_preferences(a) == canonical_preferences(b)
+    assert "nature_categories" not in canonical_preferences(b)
+    assert "w_quietness" not in canonical_preferences(b)
+
+
+def test_canonical_preferences_round_coordinates():
+    a = SearchPreferences(lat=54.4171231, lon=18.4561119)
+    b = SearchPreferences(lat=54.4171229, lon=18.4561121)
+    assert canonical_preferences(a) == canonical_preferences(b)
+    assert canonical_preferences(a) != canonical_preferences(SearchPreferences(lat=54.4172, lon=18.4561))
+
+
+def test_canonical_preferences_treat_whole_floats_as_ints():
+    a = SearchPreferences(min_area=1000, max_dist_to_forest_m=500, w_nature=0)
+    b = SearchPreferences(min_area=1000.0, max_dist_to_forest_m=500.0, w_nature=0.0)
+    assert canonical_preferences(a) == canonical_preferences(b) == {
+        **canonical_preferences(SearchPreferences()), "min_area": 1000, "max_dist_to_forest_m": 500,
+    }
+    assert canonical_preferences(SearchPreferences(has_road_access=True))["has_road_access"] is True
+
+
+@pytest.mark.asyncio
+async def test_key_depends_on_limit_and_dataset_version(redis, version):
+    cache = SearchResultCache()
+    prefs = SearchPreferences(gmina="Gdańsk")
+    key = await cache.make_key(prefs, 20)
+    assert key == await cache.make_key(SearchPreferences(gmina="Gdańsk "), 20)
+    assert await cache.make_key(SearchPreferences(min_area=1000), 20) == \
+        await cache.make_key(SearchPreferences(min_area=1000.0), 20)
+    assert key != await cache.make_key(prefs, 50)
+
+    version["value"] = "v2"
+    assert key != await cache.make_key(prefs, 20)
+
+
+@pytest.mark.asyncio
+async def test_version_change_clears_memory_tier(redis, version):
+    cache = SearchResultCache()
+    key = await cache.make_key(SearchPreferences(gmina="Gdańsk"), 20)
+    await cache.put(key, entry("a"))
+    assert cache.stats()["entries"] == 1
+
+    version["value"] = "v2"
+    await cache.make_key(SearchPreferences(gmina="Gdańsk"), 20)
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_put_sets_ttl_and_redis_hit_is_promoted(redis, version):
+    cache = SearchResultCache(ttl_s=120)
+    key = await cache.make_key(SearchPreferences(gmina="Gdańsk"), 20)
+    await cache.put(key, entry("a", "b"))
+    assert redis.expire[key] == 120
+
+    # Another worker: empty memory tier, same Redis
+    other = SearchResultCache(ttl_s=120)
+    assert (await other.get(key)).ids == ["a", "b"]
+    assert other.stats()["redis"]["hits"] == 1
+    assert (await other.get(key)).ids == ["a", "b"]
+    assert other.stats()["memory"]["hits"] == 1
+    assert await other.get("search:v1:v1:missing") is None
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_evicts_least_recently_used(redis, version):
+    cache = SearchResultCache(max_entries=2)
+    for key in ("k1", "k2"):
+        await cache.put(key, entry(key))
+    await cache.get("k1")
+    await cache.put("k3", entry("k3"))
+    redis.data.clear()
+
+    assert await cache.get("k1") is not None
+    assert await cache.get("k2") is None
+    assert await cache.get("k3") is not None
@@ -0,0 +1,78 @@
+"""Tests for speculative progressive relaxation."""
+
+import asyncio
+
+import pytest
+
+from app.services.parcel_search import HybridSearchService
+
+
+class Ladder:
+    """Strategies that sleep and return a fixed number of results."""
+
+    def __init__(self, *specs):
+        self.running = 0
+        self.peak = 0
+        self.started = []
+        self.strategies = [self._strategy(*spec) for spec in specs]
+
+    def _strategy(self, name, delay, count, min_results):
+        async def run():
+            self.started.append(name)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.running -= 1
+            return [name] * count
+        return name, run, min_results
+
+
+@pytest.fixture
+def service():
+    service = HybridSearchService()
+    service.SPECULATIVE_BUDGET_S = 0.5
+    return service
+
+
+@pytest.mark.asyncio
+async def test_next_strategy_runs_alongside_a_short_one(service):
+    ladder = Ladder(("full", 0.1, 2, 5), ("relaxed", 0.1, 5, 5), ("minimal", 0.1, 5, 1))
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    name, results = await service._run_speculative(ladder.strategies)
+
+    assert name == "relaxed" and len(results) == 5
+    # Not the 0.2 s of running full and relaxed one after another
+    assert loop.time() - start < 0.18
+    assert ladder.started == ["full", "relaxed"]
+
+
+@pytest.mark.asyncio
+async def test_priority_order_and_bounded_window(service):
+    ladder = Ladder(("full", 0.1, 5, 5), ("relaxed", 0.01, 5, 5),
+                    ("minimal", 0.01, 5, 1), ("semantic", 0.01, 5, 1))
+    name, _ = await service._run_speculative(ladder.strategies)
+
+    assert name == "full"
+    assert ladder.peak <= service.SPECULATIVE_IN_FLIGHT
+    # Nothing below the finished acceptable "relaxed" is started
+    assert ladder.started == ["full", "relaxed"]
+
+
+@pytest.mark.asyncio
+async def test_lower_strategy_taken_once_budget_is_spent(service):
+    service.SPECULATIVE_BUDGET_S = 0.05
+    ladder = Ladder(("full", 5, 5, 5), ("relaxed", 0.01, 5, 5))
+    name, _ = await service._run_speculative(ladder.strategies)
+    assert name == "relaxed"
+
+
+@pytest.mark.asyncio
+async def test_whole_ladder_below_threshold(service):
+    ladder = Ladder(("full", 0.01, 0, 5), ("relaxed", 0.01, 1, 5),
+                    ("minimal", 0.01, 0, 1), ("semantic", 0.01, 0, 1))
+    assert await service._run_speculative(ladder.strategies) == (None, [])
+    assert ladder.peak <= service.SPECULATIVE_IN_FLIGHT
+    assert ladder.started == ["full", "relaxed", "minimal", "semantic"]
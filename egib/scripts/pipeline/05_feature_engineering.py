@@ -9,12 +9,19 @@ Enriches parcel data with:
 4. Quality scores (quietness, nature, accessibility)
 """
 
+import argparse
+import hashlib
 import logging
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 import geopandas as gpd
 import numpy as np
 import pandas as pd
+import shapely
 from scipy.spatial import cKDTree
 from shapely.geometry import Point
 
@@ -206,21 +213,70 @@ def compute_distances(parcels: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
     return parcels
 
 
-def compute_buffer_stats(parcels: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+# Buffer statistics: parcels are sharded into square tiles (by centroid),
+# processed in parallel, and each finished tile is checkpointed, so an
+# interrupted run resumes where it stopped
+BUFFER_RADIUS_M = 500
+BUFFER_TILE_M = 5000
+BUFFER_LAYERS = {
+    "forest": "lasy.gpkg",
+    "water": "wody.gpkg",
+    "buildings": "budynki.gpkg",
+}
+
+# Set in each worker by _init_buffer_worker: layer -> (geometries, STRtree)
+_buffer_layers = {}
+
+
+def _init_buffer_worker(layers: dict) -> None:
+    """Build the STRtrees once per worker process."""
+    global _buffer_layers
+    _buffer_layers = {name: (geoms, shapely.STRtree(geoms)) for name, geoms in layers.items()}
+
+
+def _tile_buffer_stats(tile: tuple, centroids: np.ndarray) -> tuple:
+    """Forest / water % and building count within BUFFER_RADIUS_M for one tile's parcels."""
+    buffers = shapely.buffer(shapely.points(centroids), BUFFER_RADIUS_M)
+    n = len(buffers)
+    buffer_area = np.pi * BUFFER_RADIUS_M ** 2
+
+    result = {}
+    for name in ("forest", "water"):
+        geoms, tree = _buffer_layers[name]
+        # pairs[0] = buffer index, pairs[1] = layer geometry index
+        pairs = tree.query(buffers, predicate="intersects")
+        area = shapely.area(shapely.intersection(geoms[pairs[1]], buffers[pairs[0]]))
+        result[name] = np.bincount(pairs[0], weights=area, minlength=n) / buffer_area * 100
+
+    _, tree = _buffer_layers["buildings"]
+    pairs = tree.query(buffers, predicate="intersects")
+    result["buildings"] = np.bincount(pairs[0], minlength=n)
+
+    return tile, result["forest"], result["water"], result["buildings"]
+
+
+def compute_buffer_stats(parcels: gpd.GeoDataFrame, workers: int = None) -> gpd.GeoDataFrame:
     """
     Compute statistics within 500m buffer of each parcel.
     - % forest coverage
     - % water coverage
     - count of buildings
+
+    Buffers are intersected with the layers in bulk (STRtree.query over all
+    buffers of a tile + shapely array ops), tiles run on all cores, and
+    finished tiles are kept in data/processed/checkpoints/ until the run
+    completes.
     """
-    logger.info("Computing buffer statistics (500m)...")
-    logger.info("  This may take a while...")
+    logger.info(f"Computing buffer statistics ({BUFFER_RADIUS_M}m)...")
 
     # Load BDOT10k layers
     try:
-        forests = gpd.read_file(BDOT_PATH / "lasy.gpkg")
-        water = gpd.read_file(BDOT_PATH / "wody.gpkg")
-        buildings = gpd.read_file(BDOT_PATH / "budynki.gpkg")
+        layers = {}
+        for name, filename in BUFFER_LAYERS.items():
+            layer = gpd.read_file(BDOT_PATH / filename)
+            if parcels.crs is not None and layer.crs != parcels.crs:
+                layer = layer.to_crs(parcels.crs)
+            layers[name] = layer.geometry[layer.geometry.notna()].to_numpy()
     except Exception as e:
         logger.error(f"  Error loading BDOT10k: {e}")
         parcels['pct_forest_500m'] = np.nan
@@ -228,51 +284,61 @@ def compute_buffer_stats(parcels: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         parcels['count_buildings_500m'] = np.nan
         return parcels
 
-    # Create spatial indexes
-    forests_sindex = forests.sindex
-    water_sindex = water.sindex
-    buildings_sindex = buildings.sindex
+    centroids = shapely.get_coordinates(shapely.centroid(parcels.geometry.values))
+    tile_keys = np.floor(centroids / BUFFER_TILE_M).astype(np.int64)
+    tiles = {}
+    for i, key in enumerate(map(tuple, tile_keys)):
+        tiles.setdefault(key, []).append(i)
+    tiles = {key: np.array(idx) for key, idx in tiles.items()}
 
-    # Buffer area
-    buffer_radius = 500
-    buffer_area = np.pi * buffer_radius ** 2
+    # Checkpoints are tied to the exact parcel set (centroid fingerprint)
+    fingerprint = hashlib.sha1(centroids.round(2).tobytes()).hexdigest()[:12]
+    checkpoint_dir = DATA_PATH / "checkpoints" / f"buffer_stats_{BUFFER_RADIUS_M}m_{fingerprint}"
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
 
-    # Process in chunks to avoid memory issues
-    chunk_size = 10000
-    n_chunks = (len(parcels) + chunk_size - 1) // chunk_size
+    def checkpoint_path(tile):
+        return checkpoint_dir / f"{tile[0]}_{tile[1]}.npz"
 
     pct_forest = np.zeros(len(parcels))
     pct_water = np.zeros(len(parcels))
     count_buildings = np.zeros(len(parcels), dtype=int)
 
-    for chunk_idx in range(n_chunks):
-        start_idx = chunk_idx * chunk_size
-        end_idx = min((chunk_idx + 1) * chunk_size, len(parcels))
-
-        if chunk_idx % 5 == 0:
-            logger.info(f"  Processing chunk {chunk_idx+1}/{n_chunks} ({start_idx:,}-{end_idx:,})...")
-
-        for i in range(start_idx, end_idx):
-            parcel_centroid = parcels.iloc[i].geometry.centroid
-            buffer = parcel_centroid.buffer(buffer_radius)
-
-            # Forest intersection
-            possible_forests = list(forests_sindex.intersection(buffer.bounds))
-            if possible_forests:
-                forest_intersection = forests.iloc[possible_forests].intersection(buffer)
-                pct_forest[i] = forest_intersection.area.sum() / buffer_area * 100
-
-            # Water intersection
-            possible_water = list(water_sindex.intersection(buffer.bounds))
-            if possible_water:
-                water_intersection = water.iloc[possible_water].intersection(buffer)
-                pct_water[i] = water_intersection.area.sum() / buffer_area * 100
-
-            # Buildings count
-            possible_buildings = list(buildings_sindex.intersection(buffer.bounds))
-            if possible_buildings:
-                buildings_in_buffer = buildings.iloc[possible_buildings]
-                count_buildings[i] = sum(buildings_in_buffer.intersects(buffer))
+    def store(tile, forest, water, n_buildings):
+        idx = tiles[tile]
+        pct_forest[idx] = forest
+        pct_water[idx] = water
+        count_buildings[idx] = n_buildings
+
+    pending = []
+    for tile in tiles:
+        path = checkpoint_path(tile)
+        if path.exists():
+            with np.load(path) as saved:
+                store(tile, saved["forest"], saved["water"], saved["buildings"])
+        else:
+            pending.append(tile)
+
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"  {len(parcels):,} parcels in {len(tiles)} tiles of {BUFFER_TILE_M / 1000:.0f} km, "
+                f"{len(tiles) - len(pending)} resumed from {checkpoint_dir.name}, "
+                f"{workers} workers")
+
+    start_time = time.time()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_buffer_worker, initargs=(layers,)
+    ) as executor:
+        futures = [
+            executor.submit(_tile_buffer_stats, tile, centroids[tiles[tile]])
+            for tile in pending
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            tile, forest, water, n_buildings = future.result()
+            np.savez(checkpoint_path(tile), forest=forest, water=water, buildings=n_buildings)
+            store(tile, forest, water, n_buildings)
+            if done % 10 == 0 or done == len(futures):
+                logger.info(f"  {done}/{len(futures)} tiles ({time.time() - start_time:.0f}s)")
+
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
 
     parcels['pct_forest_500m'] = pct_forest.round(1)
     parcels['pct_water_500m'] = pct_water.round(1)
@@ -285,6 +351,38 @@ def compute_buffer_stats(parcels: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
     return parcels
 
 
+def compute_buffer_stats_raster(parcels: gpd.GeoDataFrame, radii=(BUFFER_RADIUS_M,)) -> gpd.GeoDataFrame:
+    """
+    Buffer statistics from land-cover rasters (landcover_raster.py).
+
+    Fast approximation of compute_buffer_stats (cell-center coverage on a
+    10 m grid, buildings counted by centroid). Adds pct_forest_{r}m,
+    pct_water_{r}m and count_buildings_{r}m for every radius in `radii`
+    (500m is always included).
+    """
+    from landcover_raster import buffer_features, load_or_build
+
+    # The 500m columns feed compute_quality_scores - always computed
+    radii = sorted(set(radii) | {BUFFER_RADIUS_M})
+    logger.info(f"Computing buffer statistics from rasters ({', '.join(f'{r}m' for r in radii)})...")
+    try:
+        grid, layers = load_or_build(parcels.total_bounds, crs=parcels.crs)
+    except Exception as e:
+        logger.error(f"  Error building land-cover rasters: {e}")
+        for radius in radii:
+            parcels[f'pct_forest_{radius}m'] = np.nan
+            parcels[f'pct_water_{radius}m'] = np.nan
+            parcels[f'count_buildings_{radius}m'] = np.nan
+        return parcels
+
+    centroids = shapely.get_coordinates(shapely.centroid(parcels.geometry.values))
+    for column, values in buffer_features(grid, layers, centroids, radii).items():
+        parcels[column] = values
+        logger.info(f"  {column}: median={np.median(values):.1f}")
+
+    return parcels
+
+
 def compute_quality_scores(parcels: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
     """
     Compute composite quality scores (0-100).
@@ -446,6 +544,15 @@ def add_binned_categories(parcels: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Feature engineering for parcels")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes for buffer statistics (default: all cores)")
+    parser.add_argument("--buffer-engine", choices=["vector", "raster"], default="vector",
+                        help="Buffer statistics: exact polygon overlay or land-cover rasters")
+    parser.add_argument("--buffer-radii", type=int, nargs="+", default=[BUFFER_RADIUS_M],
+                        help="Buffer radii in meters (raster engine only)")
+    args = parser.parse_args()
+
     # Load data
     parcels = load_parcels()
     pog = load_pog()
@@ -453,7 +560,10 @@ def main():
     # Feature engineering steps
     parcels = spatial_join_pog(parcels, pog)
     parcels = compute_distances(parcels)
-    parcels = compute_buffer_stats(parcels)
+    if args.buffer_engine == "raster":
+        parcels = compute_buffer_stats_raster(parcels, radii=args.buffer_radii)
+    else:
+        parcels = compute_buffer_stats(parcels, workers=args.workers)
     parcels = compute_quality_scores(parcels)
     parcels = add_buildability_flags(parcels)
     parcels = add_binned_categories(parcels)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+07b_build_road_graph.py - Build the road network graph for travel-time search
+
+Turns the clipped BDOT10k road layer (SKDR_L, drogi_wszystkie.gpkg from
+03b_clip_bdot10k.py) into a compact graph for shortest-path queries:
+
+- nodes: road segment endpoints (snapped to a 0.5 m grid)
+- edges: segments, both directions, in CSR layout (indptr / indices)
+- per edge: length in meters and road class code (KLASADROGI)
+- per parcel: nearest node of the main connected component + distance
+
+Everything is stored as numpy arrays in one .npz, which the backend
+(app.services.road_graph) memory-loads for isochrone search; travel speeds
+per class live in the backend, so they can change without a rebuild.
+
+Input:
+  - egib/data/bdot10k_trojmiasto/drogi_wszystkie.gpkg
+  - egib/data/processed/parcels_enriched.gpkg
+
+Output:
+  - egib/data/processed/road_graph.npz (copy to settings.road_graph_path)
+
+Usage:
+    python 07b_build_road_graph.py [--output road_graph.npz]
+"""
+
+import argparse
+import importlib.util
+import logging
+import time
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASE_PATH = Path("/home/marcin/moja-dzialka/egib")
+DATA_PATH = BASE_PATH / "data" / "processed"
+BDOT_PATH = BASE_PATH / "data" / "bdot10k_trojmiasto"
+
+# Graph format and road classes shared with the backend (app.services.road_graph)
+# - loaded by path to avoid importing the backend's dependencies and config
+_road_classes_path = (
+    Path(__file__).resolve().parent.parent.parent.parent
+    / "backend" / "app" / "services" / "road_classes.py"
+)
+_spec = importlib.util.spec_from_file_location("road_classes", _road_classes_path)
+_road_classes = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_road_classes)
+GRAPH_FORMAT = _road_classes.GRAPH_FORMAT
+
+# KLASADROGI values; the index is the edge's road_class code
+ROAD_CLASSES = list(_road_classes.ROAD_CLASSES)
+
+# Endpoints closer than this are the same node (meters, EPSG:2180)
+NODE_SNAP_M = 0.5
+
+
+def load_roads() -> gpd.GeoDataFrame:
+    """Load road segments as single LineStrings in EPSG:2180."""
+    logger.info("Loading roads...")
+    roads = gpd.read_file(BDOT_PATH / "drogi_wszystkie.gpkg")
+    if roads.crs is not None and roads.crs.to_epsg() != 2180:
+        roads = roads.to_crs("EPSG:2180")
+    roads = roads[roads.geometry.notna() & ~roads.geometry.is_empty]
+    roads = roads.explode(index_parts=False)
+    roads = roads[roads.geometry.geom_type == "LineString"]
+    logger.info(f"  {len(roads):,} segments")
+    return roads
+
+
+def build_graph(roads: gpd.GeoDataFrame) -> dict:
+    """Build CSR arrays from road segments (vectorized)."""
+    logger.info("Building graph...")
+    lines = roads.geometry.values
+    start = shapely.get_coordinates(shapely.get_point(lines, 0))
+    end = shapely.get_coordinates(shapely.get_point(lines, -1))
+    length = shapely.length(lines)
+
+    class_index = {name: i for i, name in enumerate(ROAD_CLASSES)}
+    if "KLASADROGI" in roads.columns:
+        road_class = roads["KLASADROGI"].map(class_index).fillna(len(ROAD_CLASSES) - 1)
+        road_class = road_class.to_numpy(dtype=np.uint8)
+    else:
+        road_class = np.full(len(roads), len(ROAD_CLASSES) - 1, dtype=np.uint8)
+
+    # Endpoints -> node ids on a NODE_SNAP_M grid
+    grid = np.round(np.vstack([start, end]) / NODE_SNAP_M).astype(np.int64)
+    keys, node_of = np.unique(grid, axis=0, return_inverse=True)
+    node_of = node_of.ravel()
+    node_xy = keys.astype(np.float64) * NODE_SNAP_M
+    n = len(keys)
+    u, v = node_of[:len(roads)], node_of[len(roads):]
+
+    keep = u != v
+    u, v, length, road_class = u[keep], v[keep], length[keep], road_class[keep]
+    logger.info(f"  {n:,} nodes, {len(u):,} segments ({(~keep).sum():,} loops dropped)")
+
+    # Both directions, sorted by source -> CSR
+    src = np.concatenate([u, v])
+    dst = np.concatenate([v, u])
+    length = np.concatenate([length, length]).astype(np.float32)
+    road_class = np.concatenate([road_class, road_class])
+    order = np.lexsort((dst, src))
+    src, dst, length, road_class = src[order], dst[order], length[order], road_class[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+
+    # Largest connected component - parcels and origins snap only to it
+    graph = csr_matrix((np.ones(len(dst), dtype=np.int8), dst, indptr), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    main_component = labels == np.bincount(labels).argmax()
+    logger.info(f"  main component: {main_component.sum():,} / {n:,} nodes")
+
+    node_lonlat = gpd.GeoSeries(
+        gpd.points_from_xy(node_xy[:, 0], node_xy[:, 1]), crs="EPSG:2180"
+    ).to_crs("EPSG:4326")
+    node_lonlat = np.column_stack([node_lonlat.x.to_numpy(), node_lonlat.y.to_numpy()])
+
+    return {
+        "node_xy": node_xy,
+        "node_lonlat": node_lonlat,
+        "main_component": main_component,
+        "indptr": indptr,
+        "indices": dst.astype(np.int32),
+        "length_m": length,
+        "road_class": road_class,
+    }
+
+
+def snap_parcels(graph: dict) -> dict:
+    """Nearest main-component node for each parcel (representative point)."""
+    logger.info("Snapping parcels to the graph...")
+    parcels = gpd.read_file(DATA_PATH / "parcels_enriched.gpkg", columns=["id_dzialki"])
+    points = shapely.get_coordinates(parcels.geometry.representative_point().values)
+
+    candidates = np.flatnonzero(graph["main_component"])
+    tree = cKDTree(graph["node_xy"][candidates])
+    dist, idx = tree.query(points, k=1)
+    logger.info(f"  {len(parcels):,} parcels, snap distance median {np.median(dist):.0f} m, "
+                f"p95 {np.percentile(dist, 95):.0f} m")
+
+    return {
+        "parcel_ids": parcels["id_dzialki"].astype(str).to_numpy(dtype=str),
+        "parcel_node": candidates[idx].astype(np.int32),
+        "parcel_snap_m": dist.astype(np.float32),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build road graph (CSR) for travel-time search")
+    parser.add_argument("--output", default=str(DATA_PATH / "road_graph.npz"), help="Output .npz")
+    args = parser.parse_args()
+
+    start = time.time()
+    graph = build_graph(load_roads())
+    graph.update(snap_parcels(graph))
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        output,
+        format=np.array(GRAPH_FORMAT),
+        class_names=np.array(ROAD_CLASSES),
+        **graph,
+    )
+    logger.info(f"Saved {output} ({output.stat().st_size / 1e6:.1f} MB) in {time.time() - start:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+07c_network_distances.py - Walking distances to POI over the road network
+
+The dist_to_* columns from 05_feature_engineering.py are straight-line
+(KD-tree) distances, which are badly wrong across rivers, rail lines and
+the ring road. This step computes the network equivalent for each POI class:
+
+- net_dist_to_school, net_dist_to_kindergarten, net_dist_to_bus_stop,
+  net_dist_to_pharmacy, net_dist_to_doctors, net_dist_to_supermarket,
+  net_dist_to_restaurant
+
+Each class is ONE multi-source shortest-path run on the road graph from
+07b_build_road_graph.py: a virtual source node is linked to the snapped POI
+nodes (edge weight = POI snap distance) and scipy's Dijkstra runs from it,
+so every node gets the walking distance to its nearest POI of the class.
+A parcel's distance is its node's distance plus its own snap distance.
+Walking excludes motorways and expressways; parcels not reached within
+MAX_NET_DIST_M get NaN.
+
+Input:
+  - egib/data/processed/road_graph.npz (07b_build_road_graph.py)
+  - egib/data/processed/poi_trojmiasto.gpkg
+  - egib/data/processed/parcels_enriched.gpkg
+
+Output:
+  - net_dist_to_* columns in parcels_enriched.gpkg (exported to CSV by 13,
+    imported to Neo4j by 16/24 and to PostGIS by import_postgis.py)
+  - optionally the same columns written straight into PostGIS / Neo4j
+
+Usage:
+    python 07c_network_distances.py                    # parcels_enriched.gpkg
+    python 07c_network_distances.py --postgis --neo4j  # + live databases
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import time
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASE_PATH = Path("/home/marcin/moja-dzialka/egib")
+DATA_PATH = BASE_PATH / "data" / "processed"
+
+# Neo4j connection
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+
+# PostGIS connection
+PG_HOST = os.getenv("POSTGRES_HOST", "localhost")
+PG_PORT = os.getenv("POSTGRES_PORT", "5432")
+PG_DB = os.getenv("POSTGRES_DB", "moja_dzialka")
+PG_USER = os.getenv("POSTGRES_USER", "app")
+PG_PASSWORD = os.getenv("POSTGRES_PASSWORD", "secret")
+
+# Graph format and road classes shared with the backend (app.services.road_graph)
+# - loaded by path to avoid importing the backend's dependencies and config
+_road_classes_path = (
+    Path(__file__).resolve().parent.parent.parent.parent
+    / "backend" / "app" / "services" / "road_classes.py"
+)
+_spec = importlib.util.spec_from_file_location("road_classes", _road_classes_path)
+_road_classes = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_road_classes)
+GRAPH_FORMAT = _road_classes.GRAPH_FORMAT
+NOT_WALKABLE = _road_classes.NOT_WALKABLE
+
+# Dijkstra cut-off; parcels farther than this from every POI of a class get NaN
+MAX_NET_DIST_M = 20000.0
+# POI farther than this from the road network are ignored
+MAX_POI_SNAP_M = 500.0
+
+BATCH_SIZE = 5000
+
+
+def poi_filters(poi: gpd.GeoDataFrame) -> dict:
+    """POI classes -> row masks.
+
+    NOTE: keep in sync with compute_distances() in 05_feature_engineering.py
+    """
+    return {
+        'school': (poi['category'] == 'education') & (poi['type'] == 'school'),
+        'kindergarten': (poi['category'] == 'education') & (poi['type'] == 'kindergarten'),
+        'bus_stop': (poi['category'] == 'transport'),
+        'pharmacy': (poi['category'] == 'health') & (poi['type'] == 'pharmacy'),
+        'doctors': (poi['category'] == 'health') & (poi['type'] == 'doctors'),
+        'supermarket': (poi['category'] == 'shop') & (poi['type'].isin(['supermarket', 'convenience'])),
+        'restaurant': (poi['category'] == 'gastro') & (poi['type'] == 'restaurant'),
+    }
+
+
+def load_graph(path: Path) -> dict:
+    """Load the road graph arrays written by 07b_build_road_graph.py."""
+    logger.info(f"Loading road graph {path}...")
+    with np.load(path, allow_pickle=False) as data:
+        if int(data["format"]) != GRAPH_FORMAT:
+            raise ValueError(f"road graph format {int(data['format'])}, expected {GRAPH_FORMAT}")
+        graph = {key: data[key] for key in data.files}
+    n = len(graph["indptr"]) - 1
+    logger.info(f"  {n:,} nodes, {len(graph['indices']):,} edges, "
+                f"{len(graph['parcel_ids']):,} parcels")
+    return graph
+
+
+def walk_edges(graph: dict) -> np.ndarray:
+    """Edge weights in meters for walking (0 = edge not walkable)."""
+    class_names = [str(c) for c in graph["class_names"]]
+    walkable = np.array([c not in NOT_WALKABLE for c in class_names])[graph["road_class"]]
+    # Weight 0 is "no edge" for scipy - floor real edges at 1 cm
+    return np.where(walkable, np.maximum(graph["length_m"].astype(np.float64), 0.01), 0.0)
+
+
+def snap_poi(points: np.ndarray, tree: cKDTree, candidates: np.ndarray):
+    """Nearest main-component node per POI: (unique nodes, min snap distance per node)."""
+    dist, idx = tree.query(points, k=1)
+    keep = dist <= MAX_POI_SNAP_M
+    nodes, dist = candidates[idx[keep]], dist[keep]
+    # Several POI on one node -> the closest one
+    order = np.lexsort((dist, nodes))
+    nodes, dist = nodes[order], dist[order]
+    first = np.ones(len(nodes), dtype=bool)
+    first[1:] = nodes[1:] != nodes[:-1]
+    return nodes[first], np.maximum(dist[first], 0.01), int((~keep).sum())
+
+
+def multi_source_distances(
+    graph: dict, weights: np.ndarray, sources: np.ndarray, offsets: np.ndarray,
+) -> np.ndarray:
+    """Network distance (m) from every node to the nearest source, in one Dijkstra run.
+
+    A virtual node n gets edges to all sources (weighted by their offsets);
+    directed Dijkstra from it yields min over sources of offset + path length.
+    """
+    indptr, indices = graph["indptr"], graph["indices"]
+    n = len(indptr) - 1
+    matrix = csr_matrix(
+        (
+            np.concatenate([weights, offsets]),
+            np.concatenate([indices, sources.astype(indices.dtype)]),
+            np.append(indptr, indptr[-1] + len(sources)),
+        ),
+        shape=(n + 1, n + 1),
+    )
+    matrix.eliminate_zeros()
+    dist = dijkstra(matrix, directed=True, indices=n, limit=MAX_NET_DIST_M)
+    return dist[:n]
+
+
+def compute_network_distances(graph: dict, poi: gpd.GeoDataFrame) -> pd.DataFrame:
+    """net_dist_to_* per parcel (index: id_dzialki), one Dijkstra run per POI class."""
+    weights = walk_edges(graph)
+    candidates = np.flatnonzero(graph["main_component"])
+    tree = cKDTree(graph["node_xy"][candidates])
+    parcel_node = graph["parcel_node"]
+    parcel_snap = graph["parcel_snap_m"].astype(np.float64)
+
+    columns = {}
+    for cat_name, cat_filter in poi_filters(poi).items():
+        cat_poi = poi[cat_filter]
+        column = f"net_dist_to_{cat_name}"
+        if len(cat_poi) == 0:
+            columns[column] = np.full(len(parcel_node), np.nan)
+            logger.info(f"  {cat_name}: no POI found")
+            continue
+
+        start = time.time()
+        points = np.column_stack([cat_poi.geometry.x.to_numpy(), cat_poi.geometry.y.to_numpy()])
+        sources, offsets, dropped = snap_poi(points, tree, candidates)
+        node_dist = multi_source_distances(graph, weights, sources, offsets)
+
+        dist = node_dist[parcel_node] + parcel_snap
+        dist[~np.isfinite(dist) | (dist > MAX_NET_DIST_M)] = np.nan
+        columns[column] = dist.round()
+
+        reached = np.isfinite(dist)
+        logger.info(
+            f"  {cat_name}: {len(cat_poi):,} POI -> {len(sources):,} nodes "
+            f"({dropped} off-network), median={np.nanmedian(dist):.0f}m, "
+            f"unreached={(~reached).sum():,} ({time.time() - start:.1f}s)"
+        )
+
+    return pd.DataFrame(columns, index=pd.Index(graph["parcel_ids"].astype(str), name="id_dzialki"))
+
+
+def update_gpkg(net: pd.DataFrame) -> None:
+    """Add net_dist_to_* columns to parcels_enriched.gpkg."""
+    path = DATA_PATH / "parcels_enriched.gpkg"
+    logger.info(f"Updating {path}...")
+    parcels = gpd.read_file(path)
+    ids = parcels["id_dzialki"].astype(str)
+
+    missing = (~ids.isin(net.index)).sum()
+    if missing:
+        logger.warning(f"  {missing:,} parcels are not in the road graph - re-run 07b_build_road_graph.py")
+
+    aligned = net.reindex(ids)
+    for column in net.columns:
+        parcels[column] = aligned[column].to_numpy()
+        # Detour factor vs the straight-line distance from 05
+        euclid_column = column.replace("net_", "", 1)
+        if euclid_column in parcels.columns:
+            euclid = parcels[euclid_column].to_numpy(dtype=float)
+            ok = np.isfinite(parcels[column].to_numpy(dtype=float)) & (euclid > 100)
+            if ok.any():
+                ratio = parcels[column].to_numpy(dtype=float)[ok] / euclid[ok]
+                logger.info(f"  {column}: detour factor median {np.median(ratio):.2f}, "
+                            f"p95 {np.percentile(ratio, 95):.2f}")
+
+    parcels.to_file(path, driver='GPKG')
+    logger.info(f"  ✓ Saved {len(parcels):,} parcels")
+
+
+def _batches(net: pd.DataFrame):
+    """(ids, {column: values}) chunks with NaN -> None."""
+    for i in range(0, len(net), BATCH_SIZE):
+        chunk = net.iloc[i:i + BATCH_SIZE]
+        values = {
+            column: [None if np.isnan(v) else int(v) for v in chunk[column].to_numpy()]
+            for column in net.columns
+        }
+        yield list(chunk.index), values
+
+
+def update_postgis(net: pd.DataFrame) -> None:
+    """Write net_dist_to_* columns to the PostGIS parcels table."""
+    import psycopg2
+
+    logger.info("Updating PostGIS...")
+    conn = psycopg2.connect(
+        host=PG_HOST, port=PG_PORT, dbname=PG_DB,
+        user=PG_USER, password=PG_PASSWORD,
+    )
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    columns = list(net.columns)
+    for column in columns:
+        cur.execute(f"ALTER TABLE parcels ADD COLUMN IF NOT EXISTS {column} INTEGER;")
+
+    set_sql = ", ".join(f"{c} = v.{c}" for c in columns)
+    unnest_sql = ", ".join(["%s::text[]"] + ["%s::int[]"] * len(columns))
+    query = f"""
+        UPDATE parcels p SET {set_sql}
+        FROM unnest({unnest_sql}) AS v(id_dzialki, {", ".join(columns)})
+        WHERE p.id_dzialki = v.id_dzialki
+    """
+
+    updated = 0
+    for ids, values in _batches(net):
+        cur.execute(query, [ids] + [values[c] for c in columns])
+        updated += cur.rowcount
+    logger.info(f"  ✓ Updated {updated:,} rows in PostGIS")
+
+    cur.close()
+    conn.close()
+
+
+def update_neo4j(net: pd.DataFrame) -> None:
+    """Write net_dist_to_* properties to Neo4j Parcel nodes."""
+    from neo4j import GraphDatabase
+
+    logger.info("Updating Neo4j...")
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    query = """
+        UNWIND $batch AS row
+        MATCH (p:Parcel {id_dzialki: row.id_dzialki})
+        SET p += row.props
+        RETURN count(p) AS updated
+    """
+
+    updated = 0
+    with driver.session() as session:
+        for ids, values in _batches(net):
+            batch = [
+                {"id_dzialki": pid, "props": {c: values[c][j] for c in net.columns}}
+                for j, pid in enumerate(ids)
+            ]
+            updated += session.run(query, {"batch": batch}).single()["updated"]
+    logger.info(f"  ✓ Updated {updated:,} Parcel nodes in Neo4j")
+
+    driver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Network (walking) distances to POI over the road graph")
+    parser.add_argument("--graph", default=str(DATA_PATH / "road_graph.npz"), help="Road graph .npz from 07b")
+    parser.add_argument("--postgis", action="store_true", help="Also update the PostGIS parcels table")
+    parser.add_argument("--neo4j", action="store_true", help="Also update Neo4j Parcel nodes")
+    parser.add_argument("--skip-gpkg", action="store_true", help="Do not rewrite parcels_enriched.gpkg")
+    args = parser.parse_args()
+
+    start = time.time()
+    graph = load_graph(Path(args.graph))
+
+    poi = gpd.read_file(DATA_PATH / "poi_trojmiasto.gpkg")
+    if poi.crs is not None and poi.crs.to_epsg() != 2180:
+        poi = poi.to_crs("EPSG:2180")
+    poi = poi[poi.geometry.notna() & (poi.geometry.geom_type == "Point")]
+    logger.info(f"Loaded {len(poi):,} POI")
+
+    logger.info("Computing network distances...")
+    net = compute_network_distances(graph, poi)
+
+    if not args.skip_gpkg:
+        update_gpkg(net)
+    if args.postgis:
+        update_postgis(net)
+    if args.neo4j:
+        update_neo4j(net)
+
+    logger.info(f"Done in {time.time() - start:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,11 @@ Importuje dane z CSV do Neo4j:
 4. Relacje hierarchiczne (LOCATED_IN, BELONGS_TO)
 5. Relacje kategorialne (HAS_QUIETNESS, HAS_NATURE, etc.)
 
-Używa batch processing dla wydajności.
+Używa batch processing dla wydajności (neo4j_bulk.BulkLoader - kilka
+równoległych sesji na rozłącznych partycjach, raport rows/s).
 """
 
+import argparse
 import csv
 import os
 import sys
@@ -20,6 +22,8 @@ from typing import List, Dict, Any
 
 from loguru import logger
 
+from neo4j_bulk import WRITERS, BulkLoader
+
 # Neo4j connection
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
@@ -66,18 +70,7 @@ def load_csv(filename: str) -> List[Dict[str, Any]]:
         return rows
 
 
-def run_batch_query(session, query: str, batch: List[Dict], description: str = ""):
-    """Execute batch Cypher query."""
-    try:
-        result = session.run(query, {"batch": batch})
-        summary = result.consume()
-        return summary.counters.nodes_created + summary.counters.relationships_created
-    except Exception as e:
-        logger.error(f"Batch error: {e}")
-        return 0
-
-
-def import_parcels(session):
+def import_parcels(loader: BulkLoader):
     """Import parcel nodes from CSV."""
     logger.info("\n" + "=" * 60)
     logger.info("IMPORT DZIAŁEK (Parcel)")
@@ -153,6 +146,15 @@ def import_parcels(session):
         dist_to_industrial: row.dist_to_industrial,
         dist_to_main_road: row.dist_to_main_road,
 
+        // Network (walking) distances - 07c_network_distances.py
+        net_dist_to_school: row.net_dist_to_school,
+        net_dist_to_kindergarten: row.net_dist_to_kindergarten,
+        net_dist_to_bus_stop: row.net_dist_to_bus_stop,
+        net_dist_to_pharmacy: row.net_dist_to_pharmacy,
+        net_dist_to_doctors: row.net_dist_to_doctors,
+        net_dist_to_supermarket: row.net_dist_to_supermarket,
+        net_dist_to_restaurant: row.net_dist_to_restaurant,
+
         // Water distances (NEW)
         dist_to_sea: row.dist_to_sea,
         dist_to_river: row.dist_to_river,
@@ -186,14 +188,7 @@ def import_parcels(session):
     }}
     """
 
-    # Process in batches
-    total_created = 0
-    for i in range(0, len(parcels), BATCH_SIZE):
-        batch = parcels[i:i + BATCH_SIZE]
-        created = run_batch_query(session, query, batch)
-        total_created += created
-        if (i + BATCH_SIZE) % 25000 == 0 or i + BATCH_SIZE >= len(parcels):
-            logger.info(f"  Processed {min(i + BATCH_SIZE, len(parcels)):,} / {len(parcels):,}")
+    loader.load("Parcel nodes", query, parcels, key="id_dzialki")
 
     logger.info(f"  Zaimportowano {len(parcels):,} działek")
 
@@ -219,7 +214,7 @@ def import_districts(session):
     logger.info(f"  Utworzono {record['count']} dzielnic")
 
 
-def import_water(session):
+def import_water(loader: BulkLoader):
     """Import water nodes with classification."""
     logger.info("\n" + "=" * 60)
     logger.info("IMPORT WÓD (Water)")
@@ -242,14 +237,12 @@ def import_water(session):
         w.y = row.y
     """
 
-    for i in range(0, len(waters), BATCH_SIZE):
-        batch = waters[i:i + BATCH_SIZE]
-        run_batch_query(session, query, batch)
+    loader.load("Water nodes", query, waters, key="id")
 
     logger.info(f"  Zaimportowano {len(waters):,} obiektów wodnych")
 
 
-def import_poi(session, filename: str, label: str, properties: dict):
+def import_poi(loader: BulkLoader, filename: str, label: str, properties: dict):
     """Generic POI import."""
     logger.info(f"\n  Import {label} z {filename}...")
 
@@ -266,36 +259,34 @@ def import_poi(session, filename: str, label: str, properties: dict):
     SET {prop_clause}
     """
 
-    for i in range(0, len(rows), BATCH_SIZE):
-        batch = rows[i:i + BATCH_SIZE]
-        run_batch_query(session, query, batch)
+    loader.load(f"{label} nodes", query, rows, key="id")
 
     logger.info(f"    Zaimportowano {len(rows):,} {label}")
 
 
-def import_all_poi(session):
+def import_all_poi(loader: BulkLoader):
     """Import all POI nodes."""
     logger.info("\n" + "=" * 60)
     logger.info("IMPORT POI")
     logger.info("=" * 60)
 
-    import_poi(session, "schools.csv", "School", {
+    import_poi(loader, "schools.csv", "School", {
         "name": "name", "type": "type", "x": "x", "y": "y"
     })
 
-    import_poi(session, "bus_stops.csv", "BusStop", {
+    import_poi(loader, "bus_stops.csv", "BusStop", {
         "name": "name", "x": "x", "y": "y"
     })
 
-    import_poi(session, "forests.csv", "Forest", {
+    import_poi(loader, "forests.csv", "Forest", {
         "type": "type", "area_m2": "area_m2", "x": "x", "y": "y"
     })
 
-    import_poi(session, "shops.csv", "Shop", {
+    import_poi(loader, "shops.csv", "Shop", {
         "name": "name", "shop_type": "shop_type", "x": "x", "y": "y"
     })
 
-    import_poi(session, "roads.csv", "Road", {
+    import_poi(loader, "roads.csv", "Road", {
         "name": "name", "type": "type", "length_m": "length_m", "x": "x", "y": "y"
     })
 
@@ -458,6 +449,10 @@ def show_import_summary(session):
 def main():
     from neo4j import GraphDatabase
 
+    parser = argparse.ArgumentParser(description="Import full data into Neo4j")
+    parser.add_argument("--writers", type=int, default=WRITERS, help="Parallel Neo4j sessions")
+    args = parser.parse_args()
+
     logger.info("=" * 60)
     logger.info("IMPORT DANYCH DO NEO4J")
     logger.info("=" * 60)
@@ -472,14 +467,16 @@ def main():
 
     # Connect to Neo4j
     driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    loader = BulkLoader(driver, writers=args.writers, batch_size=BATCH_SIZE)
 
     try:
+        # Import nodes
+        import_parcels(loader)
+        import_water(loader)
+        import_all_poi(loader)
+
         with driver.session() as session:
-            # Import nodes
-            import_parcels(session)
             import_districts(session)
-            import_water(session)
-            import_all_poi(session)
 
             # Create relations
             create_hierarchy_relations(session)
@@ -489,6 +486,8 @@ def main():
             # Show summary
             show_import_summary(session)
 
+        loader.report()
+
     finally:
         driver.close()
 
@@ -35,8 +35,10 @@ RELACJE KATEGORIALNE:
 - (Parcel)-[:NEAREST_WATER_TYPE]->(WaterType)
 """
 
+import argparse
 import csv
 import os
+import re
 import sys
 from pathlib import Path
 from typing import List, Dict, Any
@@ -44,6 +46,8 @@ from typing import List, Dict, Any
 from neo4j import GraphDatabase
 from loguru import logger
 
+from neo4j_bulk import WRITERS, AdminImportWriter, BulkLoader
+
 # Neo4j connection
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
@@ -90,15 +94,8 @@ def load_csv(filename: str) -> List[Dict[str, Any]]:
         return rows
 
 
-def import_parcels(session, parcels: List[Dict]):
-    """Import parcel nodes with all properties."""
-    logger.info("\n" + "=" * 60)
-    logger.info("IMPORT DZIAŁEK (Parcel)")
-    logger.info("=" * 60)
-    logger.info(f"  Total parcels: {len(parcels):,}")
-
-    # All parcel properties
-    property_map = """
+# All parcel properties (Cypher map; also the neo4j-admin CSV columns)
+PARCEL_PROPERTY_MAP = """
         id_dzialki: row.id_dzialki,
         gmina: row.gmina,
         miejscowosc: row.miejscowosc,
@@ -164,6 +161,15 @@ def import_parcels(session, parcels: List[Dict]):
         dist_to_industrial: row.dist_to_industrial,
         dist_to_main_road: row.dist_to_main_road,
 
+        // Network (walking) distances - 07c_network_distances.py
+        net_dist_to_school: row.net_dist_to_school,
+        net_dist_to_kindergarten: row.net_dist_to_kindergarten,
+        net_dist_to_bus_stop: row.net_dist_to_bus_stop,
+        net_dist_to_pharmacy: row.net_dist_to_pharmacy,
+        net_dist_to_doctors: row.net_dist_to_doctors,
+        net_dist_to_supermarket: row.net_dist_to_supermarket,
+        net_dist_to_restaurant: row.net_dist_to_restaurant,
+
         // Water distances
         dist_to_sea: row.dist_to_sea,
         dist_to_river: row.dist_to_river,
@@ -189,23 +195,36 @@ def import_parcels(session, parcels: List[Dict]):
         count_buildings_500m: row.count_buildings_500m
     """
 
+PARCEL_PROPERTIES = re.findall(r"(\w+): row\.\w+", PARCEL_PROPERTY_MAP)
+
+
+def import_parcels(loader: BulkLoader, parcels: List[Dict]):
+    """Import parcel nodes with all properties.
+
+    Into an empty database nodes are CREATEd (ids are unique in the CSV),
+    otherwise MERGEd; rows are partitioned by id_dzialki across sessions.
+    """
+    logger.info("\n" + "=" * 60)
+    logger.info("IMPORT DZIAŁEK (Parcel)")
+    logger.info("=" * 60)
+    logger.info(f"  Total parcels: {len(parcels):,}")
+
+    if loader.exists("(:Parcel)"):
+        node = "MERGE (p:Parcel {id_dzialki: row.id_dzialki})"
+    else:
+        node = "CREATE (p:Parcel {id_dzialki: row.id_dzialki})"
+
     query = f"""
     UNWIND $batch AS row
-    MERGE (p:Parcel {{id_dzialki: row.id_dzialki}})
+    {node}
     SET p += {{
-        {property_map}
+        {PARCEL_PROPERTY_MAP}
     }}
     """
 
-    # Process in batches
-    total = len(parcels)
-    for i in range(0, total, BATCH_SIZE):
-        batch = parcels[i:i + BATCH_SIZE]
-        session.run(query, {"batch": batch})
-        if (i + BATCH_SIZE) % 15000 == 0 or i + BATCH_SIZE >= total:
-            logger.info(f"  Processed {min(i + BATCH_SIZE, total):,} / {total:,}")
+    loader.load("Parcel nodes", query, parcels, key="id_dzialki")
 
-    logger.info(f"  Imported {total:,} parcels")
+    logger.info(f"  Imported {len(parcels):,} parcels")
 
 
 def import_districts(session):
@@ -599,6 +618,14 @@ def show_import_summary(session):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Import parcels v2 into Neo4j")
+    parser.add_argument("--writers", type=int, default=WRITERS, help="Parallel Neo4j sessions")
+    parser.add_argument("--admin-csv", type=str,
+                        help="Write nodes_Parcel.csv for neo4j-admin import to this directory and exit")
+    parser.add_argument("--relations-only", action="store_true",
+                        help="Skip the Parcel node import (e.g. after neo4j-admin import)")
+    args = parser.parse_args()
+
     logger.info("=" * 60)
     logger.info("IMPORT DZIAŁEK V2 DO NEO4J")
     logger.info("=" * 60)
@@ -612,17 +639,28 @@ def main():
         sys.exit(1)
 
     # Load parcels
-    logger.info("\n  Loading parcels from CSV...")
-    parcels = load_csv("parcels_full.csv")
-    logger.info(f"  Loaded {len(parcels):,} parcels")
+    parcels = []
+    if not args.relations_only:
+        logger.info("\n  Loading parcels from CSV...")
+        parcels = load_csv("parcels_full.csv")
+        logger.info(f"  Loaded {len(parcels):,} parcels")
+
+    if args.admin_csv:
+        AdminImportWriter(args.admin_csv).nodes("Parcel", parcels, "id_dzialki", PARCEL_PROPERTIES)
+        logger.info(f"Run: python neo4j_bulk.py import {args.admin_csv}, "
+                    f"21_create_neo4j_schema_v2.py, then this script with --relations-only")
+        return
 
     # Connect to Neo4j
     driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    loader = BulkLoader(driver, writers=args.writers, batch_size=BATCH_SIZE)
 
     try:
+        if parcels:
+            import_parcels(loader, parcels)
+
         with driver.session() as session:
             # Import nodes
-            import_parcels(session, parcels)
             import_districts(session)
 
             # Create relations
@@ -638,6 +676,8 @@ def main():
             # Show summary
             show_import_summary(session)
 
+        loader.report()
+
     finally:
         driver.close()
 
@@ -23,6 +23,7 @@ Algorytm:
 UWAGA: Ten skrypt może zająć dużo czasu (~1-2h) ze względu na liczbę obliczeń.
 """
 
+import argparse
 import csv
 import math
 import os
@@ -36,6 +37,8 @@ from loguru import logger
 from scipy.spatial import cKDTree
 import numpy as np
 
+from neo4j_bulk import WRITERS, AdminImportWriter, BulkLoader
+
 # Neo4j connection
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
@@ -136,7 +139,26 @@ def load_parcel_centroids(session) -> Tuple[np.ndarray, List[str]]:
     return np.array(coords), ids
 
 
-def import_poi_nodes(session, poi_type: str, config: dict):
+def load_parcel_centroids_csv() -> Tuple[np.ndarray, List[str]]:
+    """Load parcel centroids from parcels_full.csv (neo4j-admin mode, no database)."""
+    logger.info("  Loading parcel centroids from parcels_full.csv...")
+
+    coords = []
+    ids = []
+    with open(CSV_PATH / "parcels_full.csv", 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                coords.append([float(row['centroid_x']), float(row['centroid_y'])])
+                ids.append(row['id_dzialki'])
+            except (ValueError, KeyError):
+                continue
+
+    logger.info(f"  Loaded {len(ids):,} parcel centroids")
+    return np.array(coords), ids
+
+
+def import_poi_nodes(loader: BulkLoader, poi_type: str, config: dict,
+                     writer: AdminImportWriter = None):
     """Import POI nodes from CSV if not already present."""
     csv_file = config['csv_file']
     filepath = CSV_PATH / csv_file
@@ -146,11 +168,9 @@ def import_poi_nodes(session, poi_type: str, config: dict):
         return 0
 
     # Check if already imported
-    result = session.run(f"MATCH (n:{poi_type}) RETURN count(n) as cnt")
-    record = result.single()
-    if record['cnt'] > 0:
-        logger.info(f"  {poi_type}: {record['cnt']:,} already in database")
-        return record['cnt']
+    if writer is None and loader.exists(f"(:{poi_type})"):
+        logger.info(f"  {poi_type}: already in database")
+        return 0
 
     # Import from CSV
     logger.info(f"  Importing {poi_type} from {csv_file}...")
@@ -170,28 +190,32 @@ def import_poi_nodes(session, poi_type: str, config: dict):
                         cleaned[k] = v
             rows.append(cleaned)
 
+    if writer is not None:
+        writer.nodes(poi_type, rows, "id")
+        return len(rows)
+
     # Build property list based on available columns
     sample = rows[0] if rows else {}
     props = list(sample.keys())
 
     prop_clause = ", ".join([f"n.{p} = row.{p}" for p in props])
 
+    # The label is empty (checked above) and CSV ids are unique - CREATE is safe
     query = f"""
     UNWIND $batch AS row
-    MERGE (n:{poi_type} {{id: row.id}})
+    CREATE (n:{poi_type} {{id: row.id}})
     SET {prop_clause}
     """
 
-    for i in range(0, len(rows), BATCH_SIZE):
-        batch = rows[i:i + BATCH_SIZE]
-        session.run(query, {"batch": batch})
+    loader.load(f"{poi_type} nodes", query, rows)
 
     logger.info(f"  Imported {len(rows):,} {poi_type} nodes")
     return len(rows)
 
 
-def create_poi_relations(session, poi_type: str, config: dict,
-                         parcel_coords: np.ndarray, parcel_ids: List[str]):
+def create_poi_relations(loader: BulkLoader, poi_type: str, config: dict,
+                         parcel_coords: np.ndarray, parcel_ids: List[str],
+                         writer: AdminImportWriter = None):
     """Create NEAR_* relations for a POI type using KD-tree."""
     logger.info(f"\n  Processing {poi_type}...")
 
@@ -254,21 +278,22 @@ def create_poi_relations(session, poi_type: str, config: dict,
 
     logger.info(f"    Total relations to create: {len(relations):,}")
 
-    # Create relations in Neo4j
+    if writer is not None:
+        writer.relationships(rel_type, relations, "parcel_id", "Parcel", "poi_id", poi_type)
+        return len(relations)
+
+    # Create relations in Neo4j (CREATE when the type is empty - pairs are unique)
     if relations:
+        create = "MERGE" if loader.exists(f"()-[:{rel_type}]->()") else "CREATE"
         query = f"""
         UNWIND $batch AS row
         MATCH (p:Parcel {{id_dzialki: row.parcel_id}})
         MATCH (poi:{poi_type} {{id: row.poi_id}})
-        MERGE (p)-[r:{rel_type}]->(poi)
+        {create} (p)-[r:{rel_type}]->(poi)
         SET r.distance_m = row.distance_m
         """
 
-        for i in range(0, len(relations), BATCH_SIZE):
-            batch = relations[i:i + BATCH_SIZE]
-            session.run(query, {"batch": batch})
-            if (i + BATCH_SIZE) % 20000 == 0 or i + BATCH_SIZE >= len(relations):
-                logger.info(f"    Created {min(i + BATCH_SIZE, len(relations)):,} / {len(relations):,} relations")
+        loader.load(rel_type, query, relations, key="parcel_id")
 
     return len(relations)
 
@@ -330,14 +355,30 @@ def show_summary(session):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Create NEAR_* relations")
+    parser.add_argument("--writers", type=int, default=WRITERS, help="Parallel Neo4j sessions")
+    parser.add_argument("--admin-csv", type=str,
+                        help="Write POI node / NEAR_* CSVs for neo4j-admin import to this directory")
+    args = parser.parse_args()
+
     logger.info("=" * 60)
     logger.info("TWORZENIE RELACJI NEAR_* Z ODLEGŁOŚCIAMI")
     logger.info("=" * 60)
     logger.info(f"URI: {NEO4J_URI}")
     logger.info(f"CSV Path: {CSV_PATH}")
 
+    if args.admin_csv:
+        writer = AdminImportWriter(args.admin_csv)
+        parcel_coords, parcel_ids = load_parcel_centroids_csv()
+        for poi_type, config in POI_THRESHOLDS.items():
+            import_poi_nodes(None, poi_type, config, writer)
+            create_poi_relations(None, poi_type, config, parcel_coords, parcel_ids, writer)
+        logger.info(f"Run: python neo4j_bulk.py import {args.admin_csv}")
+        return
+
     # Connect to Neo4j
     driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    loader = BulkLoader(driver, writers=args.writers, batch_size=BATCH_SIZE)
 
     try:
         with driver.session() as session:
@@ -355,15 +396,17 @@ def main():
                 logger.info("=" * 60)
 
                 # Import POI nodes if needed
-                import_poi_nodes(session, poi_type, config)
+                import_poi_nodes(loader, poi_type, config)
 
                 # Create relations
-                create_poi_relations(session, poi_type, config, parcel_coords, parcel_ids)
+                create_poi_relations(loader, poi_type, config, parcel_coords, parcel_ids)
 
             # Verify and summarize
             verify_relations(session)
             show_summary(session)
 
+        loader.report()
+
     finally:
         driver.close()
 
@@ -10,36 +10,43 @@ Wymagane dla:
 
 Algorytm:
 1. Załaduj geometrie działek z GeoPackage
-2. Użyj spatial index (STRtree) do szybkiego wyszukiwania kandydatów
-3. Dla każdej pary sprawdź ST_Touches (wspólna granica)
-4. Oblicz długość wspólnej granicy
-5. Utwórz relację ADJACENT_TO z właściwością shared_border_m
+2. Podziel działki na kafle 2 km (po centroidzie), kafle liczone równolegle
+3. Dla kafla: jedno zbiorcze zapytanie STRtree (predicate='intersects')
+   zwraca pary indeksów; duplikaty odrzuca maska i < j
+4. Przecięcia i długości wspólnej granicy liczone wektorowo (shapely 2)
+5. Usuń stare relacje i utwórz ADJACENT_TO (CREATE) z właściwością
+   shared_border_m w kilku równoległych sesjach Neo4j
 
 Relacja:
 (p1:Parcel)-[:ADJACENT_TO {shared_border_m: 45.3}]->(p2:Parcel)
 
-UWAGA: Ten skrypt może zająć dużo czasu (2-4h) i pamięci (~16GB RAM).
-Zaleca się uruchomienie z parametrem --district dla pojedynczej dzielnicy.
+UWAGA: Ten skrypt potrzebuje dużo pamięci (~16GB RAM) - każdy proces
+trzyma wszystkie geometrie. Przy braku pamięci zmniejsz --workers.
 
 Użycie:
     python 27_create_adjacency_relations.py                    # wszystkie
     python 27_create_adjacency_relations.py --district Osowa   # pojedyncza dzielnica
     python 27_create_adjacency_relations.py --limit 10000      # pierwsze N działek
+    python 27_create_adjacency_relations.py --workers 4 --writers 4
+    python 27_create_adjacency_relations.py --admin-csv /data/admin-import  # neo4j-admin
 """
 
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Tuple
 import argparse
 
 import geopandas as gpd
 import numpy as np
+import shapely
 from shapely.strtree import STRtree
-from shapely.geometry import LineString
 from neo4j import GraphDatabase
 from loguru import logger
 
+from neo4j_bulk import WRITERS, AdminImportWriter, BulkLoader
+
 # Neo4j connection
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
@@ -81,110 +88,138 @@ def load_parcels(gpkg_path: Path, district: str = None, limit: int = None) -> gp
     return gdf
 
 
-def find_adjacent_pairs(gdf: gpd.GeoDataFrame) -> List[Tuple[str, str, float]]:
-    """Find all pairs of adjacent parcels using spatial index."""
-    logger.info("\nFinding adjacent parcel pairs...")
+# Pair detection: parcels are sharded into square tiles (by centroid); each
+# worker queries its tiles against an STRtree of ALL parcels, so pairs that
+# cross tile borders are found too (kept once via the i < j mask)
+ADJACENCY_TILE_M = 2000
+MIN_SHARED_BORDER_M = 0.1  # >10cm
+POLYGON_TYPE_IDS = (3, 6)  # shapely type ids of Polygon, MultiPolygon
 
-    # Build spatial index
-    logger.info("  Building spatial index...")
+# Set in each worker by _init_adjacency_worker
+_geometries = None
+_tree = None
 
-    # Get geometry and ID arrays for efficient access
-    geometries = gdf.geometry.values
-    parcel_ids = gdf['id_dzialki'].values
 
-    tree = STRtree(geometries)
+def _init_adjacency_worker(geometries: np.ndarray) -> None:
+    """Build the STRtree once per worker process."""
+    global _geometries, _tree
+    _geometries = geometries
+    _tree = STRtree(geometries)
+
+
+def _tile_adjacent_pairs(idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Adjacent pairs (i < j) with i in this tile: (i, j, shared border m)."""
+    # One bulk query: pairs[0] = position in idx, pairs[1] = global index
+    pairs = _tree.query(_geometries[idx], predicate="intersects")
+    i, j = idx[pairs[0]], pairs[1]
+    keep = i < j
+    i, j = i[keep], j[keep]
+
+    # Adjacency = 1-dimensional intersection; a polygon means overlap (data error)
+    intersection = shapely.intersection(_geometries[i], _geometries[j])
+    length = shapely.length(intersection)
+    keep = ~np.isin(shapely.get_type_id(intersection), POLYGON_TYPE_IDS) & (length > MIN_SHARED_BORDER_M)
+    return i[keep], j[keep], length[keep].round(2)
 
-    # Find adjacent pairs
-    adjacent_pairs = []
-    processed_pairs: Set[Tuple[str, str]] = set()
-
-    total = len(gdf)
-    for idx in range(total):
-        parcel_id = parcel_ids[idx]
-        geom = geometries[idx]
-
-        # Query spatial index for candidates - returns INDICES in Shapely 2.0+
-        candidate_indices = tree.query(geom)
-
-        for cand_idx in candidate_indices:
-            # Skip self
-            if cand_idx == idx:
-                continue
-
-            cand_id = parcel_ids[cand_idx]
-            cand_geom = geometries[cand_idx]
-
-            # Create canonical pair key (sorted IDs)
-            pair_key = tuple(sorted([parcel_id, cand_id]))
-            if pair_key in processed_pairs:
-                continue
-
-            processed_pairs.add(pair_key)
-
-            # Check if they share a boundary (touches OR intersects boundary)
-            # Using touches() is too strict - parcels with tiny overlaps won't match
-            # Check if boundaries intersect instead
-            try:
-                # First quick check: do bounding boxes touch?
-                if not geom.intersects(cand_geom):
-                    continue
-
-                # Check if it's a true adjacency (boundary touches boundary)
-                # Not a full overlap (which would mean data error)
-                intersection = geom.intersection(cand_geom)
-
-                if intersection.is_empty:
-                    continue
-
-                # For adjacency, intersection should be 1-dimensional (line/multiline)
-                # not 2-dimensional (polygon overlap)
-                if intersection.geom_type in ('Polygon', 'MultiPolygon'):
-                    # This is an overlap, not adjacency - skip
-                    # (or could be data error)
-                    continue
-
-                # Get length of shared boundary
-                if hasattr(intersection, 'length') and intersection.length > 0.1:  # >10cm
-                    shared_border = intersection.length
-                    adjacent_pairs.append((parcel_id, cand_id, round(shared_border, 2)))
-
-            except Exception as e:
-                logger.debug(f"  Error processing pair {pair_key}: {e}")
-                continue
-
-        if (idx + 1) % 10000 == 0 or idx + 1 == total:
-            logger.info(f"  Processed {idx + 1:,} / {total:,} parcels, found {len(adjacent_pairs):,} pairs")
+
+def find_adjacent_pairs(gdf: gpd.GeoDataFrame, workers: int = None) -> List[Tuple[str, str, float]]:
+    """Find all pairs of adjacent parcels (bulk STRtree queries over spatial tiles)."""
+    logger.info("\nFinding adjacent parcel pairs...")
+
+    # Get geometry and ID arrays for efficient access
+    geometries = gdf.geometry.to_numpy()
+    parcel_ids = gdf['id_dzialki'].to_numpy()
+
+    centroids = shapely.get_coordinates(shapely.centroid(geometries))
+    tile_keys = np.floor(centroids / ADJACENCY_TILE_M).astype(np.int64)
+    _, tile_of = np.unique(tile_keys, axis=0, return_inverse=True)
+    tile_of = tile_of.ravel()
+    order = np.argsort(tile_of, kind="stable")
+    tiles = np.split(order, np.flatnonzero(np.diff(tile_of[order])) + 1)
+
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"  {len(gdf):,} parcels in {len(tiles)} tiles of {ADJACENCY_TILE_M / 1000:.0f} km, "
+                f"{workers} workers")
+
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_adjacency_worker, initargs=(geometries,)
+    ) as executor:
+        futures = [executor.submit(_tile_adjacent_pairs, idx) for idx in tiles]
+        found = 0
+        for done, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            found += len(results[-1][0])
+            if done % 20 == 0 or done == len(futures):
+                logger.info(f"  Processed {done:,} / {len(futures):,} tiles, found {found:,} pairs")
+
+    # Keep pairs grouped by tile - writers then touch mostly disjoint nodes
+    adjacent_pairs = [
+        (parcel_ids[i], parcel_ids[j], float(border))
+        for tile_i, tile_j, tile_border in results
+        for i, j, border in zip(tile_i, tile_j, tile_border)
+    ]
 
     logger.info(f"\nTotal adjacent pairs found: {len(adjacent_pairs):,}")
     return adjacent_pairs
 
 
-def create_adjacency_relations(session, pairs: List[Tuple[str, str, float]]):
-    """Create ADJACENT_TO relations in Neo4j."""
-    logger.info("\nCreating ADJACENT_TO relations in Neo4j...")
+def delete_adjacency_relations(session, parcel_ids: List[str] = None):
+    """Remove existing ADJACENT_TO relations (so they can be CREATEd, not MERGEd).
+
+    With parcel_ids (--district / --limit runs) only relations between two
+    of those parcels are removed - exactly the pairs find_adjacent_pairs
+    recomputes. Edges to parcels outside the subset are kept, since the
+    STRtree covers only the loaded parcels and would not recreate them.
+    """
+    logger.info("\nDeleting existing ADJACENT_TO relations...")
+    if parcel_ids is None:
+        result = session.run("""
+            MATCH ()-[r:ADJACENT_TO]->()
+            CALL { WITH r DELETE r } IN TRANSACTIONS OF 50000 ROWS
+            RETURN count(r) AS deleted
+        """)
+        logger.info(f"  Deleted {result.single()['deleted']:,} relations")
+        return
+
+    deleted = 0
+    for i in range(0, len(parcel_ids), BATCH_SIZE):
+        result = session.run("""
+            UNWIND $batch AS id
+            MATCH (a:Parcel {id_dzialki: id})-[r:ADJACENT_TO]-(b:Parcel)
+            WHERE a.id_dzialki IN $batch AND b.id_dzialki IN $ids
+            WITH DISTINCT r
+            DELETE r
+            RETURN count(r) AS deleted
+        """, {"batch": parcel_ids[i:i + BATCH_SIZE], "ids": parcel_ids})
+        deleted += result.single()["deleted"]
+    logger.info(f"  Deleted {deleted:,} relations")
+
+
+def adjacency_rows(pairs: List[Tuple[str, str, float]]) -> List[Dict]:
+    return [{"id1": p[0], "id2": p[1], "shared_border_m": p[2]} for p in pairs]
+
+
+def create_adjacency_relations(loader: BulkLoader, pairs: List[Tuple[str, str, float]]):
+    """Create ADJACENT_TO relations in Neo4j with parallel sessions.
+
+    Relations were deleted beforehand, so plain CREATE is safe.
+    """
+    logger.info(f"\nCreating ADJACENT_TO relations in Neo4j ({loader.writers} writers)...")
 
     if not pairs:
         logger.warning("  No pairs to create")
         return
 
-    # Create relations in batches
     query = """
     UNWIND $batch AS row
     MATCH (p1:Parcel {id_dzialki: row.id1})
     MATCH (p2:Parcel {id_dzialki: row.id2})
-    MERGE (p1)-[r:ADJACENT_TO]->(p2)
-    SET r.shared_border_m = row.border
+    CREATE (p1)-[:ADJACENT_TO {shared_border_m: row.shared_border_m}]->(p2)
     """
-
-    total = len(pairs)
-    for i in range(0, total, BATCH_SIZE):
-        batch = [{"id1": p[0], "id2": p[1], "border": p[2]} for p in pairs[i:i + BATCH_SIZE]]
-        session.run(query, {"batch": batch})
-
-        if (i + BATCH_SIZE) % 20000 == 0 or i + BATCH_SIZE >= total:
-            logger.info(f"  Created {min(i + BATCH_SIZE, total):,} / {total:,} relations")
-
-    logger.info(f"Created {total:,} ADJACENT_TO relations")
+    # Pairs are grouped by tile - contiguous slices keep writers on mostly disjoint nodes
+    loader.load("ADJACENT_TO", query, adjacency_rows(pairs))
+    logger.info(f"Created {len(pairs):,} ADJACENT_TO relations")
 
 
 def verify_relations(session):
@@ -243,6 +278,11 @@ def main():
     parser = argparse.ArgumentParser(description="Create adjacency relations")
     parser.add_argument("--district", type=str, help="Process only this district")
     parser.add_argument("--limit", type=int, help="Limit number of parcels")
+    parser.add_argument("--workers", type=int, help="Processes for pair detection (default: all cores)")
+    parser.add_argument("--writers", type=int, default=WRITERS, help="Parallel Neo4j sessions")
+    parser.add_argument("--admin-csv", type=str,
+                        help="Write rels_ADJACENT_TO.csv for neo4j-admin import to this directory "
+                             "instead of loading into Neo4j")
     args = parser.parse_args()
 
     logger.info("=" * 60)
@@ -263,20 +303,32 @@ def main():
         return
 
     # Find adjacent pairs
-    pairs = find_adjacent_pairs(gdf)
+    pairs = find_adjacent_pairs(gdf, args.workers)
 
     if len(pairs) == 0:
         logger.warning("No adjacent pairs found")
         return
 
+    if args.admin_csv:
+        AdminImportWriter(args.admin_csv).relationships(
+            "ADJACENT_TO", adjacency_rows(pairs), "id1", "Parcel", "id2", "Parcel",
+        )
+        logger.info(f"Run: python neo4j_bulk.py import {args.admin_csv}")
+        return
+
     # Connect to Neo4j and create relations
     driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    loader = BulkLoader(driver, writers=args.writers, batch_size=BATCH_SIZE)
 
     try:
+        partial = args.district or args.limit
+        with driver.session() as session:
+            delete_adjacency_relations(session, list(gdf['id_dzialki']) if partial else None)
+        create_adjacency_relations(loader, pairs)
         with driver.session() as session:
-            create_adjacency_relations(session, pairs)
             verify_relations(session)
             analyze_graph_stats(session)
+        loader.report()
 
     finally:
         driver.close()
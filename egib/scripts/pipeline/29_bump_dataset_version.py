@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+29_bump_dataset_version.py - Stamp the imported dataset with a new version
+
+Writes a single (:DatasetVersion {id: "current"}) node to Neo4j. The backend
+reads it (app.services.dataset_version) to invalidate in-process snapshots
+such as the columnar parcel store after a pipeline run.
+
+Run as the last step of every import.
+
+Usage:
+    python 29_bump_dataset_version.py                 # version = UTC timestamp
+    python 29_bump_dataset_version.py --version v2.1  # explicit version
+"""
+
+import os
+import argparse
+from datetime import datetime, timezone
+
+from neo4j import GraphDatabase
+from loguru import logger
+
+# Neo4j connection
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+
+
+def bump_version(version: str):
+    """Write the version stamp node."""
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+
+    with driver.session() as session:
+        result = session.run("""
+            MATCH (p:Parcel) WITH count(p) AS parcels
+            MERGE (v:DatasetVersion {id: 'current'})
+            WITH v, parcels, v.version AS previous
+            SET v.version = $version,
+                v.parcel_count = parcels,
+                v.updated_at = datetime()
+            RETURN previous, parcels
+        """, version=version)
+        r = result.single()
+        logger.info(f"Dataset version: {r['previous']} -> {version} ({r['parcels']:,} parcels)")
+
+    driver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bump dataset version stamp in Neo4j")
+    parser.add_argument("--version", help="Version string (default: UTC timestamp)")
+    args = parser.parse_args()
+
+    version = args.version or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    bump_version(version)
+    logger.info("Done!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+30_materialize_district_stats.py - Materialize aggregates on District / City
+
+Writes per-district and per-city parcel aggregates as node properties, so
+location stats (parcel counts, centroids, category distributions, built /
+residential shares) are read in O(1) instead of scanning parcels:
+
+- parcel_count
+- sum_area / n_area, sum_quietness / n_quietness
+- sum_lat / sum_lon / n_centroid (average parcel centroid)
+- n_built, n_residential, n_residential_zone, n_mpzp, n_road_access
+- quietness_categories / quietness_counts, nature_categories / nature_counts
+
+Only sums and counts are stored, so the backend can merge districts
+(name prefixes) and subtract single parcels exactly. Every node is stamped
+with stats_version = the current DatasetVersion; the backend
+(app.services.district_stats) ignores stats with a stale stamp and
+re-materializes them itself.
+
+Run after 29_bump_dataset_version.py.
+
+Usage:
+    python 30_materialize_district_stats.py
+"""
+
+import os
+import argparse
+import importlib.util
+from pathlib import Path
+
+from neo4j import GraphDatabase
+from loguru import logger
+
+# Neo4j connection
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+
+# Materialization queries shared with the backend (app.services.district_stats)
+# - loaded by path to avoid importing the backend's dependencies and config
+backend_path = Path(__file__).resolve().parent.parent.parent.parent / "backend"
+_spec = importlib.util.spec_from_file_location(
+    "district_stats_queries", backend_path / "app" / "services" / "district_stats_queries.py",
+)
+_queries = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_queries)
+
+LEVELS = {
+    "District": _queries.MATERIALIZE_DISTRICTS,
+    "City": _queries.MATERIALIZE_CITIES,
+}
+
+
+def materialize(version: str = None):
+    """Write aggregates on District and City nodes."""
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+
+    with driver.session() as session:
+        if version is None:
+            r = session.run(
+                "MATCH (v:DatasetVersion {id: 'current'}) RETURN v.version AS version"
+            ).single()
+            if r is None or not r["version"]:
+                logger.error("No DatasetVersion stamp - run 29_bump_dataset_version.py first")
+                driver.close()
+                return
+            version = r["version"]
+
+        for label, query in LEVELS.items():
+            r = session.run(query, version=version).single()
+            logger.info(f"{label}: {r['nodes']:,} nodes, {r['parcels'] or 0:,} parcels "
+                        f"(stats_version {version})")
+
+    driver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize District/City aggregates in Neo4j")
+    parser.add_argument("--version", help="Stamp (default: current DatasetVersion)")
+    args = parser.parse_args()
+
+    materialize(args.version)
+    logger.info("Done!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+landcover_raster.py - Raster land-cover engine for buffer statistics
+
+Fast alternative to the exact polygon overlays of compute_buffer_stats()
+(05_feature_engineering.py). The BDOT10k forest and water layers are
+rasterized once to a regular grid (cell-center coverage, 0/1) and buildings
+are counted per cell (by centroid). Each raster is stored as row-wise
+prefix sums in a .npy file that is memory-mapped on load, so the sum over
+any disc is one O(1) difference per disc row:
+
+    sum(row, c0..c1) = prefix[row, c1 + 1] - prefix[row, c0]
+
+A radius is just a different set of row spans, so extra radii (250 m,
+1 km, ...) cost a few seconds for all parcels instead of a full overlay.
+
+Rasters are rebuilt only when the source layers, the cell size or the
+extent change (recorded in grid.json).
+
+Output (default egib/data/processed/landcover/):
+  - grid.json          origin, cell size, shape, source fingerprint
+  - forest.npy         uint32 prefix sums of forest coverage
+  - water.npy          uint32 prefix sums of water coverage
+  - buildings.npy      uint32 prefix sums of building counts
+
+Usage (as a library, see 05_feature_engineering.py --buffer-engine raster):
+    from landcover_raster import load_or_build, buffer_features
+
+Usage (standalone, prebuild the rasters):
+    python landcover_raster.py [--cell 10]
+"""
+
+import argparse
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASE_PATH = Path("/home/marcin/moja-dzialka/egib")
+DATA_PATH = BASE_PATH / "data" / "processed"
+BDOT_PATH = BASE_PATH / "data" / "bdot10k_trojmiasto"
+RASTER_PATH = DATA_PATH / "landcover"
+
+RASTER_CELL_M = 10.0
+# Raster extent = parcel bounds + this margin (largest supported radius)
+RASTER_MARGIN_M = 2000.0
+# Cell rows rasterized per contains_xy call (bounds memory for large polygons)
+ROW_BLOCK = 256
+
+# Area layers (fraction of covered cells) and count layers (features per cell)
+COVERAGE_LAYERS = {
+    "forest": "lasy.gpkg",
+    "water": "wody.gpkg",
+}
+COUNT_LAYERS = {
+    "buildings": "budynki.gpkg",
+}
+
+
+@dataclass
+class Grid:
+    """Regular grid in EPSG:2180; row 0 is the southern edge."""
+    x0: float
+    y0: float
+    cell: float
+    rows: int
+    cols: int
+    source: str = ""
+
+    @classmethod
+    def covering(cls, bounds: Iterable[float], cell: float, source: str = "") -> "Grid":
+        minx, miny, maxx, maxy = bounds
+        x0 = np.floor((minx - RASTER_MARGIN_M) / cell) * cell
+        y0 = np.floor((miny - RASTER_MARGIN_M) / cell) * cell
+        cols = int(np.ceil((maxx + RASTER_MARGIN_M - x0) / cell))
+        rows = int(np.ceil((maxy + RASTER_MARGIN_M - y0) / cell))
+        return cls(float(x0), float(y0), float(cell), rows, cols, source)
+
+    def cell_of(self, xy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(row, col) of the cells containing the points (may be out of range)."""
+        col = np.floor((xy[:, 0] - self.x0) / self.cell).astype(np.int64)
+        row = np.floor((xy[:, 1] - self.y0) / self.cell).astype(np.int64)
+        return row, col
+
+    def contains(self, other: "Grid") -> bool:
+        """True if this grid is the same raster as `other` or a superset of it."""
+        return (
+            self.cell == other.cell and self.source == other.source
+            and self.x0 <= other.x0 and self.y0 <= other.y0
+            and self.x0 + self.cols * self.cell >= other.x0 + other.cols * other.cell
+            and self.y0 + self.rows * self.cell >= other.y0 + other.rows * other.cell
+        )
+
+
+def source_fingerprint() -> str:
+    """Size + mtime of the source layers - rasters are rebuilt when they change."""
+    parts = []
+    for filename in {**COVERAGE_LAYERS, **COUNT_LAYERS}.values():
+        path = BDOT_PATH / filename
+        stat = path.stat()
+        parts.append(f"{filename}:{stat.st_size}:{int(stat.st_mtime)}")
+    return ";".join(parts)
+
+
+def rasterize_coverage(geoms: np.ndarray, grid: Grid) -> np.ndarray:
+    """0/1 raster: cell centers inside any of the polygons."""
+    raster = np.zeros((grid.rows, grid.cols), dtype=np.uint8)
+    bounds = shapely.bounds(geoms)
+    # Index range [c0, c1) x [r0, r1) of the cell centers inside each bbox
+    c0 = np.clip(np.ceil((bounds[:, 0] - grid.x0) / grid.cell - 0.5).astype(np.int64), 0, grid.cols)
+    c1 = np.clip(np.floor((bounds[:, 2] - grid.x0) / grid.cell - 0.5).astype(np.int64) + 1, 0, grid.cols)
+    r0 = np.clip(np.ceil((bounds[:, 1] - grid.y0) / grid.cell - 0.5).astype(np.int64), 0, grid.rows)
+    r1 = np.clip(np.floor((bounds[:, 3] - grid.y0) / grid.cell - 0.5).astype(np.int64) + 1, 0, grid.rows)
+
+    for i, geom in enumerate(geoms):
+        if c0[i] >= c1[i] or r0[i] >= r1[i]:
+            continue  # smaller than a cell - no cell center inside
+        shapely.prepare(geom)
+        xs = grid.x0 + (np.arange(c0[i], c1[i]) + 0.5) * grid.cell
+        for rb in range(r0[i], r1[i], ROW_BLOCK):
+            re = min(rb + ROW_BLOCK, r1[i])
+            ys = grid.y0 + (np.arange(rb, re) + 0.5) * grid.cell
+            inside = shapely.contains_xy(geom, xs[None, :], ys[:, None])
+            raster[rb:re, c0[i]:c1[i]] |= inside.astype(np.uint8)
+    return raster
+
+
+def rasterize_counts(points: np.ndarray, grid: Grid) -> np.ndarray:
+    """Number of points per cell."""
+    raster = np.zeros((grid.rows, grid.cols), dtype=np.uint32)
+    row, col = grid.cell_of(points)
+    ok = (row >= 0) & (row < grid.rows) & (col >= 0) & (col < grid.cols)
+    np.add.at(raster, (row[ok], col[ok]), 1)
+    return raster
+
+
+def row_prefix(raster: np.ndarray) -> np.ndarray:
+    """Row-wise prefix sums with a leading zero column (rows x cols + 1)."""
+    prefix = np.zeros((raster.shape[0], raster.shape[1] + 1), dtype=np.uint32)
+    np.cumsum(raster, axis=1, dtype=np.uint32, out=prefix[:, 1:])
+    return prefix
+
+
+def _load_layer(filename: str, crs) -> np.ndarray:
+    layer = gpd.read_file(BDOT_PATH / filename)
+    if crs is not None and layer.crs != crs:
+        layer = layer.to_crs(crs)
+    return layer.geometry[layer.geometry.notna() & ~layer.geometry.is_empty].to_numpy()
+
+
+def build(grid: Grid, out_dir: Path = RASTER_PATH, crs=None) -> None:
+    """Rasterize all layers onto `grid` and store prefix sums in out_dir."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "grid.json").unlink(missing_ok=True)
+    logger.info(f"Rasterizing land cover: {grid.rows:,} x {grid.cols:,} cells of {grid.cell:g} m")
+
+    for name, filename in {**COVERAGE_LAYERS, **COUNT_LAYERS}.items():
+        start = time.time()
+        geoms = _load_layer(filename, crs)
+        if name in COVERAGE_LAYERS:
+            raster = rasterize_coverage(geoms, grid)
+            detail = f"{raster.mean() * 100:.1f}% covered"
+        else:
+            raster = rasterize_counts(shapely.get_coordinates(shapely.centroid(geoms)), grid)
+            detail = f"{int(raster.sum()):,} features"
+        np.save(out_dir / f"{name}.npy", row_prefix(raster))
+        logger.info(f"  {name}: {len(geoms):,} geometries, {detail} ({time.time() - start:.0f}s)")
+        del raster
+
+    # grid.json last - it marks the rasters as complete
+    (out_dir / "grid.json").write_text(json.dumps(asdict(grid), indent=2))
+
+
+def load(out_dir: Path = RASTER_PATH) -> Tuple[Grid, Dict[str, np.ndarray]]:
+    """Grid and memory-mapped prefix sums per layer."""
+    grid = Grid(**json.loads((out_dir / "grid.json").read_text()))
+    layers = {
+        name: np.load(out_dir / f"{name}.npy", mmap_mode="r")
+        for name in {**COVERAGE_LAYERS, **COUNT_LAYERS}
+    }
+    return grid, layers
+
+
+def load_or_build(
+    bounds: Iterable[float],
+    cell: float = RASTER_CELL_M,
+    out_dir: Path = RASTER_PATH,
+    crs=None,
+) -> Tuple[Grid, Dict[str, np.ndarray]]:
+    """Reuse the stored rasters if they cover `bounds` at `cell`, else rebuild."""
+    wanted = Grid.covering(bounds, cell, source_fingerprint())
+    if (out_dir / "grid.json").exists():
+        grid, layers = load(out_dir)
+        if grid.contains(wanted):
+            logger.info(f"Using land-cover rasters from {out_dir} ({grid.cell:g} m)")
+            return grid, layers
+        logger.info("Land-cover rasters are stale or too small - rebuilding")
+    build(wanted, out_dir, crs)
+    return load(out_dir)
+
+
+def disc_spans(radius_m: float, cell: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Row offsets and half-widths (cells) of a disc of cell centers."""
+    r = int(np.floor(radius_m / cell))
+    dy = np.arange(-r, r + 1)
+    half = np.floor(np.sqrt(np.maximum((radius_m / cell) ** 2 - dy ** 2, 0))).astype(np.int64)
+    return dy, half
+
+
+def disc_sums(prefix: np.ndarray, grid: Grid, xy: np.ndarray, radius_m: float) -> np.ndarray:
+    """Raster sum over a disc around each point (cells outside the grid count as 0)."""
+    row, col = grid.cell_of(xy)
+    total = np.zeros(len(xy), dtype=np.int64)
+    for dy, half in zip(*disc_spans(radius_m, grid.cell)):
+        r = row + dy
+        ok = (r >= 0) & (r < grid.rows)
+        c0 = np.clip(col - half, 0, grid.cols)
+        c1 = np.clip(col + half + 1, 0, grid.cols)
+        ok &= c1 > c0
+        total[ok] += prefix[r[ok], c1[ok]].astype(np.int64) - prefix[r[ok], c0[ok]]
+    return total
+
+
+def buffer_features(
+    grid: Grid,
+    layers: Dict[str, np.ndarray],
+    xy: np.ndarray,
+    radii: Iterable[int] = (500,),
+) -> Dict[str, np.ndarray]:
+    """
+    Land-cover features per point for each radius.
+
+    Returns:
+        {"pct_forest_500m": ..., "pct_water_500m": ..., "count_buildings_500m": ...}
+        (same names and units as compute_buffer_stats)
+    """
+    features = {}
+    for radius in radii:
+        disc_cells = int((2 * disc_spans(radius, grid.cell)[1] + 1).sum())
+        for name in COVERAGE_LAYERS:
+            pct = disc_sums(layers[name], grid, xy, radius) / disc_cells * 100
+            features[f"pct_{name}_{radius}m"] = pct.round(1)
+        for name in COUNT_LAYERS:
+            features[f"count_{name}_{radius}m"] = disc_sums(layers[name], grid, xy, radius)
+    return features
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rasterize BDOT10k land cover for buffer statistics")
+    parser.add_argument("--cell", type=float, default=RASTER_CELL_M, help="Cell size in meters")
+    parser.add_argument("--output", default=str(RASTER_PATH), help="Output directory")
+    args = parser.parse_args()
+
+    parcels = gpd.read_file(DATA_PATH / "parcels_enriched.gpkg", columns=["id_dzialki"])
+    load_or_build(parcels.total_bounds, args.cell, Path(args.output), parcels.crs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+neo4j_bulk.py - Shared bulk loading for the Neo4j import stages
+
+Used by 16_import_neo4j_full.py, 24_import_parcels_v2.py,
+25_create_poi_relations.py and 27_create_adjacency_relations.py.
+
+Two modes:
+
+1. Incremental (live database) - BulkLoader
+   Rows are split into `writers` disjoint partitions by a key (e.g.
+   id_dzialki), so no two sessions ever MERGE the same node; each partition
+   is written by its own session in UNWIND batches. Batches run as managed
+   write transactions (retried on deadlocks / transient errors). Stages use
+   CREATE instead of MERGE when the target label / relation type is empty,
+   i.e. uniqueness is already guaranteed. Every stage reports rows/s.
+
+2. Fresh build (offline) - AdminImportWriter
+   Stages write node / relationship CSVs in the neo4j-admin header format
+   into one directory; `neo4j_bulk.py import <dir>` then runs
+   `neo4j-admin database import full` on everything in it (the database
+   must be stopped; the import replaces it). Afterwards recreate the
+   constraints / indexes (21_create_neo4j_schema_v2.py) and the relations
+   derived by Cypher (categories, districts) against the live database,
+   e.g. 24_import_parcels_v2.py --relations-only.
+
+Usage:
+    from neo4j_bulk import BulkLoader, AdminImportWriter
+
+    loader = BulkLoader(driver, writers=4)
+    verb = "MERGE" if loader.exists("(:Parcel)") else "CREATE"
+    loader.load("Parcel nodes", query, rows, key="id_dzialki")
+    loader.report()
+
+    python neo4j_bulk.py import /data/admin-import [--database neo4j] [--dry-run]
+"""
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from loguru import logger
+
+BATCH_SIZE = 5000
+WRITERS = 4
+
+NEO4J_ADMIN = os.getenv("NEO4J_ADMIN", "neo4j-admin")
+ARRAY_DELIMITER = ";"
+
+Key = Union[str, Callable[[Dict[str, Any]], Any]]
+
+
+@dataclass
+class StageStats:
+    """Rows written by one stage and how long it took."""
+    stage: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def _partition(rows: Sequence[Dict[str, Any]], key: Optional[Key], n: int) -> List[List[Dict[str, Any]]]:
+    """Split rows into n partitions; equal keys always land in the same one."""
+    if n <= 1:
+        return [list(rows)]
+    if key is None:
+        # No key: contiguous slices (keeps spatially grouped input together)
+        size = (len(rows) + n - 1) // n
+        return [list(rows[i:i + size]) for i in range(0, len(rows), size)]
+
+    get = key if callable(key) else (lambda row: row[key])
+    partitions: List[List[Dict[str, Any]]] = [[] for _ in range(n)]
+    for row in rows:
+        # crc32 - stable across processes, unlike hash() of str
+        partitions[zlib.crc32(str(get(row)).encode()) % n].append(row)
+    return [p for p in partitions if p]
+
+
+class BulkLoader:
+    """Parallel UNWIND loader over disjoint row partitions."""
+
+    def __init__(self, driver, writers: int = WRITERS, batch_size: int = BATCH_SIZE):
+        self.driver = driver
+        self.writers = max(1, writers)
+        self.batch_size = batch_size
+        self.stats: List[StageStats] = []
+
+    def exists(self, pattern: str) -> bool:
+        """True if the graph has any match for a pattern, e.g. "(:Parcel)" or "()-[:ADJACENT_TO]->()"."""
+        with self.driver.session() as session:
+            return session.run(f"RETURN EXISTS {{ MATCH {pattern} }} AS found").single()["found"]
+
+    def load(
+        self,
+        stage: str,
+        query: str,
+        rows: Sequence[Dict[str, Any]],
+        key: Optional[Key] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> StageStats:
+        """
+        Run `query` (UNWIND $batch AS row ...) over all rows in parallel sessions.
+
+        Args:
+            stage: Name used in progress and rows/s logs
+            query: Cypher with a $batch parameter
+            rows: Row dicts
+            key: Partition key (field name or function). Rows with equal keys
+                are written by the same session, so concurrent MERGEs never
+                race on one node. Without a key rows are split into
+                contiguous slices.
+            params: Extra query parameters
+        """
+        total = len(rows)
+        if total == 0:
+            logger.warning(f"  {stage}: no rows")
+            return StageStats(stage, 0, 0.0)
+
+        partitions = _partition(rows, key, self.writers)
+        done = 0
+        lock = threading.Lock()
+        start = time.time()
+
+        def write_partition(partition: List[Dict[str, Any]]) -> int:
+            nonlocal done
+            with self.driver.session() as session:
+                for i in range(0, len(partition), self.batch_size):
+                    batch = partition[i:i + self.batch_size]
+                    session.execute_write(
+                        lambda tx: tx.run(query, {**(params or {}), "batch": batch}).consume()
+                    )
+                    with lock:
+                        before, done = done, done + len(batch)
+                        step = self.batch_size * 10
+                        if before // step != done // step or done == total:
+                            logger.info(f"  {stage}: {done:,} / {total:,}")
+            return len(partition)
+
+        with ThreadPoolExecutor(max_workers=len(partitions)) as executor:
+            written = sum(executor.map(write_partition, partitions))
+
+        stats = StageStats(stage, written, time.time() - start)
+        self.stats.append(stats)
+        logger.info(f"  {stage}: {stats.rows:,} rows in {stats.seconds:.1f}s "
+                    f"({stats.rows_per_s:,.0f} rows/s, {len(partitions)} sessions)")
+        return stats
+
+    def report(self) -> None:
+        """Log rows/s of every stage loaded so far."""
+        if not self.stats:
+            return
+        logger.info("\n  Bulk load summary:")
+        for s in self.stats:
+            logger.info(f"    {s.stage:<40} {s.rows:>10,} rows  {s.seconds:>7.1f}s  {s.rows_per_s:>10,.0f} rows/s")
+
+
+def _csv_type(values: Sequence[Any]) -> str:
+    """neo4j-admin header type of a column ('' = string)."""
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds:
+        return ""
+    if kinds == {bool}:
+        return ":boolean"
+    if kinds == {int}:
+        return ":long"
+    if kinds <= {int, float}:
+        return ":double"
+    return ""
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+class AdminImportWriter:
+    """Node / relationship CSVs for `neo4j-admin database import full`.
+
+    Files are named nodes_<Label>.csv and rels_<TYPE>.csv; ids use one id
+    space per label, so the same string can be an id in two labels.
+    """
+
+    def __init__(self, out_dir: Union[str, Path]):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+
+    def _write(self, path: Path, header: List[str], columns: List[str], rows: Sequence[Dict[str, Any]]) -> Path:
+        start = time.time()
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow([_csv_value(row.get(c)) for c in columns])
+        os.replace(tmp, path)
+        elapsed = time.time() - start
+        logger.info(f"  {path.name}: {len(rows):,} rows ({len(rows) / max(elapsed, 1e-9):,.0f} rows/s)")
+        return path
+
+    def nodes(
+        self,
+        label: str,
+        rows: Sequence[Dict[str, Any]],
+        id_field: str,
+        properties: Optional[List[str]] = None,
+    ) -> Path:
+        """Write nodes_<label>.csv; id_field is the :ID and stays a property."""
+        properties = [p for p in (properties or list(rows[0].keys() if rows else [])) if p != id_field]
+        header = [f"{id_field}:ID({label})"] + [
+            f"{p}{_csv_type([r.get(p) for r in rows])}" for p in properties
+        ]
+        return self._write(self.out_dir / f"nodes_{label}.csv", header, [id_field] + properties, rows)
+
+    def relationships(
+        self,
+        rel_type: str,
+        rows: Sequence[Dict[str, Any]],
+        start: str,
+        start_label: str,
+        end: str,
+        end_label: str,
+        properties: Optional[List[str]] = None,
+    ) -> Path:
+        """Write rels_<rel_type>.csv from rows with start / end id fields."""
+        properties = properties or [k for k in (rows[0].keys() if rows else []) if k not in (start, end)]
+        header = [f":START_ID({start_label})", f":END_ID({end_label})"] + [
+            f"{p}{_csv_type([r.get(p) for r in rows])}" for p in properties
+        ]
+        return self._write(self.out_dir / f"rels_{rel_type}.csv", header, [start, end] + properties, rows)
+
+
+def admin_import_command(csv_dir: Path, database: str = "neo4j") -> List[str]:
+    """neo4j-admin command importing every nodes_* / rels_* CSV in csv_dir."""
+    command = [
+        NEO4J_ADMIN, "database", "import", "full",
+        "--overwrite-destination",
+        "--skip-bad-relationships",
+        f"--array-delimiter={ARRAY_DELIMITER}",
+    ]
+    for path in sorted(csv_dir.glob("nodes_*.csv")):
+        command.append(f"--nodes={path.stem[len('nodes_'):]}={path}")
+    for path in sorted(csv_dir.glob("rels_*.csv")):
+        command.append(f"--relationships={path.stem[len('rels_'):]}={path}")
+    command.append(database)
+    return command
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Neo4j bulk import helpers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("import", help="Run neo4j-admin database import on a CSV directory")
+    run.add_argument("csv_dir", help="Directory with nodes_*.csv / rels_*.csv")
+    run.add_argument("--database", default="neo4j", help="Target database (must be stopped)")
+    run.add_argument("--dry-run", action="store_true", help="Only print the command")
+    args = parser.parse_args()
+
+    csv_dir = Path(args.csv_dir)
+    command = admin_import_command(csv_dir, args.database)
+    if not any(arg.startswith("--nodes=") for arg in command):
+        logger.error(f"No nodes_*.csv in {csv_dir}")
+        return 1
+
+    logger.info(" ".join(command))
+    if args.dry_run:
+        return 0
+
+    start = time.time()
+    result = subprocess.run(command)
+    logger.info(f"neo4j-admin finished with code {result.returncode} in {time.time() - start:.0f}s")
+    return result.returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
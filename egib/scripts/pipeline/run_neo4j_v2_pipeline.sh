@@ -9,6 +9,8 @@
 # 5. 25_create_poi_relations.py - Relacje NEAR_* z odległościami
 # 6. 26_generate_parcel_embeddings.py - Embeddingi 256-dim
 # 7. 27_create_adjacency_relations.py - Relacje sąsiedztwa (opcjonalnie)
+# 8. 29_bump_dataset_version.py - Nowa wersja danych (unieważnia cache backendu)
+# 9. 30_materialize_district_stats.py - Agregaty na węzłach District/City
 #
 # Użycie:
 #   ./run_neo4j_v2_pipeline.sh              # wszystko
@@ -114,6 +116,14 @@ if [ "$SKIP_ADJACENCY" = false ]; then
     run_script "27_create_adjacency_relations.py"
 fi
 
+echo ""
+echo "=== Phase 8: Dataset Version ==="
+run_script "29_bump_dataset_version.py"
+
+echo ""
+echo "=== Phase 9: District Stats ==="
+run_script "30_materialize_district_stats.py"
+
 # End time
 END_TIME=$(date +%s)
 DURATION=$((END_TIME - START_TIME))
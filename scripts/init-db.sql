@@ -26,6 +26,12 @@ CREATE TABLE IF NOT EXISTS parcels (
     -- Geometry (EPSG:2180 - Polish national CRS)
     geom GEOMETRY(Polygon, 2180),
 
+    -- Precomputed WGS84 output (scripts/pipeline/precompute_wgs84.py)
+    geom_4326 GEOMETRY(Geometry, 4326),
+    centroid_4326 GEOMETRY(Point, 4326),
+    geojson_4326 TEXT,
+    twkb_4326 BYTEA,
+
     -- Centroid in WGS84 for frontend display
     centroid_lat DOUBLE PRECISION,
     centroid_lon DOUBLE PRECISION,
@@ -86,6 +92,8 @@ CREATE TABLE IF NOT EXISTS parcels (
 
 -- Spatial index (critical for geometry queries)
 CREATE INDEX IF NOT EXISTS idx_parcels_geom ON parcels USING GIST(geom);
+CREATE INDEX IF NOT EXISTS idx_parcels_geom_4326 ON parcels USING GIST(geom_4326);
+CREATE INDEX IF NOT EXISTS idx_parcels_centroid_4326 ON parcels USING GIST(centroid_4326);
 
 -- Administrative indexes
 CREATE INDEX IF NOT EXISTS idx_parcels_gmina ON parcels(gmina);
@@ -143,7 +151,7 @@ SELECT
     quietness_score,
     nature_score,
     accessibility_score,
-    ST_Transform(geom, 4326) as geom_wgs84,
+    COALESCE(geom_4326, ST_Transform(geom, 4326)) as geom_wgs84,
     centroid_lat,
     centroid_lon
 FROM parcels;
@@ -296,6 +296,11 @@ def main():
     if not args.skip_indexes:
         create_indexes(args.host, args.port, args.db, args.user, args.password)
 
+    # Phase 3b: WGS84 geometry columns (dropped by ogr2ogr -overwrite)
+    if not args.only or "parcels_enriched.gpkg" in args.only:
+        from precompute_wgs84 import precompute_wgs84
+        precompute_wgs84(args.host, args.port, args.db, args.user, args.password)
+
     # Phase 4: Verify
     verify_import(args.host, args.port, args.db, args.user, args.password)
 
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+precompute_wgs84.py - Materialize WGS84 geometry for parcels in PostGIS
+
+The backend serves parcel geometry to the map in WGS84 (EPSG:4326), while
+parcels.geom is stored in EPSG:2180. Instead of ST_Transform on every
+request, this step stores per parcel:
+
+- geom_4326      simplified (0.5 m in EPSG:2180) WGS84 geometry, GIST index
+- centroid_4326  WGS84 centroid point, GIST index
+- geojson_4326   precomputed ST_AsGeoJSON(geom_4326, 6) text (~0.1 m precision)
+- twkb_4326      precomputed ST_AsTWKB(geom_4326, 6) bytes (compact transport)
+
+Must be re-run after every parcels import (ogr2ogr -overwrite drops the
+columns). import_postgis.py calls it after importing parcels; the backend
+(app.services.spatial_service) falls back to ST_Transform when the columns
+are missing or empty for a parcel.
+
+Usage:
+    python precompute_wgs84.py [--host localhost] [--batch-size 50000]
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import time
+from pathlib import Path
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Default connection
+DEFAULT_HOST = os.environ.get("POSTGRES_HOST", "localhost")
+DEFAULT_PORT = os.environ.get("POSTGRES_PORT", "5432")
+DEFAULT_DB = os.environ.get("POSTGRES_DB", "moja_dzialka")
+DEFAULT_USER = os.environ.get("POSTGRES_USER", "app")
+DEFAULT_PASSWORD = os.environ.get("POSTGRES_PASSWORD", "password")
+
+# Simplification tolerance in EPSG:2180 meters (invisible below zoom ~20)
+SIMPLIFY_TOLERANCE_M = 0.5
+# Column list and coordinate precision shared with the backend reader -
+# loaded by path to avoid importing the backend's dependencies and config
+_columns_path = Path(__file__).resolve().parent.parent.parent / "backend" / "app" / "services" / "wgs84_columns.py"
+_spec = importlib.util.spec_from_file_location("wgs84_columns", _columns_path)
+_wgs84_columns = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_wgs84_columns)
+COLUMNS = _wgs84_columns.PRECOMPUTED_COLUMNS
+# Decimal digits of the GeoJSON / TWKB coordinates (1e-6 deg ~ 0.1 m)
+PRECISION = _wgs84_columns.COORD_PRECISION
+
+UPDATE_BATCH = f"""
+    UPDATE parcels p
+    SET geom_4326 = g.geom_4326,
+        centroid_4326 = ST_Transform(ST_Centroid(p.geom), 4326),
+        geojson_4326 = ST_AsGeoJSON(g.geom_4326, {PRECISION}),
+        twkb_4326 = ST_AsTWKB(g.geom_4326, {PRECISION})
+    FROM (
+        SELECT gid, ST_Transform(
+            ST_SimplifyPreserveTopology(geom, {SIMPLIFY_TOLERANCE_M}), 4326
+        ) AS geom_4326
+        FROM parcels
+        WHERE gid >= %(start)s AND gid < %(end)s AND geom IS NOT NULL
+    ) g
+    WHERE p.gid = g.gid
+"""
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_parcels_geom_4326 ON parcels USING GIST (geom_4326)",
+    "CREATE INDEX IF NOT EXISTS idx_parcels_centroid_4326 ON parcels USING GIST (centroid_4326)",
+]
+
+
+def precompute_wgs84(
+    host: str,
+    port: str,
+    db: str,
+    user: str,
+    password: str,
+    batch_size: int = 50000,
+) -> bool:
+    """Add and fill the WGS84 columns on parcels, in gid batches."""
+    import psycopg2
+
+    logger.info("Precomputing WGS84 geometry for parcels...")
+
+    try:
+        conn = psycopg2.connect(
+            host=host,
+            port=port,
+            dbname=db,
+            user=user,
+            password=password
+        )
+        conn.autocommit = True
+        cursor = conn.cursor()
+
+        for column, column_type in COLUMNS:
+            cursor.execute(f"ALTER TABLE parcels ADD COLUMN IF NOT EXISTS {column} {column_type}")
+
+        cursor.execute("SELECT min(gid), max(gid) FROM parcels")
+        min_gid, max_gid = cursor.fetchone()
+        if min_gid is None:
+            logger.warning("  ⚠ parcels table is empty")
+            return True
+
+        # One transaction per batch keeps locks and WAL bursts small
+        start_time = time.time()
+        updated = 0
+        for start in range(min_gid, max_gid + 1, batch_size):
+            cursor.execute(UPDATE_BATCH, {"start": start, "end": start + batch_size})
+            updated += cursor.rowcount
+            logger.info(f"  {updated:,} parcels ({start + batch_size - min_gid:,} / "
+                        f"{max_gid - min_gid + 1:,} gids)")
+
+        for statement in INDEXES:
+            cursor.execute(statement)
+        cursor.execute("ANALYZE parcels")
+
+        logger.info(f"  ✓ {updated:,} parcels in {time.time() - start_time:.0f}s")
+
+        cursor.close()
+        conn.close()
+        return True
+    except Exception as e:
+        logger.error(f"Failed to precompute WGS84 geometry: {e}")
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize WGS84 parcel geometry in PostGIS")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="PostgreSQL host")
+    parser.add_argument("--port", default=DEFAULT_PORT, help="PostgreSQL port")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Database name")
+    parser.add_argument("--user", default=DEFAULT_USER, help="Database user")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Database password")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Parcels (gids) per UPDATE")
+    args = parser.parse_args()
+
+    ok = precompute_wgs84(
+        args.host, args.port, args.db, args.user, args.password, args.batch_size
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    exit(main())